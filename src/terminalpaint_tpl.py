@@ -1,94 +1,54 @@
 from pathlib import Path
 from termpaint_lib import *
+from termpaint_canvas import Canvas, TiledCanvas, BLANK_COLOR_PAIR_IDX
+from termpaint_view import Viewport
+from termpaint_history import History, CellEdit, SpanEdit, ShapeEdit, RegionEdit, GroupEdit, CanvasEdit
+from termpaint_fill import RegionIndex, find_region_spans
+from termpaint_shapes import RubberBand, line_spans, rect_spans, ellipse_spans
+from termpaint_clipboard import Clipboard, region_rect, copy_region, flip_region, rotate_region, map_region_colors
+from termpaint_layers import Layer, LayeredCanvas
+from termpaint_frames import Animation
+from termpaint_io import RAW_TO_IDX, IDX_TO_RAW, read_paint, write_paint
+from termpaint_autosave import Autosaver, default_autosave_path
+from termpaint_import import IMAGE_SUFFIXES, image_to_canvas
+from termpaint_browser import OpenDialog
+from termpaint_perf import CountingWindow, PerfRecorder
+from termpaint_session import RecordingWindow
+from termpaint_mmap import BINARY_SUFFIX, open_binary_paint, write_binary_paint
+from termpaint_palette import Palette, parse_color, format_color
+from termpaint_diff import diff_with_file
+from termpaint_colorindex import ColorIndex
+import argparse
+import os
+import time
+from contextlib import nullcontext
+from functools import partial, wraps
 import curses.ascii
+import termpaint_ansi
 
-def move_cursor(w, canvas_dim, key, now_coord):
-    """Move the cursor one position in a certain direction
+# Palette lookup tables, built once instead of on every key press
+COLOR_KEYS = tuple(ord(raw) for raw in RAW_TO_IDX)
+KEY_TO_IDX = {ord(raw): idx for raw, idx in RAW_TO_IDX.items()}
+_COLOR_INPUT_TABLES = {
+    'color input tuple': COLOR_KEYS,
+    'ordInput-idx dict': KEY_TO_IDX,
+    'rawInput-idx dict': RAW_TO_IDX,
+    'idx-rawInput dict': IDX_TO_RAW,
+}
 
-    This function receives an ASCII value of a key pressed
-    from the keyboard. It dictates where the cursor will be
-    moved from `now_coord`. The resulting coordinate will be
-    clipped to one less than the the canvas dimensions.
-
-    :param w: the `Window` object
-    :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
-    :param key: the key pressed
-    :type key: int
-    :param now_coord: current coordinate as a 2-ary tuple `(row, column)`
-    :type now_coord: tuple
-    :return: resulting coordinate as a 2-ary tuple `(row, column)`
-    """
+def color_input(color_return):
+    """Get a palette lookup table
 
-    x_value = now_coord[1]
-    y_value = now_coord[0]
+    The tables are built once when the module is loaded, so this does
+    not allocate anything. Hot paths use the module-level tables directly.
 
-    if key == curses.KEY_DOWN:
-        if y_value == canvas_dim[0] - 1:
-            pass
-        else:
-            y_value += 1
-    elif key == curses.KEY_UP:
-        if y_value == 0:
-            pass
-        else:
-            y_value -= 1
-    elif key == curses.KEY_LEFT:
-        if x_value == 0:
-            pass
-        else:
-            x_value -= 1
-    elif key == curses.KEY_RIGHT:
-        if x_value == canvas_dim[1] - 1:
-            pass
-        else:
-            x_value += 1
-    return w.move(y_value, x_value)
+    :param color_return: one of `'color input tuple'`, `'ordInput-idx dict'`, `'rawInput-idx dict'` or `'idx-rawInput dict'`
+    :type color_return: string
+    :return: the lookup table
+    """
+    return _COLOR_INPUT_TABLES[color_return]
 
-def color_input(color_return):
-    if color_return == 'color input tuple':
-        return (ord('r'), ord('g'), ord('b'), ord('c'), ord('m'), ord('y'), ord('w'), ord('x'))
-
-    elif color_return == 'ordInput-idx dict':
-        return {ord('r'): 3,
-                ord('g'): 4,
-                ord('b'): 5,
-                ord('c'): 6,
-                ord('m'): 7,
-                ord('y'): 8,
-                ord('w'): 9,
-                ord('x'): 10}
-
-    elif color_return == 'rawInput-idx dict':
-        return {'r': 3,
-                'g': 4,
-                'b': 5,
-                'c': 6,
-                'm': 7,
-                'y': 8,
-                'w': 9,
-                'x': 10}
-    
-    elif color_return == 'idx-rawInput dict':
-        return {3: 'r',
-                4: 'g',
-                5: 'b',
-                6: 'c',
-                7: 'm',
-                8: 'y',
-                9: 'w',
-                10: 'x',
-                196608: 'r',
-                262144: 'g',
-                327680: 'b',
-                393216: 'c',
-                458752: 'm',
-                524288: 'y',
-                589824: 'w',
-                655360: 'x'}
-
-def pencil_canvas(w, canvas_dim, coord, color_pair_idx):
+def pencil_canvas(w, view, coord, color_pair_idx, history=None):
     """Color a single coordinate in the canvas
 
     This function accepts a `color_pair_idx` corresponding
@@ -96,98 +56,193 @@ def pencil_canvas(w, canvas_dim, coord, color_pair_idx):
 
     :param w: the `Window` object
     :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
-    :param coord: coordinate to color as a 2-ary tuple `(row, column)`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param coord: screen coordinate to color as a 2-ary tuple `(row, column)`
     :type coord: tuple
     :param color_pair_idx: index of the color-pair `coord` should be set to
     :type color_pair_idx: int
+    :param history: journal to record the edit in, or `None`
+    :type history: `class History`
     """
 
-    return color_cell_at(w, get_cursor_pos(), color_input('ordInput-idx dict')[color_pair_idx])
+    color_pair_idx = KEY_TO_IDX[color_pair_idx]
+    canvas_coord = view.to_canvas(coord)
+    if history is not None:
+        old_color_pair_idx = view.canvas.get(canvas_coord)
+        if old_color_pair_idx != color_pair_idx:
+            history.record(CellEdit(canvas_coord, old_color_pair_idx, color_pair_idx))
+    view.canvas.set(canvas_coord, color_pair_idx)
+    redraw_span(w, view, (canvas_coord[0], canvas_coord[1], canvas_coord[1] + 1))
 
-def valid_coord(canvas_dim, visited, coord):
-    if coord[0] < 0 or coord[1] < 0 or coord[0] >= canvas_dim[0] or coord[1] >= canvas_dim[1] or coord in visited:
-        return False
-    return True
+def _region_index(canvas):
+    # The region index of a drawing, or `None` if it is memory-mapped or too
+    # noisy to label; a drawing with layers keeps it on its active layer,
+    # which may be memory-mapped while the drawing itself is not
+    if canvas.mapped_path is not None:
+        return None
+    region_index = canvas.indexed(RegionIndex)
+    if region_index.canvas.mapped_path is not None or not region_index.can_label():
+        return None
+    return region_index
 
-def fill_canvas(w, canvas_dim, start_coord, color_pair_idx):
+def fill_canvas(w, view, start_coord, color_pair_idx, connectivity=4, history=None):
     """Flood-fill a color starting at a coordinate in the canvas
 
     Given a `start_coord`, this function will try to fill this cell, its
     adjacent cells (north, east, west, south), the adjacent cells' adjacent
     cells, etc. with a similar color pair as itself to a new color pair until
-    the color pair of the whole group of cells have been changed.
+    the color pair of the whole group of cells have been changed. With
+    `connectivity=8`, diagonally adjacent cells are filled as well.
+
+    With `connectivity=4`, the region is taken from the region index of
+    the drawing (see `RegionIndex`). The first fill labels the whole
+    drawing, and later fills only label again the rows changed since the
+    last one. Opening a drawing does not label it, so drawings that are
+    never filled do not pay for it. Memory-mapped drawings and layers,
+    drawings with too many runs to label quickly (see `RegionIndex.can_label()`),
+    and `connectivity=8`, search for the region with `find_region_spans()`
+    instead. Each span of the region is colored
+    with a single `chgat` call.
 
     :param w: the `Window` object
     :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
-    :param start_coord: starting coordinate to color as a 2-ary tuple `(row, column)`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param start_coord: starting screen coordinate to color as a 2-ary tuple `(row, column)`
     :type start_coord: tuple
     :param color_pair_idx: index of the color-pair `start_coord` and its adjacent cells should be set to
     :type color_pair_idx: int
+    :param connectivity: either `4` or `8`
+    :type connectivity: int
+    :param history: journal to record the edit in, or `None`
+    :type history: `class History`
     """
-    # HINT: Read on breadth-first search (BFS) on a grid.
-    #       Make sure to keep track of the original color while doing the coloring.
-
-    queue = []
-    visited = []
-
-    queue.append(start_coord)
-    visited.append(start_coord)
-    initial_color = get_color_pair_idx_at(w, start_coord)
-    final_color = color_input('ordInput-idx dict')[color_pair_idx]
-    color_cell_at(w, start_coord, final_color)
-
-    while queue:
-        current_coord = queue.pop(0)
-        current_y_coord = current_coord[0]
-        current_x_coord = current_coord[1]
-        
-        if valid_coord(canvas_dim, visited, (current_y_coord + 1, current_x_coord)) == True:
-            coord_color = get_color_pair_idx_at(w, (current_y_coord + 1, current_x_coord))
-            if coord_color == initial_color:
-                color_cell_at(w, (current_y_coord + 1, current_x_coord), final_color)
-                queue.append((current_y_coord + 1, current_x_coord))
-                visited.append((current_y_coord + 1, current_x_coord))
-        
-        if valid_coord(canvas_dim, visited, (current_y_coord - 1, current_x_coord)) == True:
-            coord_color = get_color_pair_idx_at(w, (current_y_coord - 1, current_x_coord))
-            if coord_color == initial_color:
-                color_cell_at(w, (current_y_coord - 1, current_x_coord), final_color)
-                queue.append((current_y_coord - 1, current_x_coord))
-                visited.append((current_y_coord - 1, current_x_coord))
-        
-        if valid_coord(canvas_dim, visited, (current_y_coord, current_x_coord + 1)) == True:
-            coord_color = get_color_pair_idx_at(w, (current_y_coord, current_x_coord + 1))
-            if coord_color == initial_color:
-                color_cell_at(w, (current_y_coord, current_x_coord + 1), final_color)
-                queue.append((current_y_coord, current_x_coord + 1))
-                visited.append((current_y_coord, current_x_coord + 1))
-        
-        if valid_coord(canvas_dim, visited, (current_y_coord, current_x_coord - 1)) == True:
-            coord_color = get_color_pair_idx_at(w, (current_y_coord, current_x_coord - 1))
-            if coord_color == initial_color:
-                color_cell_at(w, (current_y_coord, current_x_coord - 1), final_color)
-                queue.append((current_y_coord, current_x_coord - 1))
-                visited.append((current_y_coord, current_x_coord - 1))
-        
+    final_color = KEY_TO_IDX[color_pair_idx]
+
+    canvas = view.canvas
+    canvas_coord = view.to_canvas(start_coord)
+
+    initial_color = canvas.get(canvas_coord)
+
+    if initial_color != final_color:
+        region_index = _region_index(canvas) if connectivity == 4 else None
+        if region_index is not None:
+            spans = region_index.region_spans(canvas_coord)
+        else:
+            spans = find_region_spans(canvas, canvas_coord, connectivity)
+        for y_value, x_start, x_end in spans:
+            canvas.fill_span(y_value, x_start, x_end, final_color)
+            redraw_span(w, view, (y_value, x_start, x_end))
+        if history is not None:
+            history.record(SpanEdit(spans, initial_color, final_color))
+
     w.move(start_coord[0], start_coord[1])
-    w.refresh()
+    w.noutrefresh()
+
+def draw_shape(w, view, spans, color_pair_idx, history=None):
+    """Color the spans of a shape in the canvas
+
+    Each span is colored with a single `chgat` call. The cells under the
+    shape are kept in the journal so the shape can be undone.
 
-def clear_canvas(w, term_dim, canvas_dim):
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param spans: `list` of canvas spans as 3-ary tuples `(row, column_start, column_end)`, as returned by `line_spans()`
+    :type spans: list
+    :param color_pair_idx: index of the color-pair of the shape
+    :type color_pair_idx: int
+    :param history: journal to record the edit in, or `None`
+    :type history: `class History`
+    """
+    cur_coord = get_cursor_pos()
+    canvas = view.canvas
+    old_cells = bytearray()
+    for y_value, x_start, x_end in spans:
+        old_cells += canvas.span(y_value, x_start, x_end)
+        canvas.fill_span(y_value, x_start, x_end, color_pair_idx)
+        redraw_span(w, view, (y_value, x_start, x_end))
+
+    if history is not None and old_cells.count(color_pair_idx) != len(old_cells):
+        history.record(ShapeEdit(spans, old_cells, color_pair_idx))
+
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+
+def clear_region(w, view, top_left, dim):
+    """Set a rectangular part of the canvas to color pair 10
+
+    Each row is cleared with a single `chgat` call.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param top_left: canvas coordinate of the top-left corner as a 2-ary tuple `(row, column)`
+    :type top_left: tuple
+    :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :return: the `RegionEdit` to record, or `None` if nothing changed
+    """
+    cur_coord = get_cursor_pos()
+    canvas = view.canvas
+    old_cells = copy_region(canvas, top_left, dim).cells
+    for y_value in range(top_left[0], top_left[0] + dim[0]):
+        canvas.fill_span(y_value, top_left[1], top_left[1] + dim[1], BLANK_COLOR_PAIR_IDX)
+        redraw_span(w, view, (y_value, top_left[1], top_left[1] + dim[1]))
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+
+    new_cells = bytes([BLANK_COLOR_PAIR_IDX]) * len(old_cells)
+    if old_cells != new_cells:
+        return RegionEdit(top_left, dim, old_cells, new_cells)
+
+def paste_region(w, view, region, top_left):
+    """Copy a region into the canvas
+
+    The region is clipped to the canvas. Every row is written to the
+    canvas as one slice and drawn with one `chgat` call per run of colors.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param region: the region as returned by `copy_region()`
+    :type region: `class Canvas`
+    :param top_left: canvas coordinate to paste the top-left corner at as a 2-ary tuple `(row, column)`
+    :type top_left: tuple
+    :return: the `RegionEdit` to record, or `None` if nothing changed
+    """
+    cur_coord = get_cursor_pos()
+    canvas = view.canvas
+    dim = (min(region.dim[0], canvas.dim[0] - top_left[0]), min(region.dim[1], canvas.dim[1] - top_left[1]))
+    old_cells = copy_region(canvas, top_left, dim).cells
+    new_cells = copy_region(region, (0, 0), dim).cells
+    for y_offset in range(dim[0]):
+        canvas.write_span(top_left[0] + y_offset, top_left[1], bytes(new_cells[y_offset * dim[1]:(y_offset + 1) * dim[1]]))
+        redraw_span(w, view, (top_left[0] + y_offset, top_left[1], top_left[1] + dim[1]))
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+
+    if old_cells != new_cells:
+        return RegionEdit(top_left, dim, old_cells, new_cells)
+
+def clear_canvas(w, term_dim, view, history=None):
     """Clear canvas
 
-    This function fills the whole of the canvas with color pair 0.
+    This function fills the whole of the canvas with color pair 10.
     After that, it will print a prompt.
 
     :param w: the `Window` object
     :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
     :param term_dim: terminal dimensions as a 2-ary tuple `(row, column)`
     :type term_dim: tuple
+    :param history: journal to record the edit in, or `None`
+    :type history: `class History`
     """
     yn = None
     while yn != True:
@@ -196,18 +251,32 @@ def clear_canvas(w, term_dim, canvas_dim):
             break
 
     if yn == True:
-        for y_value in range(canvas_dim[0]):
-            color_cell_at(w, (y_value, 0), 10, True)
-        print_status_bar(w, term_dim, msg='Canvas cleared!')
+        msg = 'Canvas cleared!'
+        # A snapshot over the journal cap would push out every older edit
+        if history is not None and not history.record(CanvasEdit(view.canvas, BLANK_COLOR_PAIR_IDX)):
+            msg = 'Canvas cleared! Too large to undo'
+        view.canvas.clear(BLANK_COLOR_PAIR_IDX)
+        draw_canvas(w, view)
+        print_status_bar(w, term_dim, msg=msg)
         w.move(0, 0)
-        w.refresh()
+        w.noutrefresh()
 
-def open_drawing(w, canvas_dim, fpath):
+def open_drawing(w, view, fpath):
     """Open a drawing file
 
     Open a .paint file specified in `fpath`. `fpath` is specified
     relative to the current working directory.
 
+    A .paint file is read into a new canvas as large as the drawing in it,
+    but at least the size of the screen; a layered one keeps its layers,
+    with the top one active, and an animation keeps its frames. A
+    binary .bpaint file is memory-mapped instead, so it may be much larger
+    than the screen; only the part that fits on the screen is drawn. A
+    .png or .ppm image is scaled to the screen and mapped to the drawing
+    colors (see `image_to_canvas()`). The view is moved back to the
+    top-left corner of the drawing. The palette of a .paint file replaces
+    `PALETTE`; a .bpaint file has no palette, so it keeps the one in use.
+
     If successful, it will return a 2-ary tuple (`is_success`, `str_info`)
     relating to the result of the file open. If successful, `is_success` is
     `True` and `str_info` contains `fpath`. Otherwise, `is_success` is `False`
@@ -215,11 +284,12 @@ def open_drawing(w, canvas_dim, fpath):
     
     In addition, this function will clear the canvas and draw the contents
     of the file on it if the file is found and reading is successful.
+    Cells not covered by the file are set to color pair 10.
 
     :param w: the `Window` object
     :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
     :param fpath: path to the paint file relative to the current working directory
     :type fpath: string
     :return: `tuple` (`bool`, `str`) of the status of opening
@@ -229,46 +299,57 @@ def open_drawing(w, canvas_dim, fpath):
     file_suffix = Path(fpath).suffix
     try:
         if file_suffix == '.paint':
-            with open(fpath, 'r') as open_file:
-                magic_string = open_file.readline().strip()
-                if magic_string == 'EEE111_PAINT1234':
-                    for y_value in range(canvas_dim[0]):
-                        color_cell_at(w, (y_value, 0), 0, True)
-                    y_coord = 0
-                    for line in open_file:
-                        x_coord = 0
-                        for pixel in line.strip():
-                            color_cell_at(w, (y_coord, x_coord), color_input('rawInput-idx dict')[pixel])
-                            x_coord += 1
-                        y_coord += 1
-                    return (True, fpath)
-                else:
-                    return (False, fpath)
+            # Read into a new canvas so a bad file leaves the drawing untouched
+            palette = Palette()
+            view.replace(read_paint(fpath, min_dim=view.dim, layers=True, frames=True, palette=palette))
+            PALETTE.replace(palette)
+            PAIRS.reset()
+            draw_canvas(w, view)
+            return (True, fpath)
+        elif file_suffix.lower() in IMAGE_SUFFIXES:
+            view.replace(image_to_canvas(fpath, view.dim))
+            PALETTE.clear()
+            PAIRS.reset()
+            draw_canvas(w, view)
+            w.move(0, 0)
+            return (True, fpath)
+        elif file_suffix == BINARY_SUFFIX:
+            view.replace(open_binary_paint(fpath))
+            draw_canvas(w, view)
+            w.move(0, 0)
+            return (True, fpath)
         else:
             return (False, fpath)
     except:
         return (False, fpath)
 
-def save_drawing(w, canvas_dim, fpath):
+def save_drawing(w, canvas, fpath):
     """Save a drawing file
 
     Save the drawing on the canvas to the file path specified in `fpath`.
     `fpath` is specified relative to the current working directory. If
     the file exists, it will be overwritten. If `fpath` does not end with
-    `.paint`, the function will append `.paint` to the path before saving.
+    `.paint` or `.bpaint`, the function will append `.paint` to the path
+    before saving. Paths ending with `.bpaint` are saved in the binary
+    format; saving a memory-mapped canvas to its own file only flushes it.
+    A drawing with layers is saved with its layers to a .paint file, and
+    flattened to a .bpaint file. An animation is saved with its frames to
+    a .paint file; only its current frame is saved to a .bpaint file.
 
     If successful, it will return a 2-ary tuple (`is_success`, `str_info`)
     relating to the result of the file open. If successful, `is_success` is
     `True` and `str_info` contains `fpath`. Otherwise, `is_success` is `False`
     and `str_info` will either return an error message as a string or `None`.
     
-    In addition, this function will clear the canvas and draw the contents
-    of the file on it if the file is found and reading is successful.
+    The drawing is read from `canvas`, not from the window, and written
+    with run-length encoded rows and the colors of `PALETTE` (see
+    `write_paint()`). `open_drawing()` reads both this and the plain
+    `EEE111_PAINT1234` format.
 
     :param w: the `Window` object
     :type w: `class Window`
-    :param canvas_dim: canvas dimensions as a 2-ary tuple `(row, column)`
-    :type canvas_dim: tuple
+    :param canvas: the drawing being saved
+    :type canvas: `class Canvas`
     :param fpath: path to the paint file relative to the current working directory
     :type fpath: string
     :return: `tuple` (`bool`, `str`) of the status of opening
@@ -276,112 +357,1052 @@ def save_drawing(w, canvas_dim, fpath):
     # HINT: Read on the `with` construct and `open()` function somewhere to open a file
     
     try:
-        if Path(fpath).suffix != '.paint':
+        if Path(fpath).suffix not in ('.paint', BINARY_SUFFIX):
             fpath += '.paint'
         
-        with open(fpath, 'w') as save_file:
-            save_file.write('EEE111_PAINT1234\n')
-            y_coord = 0
-            for line in range(canvas_dim[0]):
-                x_coord = 0
-                for pixel in range(canvas_dim[1]):
-                    pixel_color = get_color_pair_idx_at(w, (y_coord, x_coord))
-                    save_file.write(color_input('idx-rawInput dict')[pixel_color])
-                    x_coord += 1
-                save_file.write('\n')
-                y_coord += 1
-            return (True, fpath)
+        if Path(fpath).suffix == BINARY_SUFFIX:
+            if canvas.mapped_path is not None and os.path.exists(fpath) and os.path.samefile(fpath, canvas.mapped_path):
+                canvas.flush()
+            elif isinstance(canvas, LayeredCanvas):
+                # Flattening into the file a layer is mapped from would change that layer
+                for layer in canvas.layers:
+                    if layer.canvas.mapped_path is not None and os.path.exists(fpath) and os.path.samefile(fpath, layer.canvas.mapped_path):
+                        return (False, fpath)
+                write_binary_paint(fpath, canvas.flatten())
+            elif isinstance(canvas, Animation):
+                write_binary_paint(fpath, canvas.frame_canvas(canvas.current))
+            else:
+                write_binary_paint(fpath, canvas)
+        else:
+            write_paint(fpath, canvas, palette=PALETTE)
+        return (True, fpath)
     except:
         return (False, fpath)
 
-def constant_commands(w, term_dim, canvas_dim, key, now_paint_mode):
-    if key in (curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT):
-        move_cursor(w, canvas_dim, key, get_cursor_pos())
-        w.refresh()
+def undo_redo(w, view, history, undo):
+    """Undo or redo the newest edit and draw the cells it changed
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param history: journal of the edits
+    :type history: `class History`
+    :param undo: `True` to undo, `False` to redo
+    :type undo: bool
+    :return: `bool` - `False` if there was nothing to undo or redo
+    """
+    cur_coord = get_cursor_pos()
+    changed = history.undo(view.canvas) if undo else history.redo(view.canvas)
+    if changed is False:
+        return False
+
+    if changed is None:
+        draw_canvas(w, view)
+    else:
+        for y_value, x_start, x_end, _ in changed:
+            redraw_span(w, view, (y_value, x_start, x_end))
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+    return True
 
-    elif key == curses.ascii.ctrl(ord('p')):
-        now_paint_mode = 'Pencil'
-        print_status_bar(w, term_dim, msg=f'> {now_paint_mode} Mode')
-        return now_paint_mode
+# Row and column steps of the arrow keys
+ARROW_STEPS = {
+    curses.KEY_UP: (-1, 0),
+    curses.KEY_DOWN: (1, 0),
+    curses.KEY_LEFT: (0, -1),
+    curses.KEY_RIGHT: (0, 1),
+}
 
-    elif key == curses.ascii.ctrl(ord('f')):
-        now_paint_mode = 'Fill'
-        print_status_bar(w, term_dim, msg=f'> {now_paint_mode} Mode')
-        return now_paint_mode
+def move_cursor_keys(w, view, keys):
+    """Move the cursor for a run of arrow keys at once
 
-    elif key == curses.ascii.ctrl(ord('x')):    # ^X (clear canvas)
-        clear_canvas(w, term_dim, canvas_dim)
+    The keys are applied one after another as if pressed separately: the
+    cursor moves inside the visible part of the canvas, and pushing it
+    against an edge scrolls the view by one row or column if the canvas
+    continues past it. Only the end result is drawn, with a single
+    `scroll_view()` and `move()`, so holding down an arrow key costs one
+    frame per batch of keys instead of one per key.
 
-    elif key == curses.ascii.ctrl(ord('o')):    # ^O (open drawing)
-        success = open_drawing(w, canvas_dim, collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter drawing to open: '))
-        if success[0] == True:
-            print_status_bar(w, term_dim, msg='Drawing opened!')
-        
-        elif success[0] == False:
-            print_status_bar(w, term_dim, msg='Drawing NOT opened!')
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param keys: arrow keys, in the order they were pressed
+    :type keys: list
+    """
+    y_value, x_value = get_cursor_pos()
+    origin = view.origin
+    canvas_dim = view.canvas.dim
 
-    elif key == curses.ascii.ctrl(ord('s')):    # ^S (save drawing)
-        success = save_drawing(w, canvas_dim, collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter path to save drawing: '))
-        if success[0] == True:
-            print_status_bar(w, term_dim, msg='Drawing saved!')
-        
-        elif success[0] == False:
-            print_status_bar(w, term_dim, msg='Drawing NOT saved!')
+    for key in keys:
+        d_row, d_col = ARROW_STEPS[key]
+        visible_rows = min(canvas_dim[0] - origin[0], view.dim[0])
+        visible_cols = min(canvas_dim[1] - origin[1], view.dim[1])
+        next_y, next_x = y_value + d_row, x_value + d_col
+        if 0 <= next_y < visible_rows and 0 <= next_x < visible_cols:
+            y_value, x_value = next_y, next_x
+        else:
+            origin = view.clamp_origin((origin[0] + d_row, origin[1] + d_col))
+
+    scroll_view(w, view, origin)
+    w.move(y_value, x_value)
+    w.noutrefresh()
+
+def new_drawing(w, view, size):
+    """Start a new, empty drawing
+
+    The drawing is a `TiledCanvas`, so it can be much larger than the
+    screen while only the tiles drawn on take memory.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param size: dimensions as text in the form `ROWS COLUMNS`, or empty for the screen size
+    :type size: string
+    :return: `tuple` (`bool`, `str`) of the status of creating
+    """
+    try:
+        dim = tuple(int(value) for value in size.split()) if size.strip() else view.dim
+        if len(dim) != 2 or dim[0] <= 0 or dim[1] <= 0:
+            return (False, size)
+    except ValueError:
+        return (False, size)
+
+    view.replace(TiledCanvas(dim))
+    PALETTE.clear()
+    PAIRS.reset()
+    draw_canvas(w, view)
+    w.move(0, 0)
+    return (True, size)
+
+def play_animation(w, view, animation):
+    """Play the frames of an animation in a loop until a key is pressed
+
+    Frames are shown `animation.fps` times per second, starting with the
+    one after the current frame. Only the cells that differ from the frame
+    before (see `Animation.changed_spans()`) are drawn, and every frame is
+    sent to the terminal at once. If drawing a frame takes longer than its
+    time, the next one is shown right away instead of catching up with a
+    burst of frames. The onion skin is hidden while playing. The key that
+    stops the playback is not handled.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param animation: the animation to play; its current frame must be shown
+    :type animation: `class Animation`
+    :return: 2-ary tuple (`int` frames_shown, `float` seconds) of the playback
+    """
+    cur_coord = get_cursor_pos()
+    onion = animation.onion
+    animation.onion = False
+    if onion:
+        draw_canvas(w, view)
+
+    interval = 1 / animation.fps
+    shown = animation.current
+    frames_shown = 0
+    start = next_time = time.perf_counter()
+    w.nodelay(True)
+    try:
+        while w.getch() == -1:
+            next_idx = (shown + 1) % len(animation.frames)
+            for y_value, x_start, x_end, color_pair_idx in animation.changed_spans(shown, next_idx, view.origin, view.visible_dim()):
+                draw_span(w, view, (y_value, x_start, x_end), color_pair_idx)
+            shown = next_idx
+            frames_shown += 1
+            w.move(cur_coord[0], cur_coord[1])
+            update_screen(w)
+
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+    finally:
+        w.nodelay(False)
+        animation.onion = onion
+    seconds = time.perf_counter() - start
+
+    # Show the current frame again
+    if onion:
+        draw_canvas(w, view)
+    else:
+        for y_value, x_start, x_end, color_pair_idx in animation.changed_spans(shown, animation.current, view.origin, view.visible_dim()):
+            draw_span(w, view, (y_value, x_start, x_end), color_pair_idx)
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+    return frames_shown, seconds
+
+# Returned by a key handler to end the main loop
+QUIT = 'Quit'
+
+def show_diff(w, term_dim, view, diff):
+    """Highlight the cells of a diff until a key other than an arrow key is pressed
+
+    The highlight is only drawn on the screen; the drawing is left as it
+    is. Changed cells are covered with a checkerboard (see `hatch_span()`)
+    rather than a color, so they cannot be mistaken for cells of that
+    color. Arrow keys move the cursor and scroll the view as usual, and only
+    the changed cells on the screen are highlighted again. The key that
+    ends it is not handled otherwise.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param term_dim: terminal dimensions as a 2-ary tuple `(row, column)`
+    :type term_dim: tuple
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param diff: the cells to highlight, in canvas coordinates
+    :type diff: `class PaintDiff`
+    """
+    row_spans = {}
+    for span in diff.spans:
+        row_spans.setdefault(span[0], []).append(span)
+    print_status_bar(w, term_dim, msg=f'{diff.cells} cells differ in {len(diff.areas())} areas - arrows scroll, any other key hides them'[:term_dim[1] - 1])
+
+    while True:
+        cur_coord = get_cursor_pos()
+        for y_value in range(view.origin[0], view.origin[0] + view.visible_dim()[0]):
+            for span in row_spans.get(y_value, ()):
+                hatch_span(w, view, span)
+        w.move(cur_coord[0], cur_coord[1])
+        update_screen(w)
+        key = w.getch()
+        if key not in ARROW_STEPS:
+            break
+        move_cursor_keys(w, view, [key])
+
+    cur_coord = get_cursor_pos()
+    unhatch_rows(w, view)
+    draw_canvas(w, view)
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
+
+def _move_key(w, term_dim, view, history, key, now_paint_mode):
+    move_cursor_keys(w, view, [key])
+
+def _pencil_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    print_status_bar(w, term_dim, msg='> Pencil Mode')
+    return 'Pencil'
+
+def _fill_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    print_status_bar(w, term_dim, msg='> Fill Mode')
+    return 'Fill'
+
+def _line_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    print_status_bar(w, term_dim, msg='> Line Mode')
+    return 'Line'
+
+def _rect_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    # Pressed again, switches between the outline and the filled shape
+    paint_mode = 'Filled Rect' if now_paint_mode == 'Rect' else 'Rect'
+    print_status_bar(w, term_dim, msg=f'> {paint_mode} Mode')
+    return paint_mode
+
+def _ellipse_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    paint_mode = 'Filled Ellipse' if now_paint_mode == 'Ellipse' else 'Ellipse'
+    print_status_bar(w, term_dim, msg=f'> {paint_mode} Mode')
+    return paint_mode
+
+def _clear_key(w, term_dim, view, history, key, now_paint_mode):
+    clear_canvas(w, term_dim, view, history)
+
+def _undo_key(w, term_dim, view, history, key, now_paint_mode):
+    if not undo_redo(w, view, history, True):
+        print_status_bar(w, term_dim, msg='Nothing to undo!')
+    # Undoing an edit on another frame makes it the current one
+    _sync_history_layer(view, history)
+
+def _redo_key(w, term_dim, view, history, key, now_paint_mode):
+    if not undo_redo(w, view, history, False):
+        print_status_bar(w, term_dim, msg='Nothing to redo!')
+    _sync_history_layer(view, history)
+
+def _new_key(w, term_dim, view, history, key, now_paint_mode):
+    success = new_drawing(w, view, collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter size of new drawing (rows columns): '))
+    if success[0] == True:
+        history.clear()
+        _sync_history_layer(view, history)
+        print_status_bar(w, term_dim, msg='New drawing created!')
+    else:
+        print_status_bar(w, term_dim, msg='Drawing NOT created!')
+
+# Files that `open_drawing()` can open
+OPEN_SUFFIXES = ('.paint', BINARY_SUFFIX) + IMAGE_SUFFIXES
+
+OPEN_DIALOG = OpenDialog(OPEN_SUFFIXES)
+
+def _open_key(w, term_dim, view, history, key, now_paint_mode):
+    fpath = OPEN_DIALOG.run(w, term_dim)
+    if fpath is None:
+        print_status_bar(w, term_dim, msg='Open cancelled')
+        return
+    success = open_drawing(w, view, fpath)
+    if success[0] == True:
+        history.clear()
+        _sync_history_layer(view, history)
+        print_status_bar(w, term_dim, msg='Drawing opened!')
+    else:
+        print_status_bar(w, term_dim, msg=f'Drawing NOT opened: {fpath}'[:term_dim[1] - 1])
+
+def _save_key(w, term_dim, view, history, key, now_paint_mode):
+    success = save_drawing(w, view.canvas, collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter path to save drawing: '))
+    if success[0] == True:
+        print_status_bar(w, term_dim, msg='Drawing saved!')
+    else:
+        print_status_bar(w, term_dim, msg='Drawing NOT saved!')
+
+def _sync_history_layer(view, history):
+    # Record the edits on the active layer of a drawing with layers, or on the current frame of an animation
+    history.layer = view.canvas.active if isinstance(view.canvas, LayeredCanvas) else None
+    history.frame = view.canvas.frames[view.canvas.current] if isinstance(view.canvas, Animation) else None
 
-def ui_main(w):
-    # Initialize color pairs
+def _print_layer_status(w, term_dim, view):
+    canvas = view.canvas
+    layer = canvas.layers[canvas.active]
+    transparent = 'opaque' if layer.transparent is None else f'transparent {IDX_TO_RAW[layer.transparent]}'
+    hidden = ', hidden' if not layer.visible else ''
+    print_status_bar(w, term_dim, msg=f'Layer {canvas.active + 1} of {len(canvas.layers)}: {layer.name} ({transparent}{hidden})')
+
+def _add_layer_key(w, term_dim, view, history, key, now_paint_mode):
+    if isinstance(view.canvas, Animation):
+        print_status_bar(w, term_dim, msg='Layers cannot be added to an animation')
+        return
+    if not isinstance(view.canvas, LayeredCanvas):
+        # The drawing so far becomes the bottom layer, with its edits
+        view.canvas = LayeredCanvas([Layer(view.canvas, 'Background')])
+        history.assign_layer(0)
+    view.canvas.add_layer(f'Layer {len(view.canvas.layers) + 1}')
+    history.touch()
+    _sync_history_layer(view, history)
+    _print_layer_status(w, term_dim, view)
+
+def _next_layer_key(w, term_dim, view, history, key, now_paint_mode):
+    if not isinstance(view.canvas, LayeredCanvas):
+        print_status_bar(w, term_dim, msg='No layers - press ^A to add one')
+        return
+    view.canvas.select((view.canvas.active + 1) % len(view.canvas.layers))
+    _sync_history_layer(view, history)
+    _print_layer_status(w, term_dim, view)
+
+def _hide_layer_key(w, term_dim, view, history, key, now_paint_mode):
+    if not isinstance(view.canvas, LayeredCanvas):
+        print_status_bar(w, term_dim, msg='No layers - press ^A to add one')
+        return
+    view.canvas.set_visible(view.canvas.active, not view.canvas.layers[view.canvas.active].visible)
+    history.touch()
+    draw_canvas(w, view)
+    _print_layer_status(w, term_dim, view)
+
+def _transparent_color_key(w, term_dim, view, history, key, now_paint_mode):
+    if not isinstance(view.canvas, LayeredCanvas):
+        print_status_bar(w, term_dim, msg='No layers - press ^A to add one')
+        return
+    raw = collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter transparent color of the layer (r g b c m y w x, or nothing for opaque): ').strip()
+    if raw and raw not in RAW_TO_IDX:
+        print_status_bar(w, term_dim, msg='Unknown color!')
+        return
+    view.canvas.set_transparent(view.canvas.active, RAW_TO_IDX[raw] if raw else None)
+    history.touch()
+    draw_canvas(w, view)
+    _print_layer_status(w, term_dim, view)
+
+def _pick_color_key(w, term_dim, view, history, key, now_paint_mode):
+    text = collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter color to draw with k (#rrggbb, or 0-255 for a terminal color): ')
+    try:
+        rgb = parse_color(text)
+    except ValueError:
+        print_status_bar(w, term_dim, msg='Unknown color!')
+        return
+    KEY_TO_RGB[CUSTOM_COLOR_KEY] = rgb
+    print_status_bar(w, term_dim, msg=f'Picked {format_color(rgb)} - press k to draw with it')
+
+def _color_name(color_pair_idx):
+    # A drawing color by its letter, a palette color as #rrggbb
+    return IDX_TO_RAW.get(color_pair_idx) or format_color(PALETTE.rgb(color_pair_idx))
+
+def _typed_color(text):
+    """Get a color typed as a letter, `#rrggbb` or 0-255
+
+    :return: 2-ary tuple (`int` color pair index, `tuple` RGB color); the index is `None` for a color not in `PALETTE`
+    """
+    if text in RAW_TO_IDX:
+        return RAW_TO_IDX[text], PALETTE.rgb(RAW_TO_IDX[text])
+    rgb = parse_color(text)
+    return PALETTE.find(rgb), rgb
+
+def _replace_color_key(w, term_dim, view, history, key, now_paint_mode):
+    text = collect_text_prompt(w, term_dim, lines_from_end=2, msg='Replace color everywhere (from and to, such as r b or x #ff8000): ')
+    try:
+        old_text, new_text = text.split()
+        old_color = _typed_color(old_text)[0]
+        new_color, new_rgb = _typed_color(new_text)
+    except ValueError:
+        print_status_bar(w, term_dim, msg='Enter two colors!')
+        return
+    if old_color is None or old_color == new_color:
+        print_status_bar(w, term_dim, msg='Nothing to replace')
+        return
+    if new_color is None:
+        try:
+            new_color = PALETTE.add(new_rgb)
+        except ValueError:
+            print_status_bar(w, term_dim, msg='The palette is full!')
+            return
+
+    # Only the rows with the color are read, by the color index
+    spans = view.canvas.indexed(ColorIndex).spans(old_color)
+    if not spans:
+        print_status_bar(w, term_dim, msg=f'No {old_text} cells')
+        return
+    edit = SpanEdit(spans, old_color, new_color)
+    edit.apply(view.canvas, False)
+    history.record(edit)
+
+    cur_coord = get_cursor_pos()
+    draw_canvas(w, view)
+    w.move(cur_coord[0], cur_coord[1])
+    cells = sum(x_end - x_start for _, x_start, x_end in spans)
+    print_status_bar(w, term_dim, msg=f'Replaced {cells} {old_text} cells with {new_text}')
+
+# Notes shown on the status bar by the main loop, toggled by their keys
+SHOWN_NOTES = set()
+
+def _counts_key(w, term_dim, view, history, key, now_paint_mode):
+    SHOWN_NOTES.symmetric_difference_update({'counts'})
+
+def color_counts_note(canvas, max_len):
+    """Get the number of cells of every color in a drawing as a status bar note
+
+    The numbers come from the color index of the drawing, so this only
+    takes time proportional to the rows changed since the last call.
+
+    :param canvas: the drawing
+    :type canvas: `class Canvas`, or any canvas with an `indexed()` method
+    :param max_len: length to cut the note to
+    :type max_len: int
+    :return: string such as `'x 1910 r 12 #ff8000 3'`, most cells first
+    """
+    counts = canvas.indexed(ColorIndex).colors()
+    note = ' '.join(f'{_color_name(color_pair_idx)} {count}' for color_pair_idx, count in counts.items())
+    return note if len(note) <= max_len else note[:max_len - 3] + '...'
+
+def region_note(view, coord):
+    """Get the size of the region of same-colored cells under a screen coordinate as a status bar note
+
+    The size comes from the region index of the drawing, so this only
+    takes time proportional to the edits since the last call. There is no
+    note for a memory-mapped drawing or a drawing with too many runs to
+    label quickly, or for a coordinate outside the drawing.
+
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param coord: screen coordinate as a 2-ary tuple `(row, column)`
+    :type coord: tuple
+    :return: string such as `'region 120'`, or `''`
+    """
+    canvas = view.canvas
+    canvas_coord = view.to_canvas(coord)
+    if not all(0 <= value < canvas_len for value, canvas_len in zip(canvas_coord, canvas.dim)):
+        return ''
+    region_index = _region_index(canvas)
+    if region_index is None:
+        return ''
+    return f'region {region_index.region_size(canvas_coord)}'
+
+def _print_frame_status(w, term_dim, view):
+    canvas = view.canvas
+    onion = ', onion skin' if canvas.onion else ''
+    print_status_bar(w, term_dim, msg=f'> Frames Mode - frame {canvas.current + 1} of {len(canvas.frames)}, {canvas.fps:g} fps{onion}, {len(canvas.store)} tiles stored')
+
+def _frames_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    if isinstance(view.canvas, LayeredCanvas):
+        print_status_bar(w, term_dim, msg='Frames cannot be added to a drawing with layers')
+        return
+    if not isinstance(view.canvas, Animation):
+        # The drawing so far becomes the first frame, with its edits
+        canvas = view.canvas
+        view.canvas = Animation([canvas])
+        canvas.close()
+        history.assign_frame(view.canvas.frames[0])
+        _sync_history_layer(view, history)
+    _print_frame_status(w, term_dim, view)
+    return 'Frames'
+
+def _add_frame_key(w, term_dim, view, history, key, now_paint_mode):
+    view.canvas.add_frame()
+    history.touch()
+    _sync_history_layer(view, history)
+    if view.canvas.onion:
+        draw_canvas(w, view)
+    _print_frame_status(w, term_dim, view)
+
+def _delete_frame_key(w, term_dim, view, history, key, now_paint_mode):
+    if len(view.canvas.frames) == 1:
+        print_status_bar(w, term_dim, msg='An animation needs at least one frame')
+        return
+    if not show_yn_prompt(w, term_dim, (8, 40), msg='Delete this frame?'):
+        return
+    view.canvas.delete_frame()
+    # Deleting a frame cannot be undone, so neither can the edits on it
+    history.clear()
+    _sync_history_layer(view, history)
+    draw_canvas(w, view)
+    _print_frame_status(w, term_dim, view)
+
+def _step_frame_key(w, term_dim, view, history, key, now_paint_mode):
+    canvas = view.canvas
+    shown = canvas.current
+    canvas.select((shown + (1 if key == ord('.') else -1)) % len(canvas.frames))
+    _sync_history_layer(view, history)
+    if canvas.onion:
+        draw_canvas(w, view)
+    else:
+        cur_coord = get_cursor_pos()
+        for y_value, x_start, x_end, color_pair_idx in canvas.changed_spans(shown, canvas.current, view.origin, view.visible_dim()):
+            draw_span(w, view, (y_value, x_start, x_end), color_pair_idx)
+        w.move(cur_coord[0], cur_coord[1])
+    _print_frame_status(w, term_dim, view)
+
+def _onion_key(w, term_dim, view, history, key, now_paint_mode):
+    view.canvas.onion = not view.canvas.onion
+    draw_canvas(w, view)
+    _print_frame_status(w, term_dim, view)
+
+def _play_key(w, term_dim, view, history, key, now_paint_mode):
+    print_status_bar(w, term_dim, msg='Playing - press any key to stop')
+    frames_shown, seconds = play_animation(w, view, view.canvas)
+    fps = frames_shown / seconds if seconds else 0.0
+    print_status_bar(w, term_dim, msg=f'Played {frames_shown} frames at {fps:.1f} fps (target {view.canvas.fps:g})')
+
+def _fps_key(w, term_dim, view, history, key, now_paint_mode):
+    try:
+        fps = float(collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter frames per second: '))
+    except ValueError:
+        fps = 0
+    if not 0 < fps <= 1000:
+        print_status_bar(w, term_dim, msg='Invalid frames per second!')
+        return
+    view.canvas.fps = fps
+    history.touch()
+    _print_frame_status(w, term_dim, view)
+
+def _shown_rows(canvas):
+    # The flattened image of a drawing with layers, and the current frame of an animation
+    if isinstance(canvas, LayeredCanvas):
+        return (canvas.composite_span(y_value, 0, canvas.dim[1]) for y_value in range(canvas.dim[0]))
+    return canvas.rows()
+
+def _diff_key(w, term_dim, view, history, key, now_paint_mode):
+    fpath = collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter path of drawing to compare with: ').strip()
+    if not fpath:
+        return
+    try:
+        diff = diff_with_file(_shown_rows(view.canvas), PALETTE, fpath)
+    except (OSError, ValueError):
+        print_status_bar(w, term_dim, msg=f'Drawing NOT compared: {fpath}'[:term_dim[1] - 1])
+        return
+    if not diff.spans:
+        print_status_bar(w, term_dim, msg='No cells differ')
+        return
+    show_diff(w, term_dim, view, diff)
+    print_status_bar(w, term_dim, msg=f'{diff.cells} cells differ in {diff.rows} rows')
+
+def _quit_key(w, term_dim, view, history, key, now_paint_mode):
+    yn = None
+    while yn != True:
+        yn = show_yn_prompt(w, term_dim, (8, 40), msg='Exit TerminalPaint?')
+        if yn == False:
+            break
+    if yn == True:
+        return QUIT
+
+# Draws with the color picked with ^B
+CUSTOM_COLOR_KEY = ord('k')
+
+# RGB color of every key that draws with a palette color, set by ^B
+KEY_TO_RGB = {}
+
+def _palette_color(handler):
+    """Wrap a color key handler to draw with the palette color picked for the key
+
+    The color is added to `PALETTE` if it is not in it yet, which is also
+    needed after another drawing is opened.
+    """
+    @wraps(handler)
+    def palette_color_handler(w, term_dim, view, history, key, now_paint_mode):
+        if key not in KEY_TO_RGB:
+            print_status_bar(w, term_dim, msg='No color picked - press ^B to pick one')
+            return
+        try:
+            KEY_TO_IDX[key] = PALETTE.add(KEY_TO_RGB[key])
+        except ValueError:
+            print_status_bar(w, term_dim, msg='The palette is full!')
+            return
+        return handler(w, term_dim, view, history, key, now_paint_mode)
+    return palette_color_handler
+
+def _pencil_key(w, term_dim, view, history, key, now_paint_mode):
+    pencil_canvas(w, view, get_cursor_pos(), key, history)
+
+def _fill_key(w, term_dim, view, history, key, now_paint_mode):
+    fill_canvas(w, view, get_cursor_pos(), key, history=history)
+
+# Rasterizer of every shape mode
+SHAPE_SPANS = {
+    'Line': line_spans,
+    'Rect': rect_spans,
+    'Filled Rect': partial(rect_spans, filled=True),
+    'Ellipse': ellipse_spans,
+    'Filled Ellipse': partial(ellipse_spans, filled=True),
+}
+
+# Shape whose end point is being moved in a shape mode
+RUBBER_BAND = RubberBand()
+
+def _shape_key(w, term_dim, view, history, key, now_paint_mode):
+    # The first color key starts a shape at the cursor, and the second
+    # one draws it to the cursor in its color
+    if not RUBBER_BAND.active():
+        RUBBER_BAND.start(w, view, SHAPE_SPANS[now_paint_mode], view.to_canvas(get_cursor_pos()), KEY_TO_IDX[key])
+        return
+    RUBBER_BAND.update(w, view, view.to_canvas(get_cursor_pos()))
+    spans = RUBBER_BAND.finish()[0]
+    draw_shape(w, view, spans, KEY_TO_IDX[key], history)
+
+# Color pair of the outline of the selected part in the Select mode
+SELECTION_COLOR_PAIR_IDX = 1
+
+# Copied part of the drawing, kept when another drawing is opened
+CLIPBOARD = Clipboard()
+
+def _paste_outline(dim, canvas_dim, start_coord, end_coord):
+    # Outline of a region pasted at `end_coord`, clipped to the canvas
+    bottom_right = (min(end_coord[0] + dim[0], canvas_dim[0]) - 1, min(end_coord[1] + dim[1], canvas_dim[1]) - 1)
+    return rect_spans(end_coord, bottom_right)
+
+def _show_paste_outline(w, view):
+    RUBBER_BAND.cancel(w, view)
+    rasterize = partial(_paste_outline, CLIPBOARD.region.dim, view.canvas.dim)
+    RUBBER_BAND.start(w, view, rasterize, view.to_canvas(get_cursor_pos()), SELECTION_COLOR_PAIR_IDX)
+
+def _selected_rect(view):
+    # The part marked in the Select mode, or `None`
+    if not RUBBER_BAND.active() or CLIPBOARD.moving:
+        return None
+    return region_rect(RUBBER_BAND.start_coord, view.to_canvas(get_cursor_pos()))
+
+def _cancel_pending(w, view):
+    """Drop the unfinished shape or selection, and put back a region being moved"""
+    RUBBER_BAND.cancel(w, view)
+    if CLIPBOARD.moving:
+        if CLIPBOARD.cut_edit is not None:
+            cur_coord = get_cursor_pos()
+            for y_value, x_start, x_end, _ in CLIPBOARD.cut_edit.apply(view.canvas, True):
+                redraw_span(w, view, (y_value, x_start, x_end))
+            w.move(cur_coord[0], cur_coord[1])
+        CLIPBOARD.moving = False
+        CLIPBOARD.cut_edit = None
+
+def _cancelling(handler):
+    """Wrap a command handler to drop the unfinished shape or selection before the command"""
+    @wraps(handler)
+    def cancelling_handler(w, term_dim, view, history, key, now_paint_mode):
+        _cancel_pending(w, view)
+        return handler(w, term_dim, view, history, key, now_paint_mode)
+    return cancelling_handler
+
+def _select_mode_key(w, term_dim, view, history, key, now_paint_mode):
+    print_status_bar(w, term_dim, msg='> Select Mode')
+    return 'Select'
+
+def _mark_key(w, term_dim, view, history, key, now_paint_mode):
+    _cancel_pending(w, view)
+    RUBBER_BAND.start(w, view, rect_spans, view.to_canvas(get_cursor_pos()), SELECTION_COLOR_PAIR_IDX)
+
+def _copy_key(w, term_dim, view, history, key, now_paint_mode):
+    rect = _selected_rect(view)
+    if rect is None:
+        print_status_bar(w, term_dim, msg='Nothing selected!')
+        return
+    RUBBER_BAND.cancel(w, view)
+    CLIPBOARD.region = copy_region(view.canvas, rect[0], rect[1])
+    CLIPBOARD.palette = PALETTE.copy()
+    if key == ord('x'):
+        edit = clear_region(w, view, rect[0], rect[1])
+        if edit is not None:
+            history.record(edit)
+    print_status_bar(w, term_dim, msg=f'{"Cut" if key == ord("x") else "Copied"} {rect[1][0]}x{rect[1][1]} cells')
+
+def _paste_key(w, term_dim, view, history, key, now_paint_mode):
+    if CLIPBOARD.region is None:
+        print_status_bar(w, term_dim, msg='Clipboard is empty!')
+        return
+    if CLIPBOARD.moving:
+        return _move_region_key(w, term_dim, view, history, key, now_paint_mode)
+    RUBBER_BAND.cancel(w, view)
+    edit = paste_region(w, view, map_region_colors(CLIPBOARD.region, CLIPBOARD.palette, PALETTE), view.to_canvas(get_cursor_pos()))
+    if edit is not None:
+        history.record(edit)
+
+def _move_region_key(w, term_dim, view, history, key, now_paint_mode):
+    # Pressed on a selection, cuts it and lets the cursor carry its outline;
+    # pressed again, pastes it there as a single edit
+    if CLIPBOARD.moving:
+        RUBBER_BAND.cancel(w, view)
+        edits = [CLIPBOARD.cut_edit, paste_region(w, view, map_region_colors(CLIPBOARD.region, CLIPBOARD.palette, PALETTE), view.to_canvas(get_cursor_pos()))]
+        edits = [edit for edit in edits if edit is not None]
+        if edits:
+            history.record(GroupEdit(edits))
+        CLIPBOARD.moving = False
+        CLIPBOARD.cut_edit = None
+        print_status_bar(w, term_dim, msg='> Select Mode')
+        return
+
+    rect = _selected_rect(view)
+    if rect is None:
+        print_status_bar(w, term_dim, msg='Nothing selected!')
+        return
+    RUBBER_BAND.cancel(w, view)
+    CLIPBOARD.region = copy_region(view.canvas, rect[0], rect[1])
+    CLIPBOARD.palette = PALETTE.copy()
+    CLIPBOARD.cut_edit = clear_region(w, view, rect[0], rect[1])
+    CLIPBOARD.moving = True
+    _show_paste_outline(w, view)
+    print_status_bar(w, term_dim, msg='Moving - press M or P to drop')
+
+def _transform_key(w, term_dim, view, history, key, now_paint_mode):
+    if CLIPBOARD.region is None:
+        print_status_bar(w, term_dim, msg='Clipboard is empty!')
+        return
+    if key == ord('r'):
+        CLIPBOARD.region = rotate_region(CLIPBOARD.region)
+    else:
+        CLIPBOARD.region = flip_region(CLIPBOARD.region, key == ord('h'))
+    if CLIPBOARD.moving:
+        _show_paste_outline(w, view)
+    print_status_bar(w, term_dim, msg='Clipboard rotated' if key == ord('r') else 'Clipboard flipped')
+
+# Keys of the Select mode
+SELECT_HANDLERS = {
+    ord(' '): _mark_key,            # start a selection at the cursor
+    ord('c'): _copy_key,            # copy the selection
+    ord('x'): _copy_key,            # cut the selection
+    ord('p'): _paste_key,           # paste at the cursor
+    ord('m'): _move_region_key,     # move the selection
+    ord('h'): _transform_key,       # flip the clipboard horizontally
+    ord('v'): _transform_key,       # flip the clipboard vertically
+    ord('r'): _transform_key,       # rotate the clipboard clockwise
+}
+
+# Keys of the Frames mode, on top of the pencil
+FRAME_HANDLERS = {
+    ord('a'): _add_frame_key,       # add a copy of the frame after it
+    ord('d'): _delete_frame_key,    # delete the frame
+    ord(','): _step_frame_key,      # go to the previous frame
+    ord('.'): _step_frame_key,      # go to the next frame
+    ord('o'): _onion_key,           # show or hide the onion skin
+    ord('p'): _play_key,            # play until a key is pressed
+    ord('f'): _fps_key,             # set the frames per second
+}
+
+# Key handlers shared by every paint mode. A handler is called as
+# `handler(w, term_dim, view, history, key, now_paint_mode)` and returns
+# the new paint mode, `QUIT`, or `None` to stay in the same mode.
+COMMAND_HANDLERS = {
+    curses.ascii.ctrl(ord('p')): _pencil_mode_key,
+    curses.ascii.ctrl(ord('f')): _fill_mode_key,
+    curses.ascii.ctrl(ord('l')): _line_mode_key,
+    curses.ascii.ctrl(ord('r')): _rect_mode_key,       # ^R again for a filled rectangle
+    curses.ascii.ctrl(ord('e')): _ellipse_mode_key,    # ^E again for a filled ellipse
+    curses.ascii.ctrl(ord('v')): _select_mode_key,
+    curses.ascii.ctrl(ord('d')): _frames_mode_key,     # ^D (animation frames)
+    curses.ascii.ctrl(ord('a')): _add_layer_key,        # ^A (add a layer on top)
+    curses.ascii.ctrl(ord('w')): _next_layer_key,       # ^W (edit the next layer up)
+    curses.ascii.ctrl(ord('g')): _hide_layer_key,       # ^G (hide or show the layer)
+    curses.ascii.ctrl(ord('k')): _transparent_color_key,  # ^K (transparent color of the layer)
+    curses.ascii.ctrl(ord('b')): _pick_color_key,       # ^B (pick the color of k)
+    curses.ascii.ctrl(ord('u')): _replace_color_key,    # ^U (replace a color everywhere)
+    curses.ascii.ctrl(ord('c')): _counts_key,           # ^C (show the number of cells of every color)
+    curses.ascii.ctrl(ord(']')): _diff_key,             # ^] (highlight the cells that differ from a file)
+    curses.ascii.ctrl(ord('x')): _clear_key,    # ^X (clear canvas)
+    curses.ascii.ctrl(ord('z')): _undo_key,     # ^Z (undo)
+    curses.ascii.ctrl(ord('y')): _redo_key,     # ^Y (redo)
+    curses.ascii.ctrl(ord('n')): _new_key,      # ^N (new drawing)
+    curses.ascii.ctrl(ord('o')): _open_key,     # ^O (open drawing)
+    curses.ascii.ctrl(ord('s')): _save_key,     # ^S (save drawing)
+    curses.ascii.ctrl(ord('q')): _quit_key,     # ^Q (quit TerminalPaint)
+}
+COMMAND_HANDLERS.update(dict.fromkeys(ARROW_STEPS, _move_key))
+
+# Complete key-to-handler table of every paint mode
+MODE_HANDLERS = {
+    'Pencil': {**COMMAND_HANDLERS, **dict.fromkeys(KEY_TO_IDX, _pencil_key), CUSTOM_COLOR_KEY: _palette_color(_pencil_key)},
+    'Fill': {**COMMAND_HANDLERS, **dict.fromkeys(KEY_TO_IDX, _fill_key), CUSTOM_COLOR_KEY: _palette_color(_fill_key)},
+}
+_SHAPE_COMMAND_HANDLERS = {
+    key: handler if handler is _move_key else _cancelling(handler)
+    for key, handler in COMMAND_HANDLERS.items()
+}
+MODE_HANDLERS.update({
+    paint_mode: {**_SHAPE_COMMAND_HANDLERS, **dict.fromkeys(KEY_TO_IDX, _shape_key), CUSTOM_COLOR_KEY: _palette_color(_shape_key)}
+    for paint_mode in SHAPE_SPANS
+})
+MODE_HANDLERS['Select'] = {**_SHAPE_COMMAND_HANDLERS, **SELECT_HANDLERS}
+MODE_HANDLERS['Frames'] = {**MODE_HANDLERS['Pencil'], **FRAME_HANDLERS}
+
+# Toggles the performance overlay when instrumentation is on
+OVERLAY_KEY = curses.ascii.ctrl(ord('t'))
+
+# Keys whose handlers read further keys from the window themselves
+PROMPT_KEYS = frozenset(curses.ascii.ctrl(ord(raw)) for raw in 'xnosqkbu]')
+
+# Prompt keys of every paint mode. In the Frames mode, d, p and f open
+# prompts too; ^D ends a batch in the other modes, so the keys after it
+# are read with the prompt keys of the Frames mode.
+MODE_PROMPT_KEYS = dict.fromkeys(MODE_HANDLERS, PROMPT_KEYS | {curses.ascii.ctrl(ord('d'))})
+MODE_PROMPT_KEYS['Frames'] = PROMPT_KEYS | {ord(raw) for raw in 'dpf'}
+
+def constant_commands(w, term_dim, view, history, key, now_paint_mode):
+    """Handle a key that works the same in every paint mode
+
+    :return: the new paint mode, `QUIT`, or `None` if the mode does not change
+    """
+    handler = COMMAND_HANDLERS.get(key)
+    if handler is not None:
+        return handler(w, term_dim, view, history, key, now_paint_mode)
+
+def read_keys(w, max_keys=1024, prompt_keys=PROMPT_KEYS):
+    """Wait for a key, then take every key that is already waiting
+
+    The window is switched to no-delay mode to drain the input without
+    blocking. Reading stops after a key that opens a prompt (see
+    `MODE_PROMPT_KEYS`), so the keys typed into the prompt are left for it.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param max_keys: most keys to take at once, so long pastes still show progress
+    :type max_keys: int
+    :param prompt_keys: keys that open a prompt in the current paint mode
+    :type prompt_keys: frozenset
+    :return: `list` of keys, in the order they were pressed
+    """
+    key = w.getch()
+    if key == -1:
+        return []
+    keys = [key]
+    if key in prompt_keys:
+        return keys
+
+    w.nodelay(True)
+    try:
+        while len(keys) < max_keys:
+            key = w.getch()
+            if key == -1:
+                break
+            keys.append(key)
+            if key in prompt_keys:
+                break
+    finally:
+        w.nodelay(False)
+    return keys
+
+def _command_name(handler):
+    # `_pencil_key` is recorded as `pencil`
+    return handler.__name__.strip('_').rsplit('_key', 1)[0]
+
+def dispatch_keys(w, term_dim, view, history, keys, now_paint_mode, recorder=None):
+    """Handle a batch of keys with the key-to-handler table of the paint mode
+
+    Runs of arrow keys are merged into one move (see `move_cursor_keys()`),
+    and every other key goes straight to its handler. Nothing is refreshed
+    here; the changes of the whole batch, such as a string of pencil
+    strokes, are sent to the terminal at once by the main loop. In a shape
+    mode, the preview of an unfinished shape follows the cursor after
+    every move.
+
+    If a `PerfRecorder` is given, every handler call and move is timed
+    with it, and `OVERLAY_KEY` turns its overlay on and off.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param term_dim: terminal dimensions as a 2-ary tuple `(row, column)`
+    :type term_dim: tuple
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param history: journal to record the edits in
+    :type history: `class History`
+    :param keys: keys in the order they were pressed, as returned by `read_keys()`
+    :type keys: list
+    :param now_paint_mode: a paint mode of `MODE_HANDLERS`, such as `'Pencil'`
+    :type now_paint_mode: string
+    :param recorder: instrumentation to record the commands with, or `None`
+    :type recorder: `class PerfRecorder`
+    :return: the paint mode after the keys, or `QUIT`
+    """
+    handlers = MODE_HANDLERS[now_paint_mode]
+    key_idx = 0
+    while key_idx < len(keys):
+        key = keys[key_idx]
+        if key in ARROW_STEPS:
+            run_end = key_idx + 1
+            while run_end < len(keys) and keys[run_end] in ARROW_STEPS:
+                run_end += 1
+            token = recorder.begin() if recorder is not None else None
+            move_cursor_keys(w, view, keys[key_idx:run_end])
+            if RUBBER_BAND.active():
+                RUBBER_BAND.update(w, view, view.to_canvas(get_cursor_pos()))
+            if recorder is not None:
+                recorder.end(token, 'move')
+            key_idx = run_end
+            continue
+
+        if key == OVERLAY_KEY and recorder is not None:
+            recorder.overlay = not recorder.overlay
+        handler = handlers.get(key)
+        if handler is not None:
+            token = recorder.begin() if recorder is not None else None
+            new_paint_mode = handler(w, term_dim, view, history, key, now_paint_mode)
+            if recorder is not None:
+                recorder.end(token, _command_name(handler))
+            if new_paint_mode == QUIT:
+                return QUIT
+            if new_paint_mode is None and now_paint_mode == 'Frames' and not isinstance(view.canvas, Animation):
+                # ^N or ^O replaced the animation with a drawing without frames
+                new_paint_mode = 'Pencil'
+            if new_paint_mode is not None:
+                now_paint_mode = new_paint_mode
+                handlers = MODE_HANDLERS[now_paint_mode]
+        key_idx += 1
+
+    return now_paint_mode
+
+def ui_main(w, autosave_path=None, autosave_interval=30.0, autosave_edits=50, perf_path=None, record_path=None, keep_canvas=False):
+    """Run the editor until the user quits
+
+    If `autosave_path` is given, an `Autosaver` saves a copy of the drawing
+    there in the background every `autosave_interval` seconds, or after
+    `autosave_edits` edits, and the time of the last autosave is shown on
+    the status bar.
+
+    If `perf_path` is given, every command is timed by a `PerfRecorder`,
+    `OVERLAY_KEY` (^T) shows the timings on the status bar, and the
+    numbers are written to `perf_path` as JSON on exit.
+
+    If `record_path` is given, every key and text typed is recorded there
+    by a `RecordingWindow`, so the session can be replayed with
+    `replay_session()`.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param autosave_path: path of the autosave file, or `None` to turn autosave off
+    :type autosave_path: string
+    :param autosave_interval: seconds between autosaves
+    :type autosave_interval: float
+    :param autosave_edits: number of edits that triggers an autosave
+    :type autosave_edits: int
+    :param perf_path: path of the JSON file for the timings, or `None` to turn instrumentation off
+    :type perf_path: string
+    :param record_path: path of the session file, or `None` to turn recording off
+    :type record_path: string
+    :param keep_canvas: `True` to leave the drawing open and return it, instead of closing it
+    :type keep_canvas: bool
+    :return: the drawing if `keep_canvas` is `True`, otherwise `None`
+    """
+    session = None
+    if record_path is not None:
+        w = session = RecordingWindow(w, record_path)
+    recorder = None
+    if perf_path is not None:
+        w = CountingWindow(w)
+        recorder = PerfRecorder(w)
+
+    # Initialize color pairs, with an empty palette for the new drawing
+    PALETTE.clear()
+    KEY_TO_RGB.clear()
+    SHOWN_NOTES.clear()
     init_ui(w)
 
     term_dim = get_term_dim()
-    canvas_dim = get_canvas_dim()
-    for y_value in range(canvas_dim[0]):
-            color_cell_at(w, (y_value, 0), 10, True)
+    view = Viewport(Canvas(get_canvas_dim()), get_canvas_dim())
+    history = History()
+    draw_canvas(w, view)
     now_paint_mode = 'Pencil'
     print_status_bar(w, term_dim, msg=f'> {now_paint_mode} Mode')
     print_command_cheatsheet(w, term_dim)
-    
-    while True:
-        now_coord = get_cursor_pos()
-        if now_paint_mode == 'Pencil':
-            key = w.getch()
 
-            if key in color_input('color input tuple'):
-                pencil_canvas(w, canvas_dim, now_coord, key)
-                            
-            elif key == curses.ascii.ctrl(ord('q')):    # ^Q (quit TerminalPaint)
-                yn = None
-                while yn != True:
-                    yn = show_yn_prompt(w, term_dim, (8, 40), msg='Exit TerminalPaint?')
-                    if yn == False:
-                        break
-                if yn == True:
-                    break
-            else:
-                command = constant_commands(w, term_dim, canvas_dim, key, now_paint_mode)
-                if command == 'Fill':
-                    now_paint_mode = 'Fill'
-                
-        elif now_paint_mode == 'Fill':
-            key = w.getch()
-                            
-            if key in color_input('color input tuple'):
-                fill_canvas(w, canvas_dim, now_coord, key)
-            
-            elif key == curses.ascii.ctrl(ord('q')):    # ^Q (quit TerminalPaint)
-                yn = None
-                while yn != True:
-                    yn = show_yn_prompt(w, term_dim, (8, 40), msg='Exit TerminalPaint?')
-                    if yn == False:
-                        break
-                if yn == True:
-                    break
-            else:
-                command = constant_commands(w, term_dim, canvas_dim, key, now_paint_mode)
-                if command == 'Pencil':
-                    now_paint_mode = 'Pencil'
+    autosaver = None
+    canvas_lock = nullcontext()
+    if autosave_path is not None:
+        autosaver = Autosaver(view, history, autosave_path, autosave_interval, autosave_edits, PALETTE)
+        canvas_lock = autosaver.lock
+        autosaver.start()
+
+    note_len = 0
+    frame_start = None
+    try:
+        while True:
+            notes = [recorder.overlay_text() if recorder is not None else '', autosaver.status() if autosaver is not None else '']
+            if 'counts' in SHOWN_NOTES:
+                notes[:0] = [color_counts_note(view.canvas, term_dim[1] // 2), region_note(view, get_cursor_pos())]
+            note = '  '.join(text for text in notes if text)
+            if note or note_len:
+                # Pad with spaces to erase the end of a longer note
+                print_status_note(w, term_dim, note.rjust(note_len))
+                note_len = len(note)
+            update_screen(w)
+            if frame_start is not None:
+                recorder.frame(time.perf_counter() - frame_start)
+
+            keys = read_keys(w, prompt_keys=MODE_PROMPT_KEYS[now_paint_mode])
+            if recorder is not None:
+                frame_start = time.perf_counter()
+            # The autosave thread copies the canvas between batches only
+            with canvas_lock:
+                now_paint_mode = dispatch_keys(w, term_dim, view, history, keys, now_paint_mode, recorder)
+                if PAIRS.evicted:
+                    # Cells whose color pair was given to another color show the wrong color.
+                    # Colors that lose their pair while these are drawn wait for the next eviction.
+                    evicted = set(PAIRS.evicted)
+                    cur_coord = get_cursor_pos()
+                    redraw_colors(w, view, evicted)
+                    w.move(cur_coord[0], cur_coord[1])
+                    PAIRS.evicted.clear()
+            if now_paint_mode == QUIT:
+                break
+            if autosaver is not None:
+                autosaver.poll()
+    finally:
+        OPEN_DIALOG.close()
+        if autosaver is not None:
+            autosaver.stop()
+        if recorder is not None:
+            recorder.dump(perf_path)
+        if session is not None:
+            session.close()
+
+    if keep_canvas:
+        return view.canvas
+    view.canvas.close()
 
 def main():
-    curses.wrapper(ui_main)
+    parser = argparse.ArgumentParser(prog='terminalpaint')
+    parser.add_argument('--backend', choices=('curses', 'ansi'), default='curses', help='draw with curses, or write ANSI escape sequences directly (fewer bytes per frame over slow links)')
+    parser.add_argument('--autosave', metavar='PATH', default=default_autosave_path(), help='file the drawing is autosaved to (default: terminalpaint/autosave.paint in $XDG_STATE_HOME, or in ~/.local/state)')
+    parser.add_argument('--autosave-interval', metavar='SECONDS', type=float, default=30.0, help='seconds between autosaves')
+    parser.add_argument('--autosave-edits', metavar='N', type=int, default=50, help='autosave early after this many edits')
+    parser.add_argument('--no-autosave', dest='autosave', action='store_const', const=None, help='turn autosave off')
+    parser.add_argument('--perf-log', metavar='PATH', help='time every command, show the timings with ^T, and write them to this JSON file on exit')
+    parser.add_argument('--record', metavar='PATH', help='record every key typed to this session file, to replay with termpaint_replay.py')
+    args = parser.parse_args()
+
+    run = termpaint_ansi.wrapper if args.backend == 'ansi' else curses.wrapper
+    run(ui_main, args.autosave, args.autosave_interval, args.autosave_edits, args.perf_log, args.record)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
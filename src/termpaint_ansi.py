@@ -0,0 +1,476 @@
+import curses
+import os
+import select
+import sys
+import termpaint_lib
+from collections import deque
+from termpaint_canvas import iter_runs
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+    tty = None
+
+# Changed cells closer than this are joined by rewriting the cells between
+# them, which is shorter than a cursor jump
+_MAX_GAP = 4
+# Runs of blanks at least this long are erased with ECH instead of written out
+_MIN_ERASE = 8
+
+# Characters of the VT100 line-drawing set by their `A_ALTCHARSET` code,
+# sent as Unicode instead of switching character sets
+_ACS_CHARS = {ord('a'): '▒'}
+_ACS_CODES = {char: curses.A_ALTCHARSET | code for code, char in _ACS_CHARS.items()}
+
+# Escape sequences sent by the keys TerminalPaint uses, without the leading ESC
+_ESCAPE_KEYS = {
+    b'[A': curses.KEY_UP,
+    b'[B': curses.KEY_DOWN,
+    b'[C': curses.KEY_RIGHT,
+    b'[D': curses.KEY_LEFT,
+    b'OA': curses.KEY_UP,
+    b'OB': curses.KEY_DOWN,
+    b'OC': curses.KEY_RIGHT,
+    b'OD': curses.KEY_LEFT,
+    b'[H': curses.KEY_HOME,
+    b'[F': curses.KEY_END,
+    b'[2~': curses.KEY_IC,
+    b'[3~': curses.KEY_DC,
+    b'[5~': curses.KEY_PPAGE,
+    b'[6~': curses.KEY_NPAGE,
+}
+
+class AnsiWindow:
+    """Window of an `AnsiCurses` screen with the `Window` methods TerminalPaint uses
+
+    Like in curses, a window has its own cells. `noutrefresh()` copies the
+    rows changed since the last copy into the back buffer of the screen,
+    and `AnsiCurses.doupdate()` sends the difference to the terminal.
+
+    :param screen: the screen the window belongs to
+    :type screen: `class AnsiCurses`
+    :param dim: window dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param origin: screen coordinate of the top-left corner as a 2-ary tuple `(row, column)`
+    :type origin: tuple
+    """
+
+    def __init__(self, screen, dim, origin=(0, 0)):
+        self.dim = (dim[0], dim[1])
+        self.origin = (origin[0], origin[1])
+        self.chars = [[' '] * dim[1] for _ in range(dim[0])]
+        self.pairs = [bytearray(dim[1]) for _ in range(dim[0])]
+        self.cursor = (0, 0)
+        self._screen = screen
+        self._touched = set(range(dim[0]))
+        self._bkgd = 0
+        self._nodelay = False
+        self._scroll_region = (0, dim[0] - 1)
+
+    def _pair(self, attr):
+        return (attr & AnsiCurses.A_COLOR) >> 8 if attr else self._bkgd
+
+    def inch(self, y_value, x_value):
+        char = self.chars[y_value][x_value]
+        return _ACS_CODES.get(char, ord(char)) | self.pairs[y_value][x_value] << 8
+
+    def chgat(self, y_value, x_value, *args):
+        if len(args) == 1:
+            length, attr = -1, args[0]
+        else:
+            length, attr = args
+        row = self.pairs[y_value]
+        x_end = len(row) if length < 0 else min(len(row), x_value + length)
+        row[x_value:x_end] = bytes([self._pair(attr)]) * (x_end - x_value)
+        self._touched.add(y_value)
+
+    def addstr(self, *args):
+        if isinstance(args[0], int):
+            y_value, x_value, text = args[:3]
+            attr = args[3] if len(args) > 3 else 0
+        else:
+            (y_value, x_value), text = self.cursor, args[0]
+            attr = args[1] if len(args) > 1 else 0
+
+        # Text past the end of the row is cut off instead of wrapped
+        text = text[:self.dim[1] - x_value]
+        x_end = x_value + len(text)
+        self.chars[y_value][x_value:x_end] = text
+        self.pairs[y_value][x_value:x_end] = bytes([self._pair(attr)]) * len(text)
+        self._touched.add(y_value)
+        self.cursor = (y_value, min(x_end, self.dim[1] - 1))
+
+    def hline(self, y_value, x_value, ch, length):
+        if isinstance(ch, str):
+            ch = ord(ch)
+        code = ch & AnsiCurses.A_CHARTEXT
+        char = _ACS_CHARS.get(code, ' ') if ch & curses.A_ALTCHARSET else chr(code)
+        x_end = min(self.dim[1], x_value + length)
+        self.chars[y_value][x_value:x_end] = [char] * (x_end - x_value)
+        self.pairs[y_value][x_value:x_end] = bytes([self._pair(ch & ~AnsiCurses.A_CHARTEXT)]) * (x_end - x_value)
+        self._touched.add(y_value)
+
+    def move(self, y_value, x_value):
+        if not (0 <= y_value < self.dim[0] and 0 <= x_value < self.dim[1]):
+            raise curses.error('wmove() returned ERR')
+        self.cursor = (y_value, x_value)
+
+    def getyx(self):
+        return self.cursor
+
+    def getmaxyx(self):
+        return self.dim
+
+    def getch(self):
+        # Like curses, show the changes to the window before waiting for a key
+        self.refresh()
+        return self._screen.read_key(0 if self._nodelay else None)
+
+    def getstr(self):
+        text = bytearray()
+        while True:
+            key = self.getch()
+            if key in (-1, ord('\n')):
+                return bytes(text)
+            if key in (curses.KEY_BACKSPACE, 8, 127):
+                if text:
+                    text.pop()
+                    if self._screen.echoing and self.cursor[1] > 0:
+                        y_value, x_value = self.cursor[0], self.cursor[1] - 1
+                        self.addstr(y_value, x_value, ' ')
+                        self.cursor = (y_value, x_value)
+            elif 32 <= key < 256:
+                text.append(key)
+                if self._screen.echoing and key < 127:
+                    self.addstr(chr(key))
+
+    def refresh(self):
+        self.noutrefresh()
+        self._screen.doupdate()
+
+    def noutrefresh(self):
+        screen = self._screen
+        origin_y, origin_x = self.origin
+        width = max(0, min(self.dim[1], screen.COLS - origin_x))
+        for y_value in self._touched:
+            screen_y = origin_y + y_value
+            if screen_y < screen.LINES:
+                screen.back_chars[screen_y][origin_x:origin_x + width] = self.chars[y_value][:width]
+                screen.back_pairs[screen_y][origin_x:origin_x + width] = self.pairs[y_value][:width]
+                screen.dirty.add(screen_y)
+        self._touched.clear()
+        screen.cursor = (origin_y + self.cursor[0], origin_x + self.cursor[1])
+
+    def scroll(self, lines=1):
+        top, bottom = self._scroll_region
+        height = bottom - top + 1
+        lines = max(-height, min(lines, height))
+        blank = lambda: ([' '] * self.dim[1], bytearray([self._bkgd]) * self.dim[1])
+        for rows in (self.chars, self.pairs):
+            region = rows[top:bottom + 1]
+            rows[top:bottom + 1] = region[lines:] + region[:lines]
+        new_rows = range(bottom - lines + 1, bottom + 1) if lines > 0 else range(top, top - lines)
+        for y_value in new_rows:
+            self.chars[y_value], self.pairs[y_value] = blank()
+        self._touched.update(range(top, bottom + 1))
+
+        # A full-width window can let the terminal shift the rows itself
+        if self.origin[1] == 0 and self.dim[1] == self._screen.COLS:
+            self._screen.scroll_lines(self.origin[0] + top, self.origin[0] + bottom, lines)
+
+    def setscrreg(self, top, bottom):
+        self._scroll_region = (top, bottom)
+
+    def delch(self, y_value, x_value):
+        del self.chars[y_value][x_value]
+        del self.pairs[y_value][x_value]
+        self.chars[y_value].append(' ')
+        self.pairs[y_value].append(self._bkgd)
+        self._touched.add(y_value)
+
+    def insch(self, y_value, x_value, ch, attr=0):
+        self.chars[y_value].insert(x_value, ch if isinstance(ch, str) else chr(ch))
+        self.pairs[y_value].insert(x_value, self._pair(attr))
+        del self.chars[y_value][-1]
+        del self.pairs[y_value][-1]
+        self._touched.add(y_value)
+
+    def bkgd(self, ch, attr=0):
+        old_bkgd, self._bkgd = self._bkgd, self._pair(attr if attr else ch)
+        for row in self.pairs:
+            row[:] = row.replace(bytes([old_bkgd]), bytes([self._bkgd]))
+        self.touchwin()
+
+    def box(self, *args):
+        rows, cols = self.dim
+        self.chars[0][:] = ['┌'] + ['─'] * (cols - 2) + ['┐']
+        self.chars[rows - 1][:] = ['└'] + ['─'] * (cols - 2) + ['┘']
+        for y_value in range(1, rows - 1):
+            self.chars[y_value][0] = self.chars[y_value][cols - 1] = '│'
+        self.touchwin()
+
+    def touchwin(self):
+        self._touched.update(range(self.dim[0]))
+
+    def scrollok(self, flag):
+        pass
+
+    def nodelay(self, flag):
+        self._nodelay = flag
+
+    def keypad(self, flag):
+        pass
+
+class AnsiCurses:
+    """Render backend that writes ANSI escape sequences directly to the terminal
+
+    This stands in for the module-level functions of `curses` (pass it to
+    `use_backend()`, or run TerminalPaint with `wrapper()`). Windows stage
+    their changes in a back buffer; `doupdate()` compares it with a front
+    buffer holding what the terminal shows and sends only the differences
+    in a single `os.write`. Changed cells are grouped into runs of one color
+    pair, so a color is set once per run, the cursor only jumps between
+    runs, and long runs of blanks are erased with a single sequence.
+    Scrolling a full-width window is sent as a terminal scroll, so only the
+    rows coming into view are written.
+
+    Constants such as `KEY_UP` come from the real `curses` module. The
+    `ACS_*` characters TerminalPaint uses are defined here, as `curses`
+    only sets them in `initscr()`, and are sent as Unicode.
+
+    :param fd_in: file descriptor to read keys from
+    :type fd_in: int
+    :param fd_out: file descriptor to write to
+    :type fd_out: int
+    :param dim: terminal dimensions as a 2-ary tuple `(row, column)`, or `None` to ask the terminal
+    :type dim: tuple
+    """
+    A_COLOR = 0xff00
+    A_CHARTEXT = 0xff
+    ACS_CKBOARD = curses.A_ALTCHARSET | ord('a')
+    # 256 colors, and as many color pairs as fit in `A_COLOR`
+    COLORS = 256
+    COLOR_PAIRS = 256
+
+    def __init__(self, fd_in=0, fd_out=1, dim=None):
+        if dim is None:
+            size = os.get_terminal_size(fd_out)
+            dim = (size.lines, size.columns)
+        self.LINES, self.COLS = dim
+        self.fd_in = fd_in
+        self.fd_out = fd_out
+        self.back_chars = [[' '] * self.COLS for _ in range(self.LINES)]
+        self.back_pairs = [bytearray(self.COLS) for _ in range(self.LINES)]
+        self.front_chars = [[' '] * self.COLS for _ in range(self.LINES)]
+        self.front_pairs = [bytearray(self.COLS) for _ in range(self.LINES)]
+        self.dirty = set()
+        self.cursor = (0, 0)
+        self.echoing = False
+        self.bytes_written = 0
+        self.frames = 0
+        self.stdscr = AnsiWindow(self, dim)
+        self._sgr = ['\x1b[0m'] * 256
+        self._pending = []
+        self._input = deque()
+        self._term_cursor = None
+        self._term_pair = None
+        self._visibility = 1
+
+    def __getattr__(self, name):
+        return getattr(curses, name)
+
+    def start(self):
+        """Switch to the alternate screen and clear it"""
+        self._write('\x1b[?1049h\x1b[0m\x1b[2J\x1b[H')
+        self._term_cursor = (0, 0)
+        self._term_pair = 0
+
+    def stop(self):
+        """Restore the colors and cursor and leave the alternate screen"""
+        self._write('\x1b[0m\x1b[?25h\x1b[?1049l')
+
+    def newwin(self, rows, cols, y_value=0, x_value=0):
+        return AnsiWindow(self, (rows, cols), (y_value, x_value))
+
+    def getsyx(self):
+        return self.cursor
+
+    def init_pair(self, color_pair_idx, fg, bg):
+        fg_code = 39 if fg < 0 else 30 + fg if fg < 8 else f'38;5;{fg}'
+        bg_code = 49 if bg < 0 else 40 + bg if bg < 8 else f'48;5;{bg}'
+        self._sgr[color_pair_idx] = f'\x1b[0;{fg_code};{bg_code}m'
+
+    def color_pair(self, color_pair_idx):
+        return color_pair_idx << 8
+
+    def pair_number(self, attr):
+        return (attr & self.A_COLOR) >> 8
+
+    def curs_set(self, visibility):
+        previous, self._visibility = self._visibility, visibility
+        self._pending.append('\x1b[?25h' if visibility else '\x1b[?25l')
+        return previous
+
+    def echo(self):
+        self.echoing = True
+
+    def noecho(self):
+        self.echoing = False
+
+    def raw(self):
+        pass
+
+    def scroll_lines(self, top, bottom, lines):
+        """Scroll screen rows `top` to `bottom` (inclusive) on the terminal
+
+        The front buffer is shifted the same way, so the rows that moved
+        are not sent again by `doupdate()`.
+        """
+        # New rows are blanked with the current background, so reset it first
+        self._pending.append(f'{self._sgr[0]}\x1b[{top + 1};{bottom + 1}r')
+        self._pending.append(f'\x1b[{lines}S' if lines > 0 else f'\x1b[{-lines}T')
+        self._pending.append('\x1b[r')
+        self._term_pair = 0
+        # Setting the scrolling region moves the cursor home
+        self._term_cursor = None
+
+        for rows, blank in ((self.front_chars, lambda: [' '] * self.COLS), (self.front_pairs, lambda: bytearray(self.COLS))):
+            region = rows[top:bottom + 1]
+            region = region[lines:] + region[:lines]
+            new_rows = range(len(region) - lines, len(region)) if lines > 0 else range(-lines)
+            for y_value in new_rows:
+                region[y_value] = blank()
+            rows[top:bottom + 1] = region
+
+    def _diff_row(self, out, y_value):
+        back_chars, back_pairs = self.back_chars[y_value], self.back_pairs[y_value]
+        front_chars, front_pairs = self.front_chars[y_value], self.front_pairs[y_value]
+        if back_pairs == front_pairs and back_chars == front_chars:
+            return
+
+        cols = self.COLS
+        changed = [x_value for x_value in range(cols) if back_pairs[x_value] != front_pairs[x_value] or back_chars[x_value] != front_chars[x_value]]
+        segments = []
+        start = end = changed[0]
+        for x_value in changed:
+            if x_value - end > _MAX_GAP:
+                segments.append((start, end + 1))
+                start = x_value
+            end = x_value
+        segments.append((start, end + 1))
+
+        for start, end in segments:
+            if self._term_cursor != (y_value, start):
+                out.append(f'\x1b[{y_value + 1};{start + 1}H')
+            for run_start, run_end, color_pair_idx in iter_runs(back_pairs[start:end]):
+                if color_pair_idx != self._term_pair:
+                    out.append(self._sgr[color_pair_idx])
+                    self._term_pair = color_pair_idx
+                length = run_end - run_start
+                text = ''.join(back_chars[start + run_start:start + run_end])
+                if length >= _MIN_ERASE and text == ' ' * length:
+                    # Erase in the current background, then step over the run
+                    out.append(f'\x1b[{length}X')
+                    if start + run_end < cols:
+                        out.append(f'\x1b[{length}C')
+                else:
+                    out.append(text)
+            # The cursor stays on the last column instead of wrapping
+            self._term_cursor = (y_value, end) if end < cols else None
+
+        front_chars[:] = back_chars
+        front_pairs[:] = back_pairs
+
+    def doupdate(self):
+        """Send the changes in the back buffer to the terminal in a single write"""
+        out = self._pending
+        self._pending = []
+        for y_value in sorted(self.dirty):
+            self._diff_row(out, y_value)
+        self.dirty.clear()
+
+        if out or self._term_cursor != self.cursor:
+            out.append(f'\x1b[{self.cursor[0] + 1};{self.cursor[1] + 1}H')
+            self._term_cursor = self.cursor
+            self._write(''.join(out))
+            self.frames += 1
+
+    def _write(self, text):
+        data = text.encode()
+        self.bytes_written += len(data)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd_out, view):]
+
+    def _fill_input(self, timeout):
+        if select.select([self.fd_in], [], [], timeout)[0]:
+            self._input.extend(os.read(self.fd_in, 4096))
+
+    def read_key(self, timeout=None):
+        """Read a key from the terminal like `getch()`
+
+        :param timeout: seconds to wait for a key, or `None` to wait forever
+        :type timeout: float
+        :return: `int` key code, or -1 if no key arrived in time
+        """
+        while True:
+            if not self._input:
+                self._fill_input(timeout)
+                if not self._input:
+                    return -1
+
+            key = self._input.popleft()
+            if key == 0x0d:
+                # Return key, translated like curses does by default
+                return ord('\n')
+            if key != 0x1b:
+                return key
+
+            # A lone ESC is only told apart from a sequence by a short wait
+            if not self._input:
+                self._fill_input(0.025)
+            if not self._input or self._input[0] not in b'[O':
+                return key
+
+            # SS3 sequences have one more byte; CSI sequences end with a byte in 0x40-0x7e
+            end = 1
+            while True:
+                while end >= len(self._input):
+                    self._fill_input(0.025)
+                    if end >= len(self._input):
+                        return key
+                if self._input[0] == ord('O') or 0x40 <= self._input[end] <= 0x7e:
+                    break
+                end += 1
+            sequence = bytes(self._input.popleft() for _ in range(end + 1))
+            if sequence in _ESCAPE_KEYS:
+                return _ESCAPE_KEYS[sequence]
+            # Unknown sequences are dropped rather than read as separate keys
+
+def wrapper(func, *args, **kwargs):
+    """Run `func(stdscr, ...)` on the terminal with the ANSI backend
+
+    This works like `curses.wrapper()`: the terminal is put in raw mode and
+    switched to the alternate screen, `termpaint_lib` is routed through an
+    `AnsiCurses` backend, and everything is restored afterwards, even if
+    `func` raises. It needs a POSIX terminal.
+
+    :return: whatever `func` returns
+    """
+    if termios is None:
+        raise RuntimeError('The ANSI backend needs a POSIX terminal')
+
+    fd_in, fd_out = sys.stdin.fileno(), sys.stdout.fileno()
+    saved_attrs = termios.tcgetattr(fd_in)
+    backend = AnsiCurses(fd_in, fd_out)
+    previous_backend = termpaint_lib.use_backend(backend)
+    try:
+        tty.setraw(fd_in)
+        backend.start()
+        return func(backend.stdscr, *args, **kwargs)
+    finally:
+        backend.stop()
+        termios.tcsetattr(fd_in, termios.TCSADRAIN, saved_attrs)
+        termpaint_lib.use_backend(previous_backend)
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from termpaint_io import write_paint_atomic
+
+def default_autosave_path():
+    """Get the path drawings are autosaved to by default
+
+    This is `terminalpaint/autosave.paint` in `$XDG_STATE_HOME`, or in
+    `~/.local/state` if it is not set.
+    """
+    state_home = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+    return os.path.join(state_home, 'terminalpaint', 'autosave.paint')
+
+class Autosaver:
+    """Background thread that saves copies of the drawing
+
+    The thread wakes up every `interval` seconds, or as soon as `poll()`
+    sees at least `edits` edits since the last autosave. If the drawing
+    changed, it takes a copy of the canvas while holding `lock` and then
+    writes the copy with `write_paint_atomic()` without holding it, so
+    the main loop only waits for the copy, never for the file. The
+    palette is copied along with the canvas. A memory-mapped canvas
+    already is its own file, so it is flushed instead of copied; this
+    only writes the pages changed since the last flush. The directory of
+    `fpath` is created if it does not exist.
+
+    The main loop must hold `lock` while it changes the canvas, replaces
+    it in the view, or changes the palette.
+
+    :param view: the part of the drawing shown on the screen; its current canvas is saved
+    :type view: `class Viewport`
+    :param history: journal of the edits, used to tell whether the drawing changed
+    :type history: `class History`
+    :param fpath: path of the autosave file
+    :type fpath: string
+    :param interval: seconds between autosaves
+    :type interval: float
+    :param edits: number of edits that triggers an autosave before the interval is over
+    :type edits: int
+    :param palette: colors of the palette indices of the drawing, or `None`
+    :type palette: `class Palette`
+    """
+    __slots__ = ('fpath', 'interval', 'edits', 'lock', 'last_saved', 'last_error', '_view', '_history', '_palette', '_saved_version', '_wake', '_stop', '_thread')
+
+    def __init__(self, view, history, fpath, interval=30.0, edits=50, palette=None):
+        self.fpath = fpath
+        self.interval = interval
+        self.edits = edits
+        self.lock = threading.Lock()
+        self.last_saved = None
+        self.last_error = None
+        self._view = view
+        self._history = history
+        self._palette = palette
+        self._saved_version = history.version
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread"""
+        self._thread = threading.Thread(target=self._run, name='autosave', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, waiting for a write in progress to finish"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        """Wake the background thread early if enough edits were made
+
+        This should be called by the main loop after handling input.
+        """
+        if self._history.version - self._saved_version >= self.edits:
+            self._wake.set()
+
+    def status(self):
+        """Get a short text about the last autosave for the status bar
+
+        :return: `string`, empty if nothing has been autosaved yet
+        """
+        if self.last_error is not None:
+            return 'Autosave failed!'
+        if self.last_saved is None:
+            return ''
+        return time.strftime('Autosaved %H:%M:%S', time.localtime(self.last_saved))
+
+    def save(self):
+        """Save a copy of the drawing now if it changed since the last autosave
+
+        :return: `bool` - `True` if the drawing was saved
+        """
+        with self.lock:
+            version = self._history.version
+            if version == self._saved_version:
+                return False
+            canvas = self._view.canvas
+            if canvas.mapped_path is not None:
+                try:
+                    canvas.flush()
+                except OSError as error:
+                    self.last_error = error
+                    return False
+                return self._saved(version)
+
+            canvas = canvas.copy()
+            palette = self._palette.copy() if self._palette is not None else None
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.fpath)), exist_ok=True)
+            write_paint_atomic(self.fpath, canvas, palette=palette)
+        except (OSError, ValueError) as error:
+            # A drawing too large for a .paint file is reported like a full disk
+            self.last_error = error
+            return False
+        finally:
+            canvas.close()
+        return self._saved(version)
+
+    def _saved(self, version):
+        self._saved_version = version
+        self.last_saved = time.time()
+        self.last_error = None
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.save()
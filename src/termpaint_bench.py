@@ -0,0 +1,264 @@
+import argparse
+import curses
+import curses.ascii
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import termpaint_lib
+import terminalpaint_tpl as tpl
+from termpaint_ansi import AnsiCurses
+from termpaint_canvas import Canvas
+from termpaint_fakecurses import FakeCurses
+from termpaint_fill import find_region_spans
+from termpaint_io import write_paint
+from termpaint_view import Viewport
+
+DEFAULT_SIZES = ((24, 80), (100, 300), (1000, 1000), (4000, 4000))
+# Screen sizes for the ANSI backend, which keeps whole screens in memory
+ANSI_SIZES = ((24, 80), (60, 200))
+
+def comb_canvas(dim):
+    """Create a canvas with a comb-shaped region
+
+    Every other column is walled off from the bottom row up to the top,
+    so the region is a single connected path with many short runs per row.
+    This is close to the worst case for a scanline fill.
+
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :return: the `Canvas` created
+    """
+    canvas = Canvas(dim)
+    for y_value in range(dim[0] - 1):
+        row = canvas.row(y_value)
+        row[1::2] = bytes([3]) * len(row[1::2])
+    return canvas
+
+def stripe_canvas(dim, width=16):
+    """Create a canvas of diagonal stripes cycling through the 8 drawing colors
+
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param width: width of a stripe in columns
+    :type width: int
+    :return: the `Canvas` created
+    """
+    pattern = bytes(3 + (x_value // width) % 8 for x_value in range(dim[1] + 8 * width))
+    canvas = Canvas(dim)
+    for y_value in range(dim[0]):
+        offset = y_value % (8 * width)
+        canvas.row(y_value)[:] = pattern[offset:offset + dim[1]]
+    return canvas
+
+def time_call(func, *args, repeat=3, setup=None):
+    """Get the best wall-clock time of `repeat` calls of `func(*args)` in seconds
+
+    If given, `setup()` is called before every call and is not timed.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def bench_fill(sizes=(25, 50, 100, 200, 400, 800)):
+    """Benchmark `find_region_spans()` on regions of increasing size
+
+    For every size `n`, a blank `n` x `n` canvas and a comb-shaped canvas
+    of the same size are filled from the top-left corner.
+
+    :param sizes: side lengths of the square canvases
+    :type sizes: tuple
+    :return: `list` of 4-ary tuples `(shape, region_cells, seconds, ns_per_cell)`
+    """
+    results = []
+    for shape, make_canvas in (('blank', Canvas), ('comb', comb_canvas)):
+        for size in sizes:
+            canvas = make_canvas((size, size))
+            region_cells = sum(x_end - x_start for _, x_start, x_end in find_region_spans(canvas, (0, 0)))
+            seconds = time_call(find_region_spans, canvas, (0, 0))
+            results.append((shape, region_cells, seconds, seconds * 1e9 / region_cells))
+    return results
+
+class _Session:
+    """A fake terminal sized to show a whole canvas, with TerminalPaint initialized on it"""
+
+    def __init__(self, dim):
+        self.fake_curses = FakeCurses((dim[0] + 3, dim[1]))
+        self.w = self.fake_curses.stdscr
+        self.previous_backend = termpaint_lib.use_backend(self.fake_curses)
+        termpaint_lib.init_ui(self.w)
+        self.view = Viewport(Canvas(dim), dim)
+        self.term_dim = termpaint_lib.get_term_dim()
+
+    def close(self):
+        termpaint_lib.use_backend(self.previous_backend)
+
+def _result(name, dim, seconds, calls, **extra):
+    result = {
+        'benchmark': name,
+        'rows': dim[0],
+        'cols': dim[1],
+        'seconds': seconds,
+        'curses_calls': calls,
+    }
+    result.update(extra)
+    return result
+
+def _measure(session, name, dim, func, repeat, setup=None, **extra):
+    calls_before = session.w.calls
+    seconds = time_call(func, repeat=repeat, setup=setup)
+    return _result(name, dim, seconds, (session.w.calls - calls_before) // repeat, **extra)
+
+def bench_operations(dim, repeat=3, keys=2000):
+    """Benchmark the editor operations on a canvas of the given size
+
+    Every operation runs against a `FakeWindow` large enough to show the
+    whole canvas, so drawing costs are included. The operations are
+    `open_drawing`, `save_drawing`, `fill_canvas`, `clear_canvas`, and the
+    key dispatch of `ui_main` with a mix of arrow and pencil keys.
+
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param repeat: number of runs of each operation; the best is kept
+    :type repeat: int
+    :param keys: number of keys sent to `ui_main`
+    :type keys: int
+    :return: `list` of `dict` results
+    """
+    results = []
+    session = _Session(dim)
+    w, view, term_dim = session.w, session.view, session.term_dim
+    cells = dim[0] * dim[1]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paint_path = os.path.join(temp_dir, 'stripes.paint')
+        write_paint(paint_path, stripe_canvas(dim))
+
+        results.append(_measure(session, 'open_drawing', dim, lambda: tpl.open_drawing(w, view, paint_path), repeat, cells=cells, bytes=os.path.getsize(paint_path)))
+        results.append(_measure(session, 'save_drawing', dim, lambda: tpl.save_drawing(w, view.canvas, os.path.join(temp_dir, 'saved.paint')), repeat, cells=cells))
+
+        blank = lambda: view.replace(Canvas(dim))
+        results.append(_measure(session, 'fill_canvas', dim, lambda: tpl.fill_canvas(w, view, (0, 0), ord('r')), repeat, setup=blank, cells=cells))
+
+        # Answer "Yes" to the prompt
+        confirm = lambda: w.feed([curses.KEY_RIGHT, ord('\n')])
+        results.append(_measure(session, 'clear_canvas', dim, lambda: tpl.clear_canvas(w, term_dim, view), repeat, setup=confirm, cells=cells))
+
+    session.close()
+
+    # Key dispatch runs the whole main loop on a fresh fake terminal
+    session = _Session(dim)
+    moves = [curses.KEY_RIGHT, ord('r'), curses.KEY_DOWN, ord('g'), curses.KEY_LEFT, ord('b'), curses.KEY_UP, ord('x')]
+    def feed_keys():
+        session.w.feed((moves * (keys // len(moves) + 1))[:keys])
+        session.w.feed([curses.ascii.ctrl(ord('q')), curses.KEY_RIGHT, ord('\n')])
+    result = _measure(session, 'key_dispatch', dim, lambda: tpl.ui_main(session.w), repeat, setup=feed_keys, keys=keys)
+    result['keys_per_second'] = keys / result['seconds']
+    results.append(result)
+    session.close()
+
+    return results
+
+def bench_ansi_frames(dim):
+    """Measure the bytes the ANSI backend sends per frame
+
+    The frames are a full redraw of a striped canvas, one pencil stroke,
+    and a scroll by one row.
+
+    :param dim: screen dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :return: `list` of `dict` results
+    """
+    canvas_dim = (dim[0] - 3, dim[1])
+    with open(os.devnull, 'wb') as devnull:
+        backend = AnsiCurses(fd_out=devnull.fileno(), dim=dim)
+        previous_backend = termpaint_lib.use_backend(backend)
+        w = backend.stdscr
+        termpaint_lib.init_ui(w)
+        view = Viewport(stripe_canvas((canvas_dim[0] * 2, canvas_dim[1])), canvas_dim)
+
+        frames = (
+            ('full_redraw', lambda: termpaint_lib.draw_canvas(w, view), canvas_dim[0] * canvas_dim[1]),
+            ('pencil', lambda: tpl.pencil_canvas(w, view, (1, 1), ord('x')), 1),
+            ('scroll_row', lambda: termpaint_lib.scroll_view(w, view, (1, 0)), canvas_dim[1]),
+        )
+        results = []
+        for name, draw, cells in frames:
+            bytes_before = backend.bytes_written
+            draw()
+            termpaint_lib.update_screen(w)
+            frame_bytes = backend.bytes_written - bytes_before
+            results.append({
+                'benchmark': f'ansi_{name}',
+                'rows': dim[0],
+                'cols': dim[1],
+                'bytes': frame_bytes,
+                'cells': cells,
+                'bytes_per_cell': frame_bytes / cells,
+            })
+        termpaint_lib.use_backend(previous_backend)
+    return results
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=3, keys=2000):
+    """Run every benchmark and collect machine-readable results
+
+    :param sizes: canvas dimensions as 2-ary tuples `(row, column)`
+    :type sizes: tuple
+    :param repeat: number of runs of each operation; the best is kept
+    :type repeat: int
+    :param keys: number of keys sent to `ui_main` per size
+    :type keys: int
+    :return: `dict` with the environment and a `list` of results
+    """
+    results = []
+    for shape, region_cells, seconds, ns_per_cell in bench_fill():
+        results.append({
+            'benchmark': f'find_region_spans_{shape}',
+            'cells': region_cells,
+            'seconds': seconds,
+            'ns_per_cell': ns_per_cell,
+        })
+    for dim in sizes:
+        results.extend(bench_operations(dim, repeat, keys))
+    for dim in ANSI_SIZES:
+        results.extend(bench_ansi_frames(dim))
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results,
+    }
+
+def _size(text):
+    rows, cols = text.lower().split('x')
+    return (int(rows), int(cols))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the TerminalPaint hot paths without a terminal.')
+    parser.add_argument('--sizes', type=lambda text: [_size(size) for size in text.split(',')], default=DEFAULT_SIZES, help='comma-separated canvas sizes such as 24x80,1000x1000')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each operation; the best is kept')
+    parser.add_argument('--keys', type=int, default=2000, help='keys sent to the main loop per size')
+    parser.add_argument('-o', '--output', help='write the JSON results to this file instead of standard output')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.sizes, args.repeat, args.keys)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import curses
+import os
+import time
+from pathlib import Path
+import termpaint_lib
+from termpaint_lib import PAIR_ATTRS, create_center_win, collect_text_prompt, get_cursor_pos
+from termpaint_canvas import iter_runs
+from termpaint_thumbs import ThumbnailCache
+
+ESCAPE_KEY = 27
+TAB_KEY = ord('\t')
+ENTER_KEYS = (curses.KEY_ENTER, ord('\n'), ord('\r'))
+BACK_KEYS = (curses.KEY_BACKSPACE, 8, 127)
+
+# Seconds between checks for a preview that is being made
+PREVIEW_POLL_INTERVAL = 0.05
+
+HELP_TEXT = 'Enter: open  Backspace: up  Tab: type a path  Esc: cancel'
+
+def list_entries(directory, suffixes):
+    """List the subdirectories of a directory and the files in it with one of `suffixes`
+
+    Hidden entries are left out. Only the directory itself is read; the
+    files are not opened or stat'ed, so large directories list quickly.
+
+    :param directory: path of the directory
+    :type directory: string
+    :param suffixes: file suffixes to list, such as `('.paint',)`
+    :type suffixes: tuple
+    :return: `list` of 2-ary tuples (`string` name, `bool` is_dir): `..` first, then the directories, then the files, each sorted by name
+    """
+    dirs, files = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                dirs.append(entry.name)
+            elif Path(entry.name).suffix in suffixes:
+                files.append(entry.name)
+
+    abs_directory = os.path.abspath(directory)
+    listing = [('..', True)] if os.path.dirname(abs_directory) != abs_directory else []
+    listing.extend((name, True) for name in sorted(dirs, key=str.lower))
+    listing.extend((name, False) for name in sorted(files, key=str.lower))
+    return listing
+
+class OpenDialog:
+    """File browser to pick a drawing to open, with a preview of the selected file
+
+    The previews come from a `ThumbnailCache`, which is created and
+    started the first time the dialog is shown. The directory and the
+    selected entry are remembered from one time to the next.
+
+    :param suffixes: suffixes of the files that can be opened
+    :type suffixes: tuple
+    :param directory: directory to start in
+    :type directory: string
+    :param cache_dir: directory to cache the previews in, or `None` for the default
+    :type cache_dir: string
+    """
+    __slots__ = ('suffixes', 'directory', 'selected', 'cache_dir', 'thumbnails')
+
+    def __init__(self, suffixes, directory='.', cache_dir=None):
+        self.suffixes = suffixes
+        self.directory = directory
+        self.selected = 0
+        self.cache_dir = cache_dir
+        self.thumbnails = None
+
+    def close(self):
+        """Stop making previews"""
+        if self.thumbnails is not None:
+            self.thumbnails.stop()
+            self.thumbnails = None
+
+    def _entries(self):
+        try:
+            return list_entries(self.directory, self.suffixes)
+        except OSError:
+            return [('..', True)]
+
+    def _change_directory(self, name):
+        # Go into a subdirectory or up, selecting the directory we came from
+        came_from = os.path.basename(os.path.abspath(self.directory))
+        self.directory = os.path.normpath(os.path.join(self.directory, name))
+        entries = self._entries()
+        self.selected = 0
+        if name == '..':
+            self.selected = next((idx for idx, entry in enumerate(entries) if entry == (came_from, True)), 0)
+        return entries
+
+    def _draw(self, prompt_w, size, entries, top, preview_x):
+        list_rows = size[0] - 4
+        list_width = preview_x - 4
+        inner_width = size[1] - 4
+        preview_dim = (list_rows, size[1] - preview_x - 2)
+
+        prompt_w.box()
+        title = os.path.abspath(self.directory)
+        if len(title) > inner_width:
+            title = '...' + title[len(title) - inner_width + 3:]
+        prompt_w.addstr(1, 2, title.ljust(inner_width))
+        prompt_w.addstr(size[0] - 2, 2, HELP_TEXT[:inner_width].ljust(inner_width))
+
+        for row in range(list_rows):
+            idx = top + row
+            text = ''
+            if idx < len(entries):
+                name, is_dir = entries[idx]
+                text = name + '/' if is_dir else name
+            text = text[:list_width].ljust(list_width)
+            if idx == self.selected:
+                prompt_w.addstr(2 + row, 2, text, termpaint_lib.curses.color_pair(2)) # Selected
+            else:
+                prompt_w.addstr(2 + row, 2, text)
+            prompt_w.addstr(2 + row, preview_x, ' ' * preview_dim[1])
+
+        # Queue the previews of the files in view, the selected one last so it is made first
+        for name, is_dir in entries[top:top + list_rows]:
+            if not is_dir:
+                self.thumbnails.get(os.path.join(self.directory, name))
+        if not entries or entries[self.selected][1]:
+            return False
+        fpath = os.path.join(self.directory, entries[self.selected][0])
+        thumbnail = self.thumbnails.get(fpath)
+        if thumbnail is None:
+            pending = self.thumbnails.pending(fpath)
+            prompt_w.addstr(2, preview_x, ('Making preview...' if pending else 'No preview')[:preview_dim[1]])
+            return pending
+
+        x_offset = preview_x + (preview_dim[1] - thumbnail.dim[1]) // 2
+        for y_value in range(min(thumbnail.dim[0], preview_dim[0])):
+            for run_start, run_end, color_pair_idx in iter_runs(thumbnail.row(y_value)):
+                prompt_w.chgat(2 + y_value, x_offset + run_start, run_end - run_start, PAIR_ATTRS[color_pair_idx])
+        return False
+
+    def run(self, w, term_dim):
+        """Show the dialog until a file is picked or the dialog is cancelled
+
+        The arrow keys, Page Up, Page Down, Home and End move the
+        selection. Enter opens the selected file or goes into the selected
+        directory, and Backspace goes up. Tab closes the dialog and asks
+        for a path instead, as does a terminal too small for the dialog.
+        While the preview of the selected file is being made, the keys are
+        polled so the preview is shown as soon as it is ready.
+
+        :param w: the `Window` object
+        :type w: `class Window`
+        :param term_dim: terminal dimensions as a 2-ary tuple `(row, column)`
+        :type term_dim: tuple
+        :return: `string` path of the file picked, or `None` if the dialog was cancelled
+        """
+        size = (min(term_dim[0] - 2, 30), min(term_dim[1] - 2, 100))
+        if size[0] < 8 or size[1] < 30:
+            return collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter drawing to open: ')
+        preview_x = min(36, size[1] // 2)
+        list_rows = size[0] - 4
+        if self.thumbnails is None:
+            self.thumbnails = ThumbnailCache((list_rows, size[1] - preview_x - 2), self.cache_dir)
+            self.thumbnails.start()
+
+        entries = self._entries()
+        self.selected = min(self.selected, max(len(entries) - 1, 0))
+        top = 0
+        fpath = None
+        type_path = False
+
+        current_cur = get_cursor_pos()
+        prompt_w, prompt_w_dims = create_center_win(size, term_dim)
+        prompt_w.bkgd(termpaint_lib.curses.color_pair(1))
+        termpaint_lib.curses.curs_set(0)
+        try:
+            while True:
+                top = min(max(top, self.selected - list_rows + 1), self.selected)
+                waiting = self._draw(prompt_w, size, entries, top, preview_x)
+                prompt_w.refresh()
+
+                w.nodelay(waiting)
+                key = w.getch()
+                if key == -1:
+                    if waiting:
+                        time.sleep(PREVIEW_POLL_INTERVAL)
+                elif key == curses.KEY_UP:
+                    self.selected = max(self.selected - 1, 0)
+                elif key == curses.KEY_DOWN:
+                    self.selected = min(self.selected + 1, max(len(entries) - 1, 0))
+                elif key == curses.KEY_PPAGE:
+                    self.selected = max(self.selected - list_rows, 0)
+                elif key == curses.KEY_NPAGE:
+                    self.selected = min(self.selected + list_rows, max(len(entries) - 1, 0))
+                elif key == curses.KEY_HOME:
+                    self.selected = 0
+                elif key == curses.KEY_END:
+                    self.selected = max(len(entries) - 1, 0)
+                elif key in ENTER_KEYS and entries:
+                    name, is_dir = entries[self.selected]
+                    if not is_dir:
+                        fpath = os.path.join(self.directory, name)
+                        break
+                    entries = self._change_directory(name)
+                elif key in BACK_KEYS:
+                    entries = self._change_directory('..')
+                elif key == TAB_KEY:
+                    type_path = True
+                    break
+                elif key == ESCAPE_KEY:
+                    break
+        finally:
+            w.nodelay(False)
+            termpaint_lib.curses.curs_set(2)
+            del prompt_w
+            w.touchwin()
+            w.move(current_cur[0], current_cur[1])
+            w.refresh()
+
+        if type_path:
+            return collect_text_prompt(w, term_dim, lines_from_end=2, msg='Enter drawing to open: ')
+        return fpath
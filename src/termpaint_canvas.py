@@ -0,0 +1,436 @@
+import re
+import zlib
+from collections import OrderedDict
+
+BLANK_COLOR_PAIR_IDX = 10
+
+# Number of cells handled at a time by whole-canvas operations
+_CHUNK_SIZE = 1 << 20
+
+# A run of one repeated byte. Literal repeats are much faster in `re`
+# than a backreference such as `(.)\1*`.
+_RUN_PATTERN = re.compile(b'|'.join(re.escape(bytes([i])) + b'+' for i in range(256)))
+
+def iter_runs(cells):
+    """Split cells into runs of the same color pair index
+
+    :param cells: color pair indices
+    :type cells: bytes-like object
+    :return: generator of 3-ary tuples `(start, end, color_pair_idx)`, where `end` is exclusive
+    """
+    for match in _RUN_PATTERN.finditer(cells):
+        yield match.start(), match.end(), cells[match.start()]
+
+def _attached_index(canvas, index_class):
+    if index_class not in canvas.indexes:
+        canvas.indexes[index_class] = index_class(canvas)
+    return canvas.indexes[index_class]
+
+class Canvas:
+    """In-memory model of a drawing
+
+    The canvas stores one byte per cell in a flat, row-major `bytearray`.
+    Each byte is a color pair index as generated by `init_color_pairs()`.
+    The canvas is the source of truth for the drawing; the curses window
+    is only used as a render target, so reading the drawing back never
+    has to go through `inch()`.
+
+    Instead of a new `bytearray`, the canvas can be given any writable
+    buffer of the right size in `cells`, for example a `memoryview` of a
+    memory-mapped file (see `open_binary_paint()`). Whole-canvas operations
+    work in chunks, so they never copy such a buffer all at once.
+
+    Every change made through the methods of the canvas is passed on to
+    its indexes, such as a `ColorIndex` (see `indexed()`).
+
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param color_pair_idx: index of the color-pair every cell starts with
+    :type color_pair_idx: int
+    :param cells: buffer of `row * column` cells to use, or `None`
+    :type cells: bytes-like object
+    :param mapping: the `mmap` object `cells` comes from, or `None`
+    :type mapping: `class mmap`
+    :param mapped_path: path of the file mapped by `mapping`, or `None`
+    :type mapped_path: string
+    """
+    __slots__ = ('dim', 'cells', 'mapped_path', 'indexes', '_view', '_mapping')
+
+    def __init__(self, dim, color_pair_idx=BLANK_COLOR_PAIR_IDX, cells=None, mapping=None, mapped_path=None):
+        self.dim = (dim[0], dim[1])
+        if cells is None:
+            cells = bytearray([color_pair_idx]) * (dim[0] * dim[1])
+        elif len(cells) != dim[0] * dim[1]:
+            raise ValueError('Cell buffer does not match the canvas dimensions')
+        self.cells = cells
+        self._view = memoryview(cells)
+        self._mapping = mapping
+        self.mapped_path = mapped_path
+        self.indexes = {}
+
+    def get(self, coord):
+        """Get the color pair index at `coord` as a 2-ary tuple `(row, column)`"""
+        return self.cells[coord[0] * self.dim[1] + coord[1]]
+
+    def set(self, coord, color_pair_idx):
+        """Set the color pair index at `coord` as a 2-ary tuple `(row, column)`"""
+        self.cells[coord[0] * self.dim[1] + coord[1]] = color_pair_idx
+        for index in self.indexes.values():
+            index.touch(coord[0])
+
+    def row(self, y_value):
+        """Get a row of the canvas
+
+        The returned `memoryview` shares memory with the canvas, so
+        writing to it changes the drawing.
+
+        :param y_value: index of the row
+        :type y_value: int
+        :return: `memoryview` of the cells in the row
+        """
+        start = y_value * self.dim[1]
+        return self._view[start:start + self.dim[1]]
+
+    def rows(self):
+        """Iterate over every row of the canvas as a `memoryview`"""
+        for y_value in range(self.dim[0]):
+            yield self.row(y_value)
+
+    def span(self, y_value, x_start, x_end):
+        """Get the cells of the columns `x_start` up to (but not including) `x_end` in a row"""
+        start = y_value * self.dim[1]
+        return self._view[start + x_start:start + x_end]
+
+    def _chunks(self):
+        for start in range(0, len(self._view), _CHUNK_SIZE):
+            yield self._view[start:start + _CHUNK_SIZE]
+
+    def fill_span(self, y_value, x_start, x_end, color_pair_idx):
+        """Set the color pair index of the columns `x_start` up to (but not including) `x_end` in a row"""
+        start = y_value * self.dim[1]
+        self._view[start + x_start:start + x_end] = bytes([color_pair_idx]) * (x_end - x_start)
+        for index in self.indexes.values():
+            index.touch(y_value)
+
+    def write_span(self, y_value, x_start, cells):
+        """Copy color pair indices into a row, starting at column `x_start`"""
+        start = y_value * self.dim[1] + x_start
+        self._view[start:start + len(cells)] = cells
+        for index in self.indexes.values():
+            index.touch(y_value)
+
+    def clear(self, color_pair_idx=BLANK_COLOR_PAIR_IDX):
+        """Set every cell of the canvas to `color_pair_idx`"""
+        for chunk in self._chunks():
+            chunk[:] = bytes([color_pair_idx]) * len(chunk)
+        for index in self.indexes.values():
+            index.invalidate()
+
+    def load(self, other):
+        """Copy the cells of another canvas with the same dimensions into this one"""
+        self._view[:] = other._view
+        for index in self.indexes.values():
+            index.invalidate()
+
+    def snapshot(self):
+        """Get an immutable copy of the cells as `bytes`"""
+        return self._view.tobytes()
+
+    def copy(self):
+        """Get an independent in-memory copy of the canvas"""
+        return Canvas(self.dim, cells=bytearray(self._view))
+
+    def recolor(self, old_color_pair_idx, new_color_pair_idx):
+        """Change every cell with `old_color_pair_idx` to `new_color_pair_idx`"""
+        table = bytearray(range(256))
+        table[old_color_pair_idx] = new_color_pair_idx
+        for chunk in self._chunks():
+            chunk[:] = chunk.tobytes().translate(table)
+        for index in self.indexes.values():
+            index.invalidate()
+
+    def indexed(self, index_class):
+        """Get the index of a kind, such as `ColorIndex`, kept up to date by the canvas
+
+        The index is made with `index_class(canvas)` on first use. It is
+        told about every change through its `touch(row)` method, or its
+        `invalidate()` method when the whole canvas may have changed.
+        """
+        return _attached_index(self, index_class)
+
+    def count(self, color_pair_idx):
+        """Get the number of cells with `color_pair_idx`"""
+        return sum(chunk.tobytes().count(color_pair_idx) for chunk in self._chunks())
+
+    def crop(self, top_left, dim):
+        """Copy a rectangular part of the canvas into a new canvas
+
+        :param top_left: top-left corner of the part as a 2-ary tuple `(row, column)`
+        :type top_left: tuple
+        :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+        :type dim: tuple
+        :return: the new `Canvas`
+        """
+        if dim[0] <= 0 or dim[1] <= 0:
+            raise ValueError('Crop area must be at least one cell in each dimension')
+        if top_left[0] < 0 or top_left[1] < 0 or top_left[0] + dim[0] > self.dim[0] or top_left[1] + dim[1] > self.dim[1]:
+            raise ValueError('Crop area is outside of the canvas')
+
+        cropped = Canvas(dim)
+        for y_value in range(dim[0]):
+            cropped.row(y_value)[:] = self.row(top_left[0] + y_value)[top_left[1]:top_left[1] + dim[1]]
+        return cropped
+
+    def flush(self):
+        """Write pending changes of a memory-mapped canvas back to its file"""
+        if self._mapping is not None:
+            self._mapping.flush()
+
+    def close(self):
+        """Flush and unmap a memory-mapped canvas
+
+        The canvas must not be used afterwards.
+        """
+        if self._mapping is not None:
+            self._view.release()
+            if isinstance(self.cells, memoryview):
+                self.cells.release()
+            self._mapping.flush()
+            self._mapping.close()
+            self._mapping = None
+            self.mapped_path = None
+
+class TiledCanvas:
+    """Drawing split into square tiles that are allocated on demand
+
+    A tile is only allocated once a cell in it is changed, so empty parts
+    of the drawing take no memory. At most `max_tiles` tiles are kept
+    uncompressed; when another is needed, the least recently used tile
+    that is not on or next to the part of the drawing on the screen (see
+    `keep_near()`) is dropped. A dropped tile that is still a single
+    color is forgotten, and any other tile is kept compressed until it
+    is used again.
+
+    This has the same methods as `Canvas`, except that `row()` and
+    `span()` return copies of the cells, so they cannot be written to,
+    and there is no `load()` or `recolor()`.
+
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param color_pair_idx: index of the color-pair every cell starts with
+    :type color_pair_idx: int
+    :param tile_size: number of rows and columns of a tile
+    :type tile_size: int
+    :param max_tiles: number of uncompressed tiles to keep
+    :type max_tiles: int
+    """
+    __slots__ = ('dim', 'tile_size', 'max_tiles', 'mapped_path', 'indexes', '_blank', '_tiles', '_cold', '_kept')
+
+    def __init__(self, dim, color_pair_idx=BLANK_COLOR_PAIR_IDX, tile_size=64, max_tiles=1024):
+        self.dim = (dim[0], dim[1])
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.mapped_path = None
+        self.indexes = {}
+        self._blank = color_pair_idx
+        self._tiles = OrderedDict()
+        self._cold = {}
+        # Tile rows and columns, from and to (inclusive), that are never dropped
+        self._kept = (0, 0, -1, -1)
+
+    def keep_near(self, top_left, dim):
+        """Keep the tiles of a part of the canvas, and the tiles around it, from being dropped
+
+        The viewport calls this with the part of the canvas on the screen
+        whenever it moves, so scrolling back and forth by a tile never has
+        to decompress a tile.
+
+        :param top_left: top-left corner of the part as a 2-ary tuple `(row, column)`
+        :type top_left: tuple
+        :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+        :type dim: tuple
+        """
+        size = self.tile_size
+        self._kept = (
+            top_left[0] // size - 1,
+            top_left[1] // size - 1,
+            (top_left[0] + dim[0] - 1) // size + 1,
+            (top_left[1] + dim[1] - 1) // size + 1,
+        )
+
+    def _tile(self, key, create):
+        """Get the cells of a tile, or `None` if it is blank and `create` is `False`"""
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        if key in self._cold:
+            tile = bytearray(zlib.decompress(self._cold.pop(key)))
+        elif create:
+            tile = bytearray([self._blank]) * (self.tile_size * self.tile_size)
+        else:
+            return None
+
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._evict()
+        return tile
+
+    def _evict(self):
+        top, left, bottom, right = self._kept
+        # The least recently used tile away from the screen, if there is one
+        for key in self._tiles:
+            if not (top <= key[0] <= bottom and left <= key[1] <= right):
+                break
+        else:
+            key = next(iter(self._tiles))
+        tile = self._tiles.pop(key)
+        if tile.count(self._blank) != len(tile):
+            self._cold[key] = zlib.compress(tile, 1)
+
+    def get(self, coord):
+        """Get the color pair index at `coord` as a 2-ary tuple `(row, column)`"""
+        tile = self._tile((coord[0] // self.tile_size, coord[1] // self.tile_size), False)
+        if tile is None:
+            return self._blank
+        return tile[(coord[0] % self.tile_size) * self.tile_size + coord[1] % self.tile_size]
+
+    def set(self, coord, color_pair_idx):
+        """Set the color pair index at `coord` as a 2-ary tuple `(row, column)`"""
+        tile = self._tile((coord[0] // self.tile_size, coord[1] // self.tile_size), color_pair_idx != self._blank)
+        if tile is not None:
+            tile[(coord[0] % self.tile_size) * self.tile_size + coord[1] % self.tile_size] = color_pair_idx
+        for index in self.indexes.values():
+            index.touch(coord[0])
+
+    def _tile_spans(self, y_value, x_start, x_end):
+        # Split columns [x_start, x_end) of a row at tile boundaries
+        size = self.tile_size
+        tile_y, offset_y = divmod(y_value, size)
+        while x_start < x_end:
+            tile_x, offset_x = divmod(x_start, size)
+            length = min(size - offset_x, x_end - x_start)
+            yield (tile_y, tile_x), offset_y * size + offset_x, length
+            x_start += length
+
+    def span(self, y_value, x_start, x_end):
+        """Get a copy of the cells of the columns `x_start` up to (but not including) `x_end` in a row"""
+        cells = bytearray()
+        for key, start, length in self._tile_spans(y_value, x_start, x_end):
+            tile = self._tile(key, False)
+            cells += bytes([self._blank]) * length if tile is None else tile[start:start + length]
+        return bytes(cells)
+
+    def row(self, y_value):
+        """Get a copy of the cells in a row as `bytes`"""
+        return self.span(y_value, 0, self.dim[1])
+
+    def rows(self):
+        """Iterate over every row of the canvas as `bytes`"""
+        for y_value in range(self.dim[0]):
+            yield self.row(y_value)
+
+    def fill_span(self, y_value, x_start, x_end, color_pair_idx):
+        """Set the color pair index of the columns `x_start` up to (but not including) `x_end` in a row"""
+        for key, start, length in self._tile_spans(y_value, x_start, x_end):
+            tile = self._tile(key, color_pair_idx != self._blank)
+            if tile is not None:
+                tile[start:start + length] = bytes([color_pair_idx]) * length
+        for index in self.indexes.values():
+            index.touch(y_value)
+
+    def write_span(self, y_value, x_start, cells):
+        """Copy color pair indices into a row, starting at column `x_start`"""
+        offset = 0
+        for key, start, length in self._tile_spans(y_value, x_start, x_start + len(cells)):
+            part = cells[offset:offset + length]
+            tile = self._tile(key, part.count(self._blank) != length)
+            if tile is not None:
+                tile[start:start + length] = part
+            offset += length
+        for index in self.indexes.values():
+            index.touch(y_value)
+
+    def clear(self, color_pair_idx=BLANK_COLOR_PAIR_IDX):
+        """Set every cell of the canvas to `color_pair_idx`, freeing every tile"""
+        self._blank = color_pair_idx
+        self._tiles.clear()
+        self._cold.clear()
+        for index in self.indexes.values():
+            index.invalidate()
+
+    def indexed(self, index_class):
+        """Get the index of a kind, such as `ColorIndex`, kept up to date by the canvas
+
+        The index is made with `index_class(canvas)` on first use. It is
+        told about every change through its `touch(row)` method, or its
+        `invalidate()` method when the whole canvas may have changed.
+        """
+        return _attached_index(self, index_class)
+
+    def count(self, color_pair_idx):
+        """Get the number of cells with `color_pair_idx`
+
+        Only the tiles in use are read; every other cell is blank.
+        """
+        size = self.tile_size
+        counted = stored = 0
+        for key in list(self._tiles) + list(self._cold):
+            # Tiles at the bottom and right edges stick out of the canvas
+            rows = min(size, self.dim[0] - key[0] * size)
+            cols = min(size, self.dim[1] - key[1] * size)
+            tile = self._tiles[key] if key in self._tiles else zlib.decompress(self._cold[key])
+            if rows == cols == size:
+                counted += tile.count(color_pair_idx)
+            else:
+                counted += sum(tile[y_value * size:y_value * size + cols].count(color_pair_idx) for y_value in range(rows))
+            stored += rows * cols
+        if color_pair_idx == self._blank:
+            counted += self.dim[0] * self.dim[1] - stored
+        return counted
+
+    def crop(self, top_left, dim):
+        """Copy a rectangular part of the canvas into a new tiled canvas
+
+        Blank parts of the rectangle stay unallocated in the new canvas.
+
+        :param top_left: top-left corner of the part as a 2-ary tuple `(row, column)`
+        :type top_left: tuple
+        :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+        :type dim: tuple
+        :return: the new `TiledCanvas`
+        """
+        if dim[0] <= 0 or dim[1] <= 0:
+            raise ValueError('Crop area must be at least one cell in each dimension')
+        if top_left[0] < 0 or top_left[1] < 0 or top_left[0] + dim[0] > self.dim[0] or top_left[1] + dim[1] > self.dim[1]:
+            raise ValueError('Crop area is outside of the canvas')
+
+        cropped = TiledCanvas(dim, self._blank, self.tile_size, self.max_tiles)
+        for y_value in range(dim[0]):
+            cropped.write_span(y_value, 0, self.span(top_left[0] + y_value, top_left[1], top_left[1] + dim[1]))
+        return cropped
+
+    def snapshot(self):
+        """Get an immutable copy of the cells as `bytes`"""
+        return b''.join(self.rows())
+
+    def copy(self):
+        """Get an independent copy of the canvas
+
+        Only the uncompressed tiles are copied; compressed tiles are
+        immutable, so they are shared. This takes time proportional to
+        the number of tiles in use rather than the size of the canvas.
+        """
+        other = TiledCanvas(self.dim, self._blank, self.tile_size, self.max_tiles)
+        other._tiles = OrderedDict((key, bytearray(tile)) for key, tile in self._tiles.items())
+        other._cold = dict(self._cold)
+        return other
+
+    def flush(self):
+        """Do nothing; a tiled canvas is never backed by a file"""
+
+    def close(self):
+        """Free every tile"""
+        self._tiles.clear()
+        self._cold.clear()
@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import sys
+import zlib
+from termpaint_canvas import Canvas
+from termpaint_io import RAW_TO_IDX, read_paint, write_paint, write_paint_atomic, iter_paint_files, output_stem
+from termpaint_fill import find_region_spans
+from termpaint_colorindex import ColorIndex
+from termpaint_export import EXPORT_FORMATS, export_files
+from termpaint_import import IMAGE_SUFFIXES, image_to_canvas
+from termpaint_palette import FIRST_PALETTE_IDX, Palette
+from termpaint_diff import diff_paint_files
+from termpaint_layers import LayeredCanvas
+from termpaint_frames import Animation
+
+def fill_drawing(canvas, start_coord, color_pair_idx, connectivity=4):
+    """Flood-fill a region of a canvas without a terminal
+
+    This is the headless counterpart of `fill_canvas()`.
+
+    :param canvas: the drawing to edit
+    :type canvas: `class Canvas`
+    :param start_coord: starting coordinate to color as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param color_pair_idx: index of the color-pair the region should be set to
+    :type color_pair_idx: int
+    :param connectivity: either `4` or `8`
+    :type connectivity: int
+    :return: `int` number of cells changed
+    """
+    if not (0 <= start_coord[0] < canvas.dim[0] and 0 <= start_coord[1] < canvas.dim[1]):
+        raise ValueError(f'Fill coordinate {start_coord} is outside of the canvas')
+    if canvas.get(start_coord) == color_pair_idx:
+        return 0
+
+    cells_changed = 0
+    for y_value, x_start, x_end in find_region_spans(canvas, start_coord, connectivity):
+        canvas.fill_span(y_value, x_start, x_end, color_pair_idx)
+        cells_changed += x_end - x_start
+    return cells_changed
+
+def drawing_stats(canvas):
+    """Get statistics of a canvas
+
+    Cells with palette colors are counted by their palette index, written
+    as in .paint files (`#0b` for index 11), so the counts add up to every
+    cell of the canvas.
+
+    :param canvas: the drawing
+    :type canvas: `class Canvas`
+    :return: `dict` with the dimensions and the number of cells of each raw color and palette index
+    """
+    counts = canvas.indexed(ColorIndex).colors()
+    colors = {raw: counts.get(idx, 0) for raw, idx in RAW_TO_IDX.items()}
+    colors.update((f'#{idx:02x}', count) for idx, count in sorted(counts.items()) if idx >= FIRST_PALETTE_IDX)
+    return {
+        'dim': list(canvas.dim),
+        'colors': colors,
+    }
+
+def process_files(paths, operation, output_dir=None, rle=True):
+    """Apply an operation to .paint files one at a time
+
+    Each file is read, passed to `operation`, and written back with its
+    palette before the next file is read, so only one drawing is held in
+    memory. A file with the same name as one written before to
+    `output_dir` fails rather than overwriting its result. Files are
+    overwritten in place with `write_paint_atomic()`, so a failed write
+    leaves the input as it was.
+
+    Layered drawings are flattened and only the first frame of an
+    animation is used, as by `read_paint()`. Their results can be written
+    to `output_dir`, but writing them in place fails, as it would lose
+    the layers or the other frames.
+
+    :param paths: iterable of file or directory paths
+    :type paths: iterable
+    :param operation: function receiving a `Canvas` and returning either a `Canvas` to write or any other result
+    :type operation: function
+    :param output_dir: directory to write results to, or `None` to overwrite the files in place
+    :type output_dir: string
+    :param rle: `True` if results should be written run-length encoded
+    :type rle: bool
+    :return: generator of 3-ary tuples (`str` path, `bool` is_success, info), where info is the path written to, the result of `operation`, or an error message
+    """
+    taken = set()
+    for fpath in iter_paint_files(paths):
+        try:
+            palette = Palette()
+            drawing = read_paint(fpath, layers=True, frames=True, palette=palette)
+            if isinstance(drawing, LayeredCanvas):
+                canvas = drawing.flatten()
+            elif isinstance(drawing, Animation):
+                canvas = drawing.frame_canvas(0)
+            else:
+                canvas = drawing
+            result = operation(canvas)
+            if not isinstance(result, Canvas):
+                yield (fpath, True, result)
+                continue
+
+            if output_dir is None:
+                if drawing is not canvas:
+                    raise ValueError('Drawings with layers or frames cannot be changed in place')
+                # The input is only replaced once the result is written in full
+                out_path = fpath
+                write_paint_atomic(out_path, result, rle, palette)
+            else:
+                out_path = output_stem(fpath, output_dir, taken) + '.paint'
+                write_paint(out_path, result, rle, palette)
+            yield (fpath, True, out_path)
+        except (OSError, ValueError) as e:
+            yield (fpath, False, str(e))
+
+def import_images(paths, output_dir, dim=None, dither=False, rle=True):
+    """Convert PNG or PPM images to .paint files one at a time
+
+    :param paths: iterable of image file or directory paths
+    :type paths: iterable
+    :param output_dir: directory to write the drawings to
+    :type output_dir: string
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`, or `None` for the size of each image
+    :type dim: tuple
+    :param dither: `True` to use Floyd-Steinberg dithering
+    :type dither: bool
+    :param rle: `True` if the drawings should be written run-length encoded
+    :type rle: bool
+    :return: generator of 3-ary tuples (`str` path, `bool` is_success, info), where info is the path written to or an error message
+    """
+    taken = set()
+    for fpath in iter_paint_files(paths, IMAGE_SUFFIXES):
+        try:
+            out_path = output_stem(fpath, output_dir, taken) + '.paint'
+            write_paint(out_path, image_to_canvas(fpath, dim, dither), rle)
+            yield (fpath, True, out_path)
+        except (OSError, ValueError, zlib.error) as e:
+            yield (fpath, False, str(e))
+
+def _raw_color(raw):
+    if raw not in RAW_TO_IDX:
+        raise argparse.ArgumentTypeError(f'color must be one of {"".join(RAW_TO_IDX)}')
+    return RAW_TO_IDX[raw]
+
+def _input_paths(paths):
+    # `-` reads one path per line from standard input
+    for path in paths:
+        if path == '-':
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+        else:
+            yield path
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='termpaint', description='Process TerminalPaint drawings without a terminal.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, help_text, writes=True):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('paths', nargs='+', metavar='PATH', help='.paint file, directory, or - to read paths from standard input')
+        if writes:
+            where = command.add_mutually_exclusive_group(required=True)
+            where.add_argument('-o', '--output-dir', help='directory to write the results to')
+            where.add_argument('-i', '--in-place', action='store_true', help='overwrite the input files')
+            command.add_argument('--plain', action='store_true', help='write one character per cell instead of run-length encoded rows')
+        return command
+
+    command = add_command('fill', 'flood-fill a region')
+    command.add_argument('--at', nargs=2, type=int, required=True, metavar=('ROW', 'COL'))
+    command.add_argument('--color', type=_raw_color, required=True)
+    command.add_argument('--connectivity', type=int, choices=(4, 8), default=4)
+
+    command = add_command('recolor', 'replace a color everywhere')
+    command.add_argument('--from', dest='from_color', type=_raw_color, required=True)
+    command.add_argument('--to', dest='to_color', type=_raw_color, required=True)
+
+    command = add_command('crop', 'crop to a rectangle')
+    command.add_argument('--at', nargs=2, type=int, required=True, metavar=('ROW', 'COL'))
+    command.add_argument('--size', nargs=2, type=int, required=True, metavar=('ROWS', 'COLS'))
+
+    add_command('stats', 'print dimensions and color counts as JSON lines', writes=False)
+
+    command = add_command('import', 'convert PNG or PPM images to drawings', writes=False)
+    command.add_argument('-o', '--output-dir', required=True, help='directory to write the drawings to')
+    command.add_argument('--size', nargs=2, type=int, metavar=('ROWS', 'COLS'), help='canvas size to scale the images to (default: the image size)')
+    command.add_argument('--dither', action='store_true', help='use Floyd-Steinberg dithering')
+    command.add_argument('--plain', action='store_true', help='write one character per cell instead of run-length encoded rows')
+
+    command = add_command('export', 'render to PNG or PPM images', writes=False)
+    command.add_argument('-o', '--output-dir', required=True, help='directory to write the images to')
+    command.add_argument('--format', dest='formats', action='append', choices=EXPORT_FORMATS, help='image format; may be given more than once (default: png)')
+    command.add_argument('--scale', type=int, default=1, help='size of a cell in pixels')
+    command.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: one per core)')
+
+    command = commands.add_parser('diff', help='print the cells and areas that differ between two drawings as JSON; exits with 1 if they differ')
+    command.add_argument('old', metavar='OLD', help='.paint or .bpaint file')
+    command.add_argument('new', metavar='NEW', help='.paint or .bpaint file')
+
+    return parser
+
+def _operation(args):
+    if args.command == 'fill':
+        def operation(canvas):
+            fill_drawing(canvas, tuple(args.at), args.color, args.connectivity)
+            return canvas
+    elif args.command == 'recolor':
+        def operation(canvas):
+            canvas.recolor(args.from_color, args.to_color)
+            return canvas
+    elif args.command == 'crop':
+        def operation(canvas):
+            return canvas.crop(tuple(args.at), tuple(args.size))
+    elif args.command == 'stats':
+        operation = drawing_stats
+    else:
+        operation = None
+    return operation
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'diff':
+        try:
+            summary = diff_paint_files(args.old, args.new).summary()
+        except (OSError, ValueError) as e:
+            print(f'{args.old}, {args.new}: {e}', file=sys.stderr)
+            return 2
+        print(json.dumps({'old': args.old, 'new': args.new, **summary}))
+        return 1 if summary['cells'] else 0
+
+    operation = _operation(args)
+    output_dir = getattr(args, 'output_dir', None)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if args.command == 'import':
+        results = import_images(_input_paths(args.paths), output_dir, args.size and tuple(args.size), args.dither, not args.plain)
+    elif args.command == 'export':
+        results = export_files(_input_paths(args.paths), output_dir, tuple(args.formats or ('png',)), args.scale, args.jobs)
+    else:
+        results = process_files(_input_paths(args.paths), operation, output_dir, not getattr(args, 'plain', False))
+
+    failures = 0
+    for fpath, is_success, info in results:
+        if not is_success:
+            failures += 1
+            print(f'{fpath}: {info}', file=sys.stderr)
+        elif args.command == 'stats':
+            print(json.dumps({'path': fpath, **info}))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+from termpaint_canvas import Canvas
+from termpaint_palette import FIRST_PALETTE_IDX, nearest_drawing_color
+
+def region_rect(start_coord, end_coord):
+    """Get the rectangle with two opposite corners
+
+    :param start_coord: a corner as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param end_coord: the opposite corner as a 2-ary tuple `(row, column)`
+    :type end_coord: tuple
+    :return: 2-ary tuple (`tuple` top_left, `tuple` dim) of the rectangle
+    """
+    top, bottom = sorted((start_coord[0], end_coord[0]))
+    left, right = sorted((start_coord[1], end_coord[1]))
+    return (top, left), (bottom - top + 1, right - left + 1)
+
+def copy_region(canvas, top_left, dim):
+    """Copy a rectangular part of a canvas
+
+    Every row is copied as one slice of the cells of the canvas, so this
+    takes time proportional to the number of rows. Unlike `Canvas.crop()`,
+    this works on any kind of canvas.
+
+    :param canvas: the drawing to copy from
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    :param top_left: top-left corner of the part as a 2-ary tuple `(row, column)`
+    :type top_left: tuple
+    :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :return: the part as a new `Canvas`
+    """
+    if top_left[0] < 0 or top_left[1] < 0 or top_left[0] + dim[0] > canvas.dim[0] or top_left[1] + dim[1] > canvas.dim[1]:
+        raise ValueError('Region is outside of the canvas')
+
+    x_start, x_end = top_left[1], top_left[1] + dim[1]
+    cells = bytearray().join(canvas.span(y_value, x_start, x_end) for y_value in range(top_left[0], top_left[0] + dim[0]))
+    return Canvas(dim, cells=cells)
+
+def flip_region(region, horizontal=True):
+    """Mirror a copied region
+
+    :param region: the region as returned by `copy_region()`
+    :type region: `class Canvas`
+    :param horizontal: `True` to swap left and right, `False` to swap top and bottom
+    :type horizontal: bool
+    :return: the mirrored region as a new `Canvas`
+    """
+    cols = region.dim[1]
+    cells = bytes(region.cells)
+    starts = range(0, len(cells), cols)
+    if horizontal:
+        flipped = bytearray().join(cells[start:start + cols][::-1] for start in starts)
+    else:
+        flipped = bytearray().join(cells[start:start + cols] for start in reversed(starts))
+    return Canvas(region.dim, cells=flipped)
+
+def rotate_region(region):
+    """Rotate a copied region a quarter turn clockwise
+
+    Each row of the result is a column of the region read from bottom to
+    top, taken with a single strided slice.
+
+    :param region: the region as returned by `copy_region()`
+    :type region: `class Canvas`
+    :return: the rotated region as a new `Canvas`
+    """
+    rows, cols = region.dim
+    cells = bytes(region.cells)
+    rotated = bytearray().join(cells[x_value::cols][::-1] for x_value in range(cols))
+    return Canvas((cols, rows), cells=rotated)
+
+def map_region_colors(region, palette, target):
+    """Give the palette colors of a copied region the indices they have in another palette
+
+    Palette indices only mean a color together with their palette, so a
+    region copied from a drawing is mapped through the RGB colors before
+    it is pasted into a drawing with another palette. Colors missing from
+    `target` are added to it, or become the closest drawing color when it
+    is full.
+
+    :param region: the region as returned by `copy_region()`
+    :type region: `class Canvas`
+    :param palette: the palette of the drawing the region was copied from
+    :type palette: `class Palette`
+    :param target: the palette of the drawing the region is pasted into
+    :type target: `class Palette`
+    :return: the region with mapped colors, or `region` itself if no color changes
+    """
+    cells = bytes(region.cells)
+    table = bytearray(range(256))
+    for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+        if bytes((color_pair_idx,)) not in cells:
+            continue
+        rgb = palette.rgb(color_pair_idx)
+        try:
+            table[color_pair_idx] = target.add(rgb)
+        except ValueError:
+            table[color_pair_idx] = nearest_drawing_color(rgb)
+    if table == bytearray(range(256)):
+        return region
+    return Canvas(region.dim, cells=bytearray(cells.translate(table)))
+
+class Clipboard:
+    """The copied region, and the move in progress if there is one
+
+    While a region is being moved, it has been cut from the canvas but
+    not pasted yet. `cut_edit` is the edit that cut it, or `None` if
+    cutting it changed nothing. `palette` holds the colors of the palette
+    indices of the region as they were when it was copied.
+    """
+    __slots__ = ('region', 'palette', 'moving', 'cut_edit')
+
+    def __init__(self):
+        self.region = None
+        self.palette = None
+        self.moving = False
+        self.cut_edit = None
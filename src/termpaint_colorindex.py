@@ -0,0 +1,99 @@
+import re
+from collections import Counter
+
+_RUN_PATTERNS = {}
+
+class ColorIndex:
+    """Number of cells of every color in a canvas, kept up to date as it is edited
+
+    Next to the total of every color, the index keeps the colors of every
+    row and the rows every color is in. The canvas tells the index which
+    rows it changes (see `touch()`); those rows are counted again the
+    next time the index is read, so reading it takes time proportional to
+    the rows changed since, and nothing if none were. Every row is
+    counted when the index is first read, and again after the whole
+    canvas changed (see `invalidate()`).
+
+    Get the index of a canvas with `canvas.indexed(ColorIndex)` rather
+    than making one, so the canvas keeps it up to date. Writing to the
+    rows returned by `Canvas.row()` is not seen by the index.
+
+    :param canvas: the canvas to count
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    """
+    __slots__ = ('canvas', '_counts', '_row_counts', '_rows_with', '_dirty', '_stale')
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._counts = [0] * 256
+        self._row_counts = [None] * canvas.dim[0]
+        self._rows_with = [set() for _ in range(256)]
+        self._dirty = set()
+        self._stale = True
+
+    def touch(self, y_value):
+        """Mark a row as changed"""
+        self._dirty.add(y_value)
+
+    def invalidate(self):
+        """Mark every row as changed"""
+        self._stale = True
+
+    def _recount(self, y_value):
+        counts = self._counts
+        old = self._row_counts[y_value]
+        new = Counter(self.canvas.row(y_value))
+        if old is not None:
+            for color_pair_idx, count in old.items():
+                counts[color_pair_idx] -= count
+                if color_pair_idx not in new:
+                    self._rows_with[color_pair_idx].discard(y_value)
+        for color_pair_idx, count in new.items():
+            counts[color_pair_idx] += count
+            self._rows_with[color_pair_idx].add(y_value)
+        self._row_counts[y_value] = new
+
+    def refresh(self):
+        """Count the changed rows again
+
+        This is done by every method that reads the index.
+        """
+        if self._stale:
+            self._stale = False
+            self._dirty.clear()
+            for y_value in range(self.canvas.dim[0]):
+                self._recount(y_value)
+            return
+        for y_value in self._dirty:
+            self._recount(y_value)
+        self._dirty.clear()
+
+    def count(self, color_pair_idx):
+        """Get the number of cells with `color_pair_idx`"""
+        self.refresh()
+        return self._counts[color_pair_idx]
+
+    def colors(self):
+        """Get the number of cells of every color in the canvas
+
+        :return: `dict` of color pair index to `int` number of cells, most cells first
+        """
+        self.refresh()
+        counted = [(count, color_pair_idx) for color_pair_idx, count in enumerate(self._counts) if count]
+        return {color_pair_idx: count for count, color_pair_idx in sorted(counted, reverse=True)}
+
+    def spans(self, color_pair_idx):
+        """Find every run of cells with `color_pair_idx`
+
+        Only the rows the color is in are read.
+
+        :return: `list` of 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive, row by row
+        """
+        self.refresh()
+        if color_pair_idx not in _RUN_PATTERNS:
+            _RUN_PATTERNS[color_pair_idx] = re.compile(re.escape(bytes([color_pair_idx])) + b'+')
+        pattern = _RUN_PATTERNS[color_pair_idx]
+        spans = []
+        for y_value in sorted(self._rows_with[color_pair_idx]):
+            spans.extend((y_value, match.start(), match.end()) for match in pattern.finditer(self.canvas.row(y_value)))
+        return spans
@@ -0,0 +1,228 @@
+import re
+from contextlib import ExitStack
+from itertools import zip_longest
+from pathlib import Path
+from termpaint_canvas import BLANK_COLOR_PAIR_IDX
+from termpaint_io import PAINT_MAGIC, PAINT_RLE_MAGIC, iter_paint_lines, read_paint
+from termpaint_mmap import BINARY_SUFFIX, open_binary_paint
+from termpaint_palette import FIRST_PALETTE_IDX, Palette
+
+# A run of cells that differ, in the XOR of two rows
+_CHANGED_RUN = re.compile(b'[^\x00]+')
+
+def row_changes(row_a, row_b):
+    """Find the columns where two rows differ
+
+    The rows are XORed as two big integers, and the runs of non-zero
+    bytes in the result are the changed cells, so both steps run in C.
+    A shorter row is compared as if it was padded with blank cells.
+
+    :param row_a: color pair indices of the first row
+    :type row_a: bytes-like object
+    :param row_b: color pair indices of the second row
+    :type row_b: bytes-like object
+    :return: `list` of 2-ary tuples `(column_start, column_end)`, where `column_end` is exclusive
+    """
+    if row_a == row_b:
+        return []
+    width = max(len(row_a), len(row_b))
+    if len(row_a) < width:
+        row_a = bytes(row_a) + bytes([BLANK_COLOR_PAIR_IDX]) * (width - len(row_a))
+    if len(row_b) < width:
+        row_b = bytes(row_b) + bytes([BLANK_COLOR_PAIR_IDX]) * (width - len(row_b))
+    changed = (int.from_bytes(row_a, 'little') ^ int.from_bytes(row_b, 'little')).to_bytes(width, 'little')
+    return [(match.start(), match.end()) for match in _CHANGED_RUN.finditer(changed)]
+
+def _color_tables(palette_a, palette_b):
+    """Get `bytes.translate()` tables giving equal palette colors of two drawings the same index
+
+    :return: 2-ary tuple of tables, or `None` if the palettes are the same
+    """
+    if palette_a.colors == palette_b.colors:
+        return None
+    shared = {}
+    tables = []
+    for palette in (palette_a, palette_b):
+        table = bytearray(range(256))
+        for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+            rgb = palette.rgb(color_pair_idx)
+            if rgb not in shared:
+                if FIRST_PALETTE_IDX + len(shared) > 255:
+                    raise ValueError('The drawings have too many colors between them to compare')
+                shared[rgb] = FIRST_PALETTE_IDX + len(shared)
+            table[color_pair_idx] = shared[rgb]
+        tables.append(bytes(table))
+    return tuple(tables)
+
+class PaintDiff:
+    """Cells that differ between two drawings
+
+    :param spans: `list` of 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive, row by row
+    :type spans: list
+    """
+    __slots__ = ('spans', 'cells', 'rows')
+
+    def __init__(self, spans):
+        self.spans = spans
+        self.cells = sum(x_end - x_start for _, x_start, x_end in spans)
+        self.rows = len({y_value for y_value, _, _ in spans})
+
+    def areas(self):
+        """Get the bounding box of every group of changed cells
+
+        Changed cells touching each other, also diagonally, are in the
+        same group.
+
+        :return: `list` of 2-ary tuples `(top_left, dim)`, both as 2-ary tuples `(row, column)`, from the top
+        """
+        spans = self.spans
+        parent = list(range(len(spans)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # Join every span to the spans of the row above that it touches
+        above_start = above_end = row_start = 0
+        for i, (y_value, x_start, x_end) in enumerate(spans):
+            if i and y_value != spans[i - 1][0]:
+                # The row before only counts as the row above if it is adjacent
+                above_start, above_end = (row_start, i) if spans[i - 1][0] == y_value - 1 else (i, i)
+                row_start = i
+            while above_start < above_end and spans[above_start][2] < x_start:
+                above_start += 1
+            j = above_start
+            while j < above_end and spans[j][1] <= x_end:
+                parent[find(j)] = find(i)
+                j += 1
+
+        boxes = {}
+        for i, (y_value, x_start, x_end) in enumerate(spans):
+            root = find(i)
+            if root in boxes:
+                top, left, bottom, right = boxes[root]
+                boxes[root] = (top, min(left, x_start), y_value, max(right, x_end))
+            else:
+                boxes[root] = (y_value, x_start, y_value, x_end)
+        return sorted(((top, left), (bottom - top + 1, right - left)) for top, left, bottom, right in boxes.values())
+
+    def summary(self):
+        """Get the number of changed cells and rows, and the bounding boxes of the changes
+
+        :return: `dict` that can be written as JSON
+        """
+        return {
+            'cells': self.cells,
+            'rows': self.rows,
+            'areas': [{'at': list(top_left), 'size': list(dim)} for top_left, dim in self.areas()],
+        }
+
+def diff_rows(rows_a, rows_b, tables=None):
+    """Compare two drawings row by row
+
+    Identical rows are skipped with a single comparison; only the rows
+    that differ are searched for changed cells (see `row_changes()`).
+    Missing rows count as blank.
+
+    :param rows_a: rows of the first drawing, as bytes-like objects
+    :type rows_a: iterable
+    :param rows_b: rows of the second drawing, as bytes-like objects
+    :type rows_b: iterable
+    :param tables: `bytes.translate()` tables to apply to the rows of each drawing, or `None`
+    :type tables: tuple
+    :return: the `PaintDiff`
+    """
+    spans = []
+    for y_value, (row_a, row_b) in enumerate(zip_longest(rows_a, rows_b, fillvalue=b'')):
+        # Comparing `memoryview`s goes cell by cell, but copies compare at memory speed
+        row_a, row_b = bytes(row_a), bytes(row_b)
+        if tables is None and row_a == row_b:
+            continue
+        if tables is not None:
+            row_a, row_b = row_a.translate(tables[0]), row_b.translate(tables[1])
+        spans.extend((y_value, x_start, x_end) for x_start, x_end in row_changes(row_a, row_b))
+    return PaintDiff(spans)
+
+def _open_rows(stack, fpath, palette):
+    """Open a drawing file for `diff_paint_files()`
+
+    :return: 2-ary tuple `(decode, rows)`; the rows are `string` lines still to be decoded with `decode`, or bytes-like objects if `decode` is `None`
+    """
+    if Path(fpath).suffix == BINARY_SUFFIX:
+        canvas = open_binary_paint(fpath, writable=False)
+        stack.callback(canvas.close)
+        return None, canvas.rows()
+
+    paint_file = stack.enter_context(open(fpath, 'r'))
+    magic_string = paint_file.readline().strip()
+    paint_file.seek(0)
+    if magic_string in (PAINT_MAGIC, PAINT_RLE_MAGIC):
+        return iter_paint_lines(paint_file, palette)
+    # Layers are flattened and only the first frame of an animation is compared
+    return None, read_paint(fpath, palette=palette).rows()
+
+def diff_paint_files(path_a, path_b):
+    """Compare two drawing files
+
+    .paint files are read one line at a time, side by side, and a row is
+    only decoded if its line differs from the one in the other file, so
+    comparing two revisions of a drawing takes about as long as reading
+    them. .bpaint files are memory-mapped and compared a row at a time.
+    Layered .paint files are flattened, and only the first frame of an
+    animation is compared. Palette colors are compared by their RGB color,
+    so the same color under another palette index is not a change.
+
+    :param path_a: path to the first drawing file
+    :type path_a: string
+    :param path_b: path to the second drawing file
+    :type path_b: string
+    :return: the `PaintDiff`
+    """
+    palettes = (Palette(), Palette())
+    with ExitStack() as stack:
+        sources = [_open_rows(stack, fpath, palette) for fpath, palette in zip((path_a, path_b), palettes)]
+        # The rows of a memory-mapped file must all be dropped before it is closed
+        return PaintDiff(_diff_lines(sources, palettes))
+
+def _diff_lines(sources, palettes):
+    (decode_a, lines_a), (decode_b, lines_b) = sources
+    spans = []
+    tables = None
+    for y_value, (line_a, line_b) in enumerate(zip_longest(lines_a, lines_b)):
+        if decode_a is None and line_a is not None:
+            # Comparing `memoryview`s goes cell by cell, but copies compare at memory speed
+            line_a = bytes(line_a)
+        if decode_b is None and line_b is not None:
+            line_b = bytes(line_b)
+        if y_value == 0:
+            # Palette lines come before the rows, so both palettes are complete here
+            tables = _color_tables(*palettes)
+        if tables is None and decode_a is decode_b and line_a == line_b:
+            continue
+        row_a = b'' if line_a is None else line_a if decode_a is None else decode_a(line_a)
+        row_b = b'' if line_b is None else line_b if decode_b is None else decode_b(line_b)
+        if tables is not None:
+            row_a, row_b = bytes(row_a).translate(tables[0]), bytes(row_b).translate(tables[1])
+        spans.extend((y_value, x_start, x_end) for x_start, x_end in row_changes(row_a, row_b))
+    return spans
+
+def diff_with_file(rows, palette, fpath):
+    """Compare a drawing with a drawing file, such as the one it was opened from
+
+    The file is read as by `diff_paint_files()`, and is the old side of
+    the diff.
+
+    :param rows: rows of the drawing, as bytes-like objects
+    :type rows: iterable
+    :param palette: palette of the drawing
+    :type palette: `class Palette`
+    :param fpath: path to the drawing file
+    :type fpath: string
+    :return: the `PaintDiff`
+    """
+    file_palette = Palette()
+    with ExitStack() as stack:
+        sources = [_open_rows(stack, fpath, file_palette), (None, rows)]
+        return PaintDiff(_diff_lines(sources, (file_palette, palette)))
@@ -0,0 +1,216 @@
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from termpaint_io import read_paint, iter_paint_files, output_stem
+from termpaint_palette import PAIR_RGB, Palette
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# `bytes.translate()` tables from color pair indices to each RGB channel
+_CHANNEL_TABLES = [bytes(rgb[channel] for rgb in PAIR_RGB) for channel in range(3)]
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Rows rendered at a time with NumPy
+_BLOCK_ROWS = 256
+
+EXPORT_FORMATS = ('png', 'ppm')
+
+def _palette_rgb(palette):
+    # The RGB color of every color pair index, with the colors of `palette` if given
+    return PAIR_RGB if palette is None else palette.rgb_table()
+
+def _scale_row(row, scale):
+    """Repeat every cell of a row `scale` times"""
+    if scale == 1:
+        return bytes(row)
+    scaled = bytearray(len(row) * scale)
+    for offset in range(scale):
+        scaled[offset::scale] = row
+    return scaled
+
+def _row_blocks(canvas):
+    """Iterate over the canvas as 2D NumPy arrays of up to `_BLOCK_ROWS` rows"""
+    for y_start in range(0, canvas.dim[0], _BLOCK_ROWS):
+        y_end = min(y_start + _BLOCK_ROWS, canvas.dim[0])
+        cells = b''.join(bytes(canvas.row(y_value)) for y_value in range(y_start, y_end))
+        yield np.frombuffer(cells, dtype=np.uint8).reshape(y_end - y_start, canvas.dim[1])
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def _png_scanlines(canvas, scale):
+    """Iterate over the PNG scanlines of the canvas, each starting with filter type 0"""
+    if np is not None:
+        for block in _row_blocks(canvas):
+            scaled = block.repeat(scale, axis=0).repeat(scale, axis=1)
+            filters = np.zeros((scaled.shape[0], 1), dtype=np.uint8)
+            yield np.concatenate((filters, scaled), axis=1).tobytes()
+        return
+
+    for row in canvas.rows():
+        scanline = b'\x00' + _scale_row(row, scale)
+        yield scanline * scale
+
+def write_png(fpath, canvas, scale=1, level=6, palette=None):
+    """Write a canvas to a PNG image
+
+    Each cell becomes a `scale` x `scale` square of pixels. The image uses
+    indexed color with `PAIR_RGB`, or the colors of `palette`, as its
+    palette, so the color pair indices are written as they are, one byte
+    per pixel. The pixel data
+    is compressed in a stream as rows are rendered, so the whole image is
+    never held in memory. Only the standard library is needed; NumPy is
+    used to scale the rows if it is installed.
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :param canvas: the drawing to write
+    :type canvas: `class Canvas`
+    :param scale: size of a cell in pixels
+    :type scale: int
+    :param level: zlib compression level from 0 to 9
+    :type level: int
+    :param palette: colors of the palette indices of the drawing, or `None`
+    :type palette: `class Palette`
+    """
+    if scale < 1:
+        raise ValueError('Scale must be at least 1')
+
+    height, width = canvas.dim[0] * scale, canvas.dim[1] * scale
+    compressor = zlib.compressobj(level)
+    with open(fpath, 'wb') as image_file:
+        image_file.write(_PNG_SIGNATURE)
+        image_file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)))
+        image_file.write(_png_chunk(b'PLTE', bytes(value for rgb in _palette_rgb(palette) for value in rgb)))
+        for scanlines in _png_scanlines(canvas, scale):
+            data = compressor.compress(scanlines)
+            if data:
+                image_file.write(_png_chunk(b'IDAT', data))
+        image_file.write(_png_chunk(b'IDAT', compressor.flush()))
+        image_file.write(_png_chunk(b'IEND', b''))
+
+def _ppm_rows(canvas, scale, palette=None):
+    """Iterate over the RGB pixel data of the canvas, in rows or blocks of rows"""
+    if np is not None:
+        rgb_table = np.array(_palette_rgb(palette), dtype=np.uint8)
+        for block in _row_blocks(canvas):
+            yield rgb_table[block].repeat(scale, axis=0).repeat(scale, axis=1).tobytes()
+        return
+
+    channel_tables = _CHANNEL_TABLES
+    if palette is not None:
+        channel_tables = [bytes(rgb[channel] for rgb in palette.rgb_table()) for channel in range(3)]
+    for row in canvas.rows():
+        row = _scale_row(row, scale)
+        pixels = bytearray(len(row) * 3)
+        for channel, table in enumerate(channel_tables):
+            pixels[channel::3] = row.translate(table)
+        yield bytes(pixels) * scale
+
+def write_ppm(fpath, canvas, scale=1, palette=None):
+    """Write a canvas to a binary PPM (P6) image
+
+    Each cell becomes a `scale` x `scale` square of pixels colored with
+    `PAIR_RGB`, or the colors of `palette`. The colors are looked up a whole row at a time, with
+    NumPy if it is installed and with `bytes.translate()` otherwise.
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :param canvas: the drawing to write
+    :type canvas: `class Canvas`
+    :param scale: size of a cell in pixels
+    :type scale: int
+    :param palette: colors of the palette indices of the drawing, or `None`
+    :type palette: `class Palette`
+    """
+    if scale < 1:
+        raise ValueError('Scale must be at least 1')
+
+    with open(fpath, 'wb', buffering=1 << 16) as image_file:
+        image_file.write(f'P6\n{canvas.dim[1] * scale} {canvas.dim[0] * scale}\n255\n'.encode('ascii'))
+        image_file.writelines(_ppm_rows(canvas, scale, palette))
+
+def export_file(fpath, output_dir, formats=('png',), scale=1):
+    """Render a .paint file to images
+
+    The images are named after the drawing, with the extension of their
+    format, in `output_dir`. The palette of the drawing is used for its
+    extra colors.
+
+    :param fpath: path to the paint file
+    :type fpath: string
+    :param output_dir: directory to write the images to
+    :type output_dir: string
+    :param formats: image formats to write, out of `EXPORT_FORMATS`
+    :type formats: tuple
+    :param scale: size of a cell in pixels
+    :type scale: int
+    :return: `list` of the paths written to
+    """
+    palette = Palette()
+    canvas = read_paint(fpath, palette=palette)
+    stem = os.path.splitext(os.path.basename(fpath))[0]
+    out_paths = []
+    for image_format in formats:
+        out_path = os.path.join(output_dir, f'{stem}.{image_format}')
+        if image_format == 'png':
+            write_png(out_path, canvas, scale, palette=palette)
+        elif image_format == 'ppm':
+            write_ppm(out_path, canvas, scale, palette)
+        else:
+            raise ValueError(f'Unknown image format: {image_format}')
+        out_paths.append(out_path)
+    return out_paths
+
+def _export_task(fpath, output_dir, formats, scale):
+    # Runs in a worker process; errors are sent back as results
+    try:
+        return (fpath, True, export_file(fpath, output_dir, formats, scale))
+    except (OSError, ValueError) as e:
+        return (fpath, False, str(e))
+
+def export_files(paths, output_dir, formats=('png',), scale=1, workers=None):
+    """Render .paint files to images in parallel
+
+    Every file is exported by `export_file()` in a pool of worker
+    processes, so the throughput grows with the number of cores. With
+    `workers=1`, the files are exported in this process instead. A file
+    with the same name as one before it fails without being exported, as
+    its images would overwrite those of the other file.
+
+    :param paths: iterable of file or directory paths
+    :type paths: iterable
+    :param output_dir: directory to write the images to
+    :type output_dir: string
+    :param formats: image formats to write, out of `EXPORT_FORMATS`
+    :type formats: tuple
+    :param scale: size of a cell in pixels
+    :type scale: int
+    :param workers: number of worker processes, or `None` for one per core
+    :type workers: int
+    :return: generator of 3-ary tuples (`str` path, `bool` is_success, info) in the order of the files, where info is the `list` of paths written to or an error message
+    """
+    fpaths = list(iter_paint_files(paths))
+    clashes = {}
+    taken = set()
+    for fpath_idx, fpath in enumerate(fpaths):
+        try:
+            output_stem(fpath, output_dir, taken)
+        except ValueError as e:
+            clashes[fpath_idx] = (fpath, False, str(e))
+    exported = [fpath for fpath_idx, fpath in enumerate(fpaths) if fpath_idx not in clashes]
+
+    with ExitStack() as stack:
+        if workers == 1 or len(exported) <= 1:
+            results = (_export_task(fpath, output_dir, formats, scale) for fpath in exported)
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            count = len(exported)
+            results = executor.map(_export_task, exported, [output_dir] * count, [formats] * count, [scale] * count)
+        for fpath_idx in range(len(fpaths)):
+            yield clashes[fpath_idx] if fpath_idx in clashes else next(results)
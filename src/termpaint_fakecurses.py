@@ -0,0 +1,191 @@
+import curses
+
+class FakeWindow:
+    """In-memory stand-in for a curses `Window`
+
+    Only the color pair and the character of every cell and the cursor
+    position are kept, which is all TerminalPaint reads back. Keys given to `feed()` are
+    returned by `getch()` in order; once they run out, `getch()` returns
+    -1 like a window in no-delay mode.
+
+    :param dim: window dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param fake_curses: the `FakeCurses` the window belongs to, or `None`
+    :type fake_curses: `class FakeCurses`
+    """
+
+    def __init__(self, dim, fake_curses=None):
+        self.dim = (dim[0], dim[1])
+        self.pairs = [bytearray(dim[1]) for _ in range(dim[0])]
+        self.chars = [bytearray(b' ') * dim[1] for _ in range(dim[0])]
+        self.cursor = (0, 0)
+        self.keys = []
+        self.calls = 0
+        self._fake_curses = fake_curses
+        self._key_idx = 0
+        self._scroll_region = (0, dim[0] - 1)
+
+    def feed(self, keys):
+        """Queue keys to be returned by `getch()`"""
+        self.keys.extend(keys)
+
+    def inch(self, y_value, x_value):
+        self.calls += 1
+        return self.pairs[y_value][x_value] << 8
+
+    def chgat(self, y_value, x_value, *args):
+        self.calls += 1
+        if len(args) == 1:
+            length, attr = -1, args[0]
+        else:
+            length, attr = args
+        row = self.pairs[y_value]
+        x_end = len(row) if length < 0 else min(len(row), x_value + length)
+        row[x_value:x_end] = bytes([(attr >> 8) & 0xff]) * (x_end - x_value)
+
+    def hline(self, y_value, x_value, ch, length):
+        self.calls += 1
+        ch = ord(ch) if isinstance(ch, str) else ch
+        x_end = min(self.dim[1], x_value + length)
+        self.chars[y_value][x_value:x_end] = bytes([ch & 0xff]) * (x_end - x_value)
+        self.pairs[y_value][x_value:x_end] = bytes([(ch >> 8) & 0xff]) * (x_end - x_value)
+
+    def move(self, y_value, x_value):
+        self.calls += 1
+        if not (0 <= y_value < self.dim[0] and 0 <= x_value < self.dim[1]):
+            raise curses.error('wmove() returned ERR')
+        self.cursor = (y_value, x_value)
+
+    def getyx(self):
+        return self.cursor
+
+    def getmaxyx(self):
+        return self.dim
+
+    def getch(self):
+        self.calls += 1
+        if self._key_idx >= len(self.keys):
+            return -1
+        key = self.keys[self._key_idx]
+        self._key_idx += 1
+        return key
+
+    def getstr(self):
+        # Text prompts read everything up to the next newline
+        text = bytearray()
+        key = self.getch()
+        while key not in (-1, ord('\n')):
+            text.append(key)
+            key = self.getch()
+        return bytes(text)
+
+    def addstr(self, *args):
+        self.calls += 1
+
+    def refresh(self):
+        self.calls += 1
+        if self._fake_curses is not None:
+            self._fake_curses.updates += 1
+
+    def noutrefresh(self):
+        self.calls += 1
+
+    def scroll(self, lines=1):
+        self.calls += 1
+        top, bottom = self._scroll_region
+        for rows, fill in ((self.pairs, b'\x00'), (self.chars, b' ')):
+            region = rows[top:bottom + 1]
+            blank = [bytearray(fill) * self.dim[1] for _ in range(min(abs(lines), len(region)))]
+            region = region[lines:] + blank if lines > 0 else blank + region[:lines]
+            rows[top:bottom + 1] = region
+
+    def setscrreg(self, top, bottom):
+        self._scroll_region = (top, bottom)
+
+    def delch(self, y_value, x_value):
+        self.calls += 1
+        row = self.pairs[y_value]
+        del row[x_value]
+        row.append(0)
+        del self.chars[y_value][x_value]
+        self.chars[y_value].append(ord(' '))
+
+    def insch(self, y_value, x_value, ch, attr=0):
+        self.calls += 1
+        row = self.pairs[y_value]
+        row.insert(x_value, (attr >> 8) & 0xff)
+        del row[-1]
+        self.chars[y_value].insert(x_value, ord(ch) if isinstance(ch, str) else ch & 0xff)
+        del self.chars[y_value][-1]
+
+    def scrollok(self, flag):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def touchwin(self):
+        pass
+
+    def bkgd(self, *args):
+        pass
+
+    def box(self, *args):
+        pass
+
+class FakeCurses:
+    """Stand-in for the module-level functions of `curses`
+
+    Pass an instance to `use_backend()` to run TerminalPaint without a
+    terminal. Constants such as `KEY_UP` come from the real `curses` module.
+
+    :param dim: terminal dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    """
+    A_COLOR = 0xff00
+    # Only defined by the real module once the terminal is set up
+    ACS_CKBOARD = curses.A_ALTCHARSET | ord('a')
+    # 256 colors, and as many color pairs as fit in `A_COLOR`
+    COLORS = 256
+    COLOR_PAIRS = 256
+
+    def __init__(self, dim):
+        self.LINES, self.COLS = dim
+        self.stdscr = FakeWindow(dim, self)
+        self.updates = 0
+
+    def __getattr__(self, name):
+        return getattr(curses, name)
+
+    def newwin(self, rows, cols, y_value=0, x_value=0):
+        return FakeWindow((rows, cols), self)
+
+    def getsyx(self):
+        return self.stdscr.cursor
+
+    def color_pair(self, color_pair_idx):
+        return color_pair_idx << 8
+
+    def pair_number(self, attr):
+        return (attr & self.A_COLOR) >> 8
+
+    def doupdate(self):
+        self.updates += 1
+
+    def init_pair(self, *args):
+        pass
+
+    def curs_set(self, visibility):
+        pass
+
+    def echo(self):
+        pass
+
+    def noecho(self):
+        pass
+
+    def raw(self):
+        pass
@@ -0,0 +1,431 @@
+import re
+from bisect import bisect_right
+from collections import deque
+from termpaint_canvas import iter_runs
+
+def _row_runs(canvas, y_value, run_pattern):
+    """Get the runs of the target color in a row
+
+    :return: 2-ary tuple of lists `(starts, ends)` of the runs, sorted by column
+    """
+    starts = []
+    ends = []
+    for match in run_pattern.finditer(canvas.row(y_value)):
+        starts.append(match.start())
+        ends.append(match.end())
+    return starts, ends
+
+def find_region_spans(canvas, start_coord, connectivity=4):
+    """Find the connected region of same-colored cells containing a coordinate
+
+    This is a scanline flood fill. Instead of visiting one cell at a time,
+    every row is split once into runs of the target color, and whole runs
+    are taken at a time. A bitmap for every row touched keeps track of
+    the cells that are already part of the region. The running time is
+    proportional to the number of rows touched and runs found, so it grows
+    linearly with the size of the region.
+
+    With `connectivity=4`, runs in adjacent rows are connected if they
+    share a column. With `connectivity=8`, runs touching diagonally are
+    connected as well.
+
+    The canvas is not modified.
+
+    :param canvas: the drawing to search
+    :type canvas: `class Canvas`
+    :param start_coord: coordinate inside the region as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param connectivity: either `4` or `8`
+    :type connectivity: int
+    :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive
+    """
+    if connectivity not in (4, 8):
+        raise ValueError('Connectivity must be either 4 or 8')
+
+    rows, cols = canvas.dim
+    reach = 1 if connectivity == 8 else 0
+    target_color = canvas.get(start_coord)
+    run_pattern = re.compile(re.escape(bytes([target_color])) + b'+')
+
+    visited = {}
+    row_runs = {}
+    spans = []
+    stack = [start_coord]
+
+    while stack:
+        y_value, x_value = stack.pop()
+        if y_value not in visited:
+            visited[y_value] = bytearray(cols)
+        if visited[y_value][x_value]:
+            continue
+
+        if y_value not in row_runs:
+            row_runs[y_value] = _row_runs(canvas, y_value, run_pattern)
+        starts, ends = row_runs[y_value]
+        run_idx = bisect_right(starts, x_value) - 1
+        x_start, x_end = starts[run_idx], ends[run_idx]
+
+        visited[y_value][x_start:x_end] = b'\x01' * (x_end - x_start)
+        spans.append((y_value, x_start, x_end))
+
+        for next_y in (y_value - 1, y_value + 1):
+            if next_y < 0 or next_y >= rows:
+                continue
+            if next_y not in row_runs:
+                row_runs[next_y] = _row_runs(canvas, next_y, run_pattern)
+            next_starts, next_ends = row_runs[next_y]
+
+            # Runs overlapping columns [x_start - reach, x_end + reach)
+            next_idx = max(bisect_right(next_starts, x_start - reach) - 1, 0)
+            while next_idx < len(next_starts) and next_starts[next_idx] < x_end + reach:
+                if next_ends[next_idx] > x_start - reach and not (next_y in visited and visited[next_y][next_starts[next_idx]]):
+                    stack.append((next_y, next_starts[next_idx]))
+                next_idx += 1
+
+    return spans
+
+# Drawings with more runs than this are not labeled by `RegionIndex`,
+# which would take about half a second; their fills search for the region
+MAX_LABELED_RUNS = 100000
+
+def count_runs(canvas, limit):
+    """Count the runs of one color in the rows of a canvas, stopping once there are more than `limit`
+
+    Every row is XORed with itself shifted by one cell, as two big
+    integers, so the color changes are counted in C.
+
+    :param canvas: the canvas to count
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    :param limit: number of runs to stop counting after
+    :type limit: int
+    :return: `int` number of runs, or a number over `limit` if there are more
+    """
+    runs = 0
+    for row in canvas.rows():
+        row = bytes(row)
+        if not row:
+            continue
+        changes = (int.from_bytes(row[1:], 'little') ^ int.from_bytes(row[:-1], 'little')).to_bytes(len(row) - 1, 'little')
+        runs += len(changes) - changes.count(0) + 1
+        if runs > limit:
+            break
+    return runs
+
+class RegionIndex:
+    """Connected regions of same-colored cells of a canvas, kept up to date as it is edited
+
+    Every row is split into runs of one color, and every run is labeled
+    with its region, 4-connected as with `find_region_spans()`. The runs
+    of every region are kept as a set of spans, so a fill can take the
+    region under a cell without searching for it.
+
+    The canvas tells the index which rows it changes (see `touch()`),
+    and those rows are split again the next time the index is read. Runs
+    that did not change keep their label. New runs join the regions they
+    touch, the smaller regions merged into the largest. A region that
+    lost a run may have been split in two: searches start from the runs
+    around every lost run at once, and stop as soon as they have all met,
+    or give the parts they could not join new labels. Reading the index
+    after an edit therefore takes time proportional to the runs near
+    the edit and of the parts split off, rather than to the size of the
+    canvas. Every row is split when the index is first read, and again
+    after the whole canvas changed (see `invalidate()`), so callers check
+    `can_label()` before reading the index of a drawing that may be noisy.
+
+    Get the index of a canvas with `canvas.indexed(RegionIndex)` rather
+    than making one, so the canvas keeps it up to date.
+
+    :param canvas: the canvas to label
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    """
+    __slots__ = ('canvas', '_rows', '_spans', '_sizes', '_next_label', '_dirty', '_stale', '_run_check')
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        # Runs of every row as 4 lists: starts, ends, colors and labels
+        self._rows = [None] * canvas.dim[0]
+        self._spans = {}
+        self._sizes = {}
+        self._next_label = 0
+        self._dirty = set()
+        self._stale = True
+        # `max_runs` and the answer of the last `can_label()` that counted runs
+        self._run_check = None
+
+    def touch(self, y_value):
+        """Mark a row as changed"""
+        self._dirty.add(y_value)
+
+    def invalidate(self):
+        """Mark every row as changed"""
+        self._stale = True
+        self._run_check = None
+
+    def _split_row(self, y_value):
+        """Split a row into runs again, keeping the labels of the runs that did not change
+
+        :return: `list` of the runs that are gone as 3-ary tuples `(column_start, column_end, label)`
+        """
+        starts, ends, colors = [], [], []
+        for run_start, run_end, color_pair_idx in iter_runs(self.canvas.row(y_value)):
+            starts.append(run_start)
+            ends.append(run_end)
+            colors.append(color_pair_idx)
+        labels = [None] * len(starts)
+        old = self._rows[y_value]
+        self._rows[y_value] = (starts, ends, colors, labels)
+        if old is None:
+            return []
+        kept = {run[:3]: run[3] for run in zip(*old)}
+        for run_idx, run in enumerate(zip(starts, ends, colors)):
+            labels[run_idx] = kept.pop(run, None)
+        return [(run_start, run_end, label) for (run_start, run_end, _), label in kept.items()]
+
+    def _run_idx(self, y_value, x_value):
+        return bisect_right(self._rows[y_value][0], x_value) - 1
+
+    def _neighbors(self, y_value, x_start, x_end, label):
+        """Get the runs with `label` above and below columns [x_start, x_end) of a row, as 2-ary tuples `(row, column_start)`"""
+        neighbors = []
+        for next_y in (y_value - 1, y_value + 1):
+            if not 0 <= next_y < len(self._rows):
+                continue
+            next_starts, next_ends, _, next_labels = self._rows[next_y]
+            next_idx = max(bisect_right(next_starts, x_start) - 1, 0)
+            while next_idx < len(next_starts) and next_starts[next_idx] < x_end:
+                if next_ends[next_idx] > x_start and next_labels[next_idx] == label:
+                    neighbors.append((next_y, next_starts[next_idx]))
+                next_idx += 1
+        return neighbors
+
+    def _move(self, runs, label, new_label):
+        """Move runs, as 2-ary tuples `(row, column_start)`, from one region to another"""
+        spans = self._spans[label]
+        new_spans = self._spans[new_label]
+        for y_value, x_start in runs:
+            starts, ends, _, labels = self._rows[y_value]
+            run_idx = self._run_idx(y_value, x_start)
+            labels[run_idx] = new_label
+            span = (y_value, x_start, ends[run_idx])
+            spans.discard(span)
+            new_spans.add(span)
+            self._sizes[label] -= span[2] - x_start
+            self._sizes[new_label] += span[2] - x_start
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        self._spans[label] = set()
+        self._sizes[label] = 0
+        return label
+
+    def _label(self, runs):
+        """Give labels to unlabeled runs, joining them to each other and to the labeled regions they touch
+
+        :param runs: `list` of 2-ary tuples `(row, run index)` of every unlabeled run
+        :type runs: list
+        :return: `dict` of the labels of the regions merged into others to the labels they were merged into
+        """
+        parent = {run: run for run in runs}
+
+        def find(run):
+            while parent[run] != run:
+                parent[run] = parent[parent[run]]
+                run = parent[run]
+            return run
+
+        touching = {}
+        for run in runs:
+            y_value, run_idx = run
+            starts, ends, colors, _ = self._rows[y_value]
+            x_start, x_end, color_pair_idx = starts[run_idx], ends[run_idx], colors[run_idx]
+            for next_y in (y_value - 1, y_value + 1):
+                if not 0 <= next_y < len(self._rows):
+                    continue
+                next_starts, next_ends, next_colors, next_labels = self._rows[next_y]
+                next_idx = max(bisect_right(next_starts, x_start) - 1, 0)
+                while next_idx < len(next_starts) and next_starts[next_idx] < x_end:
+                    if next_ends[next_idx] > x_start and next_colors[next_idx] == color_pair_idx:
+                        if next_labels[next_idx] is None:
+                            parent[find((next_y, next_idx))] = find(run)
+                        else:
+                            touching.setdefault(run, set()).add(next_labels[next_idx])
+                    next_idx += 1
+
+        regions = {}
+        for run in runs:
+            regions.setdefault(find(run), []).append(run)
+        merged = {}
+        for region_runs in regions.values():
+            labels = set()
+            for run in region_runs:
+                for label in touching.get(run, ()):
+                    while label in merged:
+                        label = merged[label]
+                    labels.add(label)
+            target = max(labels, key=self._sizes.get) if labels else self._new_label()
+            for label in labels - {target}:
+                spans = self._spans.pop(label)
+                for y_value, x_start, _ in spans:
+                    self._rows[y_value][3][self._run_idx(y_value, x_start)] = target
+                self._spans[target] |= spans
+                self._sizes[target] += self._sizes.pop(label)
+                merged[label] = target
+            target_spans = self._spans[target]
+            for y_value, run_idx in region_runs:
+                starts, ends, _, labels = self._rows[y_value]
+                labels[run_idx] = target
+                target_spans.add((y_value, starts[run_idx], ends[run_idx]))
+                self._sizes[target] += ends[run_idx] - starts[run_idx]
+        return merged
+
+    def _split_off(self, label, boundary):
+        """Give new labels to the parts of a region that are no longer connected
+
+        A search starts from every run in `boundary`, and the searches
+        take turns visiting one run at a time. Searches that reach the
+        same run are joined. A search that runs out of runs before all
+        are joined has visited a whole part of the region, which gets a
+        new label. This stops as soon as one search is left.
+
+        :param label: label of the region
+        :type label: int
+        :param boundary: runs of the region around the runs it lost, as 2-ary tuples `(row, column_start)`
+        :type boundary: list
+        """
+        owner = {}
+        parent = {}
+        queues = {}
+        visited = {}
+        for run in boundary:
+            if run not in owner:
+                owner[run] = parent[run] = run
+                queues[run] = deque([run])
+                visited[run] = [run]
+
+        def find(search):
+            while parent[search] != search:
+                parent[search] = parent[parent[search]]
+                search = parent[search]
+            return search
+
+        searches = len(queues)
+        turns = deque(queues)
+        while searches > 1:
+            search = turns.popleft()
+            if find(search) != search:
+                continue
+            queue = queues[search]
+            if not queue:
+                self._move(visited.pop(search), label, self._new_label())
+                searches -= 1
+                continue
+
+            y_value, x_start = queue.popleft()
+            x_end = self._rows[y_value][1][self._run_idx(y_value, x_start)]
+            current = search
+            for run in self._neighbors(y_value, x_start, x_end, label):
+                if run not in owner:
+                    owner[run] = current
+                    queues[current].append(run)
+                    visited[current].append(run)
+                    continue
+                other = find(owner[run])
+                if other != current:
+                    # Join the smaller search into the larger one
+                    larger, smaller = (other, current) if len(visited[other]) >= len(visited[current]) else (current, other)
+                    parent[smaller] = larger
+                    queues[larger].extend(queues.pop(smaller))
+                    visited[larger].extend(visited.pop(smaller))
+                    searches -= 1
+                    current = larger
+            if find(search) == search:
+                turns.append(search)
+
+    def refresh(self):
+        """Label the changed rows again
+
+        This is done by every method that reads the index.
+        """
+        if self._stale:
+            self._stale = False
+            self._dirty.clear()
+            self._rows = [None] * self.canvas.dim[0]
+            self._spans.clear()
+            self._sizes.clear()
+            for y_value in range(self.canvas.dim[0]):
+                self._split_row(y_value)
+            self._label([(y_value, run_idx) for y_value, row in enumerate(self._rows) for run_idx in range(len(row[0]))])
+            return
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        gone = []
+        for y_value in dirty:
+            for x_start, x_end, label in self._split_row(y_value):
+                self._spans[label].discard((y_value, x_start, x_end))
+                self._sizes[label] -= x_end - x_start
+                gone.append((y_value, x_start, x_end, label))
+        merged = self._label([(y_value, run_idx) for y_value in dirty for run_idx, label in enumerate(self._rows[y_value][3]) if label is None])
+
+        # Every run of a region reaches the rest of it, if it still can, through the runs around its lost runs
+        boundaries = {}
+        for y_value, x_start, x_end, label in gone:
+            while label in merged:
+                label = merged[label]
+            boundary = boundaries.setdefault(label, [])
+            starts, _, _, labels = self._rows[y_value]
+            for run_idx in range(max(self._run_idx(y_value, x_start), 0), len(starts)):
+                if starts[run_idx] >= x_end:
+                    break
+                if labels[run_idx] == label:
+                    boundary.append((y_value, starts[run_idx]))
+            boundary.extend(self._neighbors(y_value, x_start, x_end, label))
+        for label, boundary in boundaries.items():
+            if not self._sizes[label]:
+                del self._spans[label], self._sizes[label]
+            elif boundary:
+                self._split_off(label, boundary)
+
+    def can_label(self, max_runs=None):
+        """Tell if the index is labeled, or can be labeled without a long wait
+
+        Labeling the whole canvas takes time proportional to its runs, so
+        a noisy drawing is only worth it if its regions are read often. An
+        index that is labeled can always be read; otherwise the runs are
+        counted, which takes a few milliseconds. The answer is kept until
+        the whole canvas changes (see `invalidate()`), so asking on every
+        redraw of a noisy drawing does not count its runs every time.
+
+        :param max_runs: most runs to label the whole canvas for, or `None` for `MAX_LABELED_RUNS`
+        :type max_runs: int
+        :return: `bool`
+        """
+        if max_runs is None:
+            max_runs = MAX_LABELED_RUNS
+        if not self._stale:
+            return True
+        if self._run_check is None or self._run_check[0] != max_runs:
+            self._run_check = (max_runs, count_runs(self.canvas, max_runs) <= max_runs)
+        return self._run_check[1]
+
+    def _label_at(self, coord):
+        self.refresh()
+        return self._rows[coord[0]][3][self._run_idx(coord[0], coord[1])]
+
+    def region_spans(self, coord):
+        """Get the connected region of same-colored cells containing a coordinate
+
+        This gives the same cells as `find_region_spans()` with
+        `connectivity=4`, in no particular order.
+
+        :param coord: coordinate inside the region as a 2-ary tuple `(row, column)`
+        :type coord: tuple
+        :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive
+        """
+        return list(self._spans[self._label_at(coord)])
+
+    def region_size(self, coord):
+        """Get the number of cells of the region containing a coordinate"""
+        return self._sizes[self._label_at(coord)]
@@ -0,0 +1,377 @@
+import hashlib
+from termpaint_canvas import Canvas, BLANK_COLOR_PAIR_IDX, iter_runs
+
+class TileStore:
+    """Tiles of cells kept once per content and shared by every frame that has them
+
+    A tile is keyed by a hash of its cells, so equal tiles, in one frame
+    or in many, take memory once. Every use of a key is counted, and a
+    tile is dropped when it is no longer used.
+    """
+    __slots__ = ('_tiles', '_refs')
+
+    def __init__(self):
+        self._tiles = {}
+        self._refs = {}
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def size(self):
+        """Get the memory used by the cells of the tiles in bytes"""
+        return sum(len(cells) for cells in self._tiles.values())
+
+    def add(self, cells):
+        """Store the cells of a tile, or count another use of equal cells
+
+        :param cells: the cells of the tile, row after row
+        :type cells: bytes-like object
+        :return: `bytes` key of the tile
+        """
+        key = hashlib.blake2b(cells, digest_size=16).digest()
+        if key in self._refs:
+            self._refs[key] += 1
+        else:
+            self._tiles[key] = bytes(cells)
+            self._refs[key] = 1
+        return key
+
+    def get(self, key):
+        """Get the cells of a tile as `bytes`"""
+        return self._tiles[key]
+
+    def retain(self, key):
+        """Count another use of a tile"""
+        self._refs[key] += 1
+
+    def release(self, key):
+        """Count one use of a tile less, dropping it if it is no longer used"""
+        self._refs[key] -= 1
+        if not self._refs[key]:
+            del self._refs[key]
+            del self._tiles[key]
+
+    def copy(self):
+        """Get an independent copy of the store; the cells themselves are immutable and shared"""
+        other = TileStore()
+        other._tiles = dict(self._tiles)
+        other._refs = dict(self._refs)
+        return other
+
+class Frame:
+    """A frame of an animation, as the keys of its tiles in a `TileStore`, row after row of tiles"""
+    __slots__ = ('keys',)
+
+    def __init__(self, keys):
+        self.keys = keys
+
+class Animation:
+    """A drawing made of frames, edited one at a time
+
+    The canvas methods (`get()`, `set()`, `span()`, `fill_span()`, ...)
+    read and write the current frame, so every tool edits it like a plain
+    canvas. What is shown on the screen comes from `composite_span()`,
+    which adds the onion skin when it is on.
+
+    Every frame is a grid of square tiles kept in a `TileStore`, so tiles
+    that did not change from one frame to the next are stored once. The
+    current frame is also unpacked into a `Canvas` to be edited; an edit
+    marks the tiles it touches as dirty, and only those are stored again
+    when another frame becomes current. Switching frames only rewrites the
+    tiles that differ between them.
+
+    :param canvases: the frames, as canvases with the same dimensions
+    :type canvases: list
+    :param fps: frames per second of the playback
+    :type fps: float
+    :param tile_size: number of rows and columns of a tile
+    :type tile_size: int
+    """
+    __slots__ = ('dim', 'fps', 'tile_size', 'onion', 'mapped_path', 'store', 'frames', 'current', '_canvas', '_dirty')
+
+    def __init__(self, canvases, fps=12.0, tile_size=32):
+        if not canvases or any(canvas.dim != canvases[0].dim for canvas in canvases):
+            raise ValueError('Frames must all have the same dimensions')
+        self.dim = canvases[0].dim
+        self.fps = fps
+        self.tile_size = tile_size
+        self.onion = False
+        self.mapped_path = None
+        self.store = TileStore()
+        self.frames = [Frame(self._pack(canvas)) for canvas in canvases]
+        self.current = 0
+        self._canvas = Canvas(self.dim)
+        self._dirty = set()
+        self._unpack(self.frames[0], None)
+
+    def _tile_grid(self):
+        size = self.tile_size
+        return ((self.dim[0] + size - 1) // size, (self.dim[1] + size - 1) // size)
+
+    def _tile_rect(self, idx):
+        # Rows and columns [y_start, y_end) x [x_start, x_end) of a tile
+        tile_y, tile_x = divmod(idx, self._tile_grid()[1])
+        size = self.tile_size
+        y_start, x_start = tile_y * size, tile_x * size
+        return y_start, min(y_start + size, self.dim[0]), x_start, min(x_start + size, self.dim[1])
+
+    def _tile_cells(self, canvas, idx):
+        y_start, y_end, x_start, x_end = self._tile_rect(idx)
+        return b''.join(canvas.span(y_value, x_start, x_end) for y_value in range(y_start, y_end))
+
+    def _pack(self, canvas):
+        tiles_y, tiles_x = self._tile_grid()
+        return [self.store.add(self._tile_cells(canvas, idx)) for idx in range(tiles_y * tiles_x)]
+
+    def _unpack(self, frame, shown):
+        # Write the tiles of `frame` that differ from the frame `shown` into the edited canvas
+        for idx, key in enumerate(frame.keys):
+            if shown is not None and shown.keys[idx] == key:
+                continue
+            y_start, y_end, x_start, x_end = self._tile_rect(idx)
+            cells = self.store.get(key)
+            width = x_end - x_start
+            for y_value in range(y_start, y_end):
+                offset = (y_value - y_start) * width
+                self._canvas.write_span(y_value, x_start, cells[offset:offset + width])
+
+    def _touch(self, y_value, x_start, x_end):
+        # Mark the tiles under columns [x_start, x_end) of a row as dirty
+        size = self.tile_size
+        first = (y_value // size) * self._tile_grid()[1]
+        for tile_x in range(x_start // size, (x_end - 1) // size + 1):
+            self._dirty.add(first + tile_x)
+
+    def commit(self):
+        """Store the dirty tiles of the current frame"""
+        frame = self.frames[self.current]
+        for idx in self._dirty:
+            cells = self._tile_cells(self._canvas, idx)
+            old_key = frame.keys[idx]
+            if self.store.get(old_key) != cells:
+                frame.keys[idx] = self.store.add(cells)
+                self.store.release(old_key)
+        self._dirty.clear()
+
+    def select(self, idx):
+        """Make another frame the current one"""
+        if idx == self.current:
+            return
+        self.commit()
+        self._unpack(self.frames[idx], self.frames[self.current])
+        self.current = idx
+
+    def add_frame(self):
+        """Add a copy of the current frame after it and make it the current one
+
+        The copy shares every tile with the current frame, so it takes
+        no memory until it is changed.
+
+        :return: `int` index of the new frame
+        """
+        self.commit()
+        keys = list(self.frames[self.current].keys)
+        for key in keys:
+            self.store.retain(key)
+        self.frames.insert(self.current + 1, Frame(keys))
+        self.current += 1
+        return self.current
+
+    def delete_frame(self):
+        """Delete the current frame; the next one, or else the previous one, becomes current"""
+        if len(self.frames) == 1:
+            raise ValueError('An animation needs at least one frame')
+        self.commit()
+        deleted = self.frames.pop(self.current)
+        self.current = min(self.current, len(self.frames) - 1)
+        self._unpack(self.frames[self.current], deleted)
+        for key in deleted.keys:
+            self.store.release(key)
+
+    def frame_span(self, idx, y_value, x_start, x_end):
+        """Get the cells of columns `x_start` up to (but not including) `x_end` in a row of a frame
+
+        The current frame is read from the edited canvas.
+        """
+        if idx == self.current:
+            return self._canvas.span(y_value, x_start, x_end)
+        size = self.tile_size
+        frame = self.frames[idx]
+        first = (y_value // size) * self._tile_grid()[1]
+        offset_y = y_value % size
+        cells = bytearray()
+        while x_start < x_end:
+            tile_x, offset_x = divmod(x_start, size)
+            width = min(size, self.dim[1] - tile_x * size)
+            length = min(width - offset_x, x_end - x_start)
+            tile = self.store.get(frame.keys[first + tile_x])
+            cells += tile[offset_y * width + offset_x:offset_y * width + offset_x + length]
+            x_start += length
+        return bytes(cells)
+
+    def frame_rows(self, idx):
+        """Iterate over every row of a frame as `bytes`"""
+        for y_value in range(self.dim[0]):
+            yield self.frame_span(idx, y_value, 0, self.dim[1])
+
+    def frame_canvas(self, idx):
+        """Get a frame as a new `Canvas`"""
+        canvas = Canvas(self.dim)
+        for y_value, row in enumerate(self.frame_rows(idx)):
+            canvas.write_span(y_value, 0, row)
+        return canvas
+
+    def changed_spans(self, from_idx, to_idx, top_left, dim):
+        """Get the cells that differ between two frames in a rectangle
+
+        Tiles with the same key in both frames are equal and skipped
+        without reading their cells.
+
+        :param from_idx: index of the frame shown
+        :type from_idx: int
+        :param to_idx: index of the frame to show
+        :type to_idx: int
+        :param top_left: top-left corner of the rectangle as a 2-ary tuple `(row, column)`
+        :type top_left: tuple
+        :param dim: dimensions of the rectangle as a 2-ary tuple `(row, column)`
+        :type dim: tuple
+        :return: `list` of spans of `to_idx` as 4-ary tuples `(row, column_start, column_end, color_pair_idx)`
+        """
+        if from_idx != to_idx and self.current in (from_idx, to_idx):
+            self.commit()
+        size = self.tile_size
+        tiles_x = self._tile_grid()[1]
+        y_end, x_end = top_left[0] + dim[0], top_left[1] + dim[1]
+        from_keys, to_keys = self.frames[from_idx].keys, self.frames[to_idx].keys
+        changed = []
+        for tile_y in range(top_left[0] // size, (y_end - 1) // size + 1):
+            for tile_x in range(top_left[1] // size, (x_end - 1) // size + 1):
+                idx = tile_y * tiles_x + tile_x
+                if from_keys[idx] == to_keys[idx]:
+                    continue
+                span_start = max(tile_x * size, top_left[1])
+                span_end = min((tile_x + 1) * size, x_end)
+                for y_value in range(max(tile_y * size, top_left[0]), min((tile_y + 1) * size, y_end)):
+                    old_cells = self.frame_span(from_idx, y_value, span_start, span_end)
+                    new_cells = self.frame_span(to_idx, y_value, span_start, span_end)
+                    if old_cells == new_cells:
+                        continue
+                    for run_start, run_end, color_pair_idx in iter_runs(new_cells):
+                        if old_cells[run_start:run_end] != new_cells[run_start:run_end]:
+                            changed.append((y_value, span_start + run_start, span_start + run_end, color_pair_idx))
+        return changed
+
+    def composite_span(self, y_value, x_start, x_end):
+        """Get the cells of part of a row of the current frame as shown on the screen
+
+        With the onion skin on, the previous frame shows through every
+        other blank cell of the current one, in a checkerboard pattern,
+        so it can be told apart from the frame itself.
+        """
+        cells = self._canvas.span(y_value, x_start, x_end)
+        if not self.onion or len(self.frames) == 1:
+            return cells
+        ghost = self.frame_span((self.current - 1) % len(self.frames), y_value, x_start, x_end)
+        cells = bytearray(cells)
+        for run_start, run_end, color_pair_idx in iter_runs(bytes(cells)):
+            if color_pair_idx == BLANK_COLOR_PAIR_IDX:
+                first = run_start + (y_value + x_start + run_start) % 2
+                cells[first:run_end:2] = ghost[first:run_end:2]
+        return bytes(cells)
+
+    def apply_to_frame(self, frame, edit, undo):
+        """Redo (or undo, if `undo` is `True`) an edit on one of the frames, making it the current one
+
+        :return: the changed spans as returned by `edit.apply()`, or `None` if another frame became current
+        """
+        idx = self.frames.index(frame)
+        if idx == self.current:
+            return edit.apply(self, undo)
+        self.select(idx)
+        edit.apply(self, undo)
+        return None
+
+    # The canvas interface, on the current frame
+
+    def get(self, coord):
+        """Get the color pair index at `coord` in the current frame"""
+        return self._canvas.get(coord)
+
+    def set(self, coord, color_pair_idx):
+        """Set the color pair index at `coord` in the current frame"""
+        self._canvas.set(coord, color_pair_idx)
+        self._touch(coord[0], coord[1], coord[1] + 1)
+
+    def row(self, y_value):
+        """Get a row of the current frame"""
+        return self._canvas.row(y_value)
+
+    def rows(self):
+        """Iterate over every row of the current frame"""
+        return self._canvas.rows()
+
+    def span(self, y_value, x_start, x_end):
+        """Get the cells of the columns `x_start` up to (but not including) `x_end` in a row of the current frame"""
+        return self._canvas.span(y_value, x_start, x_end)
+
+    def fill_span(self, y_value, x_start, x_end, color_pair_idx):
+        """Set the color pair index of part of a row of the current frame"""
+        self._canvas.fill_span(y_value, x_start, x_end, color_pair_idx)
+        if x_start < x_end:
+            self._touch(y_value, x_start, x_end)
+
+    def write_span(self, y_value, x_start, cells):
+        """Copy color pair indices into a row of the current frame, starting at column `x_start`"""
+        self._canvas.write_span(y_value, x_start, cells)
+        if len(cells):
+            self._touch(y_value, x_start, x_start + len(cells))
+
+    def clear(self, color_pair_idx=BLANK_COLOR_PAIR_IDX):
+        """Set every cell of the current frame to `color_pair_idx`"""
+        self._canvas.clear(color_pair_idx)
+        tiles_y, tiles_x = self._tile_grid()
+        self._dirty.update(range(tiles_y * tiles_x))
+
+    def indexed(self, index_class):
+        """Get an index of the current frame (see `Canvas.indexed()`)
+
+        The frames share one index of each kind, which follows the current
+        frame. Switching frames only updates it for the tiles that differ.
+        """
+        return self._canvas.indexed(index_class)
+
+    def snapshot(self):
+        """Get an immutable copy of the cells of the current frame as `bytes`"""
+        return self._canvas.snapshot()
+
+    def copy(self):
+        """Get an independent copy of every frame
+
+        The copy shares the immutable tiles, so this takes time
+        proportional to the size of one frame.
+        """
+        self.commit()
+        other = Animation.__new__(Animation)
+        other.dim = self.dim
+        other.fps = self.fps
+        other.tile_size = self.tile_size
+        other.onion = self.onion
+        other.mapped_path = None
+        other.store = self.store.copy()
+        other.frames = [Frame(list(frame.keys)) for frame in self.frames]
+        other.current = self.current
+        other._canvas = self._canvas.copy()
+        other._dirty = set()
+        return other
+
+    def flush(self):
+        """Do nothing; an animation is never backed by a file"""
+
+    def close(self):
+        """Free every frame
+
+        The animation must not be used afterwards.
+        """
+        self.frames.clear()
+        self.store = TileStore()
+        self._canvas.close()
@@ -0,0 +1,396 @@
+import zlib
+from array import array
+from collections import deque
+from termpaint_canvas import iter_runs
+
+class CellEdit:
+    """A single cell changed, as done by the pencil
+
+    :param coord: canvas coordinate as a 2-ary tuple `(row, column)`
+    :type coord: tuple
+    :param old_color_pair_idx: color pair index before the edit
+    :type old_color_pair_idx: int
+    :param new_color_pair_idx: color pair index after the edit
+    :type new_color_pair_idx: int
+    """
+    __slots__ = ('coord', 'old_color_pair_idx', 'new_color_pair_idx')
+
+    def __init__(self, coord, old_color_pair_idx, new_color_pair_idx):
+        self.coord = coord
+        self.old_color_pair_idx = old_color_pair_idx
+        self.new_color_pair_idx = new_color_pair_idx
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on a canvas
+
+        :return: `list` of changed spans as 4-ary tuples `(row, column_start, column_end, color_pair_idx)`
+        """
+        color_pair_idx = self.old_color_pair_idx if undo else self.new_color_pair_idx
+        canvas.set(self.coord, color_pair_idx)
+        return [(self.coord[0], self.coord[1], self.coord[1] + 1, color_pair_idx)]
+
+class SpanEdit:
+    """Horizontal spans that all had one color changed to another, as done by a fill
+
+    The spans are kept flat in an `array` of `row, column_start, column_end`
+    triples, so a fill costs 12 bytes per span regardless of its width.
+
+    :param spans: `list` of 3-ary tuples `(row, column_start, column_end)`
+    :type spans: list
+    :param old_color_pair_idx: color pair index of every span before the edit
+    :type old_color_pair_idx: int
+    :param new_color_pair_idx: color pair index of every span after the edit
+    :type new_color_pair_idx: int
+    """
+    __slots__ = ('spans', 'old_color_pair_idx', 'new_color_pair_idx')
+
+    def __init__(self, spans, old_color_pair_idx, new_color_pair_idx):
+        self.spans = array('I', (value for span in spans for value in span))
+        self.old_color_pair_idx = old_color_pair_idx
+        self.new_color_pair_idx = new_color_pair_idx
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64 + self.spans.itemsize * len(self.spans)
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on a canvas
+
+        This takes time proportional to the number of spans.
+
+        :return: `list` of changed spans as 4-ary tuples `(row, column_start, column_end, color_pair_idx)`
+        """
+        color_pair_idx = self.old_color_pair_idx if undo else self.new_color_pair_idx
+        changed = []
+        for i in range(0, len(self.spans), 3):
+            y_value, x_start, x_end = self.spans[i:i + 3]
+            canvas.fill_span(y_value, x_start, x_end, color_pair_idx)
+            changed.append((y_value, x_start, x_end, color_pair_idx))
+        return changed
+
+class ShapeEdit:
+    """Horizontal spans all set to one color, as done by the shape tools
+
+    Unlike `SpanEdit`, the cells under a shape may have had any colors, so
+    the cells before the edit are kept along with the spans.
+
+    :param spans: `list` of 3-ary tuples `(row, column_start, column_end)`
+    :type spans: list
+    :param old_cells: color pair indices of the spans before the edit, one after another
+    :type old_cells: bytes
+    :param new_color_pair_idx: color pair index of every span after the edit
+    :type new_color_pair_idx: int
+    """
+    __slots__ = ('spans', 'old_cells', 'new_color_pair_idx')
+
+    def __init__(self, spans, old_cells, new_color_pair_idx):
+        self.spans = array('I', (value for span in spans for value in span))
+        self.old_cells = bytes(old_cells)
+        self.new_color_pair_idx = new_color_pair_idx
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64 + self.spans.itemsize * len(self.spans) + len(self.old_cells)
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on a canvas
+
+        :return: `list` of changed spans as 4-ary tuples `(row, column_start, column_end, color_pair_idx)`
+        """
+        changed = []
+        offset = 0
+        for i in range(0, len(self.spans), 3):
+            y_value, x_start, x_end = self.spans[i:i + 3]
+            if not undo:
+                canvas.fill_span(y_value, x_start, x_end, self.new_color_pair_idx)
+                changed.append((y_value, x_start, x_end, self.new_color_pair_idx))
+                continue
+
+            cells = self.old_cells[offset:offset + x_end - x_start]
+            offset += x_end - x_start
+            canvas.write_span(y_value, x_start, cells)
+            for run_start, run_end, color_pair_idx in iter_runs(cells):
+                changed.append((y_value, x_start + run_start, x_start + run_end, color_pair_idx))
+        return changed
+
+class RegionEdit:
+    """Rectangular part of the canvas replaced, as done by cutting or pasting
+
+    The cells before and after the edit are kept zlib-compressed, like in
+    `CanvasEdit`.
+
+    :param top_left: top-left corner of the part as a 2-ary tuple `(row, column)`
+    :type top_left: tuple
+    :param dim: dimensions of the part as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param old_cells: color pair indices of the part before the edit, row by row
+    :type old_cells: bytes
+    :param new_cells: color pair indices of the part after the edit, row by row
+    :type new_cells: bytes
+    """
+    __slots__ = ('top_left', 'dim', 'old_cells', 'new_cells')
+
+    def __init__(self, top_left, dim, old_cells, new_cells):
+        self.top_left = top_left
+        self.dim = dim
+        self.old_cells = zlib.compress(old_cells, 1)
+        self.new_cells = zlib.compress(new_cells, 1)
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64 + len(self.old_cells) + len(self.new_cells)
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on a canvas
+
+        :return: `list` of changed spans as 4-ary tuples `(row, column_start, column_end, color_pair_idx)`
+        """
+        cells = zlib.decompress(self.old_cells if undo else self.new_cells)
+        (top, left), cols = self.top_left, self.dim[1]
+        changed = []
+        for y_offset in range(self.dim[0]):
+            row = cells[y_offset * cols:(y_offset + 1) * cols]
+            canvas.write_span(top + y_offset, left, row)
+            for run_start, run_end, color_pair_idx in iter_runs(row):
+                changed.append((top + y_offset, left + run_start, left + run_end, color_pair_idx))
+        return changed
+
+class GroupEdit:
+    """Several edits undone and redone as one, as done by moving a region
+
+    :param edits: the edits in the order they were done
+    :type edits: list
+    """
+    __slots__ = ('edits',)
+
+    def __init__(self, edits):
+        self.edits = list(edits)
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64 + sum(edit.size() for edit in self.edits)
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edits on a canvas
+
+        :return: `list` of changed spans in the order they were changed, or `None` if the whole canvas changed
+        """
+        changed = []
+        for edit in reversed(self.edits) if undo else self.edits:
+            edit_changed = edit.apply(canvas, undo)
+            if edit_changed is None or changed is None:
+                changed = None
+            else:
+                changed.extend(edit_changed)
+        return changed
+
+class LayerEdit:
+    """An edit done on one layer of a `LayeredCanvas`
+
+    The edit is redone or undone on the layer it was done on, even if
+    another layer has become the active one since.
+
+    :param layer_idx: index of the layer
+    :type layer_idx: int
+    :param edit: the edit done on the layer
+    """
+    __slots__ = ('layer_idx', 'edit')
+
+    def __init__(self, layer_idx, edit):
+        self.layer_idx = layer_idx
+        self.edit = edit
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 16 + self.edit.size()
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on its layer of a `LayeredCanvas`
+
+        :return: the changed spans as returned by `LayeredCanvas.apply_to_layer()`
+        """
+        return canvas.apply_to_layer(self.layer_idx, self.edit, undo)
+
+class FrameEdit:
+    """An edit done on one frame of an `Animation`
+
+    Undoing or redoing the edit makes its frame the current one again.
+
+    :param frame: the frame
+    :type frame: `class Frame`
+    :param edit: the edit done on the frame
+    """
+    __slots__ = ('frame', 'edit')
+
+    def __init__(self, frame, edit):
+        self.frame = frame
+        self.edit = edit
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 16 + self.edit.size()
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on its frame of an `Animation`
+
+        :return: the changed spans as returned by `Animation.apply_to_frame()`
+        """
+        return canvas.apply_to_frame(self.frame, self.edit, undo)
+
+class CanvasEdit:
+    """Every cell changed, as done by clearing the canvas
+
+    The cells before the edit are kept zlib-compressed; drawings are mostly
+    long runs of one color, so this is much smaller than a plain copy.
+
+    :param canvas: the canvas before the edit
+    :type canvas: `class Canvas`
+    :param new_color_pair_idx: color pair index of every cell after the edit
+    :type new_color_pair_idx: int
+    """
+    __slots__ = ('old_cells', 'new_color_pair_idx')
+
+    def __init__(self, canvas, new_color_pair_idx):
+        self.old_cells = zlib.compress(canvas.snapshot(), 1)
+        self.new_color_pair_idx = new_color_pair_idx
+
+    def size(self):
+        """Get the approximate memory used by the edit in bytes"""
+        return 64 + len(self.old_cells)
+
+    def apply(self, canvas, undo):
+        """Redo (or undo, if `undo` is `True`) the edit on a canvas
+
+        :return: `None`, as the whole canvas has changed
+        """
+        if not undo:
+            canvas.clear(self.new_color_pair_idx)
+            return None
+
+        old_cells = zlib.decompress(self.old_cells)
+        cols = canvas.dim[1]
+        for y_value in range(canvas.dim[0]):
+            canvas.write_span(y_value, 0, old_cells[y_value * cols:(y_value + 1) * cols])
+        return None
+
+class History:
+    """Bounded undo/redo journal
+
+    Edits are recorded as compact deltas (`CellEdit`, `SpanEdit`,
+    `ShapeEdit`, `RegionEdit`, `GroupEdit` or `CanvasEdit`). When the
+    edits kept for undo take more than `max_bytes`, the oldest ones are
+    dropped. An edit that takes more than `max_bytes` on its own is not
+    journaled at all, so it cannot wipe out the edits before it. Recording
+    a new edit clears the redo stack.
+
+    `version` goes up whenever an edit is recorded, undone or redone, and
+    whenever `touch()` or `clear()` notes a change that is not journaled,
+    so it tells whether the drawing changed since it was last looked at.
+
+    While a `LayeredCanvas` is being edited, `layer` is the index of its
+    active layer, and edits are recorded as `LayerEdit`s on that layer.
+    Likewise, while an `Animation` is being edited, `frame` is its current
+    frame, and edits are recorded as `FrameEdit`s.
+
+    :param max_bytes: approximate memory cap for the journal
+    :type max_bytes: int
+    """
+    __slots__ = ('max_bytes', 'version', 'layer', 'frame', '_undo', '_redo', '_size')
+
+    def __init__(self, max_bytes=16 << 20):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self.layer = None
+        self.frame = None
+        self._undo = deque()
+        self._redo = []
+        self._size = 0
+
+    def size(self):
+        """Get the approximate memory used by the journal in bytes"""
+        return self._size
+
+    def record(self, edit):
+        """Add an edit that has just been done to the journal
+
+        :return: `False` if the edit is too large to be undone, else `True`
+        """
+        if edit.size() > self.max_bytes:
+            self.version += 1
+            return False
+        if self.layer is not None:
+            edit = LayerEdit(self.layer, edit)
+        elif self.frame is not None:
+            edit = FrameEdit(self.frame, edit)
+        self._undo.append(edit)
+        self.version += 1
+        self._size += edit.size()
+        for redo_edit in self._redo:
+            self._size -= redo_edit.size()
+        self._redo.clear()
+
+        while self._size > self.max_bytes:
+            self._size -= self._undo.popleft().size()
+        return True
+
+    def undo(self, canvas):
+        """Undo the newest edit on a canvas
+
+        :return: the changed spans as returned by `apply()`, `None` if the whole canvas changed, or `False` if there is nothing to undo
+        """
+        if not self._undo:
+            return False
+        edit = self._undo.pop()
+        self._redo.append(edit)
+        self.version += 1
+        return edit.apply(canvas, True)
+
+    def redo(self, canvas):
+        """Redo the newest undone edit on a canvas
+
+        :return: the changed spans as returned by `apply()`, `None` if the whole canvas changed, or `False` if there is nothing to redo
+        """
+        if not self._redo:
+            return False
+        edit = self._redo.pop()
+        self._undo.append(edit)
+        self.version += 1
+        return edit.apply(canvas, False)
+
+    def _wrap_edits(self, wrap):
+        for edits in (self._undo, self._redo):
+            for i, edit in enumerate(edits):
+                if not isinstance(edit, (LayerEdit, FrameEdit)):
+                    edits[i] = wrap(edit)
+        self._size = sum(edit.size() for edit in self._undo) + sum(edit.size() for edit in self._redo)
+
+    def assign_layer(self, layer_idx):
+        """Turn the edits recorded so far into edits on one layer
+
+        This is used when a plain drawing becomes a layer of a
+        `LayeredCanvas`, so its edits are still undone on it.
+        """
+        self._wrap_edits(lambda edit: LayerEdit(layer_idx, edit))
+
+    def assign_frame(self, frame):
+        """Turn the edits recorded so far into edits on one frame
+
+        This is used when a plain drawing becomes the first frame of an
+        `Animation`, so its edits are still undone on it.
+        """
+        self._wrap_edits(lambda edit: FrameEdit(frame, edit))
+
+    def touch(self):
+        """Note a change to the drawing that cannot be undone, such as adding a layer"""
+        self.version += 1
+
+    def clear(self):
+        """Forget every edit, as the drawing was replaced or changed for good"""
+        self.version += 1
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
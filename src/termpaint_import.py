@@ -0,0 +1,382 @@
+import struct
+import zlib
+from itertools import accumulate
+from termpaint_canvas import Canvas
+from termpaint_export import PAIR_RGB
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IMAGE_SUFFIXES = ('.png', '.ppm')
+
+# Color pair indices an image is mapped to, and their colors
+DRAWING_COLORS = tuple(range(3, 11))
+_DRAWING_RGB = tuple(PAIR_RGB[idx] for idx in DRAWING_COLORS)
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Number of channels of each PNG color type
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# Pixels quantized at a time with NumPy, to bound the size of the distance table
+_QUANTIZE_CHUNK = 1 << 18
+
+def _read_ppm_token(data, pos):
+    # Skip whitespace and comments, then read one header field
+    while True:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] != b'#':
+            break
+        pos = data.index(b'\n', pos)
+    end = pos
+    while end < len(data) and not data[end:end + 1].isspace():
+        end += 1
+    return data[pos:end], end
+
+def read_ppm(fpath):
+    """Read a binary PPM (P6) image
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :return: 2-ary tuple (`tuple` dimensions in `(rows, columns)`, `bytes` RGB pixels)
+    """
+    with open(fpath, 'rb') as image_file:
+        data = image_file.read()
+
+    magic, pos = _read_ppm_token(data, 0)
+    if magic != b'P6':
+        raise ValueError('Not a binary PPM image')
+    fields = []
+    for _ in range(3):
+        field, pos = _read_ppm_token(data, pos)
+        fields.append(int(field))
+    width, height, max_value = fields
+    if max_value != 255:
+        raise ValueError('Only PPM images with 8 bits per channel are supported')
+
+    # A single whitespace character separates the header from the pixels
+    pixels = data[pos + 1:pos + 1 + width * height * 3]
+    if len(pixels) != width * height * 3:
+        raise ValueError('PPM image is truncated')
+    return (height, width), pixels
+
+def _unfilter_sub(line, bpp):
+    out = bytearray(len(line))
+    for channel in range(bpp):
+        out[channel::bpp] = bytes(accumulate(line[channel::bpp], lambda left, value: (left + value) & 0xff))
+    return out
+
+def _unfilter_average(line, prev, bpp):
+    out = bytearray(line)
+    for i in range(len(out)):
+        left = out[i - bpp] if i >= bpp else 0
+        out[i] = (out[i] + ((left + prev[i]) >> 1)) & 0xff
+    return out
+
+def _unfilter_paeth(line, prev, bpp):
+    out = bytearray(line)
+    for i in range(len(out)):
+        if i >= bpp:
+            left, upper_left = out[i - bpp], prev[i - bpp]
+        else:
+            left = upper_left = 0
+        up = prev[i]
+        estimate = left + up - upper_left
+        distance_left, distance_up, distance_upper_left = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+        if distance_left <= distance_up and distance_left <= distance_upper_left:
+            predictor = left
+        elif distance_up <= distance_upper_left:
+            predictor = up
+        else:
+            predictor = upper_left
+        out[i] = (out[i] + predictor) & 0xff
+    return out
+
+def _unfilter(data, height, stride, bpp):
+    """Undo the PNG filters of every scanline
+
+    With NumPy, the None, Sub and Up filters are undone a whole row at a
+    time; Average and Paeth depend on the cell to the left, so they are
+    undone one byte at a time.
+
+    :return: `bytes` of the raw image data without filter bytes
+    """
+    if len(data) < height * (stride + 1):
+        raise ValueError('PNG image data is truncated')
+
+    rows = []
+    prev = bytes(stride)
+    for y_value in range(height):
+        start = y_value * (stride + 1)
+        filter_type, line = data[start], data[start + 1:start + 1 + stride]
+        if filter_type == 0:
+            row = line
+        elif filter_type == 1:
+            if np is not None:
+                row = np.frombuffer(line, dtype=np.uint8).reshape(-1, bpp).cumsum(axis=0, dtype=np.uint8).tobytes()
+            else:
+                row = _unfilter_sub(line, bpp)
+        elif filter_type == 2:
+            if np is not None:
+                row = (np.frombuffer(line, dtype=np.uint8) + np.frombuffer(prev, dtype=np.uint8)).tobytes()
+            else:
+                row = bytes((value + up) & 0xff for value, up in zip(line, prev))
+        elif filter_type == 3:
+            row = _unfilter_average(line, prev, bpp)
+        elif filter_type == 4:
+            row = _unfilter_paeth(line, prev, bpp)
+        else:
+            raise ValueError(f'Unknown PNG filter type {filter_type}')
+        rows.append(row)
+        prev = row
+    return b''.join(rows)
+
+def read_png(fpath):
+    """Read a PNG image
+
+    Non-interlaced images with 8 bits per channel are supported, in every
+    color type. Transparency is ignored.
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :return: 2-ary tuple (`tuple` dimensions in `(rows, columns)`, `bytes` RGB pixels)
+    """
+    with open(fpath, 'rb') as image_file:
+        data = image_file.read()
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError('Not a PNG image')
+
+    header = None
+    palette = None
+    compressed = []
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif chunk_type == b'PLTE':
+            palette = body
+        elif chunk_type == b'IDAT':
+            compressed.append(body)
+        elif chunk_type == b'IEND':
+            break
+
+    if header is None:
+        raise ValueError('PNG image has no header')
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or color_type not in _PNG_CHANNELS:
+        raise ValueError('Only PNG images with 8 bits per channel are supported')
+    if interlace != 0:
+        raise ValueError('Interlaced PNG images are not supported')
+
+    bpp = _PNG_CHANNELS[color_type]
+    raw = _unfilter(zlib.decompress(b''.join(compressed)), height, width * bpp, bpp)
+
+    if color_type == 2:
+        pixels = raw
+    elif color_type == 3:
+        if palette is None:
+            raise ValueError('PNG image has no palette')
+        palette = palette.ljust(768, b'\x00')
+        pixels = bytearray(width * height * 3)
+        for channel in range(3):
+            pixels[channel::3] = raw.translate(palette[channel::3])
+    else:
+        # Drop the alpha channel and spread gray over the three channels
+        gray = color_type in (0, 4)
+        pixels = bytearray(width * height * 3)
+        for channel in range(3):
+            pixels[channel::3] = raw[0 if gray else channel::bpp]
+    return (height, width), bytes(pixels)
+
+def read_image(fpath):
+    """Read a PNG or binary PPM image, telling them apart by their contents
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :return: 2-ary tuple (`tuple` dimensions in `(rows, columns)`, `bytes` RGB pixels)
+    """
+    with open(fpath, 'rb') as image_file:
+        magic = image_file.read(len(_PNG_SIGNATURE))
+    if magic == _PNG_SIGNATURE:
+        return read_png(fpath)
+    return read_ppm(fpath)
+
+def resize_pixels(pixels, src_dim, dim):
+    """Resize RGB pixels
+
+    With NumPy, every pixel of the result is the average of the block of
+    source pixels it covers (or the nearest source pixel, when enlarging).
+    Without NumPy, the source pixel at the center of the block is taken.
+
+    :param pixels: RGB pixels, row by row
+    :type pixels: bytes-like object
+    :param src_dim: dimensions of `pixels` as a 2-ary tuple `(row, column)`
+    :type src_dim: tuple
+    :param dim: dimensions of the result as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :return: `bytes` of RGB pixels
+    """
+    if tuple(src_dim) == tuple(dim):
+        return bytes(pixels)
+
+    if np is not None:
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(src_dim[0], src_dim[1], 3)
+        for axis in (0, 1):
+            src_len, dst_len = src_dim[axis], dim[axis]
+            if dst_len >= src_len:
+                image = image.take(np.arange(dst_len) * src_len // dst_len, axis=axis)
+                continue
+            edges = np.arange(dst_len + 1) * src_len // dst_len
+            sums = np.add.reduceat(image, edges[:-1], axis=axis, dtype=np.uint32)
+            counts = np.diff(edges).reshape((-1, 1, 1) if axis == 0 else (1, -1, 1))
+            image = ((sums + counts // 2) // counts).astype(np.uint8)
+        return image.tobytes()
+
+    rows, cols = dim
+    src_rows, src_cols = src_dim
+    src_xs = [((2 * x_value + 1) * src_cols // (2 * cols)) * 3 for x_value in range(cols)]
+    resized = bytearray()
+    for y_value in range(rows):
+        src_start = ((2 * y_value + 1) * src_rows // (2 * rows)) * src_cols * 3
+        for src_x in src_xs:
+            resized += pixels[src_start + src_x:src_start + src_x + 3]
+    return bytes(resized)
+
+def _nearest_color(red, green, blue):
+    best_idx, best_distance = 0, None
+    for i, (palette_red, palette_green, palette_blue) in enumerate(_DRAWING_RGB):
+        distance = (red - palette_red) ** 2 + (green - palette_green) ** 2 + (blue - palette_blue) ** 2
+        if best_distance is None or distance < best_distance:
+            best_idx, best_distance = i, distance
+    return best_idx
+
+def _quantize_nearest(pixels):
+    if np is not None:
+        # The nearest color has the least `|color|^2 - 2 * pixel . color`, as
+        # `|pixel|^2` is the same for every color; this is one matrix product,
+        # and exact in float32 for 8-bit channels
+        palette = np.array(_DRAWING_RGB, dtype=np.float32)
+        weights = -2 * palette.T
+        norms = (palette ** 2).sum(axis=1)
+        lookup = np.array(DRAWING_COLORS, dtype=np.uint8)
+        flat = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 3)
+        cells = np.empty(len(flat), dtype=np.uint8)
+        for start in range(0, len(flat), _QUANTIZE_CHUNK):
+            chunk = flat[start:start + _QUANTIZE_CHUNK].astype(np.float32)
+            cells[start:start + len(chunk)] = lookup[(chunk @ weights + norms).argmin(axis=1)]
+        return cells.tobytes()
+
+    # Drawings have few distinct colors, so the mapping is cached per color
+    cache = {}
+    cells = bytearray(len(pixels) // 3)
+    for i in range(len(cells)):
+        rgb = pixels[i * 3:i * 3 + 3]
+        if rgb not in cache:
+            cache[rgb] = DRAWING_COLORS[_nearest_color(*rgb)]
+        cells[i] = cache[rgb]
+    return bytes(cells)
+
+def _quantize_dithered_numpy(pixels, dim):
+    """Floyd-Steinberg dithering along anti-diagonals
+
+    A pixel only takes error from its left neighbor and the three pixels
+    above it, so the pixels `(y, x)` with the same `x + 2 * y` do not
+    depend on each other and are quantized together, in `cols + 2 * rows`
+    steps instead of `rows * cols`. The errors are added up in the same
+    order as row by row, so the result is the same.
+    """
+    rows, cols = dim
+    palette = np.array(_DRAWING_RGB, dtype=np.float64)
+    lookup = np.array(DRAWING_COLORS, dtype=np.uint8)
+    image = np.zeros((rows, cols + 2, 3))
+    image[:, 1:cols + 1] = np.frombuffer(pixels, dtype=np.uint8).reshape(rows, cols, 3)
+    # Errors carried into every pixel, with a column of padding on both sides and a row below
+    errors = np.zeros((rows + 1, cols + 2, 3))
+    cells = np.empty((rows, cols), dtype=np.uint8)
+    for step in range(cols + 2 * (rows - 1)):
+        ys = np.arange(max(0, (step - cols + 2) // 2), min(rows - 1, step // 2) + 1)
+        xs = step - 2 * ys + 1
+        wanted = np.clip(image[ys, xs] + errors[ys, xs], 0.0, 255.0)
+        colors = ((wanted[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        cells[ys, xs - 1] = lookup[colors]
+        error = wanted - palette[colors]
+        errors[ys + 1, xs - 1] += error * 3 / 16
+        errors[ys, xs + 1] += error * 7 / 16
+        errors[ys + 1, xs] += error * 5 / 16
+        errors[ys + 1, xs + 1] += error * 1 / 16
+    return cells.tobytes()
+
+def _quantize_dithered(pixels, dim):
+    if np is not None:
+        return _quantize_dithered_numpy(pixels, dim)
+
+    rows, cols = dim
+    cells = bytearray(rows * cols)
+    # Errors carried into the current and the next row, per channel
+    errors = [[0.0] * (cols + 2) for _ in range(3)]
+    for y_value in range(rows):
+        next_errors = [[0.0] * (cols + 2) for _ in range(3)]
+        row_start = y_value * cols
+        for x_value in range(cols):
+            pos = (row_start + x_value) * 3
+            wanted = [
+                min(255.0, max(0.0, pixels[pos + channel] + errors[channel][x_value + 1]))
+                for channel in range(3)
+            ]
+            color = _nearest_color(*wanted)
+            cells[row_start + x_value] = DRAWING_COLORS[color]
+            for channel in range(3):
+                error = wanted[channel] - _DRAWING_RGB[color][channel]
+                errors[channel][x_value + 2] += error * 7 / 16
+                next_errors[channel][x_value] += error * 3 / 16
+                next_errors[channel][x_value + 1] += error * 5 / 16
+                next_errors[channel][x_value + 2] += error * 1 / 16
+        errors = next_errors
+    return bytes(cells)
+
+def quantize_pixels(pixels, dim, dither=False):
+    """Map RGB pixels to the nearest of the 8 drawing colors
+
+    Without dithering, the nearest colors are found for all pixels in one
+    vectorized pass if NumPy is installed. With `dither=True`, the error
+    of every pixel is spread with Floyd-Steinberg error diffusion, a whole
+    anti-diagonal of pixels at a time with NumPy and one pixel at a time
+    without it.
+
+    :param pixels: RGB pixels, row by row
+    :type pixels: bytes-like object
+    :param dim: dimensions of `pixels` as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param dither: `True` to spread the error of every pixel to its neighbors
+    :type dither: bool
+    :return: `bytes` of color pair indices
+    """
+    if dither:
+        return _quantize_dithered(pixels, dim)
+    return _quantize_nearest(pixels)
+
+def image_to_canvas(fpath, dim=None, dither=False):
+    """Read a PNG or PPM image into a new canvas
+
+    The image is resized to `dim` (see `resize_pixels()`) and mapped to the
+    drawing colors (see `quantize_pixels()`). The result fills the cells
+    of the canvas in one go.
+
+    :param fpath: path to the image file
+    :type fpath: string
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`, or `None` for the size of the image
+    :type dim: tuple
+    :param dither: `True` to use Floyd-Steinberg dithering
+    :type dither: bool
+    :return: the new `Canvas`
+    """
+    src_dim, pixels = read_image(fpath)
+    dim = src_dim if dim is None else (dim[0], dim[1])
+    if dim[0] <= 0 or dim[1] <= 0:
+        raise ValueError('Canvas dimensions must be positive')
+    pixels = resize_pixels(pixels, src_dim, dim)
+    return Canvas(dim, cells=bytearray(quantize_pixels(pixels, dim, dither)))
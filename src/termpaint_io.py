@@ -0,0 +1,539 @@
+import os
+import re
+import tempfile
+from termpaint_canvas import Canvas, BLANK_COLOR_PAIR_IDX, iter_runs
+from termpaint_layers import Layer, LayeredCanvas
+from termpaint_frames import Animation
+from termpaint_palette import FIRST_PALETTE_IDX
+
+PAINT_MAGIC = 'EEE111_PAINT1234'
+PAINT_RLE_MAGIC = 'EEE111_PAINT_RLE'
+PAINT_LAYERS_MAGIC = 'EEE111_PAINT_LYR'
+PAINT_FRAMES_MAGIC = 'EEE111_PAINT_ANI'
+
+# Raw characters in a .paint file and the color pair indices they stand for
+RAW_TO_IDX = {'r': 3, 'g': 4, 'b': 5, 'c': 6, 'm': 7, 'y': 8, 'w': 9, 'x': 10}
+IDX_TO_RAW = {idx: raw for raw, idx in RAW_TO_IDX.items()}
+
+# `bytes.translate()` tables between raw characters and color pair indices.
+# Anything not in the palette is translated to 0, which is never a drawing color.
+_RAW_TO_IDX_TABLE = bytes(RAW_TO_IDX.get(chr(i), 0) for i in range(256))
+_IDX_TO_RAW_TABLE = bytes(ord(IDX_TO_RAW.get(i, '\0')) for i in range(256))
+
+# Largest drawing read from a .paint file. A run count of a few digits can
+# stand for any number of cells, so a file must not be trusted with more.
+MAX_ROW_LEN = 1 << 16
+MAX_CELLS = 1 << 28
+
+# A run is a count and either a raw character or `#` and the palette index in hex
+_RLE_RUN = re.compile(r'(\d*)([a-z]|#[0-9a-f]{2})')
+_RAW_RUN = re.compile('|'.join(f'{raw}+' for raw in RAW_TO_IDX))
+# A palette line, `%` and the palette index followed by the color, both in hex
+_PALETTE_LINE = re.compile(r'%([0-9a-f]{2}) ([0-9a-f]{6})')
+
+def decode_row(line):
+    """Decode a row of raw characters into color pair indices
+
+    :param line: a row of a .paint file without the line terminator
+    :type line: string
+    :return: `bytes` of color pair indices
+    """
+    row = line.encode('ascii', 'replace').translate(_RAW_TO_IDX_TABLE)
+    if 0 in row:
+        raise ValueError(f'Unknown color in row: {line!r}')
+    return row
+
+def encode_row(row):
+    """Encode a row of color pair indices into raw characters
+
+    :param row: color pair indices of the row
+    :type row: bytes-like object
+    :return: `string` of raw characters
+    """
+    raw = bytes(row).translate(_IDX_TO_RAW_TABLE)
+    if 0 in raw:
+        if max(row) >= FIRST_PALETTE_IDX:
+            raise ValueError('Palette colors can only be written to run-length encoded files')
+        raise ValueError('Row contains a color pair index that is not a color')
+    return raw.decode('ascii')
+
+def decode_rle_row(line, max_len=MAX_ROW_LEN):
+    """Decode a run-length encoded row into color pair indices
+
+    A row is a sequence of runs, each written as a count followed by a
+    raw character, for example `22c13w85c`. A count of 1 may be left out;
+    a count of 0 is an error. A palette color is written as `#` and its
+    palette index in two hex digits instead of a raw character, for
+    example `4#0b`. The length of the row is checked before any cell is
+    decoded, so a huge count is refused without taking any memory.
+
+    :param line: a row of a run-length encoded .paint file without the line terminator
+    :type line: string
+    :param max_len: largest number of cells the row may have
+    :type max_len: int
+    :return: `bytes` of color pair indices
+    """
+    runs = _RLE_RUN.findall(line)
+    if sum(len(count) + len(raw) for count, raw in runs) != len(line):
+        raise ValueError(f'Malformed run-length encoded row: {line!r}')
+    counts = [int(count) if count else 1 for count, _ in runs]
+    if 0 in counts:
+        raise ValueError(f'Run of 0 cells in row: {line!r}')
+    if sum(counts) > max_len:
+        raise ValueError(f'Row is wider than {max_len} cells')
+
+    row = bytearray()
+    for count, (_, raw) in zip(counts, runs):
+        if raw[0] == '#':
+            color_pair_idx = int(raw[1:], 16)
+            if color_pair_idx < FIRST_PALETTE_IDX:
+                raise ValueError(f'Unknown color in row: {line!r}')
+        elif raw in RAW_TO_IDX:
+            color_pair_idx = RAW_TO_IDX[raw]
+        else:
+            raise ValueError(f'Unknown color in row: {line!r}')
+        row += bytes([color_pair_idx]) * count
+    return bytes(row)
+
+def encode_rle_row(row):
+    """Encode a row of color pair indices into runs of raw characters
+
+    :param row: color pair indices of the row
+    :type row: bytes-like object
+    :return: `string` of runs as read by `decode_rle_row()`
+    """
+    raw = bytes(row).translate(_IDX_TO_RAW_TABLE)
+    if 0 not in raw:
+        return ''.join(
+            f'{len(run)}{run[0]}' if len(run) > 1 else run
+            for run in _RAW_RUN.findall(raw.decode('ascii'))
+        )
+
+    # Rows with palette colors are encoded one run of cells at a time
+    runs = []
+    for run_start, run_end, color_pair_idx in iter_runs(row):
+        if color_pair_idx in IDX_TO_RAW:
+            code = IDX_TO_RAW[color_pair_idx]
+        elif color_pair_idx >= FIRST_PALETTE_IDX:
+            code = f'#{color_pair_idx:02x}'
+        else:
+            raise ValueError('Row contains a color pair index that is not a color')
+        runs.append(f'{run_end - run_start}{code}' if run_end - run_start > 1 else code)
+    return ''.join(runs)
+
+def read_palette_line(line, palette=None):
+    """Read a palette line of a .paint file into a palette
+
+    A palette line is `%`, the palette index in two hex digits, a space,
+    and the color as six hex digits, for example `%0b ff8000`. Palette
+    lines come after the header lines of a .paint file, before its rows.
+
+    :param line: the line without the line terminator
+    :type line: string
+    :param palette: palette to set the color in, or `None` to only check the line
+    :type palette: `class Palette`
+    """
+    match = _PALETTE_LINE.fullmatch(line)
+    if match is None or int(match.group(1), 16) < FIRST_PALETTE_IDX:
+        raise ValueError(f'Malformed palette line: {line!r}')
+    if palette is not None:
+        value = int(match.group(2), 16)
+        palette.set(int(match.group(1), 16), (value >> 16, (value >> 8) & 0xff, value & 0xff))
+
+def palette_lines(palette):
+    """Get the palette lines of a .paint file for the colors of a palette
+
+    :param palette: the palette to write, or `None`
+    :type palette: `class Palette`
+    :return: `list` of `string` lines, each ending with a newline
+    """
+    if palette is None:
+        return []
+    return [
+        '%{:02x} {:02x}{:02x}{:02x}\n'.format(color_pair_idx, *rgb)
+        for color_pair_idx, rgb in sorted(palette.colors.items())
+    ]
+
+def iter_paint_lines(paint_file, palette=None):
+    """Read the magic string of an open .paint file and get its rows without decoding them
+
+    Both plain files (`EEE111_PAINT1234`) and run-length encoded files
+    (`EEE111_PAINT_RLE`) can be read. Palette lines (see
+    `read_palette_line()`) are read into `palette` as they come, so the
+    palette is complete once the first row has been read.
+
+    :param paint_file: file object opened in text mode
+    :type paint_file: file object
+    :param palette: palette to read the colors of the file into, or `None`
+    :type palette: `class Palette`
+    :return: 2-ary tuple `(decode, lines)`, where `decode` is the function decoding a row into `bytes` of color pair indices, and `lines` is a generator of `string` rows
+    """
+    magic_string = paint_file.readline().strip()
+    if magic_string == PAINT_MAGIC:
+        decode = decode_row
+    elif magic_string == PAINT_RLE_MAGIC:
+        decode = decode_rle_row
+    else:
+        raise ValueError(f'Not a .paint file: bad magic string {magic_string!r}')
+    return decode, _iter_row_lines(paint_file, palette)
+
+def _iter_row_lines(paint_file, palette):
+    blank_lines = 0
+    for line in paint_file:
+        line = line.strip()
+        if line.startswith('%'):
+            read_palette_line(line, palette)
+        elif line:
+            # A blank line is an empty row, unless only blank lines follow it
+            yield from [''] * blank_lines
+            blank_lines = 0
+            yield line
+        else:
+            blank_lines += 1
+
+def iter_paint_rows(paint_file, palette=None):
+    """Read the rows of an open .paint file one at a time
+
+    The magic string is read and checked first (see `iter_paint_lines()`).
+    A blank line is an empty row, so the rows after it keep their place;
+    blank lines at the end of the file are left out.
+
+    :param paint_file: file object opened in text mode
+    :type paint_file: file object
+    :param palette: palette to read the colors of the file into, or `None`
+    :type palette: `class Palette`
+    :return: generator of `bytes` of color pair indices, one per row
+    """
+    decode, lines = iter_paint_lines(paint_file, palette)
+    for line in lines:
+        yield decode(line)
+
+def _add_cells(cells, row):
+    """Add the cells of a row read to the cells read so far, which may not be more than `MAX_CELLS`"""
+    cells += len(row)
+    if cells > MAX_CELLS:
+        raise ValueError(f'Drawing has more than {MAX_CELLS} cells')
+    return cells
+
+def _drawing_dim(row_lists, min_dim):
+    """Get the dimensions of the canvases for the rows of the layers or frames of a drawing
+
+    :return: 2-ary tuple `(row, column)` of the largest layer or frame, but at least `min_dim`
+    """
+    dim = (
+        max(max(len(rows) for rows in row_lists), min_dim[0]),
+        max(max((len(row) for rows in row_lists for row in rows), default=0), min_dim[1]),
+    )
+    if dim[0] * dim[1] * len(row_lists) > MAX_CELLS:
+        raise ValueError(f'Drawing has more than {MAX_CELLS} cells')
+    return dim
+
+def read_layers(paint_file, min_dim=(0, 0), palette=None):
+    """Read the layers of an open layered .paint file
+
+    A layered file (`EEE111_PAINT_LYR`) has a header line for every layer,
+    `@VISIBLE TRANSPARENT NAME`, followed by its run-length encoded rows.
+    `VISIBLE` is `1` or `0`, and `TRANSPARENT` is a raw character, or `-`
+    for an opaque layer. Every layer is as large as the largest one, but
+    at least `min_dim`; cells not covered by the file are set to the
+    transparent color of the layer, or to color pair 10.
+
+    :param paint_file: file object opened in text mode
+    :type paint_file: file object
+    :param min_dim: smallest canvas dimensions as a 2-ary tuple `(row, column)`
+    :type min_dim: tuple
+    :param palette: palette to read the colors of the file into, or `None`
+    :type palette: `class Palette`
+    :return: the `LayeredCanvas` read, with its top layer active
+    """
+    magic_string = paint_file.readline().strip()
+    if magic_string != PAINT_LAYERS_MAGIC:
+        raise ValueError(f'Not a layered .paint file: bad magic string {magic_string!r}')
+
+    headers = []
+    layer_rows = []
+    blank_lines = cells = 0
+    for line in paint_file:
+        line = line.strip()
+        if line.startswith('@'):
+            visible, transparent, name = (line[1:].split(' ', 2) + [''])[:3]
+            if visible not in ('0', '1') or (transparent != '-' and transparent not in RAW_TO_IDX):
+                raise ValueError(f'Malformed layer header: {line!r}')
+            headers.append((name, visible == '1', None if transparent == '-' else RAW_TO_IDX[transparent]))
+            layer_rows.append([])
+            blank_lines = 0
+        elif line.startswith('%'):
+            read_palette_line(line, palette)
+        elif line:
+            if not layer_rows:
+                raise ValueError('Rows before the first layer header')
+            layer_rows[-1].extend([b''] * blank_lines)
+            blank_lines = 0
+            layer_rows[-1].append(decode_rle_row(line))
+            cells = _add_cells(cells, layer_rows[-1][-1])
+        else:
+            blank_lines += 1
+    if not headers:
+        raise ValueError('Layered .paint file without layers')
+
+    dim = _drawing_dim(layer_rows, min_dim)
+    layers = []
+    for (name, visible, transparent), rows in zip(headers, layer_rows):
+        canvas = Canvas(dim, BLANK_COLOR_PAIR_IDX if transparent is None else transparent)
+        for y_value, row in enumerate(rows):
+            canvas.row(y_value)[:len(row)] = row
+        layers.append(Layer(canvas, name, visible, transparent))
+    return LayeredCanvas(layers, len(layers) - 1)
+
+def read_frames(paint_file, min_dim=(0, 0), palette=None):
+    """Read the frames of an open animation .paint file
+
+    An animation file (`EEE111_PAINT_ANI`) has the frames per second of
+    its playback on the second line, then a line `@` before the run-length
+    encoded rows of every frame. Every frame is as large as the largest
+    one, but at least `min_dim`; cells not covered by the file are set to
+    color pair 10.
+
+    :param paint_file: file object opened in text mode
+    :type paint_file: file object
+    :param min_dim: smallest canvas dimensions as a 2-ary tuple `(row, column)`
+    :type min_dim: tuple
+    :param palette: palette to read the colors of the file into, or `None`
+    :type palette: `class Palette`
+    :return: the `Animation` read, with its first frame current
+    """
+    magic_string = paint_file.readline().strip()
+    if magic_string != PAINT_FRAMES_MAGIC:
+        raise ValueError(f'Not an animation .paint file: bad magic string {magic_string!r}')
+    fps = float(paint_file.readline())
+    if fps <= 0:
+        raise ValueError(f'Frames per second must be positive, not {fps}')
+
+    frame_rows = []
+    blank_lines = cells = 0
+    for line in paint_file:
+        line = line.strip()
+        if line == '@':
+            frame_rows.append([])
+            blank_lines = 0
+        elif line.startswith('%'):
+            read_palette_line(line, palette)
+        elif line:
+            if not frame_rows:
+                raise ValueError('Rows before the first frame')
+            frame_rows[-1].extend([b''] * blank_lines)
+            blank_lines = 0
+            frame_rows[-1].append(decode_rle_row(line))
+            cells = _add_cells(cells, frame_rows[-1][-1])
+        else:
+            blank_lines += 1
+    if not frame_rows:
+        raise ValueError('Animation .paint file without frames')
+
+    dim = _drawing_dim(frame_rows, min_dim)
+    canvases = []
+    for rows in frame_rows:
+        canvas = Canvas(dim)
+        for y_value, row in enumerate(rows):
+            canvas.row(y_value)[:len(row)] = row
+        canvases.append(canvas)
+    return Animation(canvases, fps)
+
+def read_paint(fpath, dim=None, min_dim=(0, 0), layers=False, frames=False, palette=None):
+    """Read a .paint file into a new canvas
+
+    If `dim` is given, the canvas has those dimensions; rows and columns
+    of the file outside of it are dropped, and cells not covered by the
+    file are set to color pair 10. Otherwise, the canvas is as large as
+    the drawing in the file, but at least `min_dim`.
+
+    A layered file is flattened into a single canvas, unless `layers` is
+    `True`; then it is read as a `LayeredCanvas` (see `read_layers()`),
+    and `dim` is not used. Likewise, only the first frame of an animation
+    file is read, unless `frames` is `True`; then it is read as an
+    `Animation` (see `read_frames()`).
+
+    If `palette` is given, its colors are replaced by the palette of the
+    file, which is empty if the file has none.
+
+    Files with rows wider than `MAX_ROW_LEN` cells, or with more than
+    `MAX_CELLS` cells in all, are refused.
+
+    :param fpath: path to the paint file
+    :type fpath: string
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`, or `None`
+    :type dim: tuple
+    :param min_dim: smallest canvas dimensions as a 2-ary tuple `(row, column)` if `dim` is `None`
+    :type min_dim: tuple
+    :param layers: `True` to keep the layers of a layered file
+    :type layers: bool
+    :param frames: `True` to keep the frames of an animation file
+    :type frames: bool
+    :param palette: palette to read the colors of the file into, or `None`
+    :type palette: `class Palette`
+    :return: the `Canvas` read, the `LayeredCanvas` if `layers` is `True` and the file is layered, or the `Animation` if `frames` is `True` and the file is an animation
+    """
+    if palette is not None:
+        palette.clear()
+    with open(fpath, 'r') as open_file:
+        magic_string = open_file.readline().strip()
+        open_file.seek(0)
+        if magic_string == PAINT_LAYERS_MAGIC:
+            layered = read_layers(open_file, min_dim if dim is None else (0, 0), palette)
+            if layers:
+                return layered
+            rows = layered.flatten().rows()
+        elif magic_string == PAINT_FRAMES_MAGIC:
+            animation = read_frames(open_file, min_dim if dim is None else (0, 0), palette)
+            if frames:
+                return animation
+            rows = animation.frame_rows(0)
+        else:
+            rows = iter_paint_rows(open_file, palette)
+
+        if dim is not None:
+            canvas = Canvas(dim)
+            for y_value, row in zip(range(dim[0]), rows):
+                row = row[:dim[1]]
+                canvas.row(y_value)[:len(row)] = row
+            return canvas
+
+        cells = 0
+        read_rows = []
+        for row in rows:
+            cells = _add_cells(cells, row)
+            read_rows.append(row)
+
+    canvas = Canvas(_drawing_dim([read_rows], min_dim))
+    for y_value, row in enumerate(read_rows):
+        canvas.row(y_value)[:len(row)] = row
+    return canvas
+
+def write_paint(fpath, canvas, rle=True, palette=None):
+    """Write a canvas to a .paint file
+
+    If the file exists, it will be overwritten. By default, each row is
+    run-length encoded (`EEE111_PAINT_RLE`); with `rle=False`, the plain
+    one-character-per-cell format (`EEE111_PAINT1234`) is written instead.
+    A `LayeredCanvas` is always written in the layered format (see
+    `read_layers()`), and an `Animation` in the animation format (see
+    `read_frames()`). The colors of `palette` are written after the
+    header lines; cells with palette colors can only be written run-length
+    encoded, and writing them plain fails before the file is touched.
+
+    :param fpath: path to the paint file
+    :type fpath: string
+    :param canvas: the drawing to write
+    :type canvas: `class Canvas`, `class LayeredCanvas` or `class Animation`
+    :param rle: `True` if the rows should be run-length encoded
+    :type rle: bool
+    :param palette: colors of the palette indices of the drawing, or `None`
+    :type palette: `class Palette`
+    """
+    if isinstance(canvas, Animation):
+        canvas.commit()
+        with open(fpath, 'w', buffering=1 << 16) as save_file:
+            save_file.write(f'{PAINT_FRAMES_MAGIC}\n{canvas.fps:g}\n')
+            save_file.writelines(palette_lines(palette))
+            for idx in range(len(canvas.frames)):
+                save_file.write('@\n')
+                save_file.writelines(encode_rle_row(row) + '\n' for row in canvas.frame_rows(idx))
+        return
+
+    if isinstance(canvas, LayeredCanvas):
+        with open(fpath, 'w', buffering=1 << 16) as save_file:
+            save_file.write(PAINT_LAYERS_MAGIC + '\n')
+            save_file.writelines(palette_lines(palette))
+            for layer in canvas.layers:
+                transparent = '-' if layer.transparent is None else IDX_TO_RAW[layer.transparent]
+                save_file.write(f'@{int(layer.visible)} {transparent} {layer.name}\n')
+                save_file.writelines(encode_rle_row(row) + '\n' for row in layer.canvas.rows())
+        return
+
+    magic_string, encode = (PAINT_RLE_MAGIC, encode_rle_row) if rle else (PAINT_MAGIC, encode_row)
+    if not rle:
+        # Every row is checked before the file is truncated, so a drawing
+        # that cannot be written plain leaves an existing file as it was
+        for row in canvas.rows():
+            encode_row(row)
+    with open(fpath, 'w', buffering=1 << 16) as save_file:
+        save_file.write(magic_string + '\n')
+        save_file.writelines(palette_lines(palette))
+        save_file.writelines(encode(row) + '\n' for row in canvas.rows())
+
+def write_paint_atomic(fpath, canvas, rle=True, palette=None):
+    """Write a canvas to a .paint file, replacing any existing file at once
+
+    The drawing is written to a temporary file in the same directory,
+    synced to disk, and then renamed over `fpath`, so the file is never
+    seen half-written, even if the program is killed while writing.
+
+    :param fpath: path to the paint file
+    :type fpath: string
+    :param canvas: the drawing to write
+    :type canvas: `class Canvas`
+    :param rle: `True` if the rows should be run-length encoded
+    :type rle: bool
+    :param palette: colors of the palette indices of the drawing, or `None`
+    :type palette: `class Palette`
+    """
+    directory, name = os.path.split(os.path.abspath(fpath))
+    temp_fd, temp_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+    os.close(temp_fd)
+    try:
+        write_paint(temp_path, canvas, rle, palette)
+        with open(temp_path, 'rb') as temp_file:
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, fpath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def output_stem(fpath, output_dir, taken):
+    """Get the path to write the results of a file to, without an extension
+
+    Results are named after the file they come from. Files with the same
+    name in different directories would overwrite each other's results,
+    so every name given out is kept in `taken`, and a name is refused if
+    it was given out before.
+
+    :param fpath: path to the file processed
+    :type fpath: string
+    :param output_dir: directory to write the results to
+    :type output_dir: string
+    :param taken: names given out so far, updated in place
+    :type taken: set
+    :return: `string` path in `output_dir` without an extension
+    """
+    stem = os.path.splitext(os.path.basename(fpath))[0]
+    if os.path.normcase(stem) in taken:
+        raise ValueError(f'Another file named {stem!r} was already written to {output_dir}')
+    taken.add(os.path.normcase(stem))
+    return os.path.join(output_dir, stem)
+
+def iter_paint_files(paths, suffixes=('.paint',)):
+    """Expand paths into .paint files one at a time
+
+    Directories are walked recursively with `os.scandir()`, so they are
+    never listed into memory all at once.
+
+    :param paths: iterable of file or directory paths
+    :type paths: iterable
+    :param suffixes: file name endings of the files to take from directories
+    :type suffixes: tuple
+    :return: generator of `string` paths to .paint files
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _iter_dir_paint_files(path, suffixes)
+        else:
+            yield path
+
+def _iter_dir_paint_files(dpath, suffixes):
+    with os.scandir(dpath) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield from _iter_dir_paint_files(entry.path, suffixes)
+            elif entry.name.endswith(suffixes):
+                yield entry.path
@@ -0,0 +1,255 @@
+import re
+from termpaint_canvas import Canvas, TiledCanvas, BLANK_COLOR_PAIR_IDX
+
+# Marks the cells with no layer above the active one in the cached composite
+_NOTHING_ABOVE = 0
+
+_OPAQUE_PATTERNS = {}
+
+def _overlay(cells, top, transparent):
+    """Copy the cells of `top` that are not `transparent` into `cells`
+
+    :param cells: the cells underneath, changed in place
+    :type cells: bytearray
+    :param top: cells on top, as many as `cells`
+    :type top: bytes-like object
+    :param transparent: color pair index that lets the cells underneath show, or `None`
+    :type transparent: int
+    """
+    if transparent is None:
+        cells[:] = top
+        return
+    if transparent not in _OPAQUE_PATTERNS:
+        _OPAQUE_PATTERNS[transparent] = re.compile(b'[^' + re.escape(bytes([transparent])) + b']+')
+    for match in _OPAQUE_PATTERNS[transparent].finditer(top):
+        cells[match.start():match.end()] = match.group()
+
+class Layer:
+    """A layer of a drawing
+
+    :param canvas: the cells of the layer
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    :param name: name of the layer
+    :type name: string
+    :param visible: `False` to leave the layer out of the flattened image
+    :type visible: bool
+    :param transparent: color pair index that lets the layers underneath show, or `None` for an opaque layer
+    :type transparent: int
+    """
+    __slots__ = ('canvas', 'name', 'visible', 'transparent')
+
+    def __init__(self, canvas, name, visible=True, transparent=None):
+        self.canvas = canvas
+        self.name = name
+        self.visible = visible
+        self.transparent = transparent
+
+class LayeredCanvas:
+    """A drawing made of a stack of layers
+
+    The canvas methods (`get()`, `set()`, `span()`, `fill_span()`, ...)
+    read and write the active layer, so every tool edits it like a plain
+    canvas. What is shown on the screen is the flattened image from
+    `composite_span()`.
+
+    The flattened image is cached in tiles. Next to it, the layers below
+    the active one and the layers above it are each kept flattened, so a
+    tile is recomposited from three sources however many layers there
+    are. An edit only marks the rows of the tiles it touches as dirty;
+    they are recomposited when they are next read. The caches of the layers below
+    and above are only rebuilt, the next time the image is read, after
+    another layer becomes active or a layer is hidden or shown.
+
+    :param layers: the layers from the bottom up
+    :type layers: list
+    :param active: index of the layer being edited
+    :type active: int
+    :param tile_size: rows and columns of a tile of the flattened image
+    :type tile_size: int
+    """
+    __slots__ = ('dim', 'layers', 'active', 'tile_size', 'mapped_path', '_below', '_above', '_composite', '_dirty_tiles', '_dirty_strips', '_stale')
+
+    def __init__(self, layers, active=0, tile_size=64):
+        if not layers or any(layer.canvas.dim != layers[0].canvas.dim for layer in layers):
+            raise ValueError('Layers must all have the same dimensions')
+        self.dim = layers[0].canvas.dim
+        self.layers = list(layers)
+        self.active = active
+        self.tile_size = tile_size
+        self.mapped_path = None
+        self._dirty_tiles = set()
+        self._dirty_strips = set()
+        self._stale = True
+
+    def _rebuild(self):
+        """Flatten the layers below and above the active one again"""
+        self._stale = False
+        rows, cols = self.dim
+        self._below = TiledCanvas(self.dim, BLANK_COLOR_PAIR_IDX, self.tile_size)
+        self._above = TiledCanvas(self.dim, _NOTHING_ABOVE, self.tile_size)
+        self._composite = TiledCanvas(self.dim, BLANK_COLOR_PAIR_IDX, self.tile_size)
+
+        below = [layer for layer in self.layers[:self.active] if layer.visible]
+        above = [layer for layer in self.layers[self.active + 1:] if layer.visible]
+        for cache, cache_layers, empty in ((self._below, below, BLANK_COLOR_PAIR_IDX), (self._above, above, _NOTHING_ABOVE)):
+            if not cache_layers:
+                continue
+            for y_value in range(rows):
+                cells = bytearray([empty]) * cols
+                for layer in cache_layers:
+                    _overlay(cells, layer.canvas.row(y_value), layer.transparent)
+                cache.write_span(y_value, 0, bytes(cells))
+
+        tiles_y = range((rows + self.tile_size - 1) // self.tile_size)
+        tiles_x = range((cols + self.tile_size - 1) // self.tile_size)
+        self._dirty_tiles = {(tile_y, tile_x) for tile_y in tiles_y for tile_x in tiles_x}
+        self._dirty_strips = set()
+
+    def _touch(self, y_value, x_start, x_end):
+        # Mark the row of the tiles under columns [x_start, x_end) of a row as dirty
+        size = self.tile_size
+        for tile_x in range(x_start // size, (x_end - 1) // size + 1):
+            self._dirty_strips.add((y_value, tile_x))
+
+    def _recomposite(self, y_value, tile_x):
+        # Recomposite the row of a tile from the active layer and the layers below and above
+        layer = self.layers[self.active]
+        x_start = tile_x * self.tile_size
+        x_end = min(x_start + self.tile_size, self.dim[1])
+        cells = bytearray(self._below.span(y_value, x_start, x_end))
+        if layer.visible:
+            _overlay(cells, layer.canvas.span(y_value, x_start, x_end), layer.transparent)
+        _overlay(cells, self._above.span(y_value, x_start, x_end), _NOTHING_ABOVE)
+        self._composite.write_span(y_value, x_start, bytes(cells))
+
+    def composite_span(self, y_value, x_start, x_end):
+        """Get the cells of the flattened image in columns `x_start` up to (but not including) `x_end` of a row
+
+        Dirty tiles, and dirty rows of tiles, under the span are
+        recomposited first.
+        """
+        if self._stale:
+            self._rebuild()
+        size = self.tile_size
+        tile_y = y_value // size
+        for tile_x in range(x_start // size, (x_end - 1) // size + 1):
+            if (tile_y, tile_x) in self._dirty_tiles:
+                self._dirty_tiles.discard((tile_y, tile_x))
+                for tile_row in range(tile_y * size, min((tile_y + 1) * size, self.dim[0])):
+                    self._recomposite(tile_row, tile_x)
+            elif (y_value, tile_x) in self._dirty_strips:
+                self._dirty_strips.discard((y_value, tile_x))
+                self._recomposite(y_value, tile_x)
+        return self._composite.span(y_value, x_start, x_end)
+
+    def flatten(self):
+        """Get the flattened image of the visible layers as a new `Canvas`"""
+        canvas = Canvas(self.dim)
+        for y_value in range(self.dim[0]):
+            canvas.write_span(y_value, 0, self.composite_span(y_value, 0, self.dim[1]))
+        return canvas
+
+    def select(self, active):
+        """Make another layer the active one"""
+        self.active = active
+        self._stale = True
+
+    def add_layer(self, name, transparent=BLANK_COLOR_PAIR_IDX):
+        """Add an empty layer on top of the others and make it the active one
+
+        The new layer is filled with its transparent color, so it starts
+        out invisible.
+
+        :return: `int` index of the new layer
+        """
+        fill_color = BLANK_COLOR_PAIR_IDX if transparent is None else transparent
+        self.layers.append(Layer(TiledCanvas(self.dim, fill_color, self.tile_size), name, True, transparent))
+        self.select(len(self.layers) - 1)
+        return self.active
+
+    def set_visible(self, idx, visible):
+        """Show or hide a layer"""
+        self.layers[idx].visible = visible
+        self._stale = True
+
+    def set_transparent(self, idx, transparent):
+        """Change the transparent color of a layer, or make it opaque with `None`"""
+        self.layers[idx].transparent = transparent
+        self._stale = True
+
+    def apply_to_layer(self, idx, edit, undo):
+        """Redo (or undo, if `undo` is `True`) an edit on one of the layers
+
+        :return: the changed spans as returned by `edit.apply()`, or `None` if the whole flattened image may have changed
+        """
+        if idx == self.active:
+            return edit.apply(self, undo)
+        edit.apply(self.layers[idx].canvas, undo)
+        self._stale = True
+        return None
+
+    # The canvas interface, on the active layer
+
+    def get(self, coord):
+        """Get the color pair index at `coord` in the active layer"""
+        return self.layers[self.active].canvas.get(coord)
+
+    def set(self, coord, color_pair_idx):
+        """Set the color pair index at `coord` in the active layer"""
+        self.layers[self.active].canvas.set(coord, color_pair_idx)
+        self._touch(coord[0], coord[1], coord[1] + 1)
+
+    def row(self, y_value):
+        """Get a row of the active layer"""
+        return self.layers[self.active].canvas.row(y_value)
+
+    def rows(self):
+        """Iterate over every row of the active layer"""
+        return self.layers[self.active].canvas.rows()
+
+    def span(self, y_value, x_start, x_end):
+        """Get the cells of the columns `x_start` up to (but not including) `x_end` in a row of the active layer"""
+        return self.layers[self.active].canvas.span(y_value, x_start, x_end)
+
+    def fill_span(self, y_value, x_start, x_end, color_pair_idx):
+        """Set the color pair index of part of a row of the active layer"""
+        self.layers[self.active].canvas.fill_span(y_value, x_start, x_end, color_pair_idx)
+        if x_start < x_end:
+            self._touch(y_value, x_start, x_end)
+
+    def write_span(self, y_value, x_start, cells):
+        """Copy color pair indices into a row of the active layer, starting at column `x_start`"""
+        self.layers[self.active].canvas.write_span(y_value, x_start, cells)
+        if len(cells):
+            self._touch(y_value, x_start, x_start + len(cells))
+
+    def clear(self, color_pair_idx=BLANK_COLOR_PAIR_IDX):
+        """Set every cell of the active layer to `color_pair_idx`"""
+        self.layers[self.active].canvas.clear(color_pair_idx)
+        self._stale = True
+
+    def indexed(self, index_class):
+        """Get an index of the active layer (see `Canvas.indexed()`)"""
+        return self.layers[self.active].canvas.indexed(index_class)
+
+    def snapshot(self):
+        """Get an immutable copy of the cells of the active layer as `bytes`"""
+        return self.layers[self.active].canvas.snapshot()
+
+    def copy(self):
+        """Get an independent copy of every layer"""
+        layers = [Layer(layer.canvas.copy(), layer.name, layer.visible, layer.transparent) for layer in self.layers]
+        return LayeredCanvas(layers, self.active, self.tile_size)
+
+    def flush(self):
+        """Write pending changes of memory-mapped layers back to their files"""
+        for layer in self.layers:
+            layer.canvas.flush()
+
+    def close(self):
+        """Close every layer
+
+        The canvas must not be used afterwards.
+        """
+        for layer in self.layers:
+            layer.canvas.close()
@@ -1,5 +1,28 @@
 import curses
 import curses.ascii
+from collections import OrderedDict
+from termpaint_canvas import iter_runs
+from termpaint_palette import FIRST_PALETTE_IDX, Palette, xterm_number, nearest_drawing_color
+
+# `curses.color_pair(idx)` for every color pair index, filled by `init_color_pairs()`.
+# Until then, every color is drawn with the default colors of the terminal.
+# Palette indices are `None` until `PAIRS` gives them a color pair.
+PAIR_ATTRS = [0] * FIRST_PALETTE_IDX + [None] * (256 - FIRST_PALETTE_IDX)
+
+def use_backend(backend):
+    """Route the `curses` calls of this module through another backend
+
+    `backend` must provide the module-level functions and constants of
+    `curses` used here, such as `FakeCurses` does. Passing the real
+    `curses` module switches back.
+
+    :param backend: the replacement for the `curses` module
+    :return: the backend used before
+    """
+    global curses
+    previous = curses
+    curses = backend
+    return previous
 
 def get_term_dim():
     """Get terminal dimensions
@@ -173,7 +196,28 @@ def print_status_bar(w, term_dim, msg):
     w.addstr(term_dim[0] - 3, 0, msg)
 
     w.move(cur_coord[0], cur_coord[1])
-    w.refresh()
+    w.noutrefresh()
+
+def print_status_note(w, term_dim, msg):
+    """Print a note at the right end of the status bar
+
+    Unlike `print_status_bar()`, the rest of the line is left as it is.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param term_dim: terminal dimensions as a 2-ary tuple `(row, column)`
+    :type term_dim: tuple
+    :param msg: note to show
+    :type msg: string
+    """
+    if not msg or len(msg) >= term_dim[1]:
+        return
+    cur_coord = get_cursor_pos()
+
+    w.addstr(term_dim[0] - 3, term_dim[1] - 1 - len(msg), msg)
+
+    w.move(cur_coord[0], cur_coord[1])
+    w.noutrefresh()
 
 def print_command_cheatsheet(w, term_dim):
     """Print the command cheatsheet
@@ -189,7 +233,23 @@ def print_command_cheatsheet(w, term_dim):
     cmds = [
         ('^P', 'Pencil'),
         ('^F', 'Fill'),
+        ('^L', 'Line'),
+        ('^R', 'Rect'),
+        ('^E', 'Ellipse'),
+        ('^V', 'Select'),
+        ('^D', 'Frames'),
+        ('^A', 'Layer+'),
+        ('^W', 'Next'),
+        ('^G', 'Hide'),
+        ('^K', 'Key'),
+        ('^B', 'Color'),
+        ('^U', 'Replace'),
+        ('^C', 'Counts'),
+        ('^]', 'Diff'),
         ('^X', 'Clear'),
+        ('^N', 'New'),
+        ('^Z', 'Undo'),
+        ('^Y', 'Redo'),
         ('^O', 'Open'),
         ('^S', 'Save'),
         ('^Q', 'Quit'),
@@ -199,6 +259,9 @@ def print_command_cheatsheet(w, term_dim):
 
     str_idx = [1, 0]
     for each_cmd in cmds:
+        # Continue on the next line if the command does not fit
+        if str_idx[1] + len(each_cmd[0]) + len(each_cmd[1]) + 1 >= term_dim[1]:
+            str_idx = [str_idx[0] - 1, 0]
         if str_idx[0] < 0:
             break
 
@@ -207,13 +270,10 @@ def print_command_cheatsheet(w, term_dim):
 
         w.addstr(term_dim[0] - str_idx[0] - 1, str_idx[1], each_cmd[1])
         str_idx[1] += len(each_cmd[1]) + 1
-
-        if str_idx[1] >= term_dim[1]:
-            str_idx[0] -= 1
     
     w.move(current_cur[0], current_cur[1])
 
-    w.refresh()
+    w.noutrefresh()
 
 def init_color_pairs():
     """Initialize and save some color pairs
@@ -238,7 +298,8 @@ def init_color_pairs():
     ```
 
     The color pairs can be used as an attribute in `curses` methods
-    by using `curses.color_pair(idx)`.
+    by using `curses.color_pair(idx)`. Color pairs from 11 up are given
+    to the palette colors of the drawing by `PAIRS` as they are drawn.
     """
     color_map = [
         curses.COLOR_RED, curses.COLOR_GREEN, curses.COLOR_BLUE,
@@ -254,6 +315,90 @@ def init_color_pairs():
     for i, color_seq in enumerate(color_map):
         curses.init_pair(3 + i, curses.COLOR_BLACK, color_seq)
 
+    PAIR_ATTRS[:] = [curses.color_pair(i) for i in range(FIRST_PALETTE_IDX)]
+    PAIRS.reset()
+
+class PairCache:
+    """Color pairs of the palette colors of the drawing, made as they are drawn
+
+    Palette colors get a color pair the first time they are drawn, which
+    is stored in `PAIR_ATTRS`, so drawing looks a color up in a list like
+    the eight drawing colors. With 256 color pairs or more, every
+    palette index has its own color pair. With fewer, the pairs from
+    `FIRST_PALETTE_IDX` up are shared: the palette colors that have one
+    are kept in `recent`, least recently drawn first, and the pair of the
+    first is taken when none is free. Cells on the screen still showing
+    the color that lost its pair change color, so that color is added to
+    `evicted` to tell that its cells must be drawn again (see
+    `redraw_colors()`). Terminals with fewer than 256 colors show the
+    closest drawing color instead.
+
+    :param palette: colors of the palette indices
+    :type palette: `class Palette`
+    """
+    __slots__ = ('palette', 'recent', 'evicted', '_colors', '_shared', '_free')
+
+    def __init__(self, palette):
+        self.palette = palette
+        self.recent = OrderedDict()
+        self.evicted = set()
+        self._colors = 8
+        self._shared = False
+        self._free = []
+
+    def reset(self):
+        """Take back every color pair given to a palette color
+
+        This must be called when palette indices get other colors, such as
+        when a drawing with another palette is opened.
+        """
+        self.evicted.update(self.recent)
+        self.recent.clear()
+        self._colors = getattr(curses, 'COLORS', 8)
+        pair_limit = min(getattr(curses, 'COLOR_PAIRS', 0), 256)
+        self._shared = pair_limit < 256
+        # Popped from the end, so the lowest pair is given first
+        self._free = list(range(pair_limit - 1, FIRST_PALETTE_IDX - 1, -1))
+        PAIR_ATTRS[FIRST_PALETTE_IDX:] = [None] * (256 - FIRST_PALETTE_IDX)
+
+    def attr(self, color_pair_idx):
+        """Get the attribute to draw a color pair index with, giving it a color pair if needed
+
+        :param color_pair_idx: a color pair index
+        :type color_pair_idx: int
+        :return: `int` attribute, as from `curses.color_pair()`
+        """
+        attr = PAIR_ATTRS[color_pair_idx]
+        if attr is not None:
+            if color_pair_idx in self.recent:
+                self.recent.move_to_end(color_pair_idx)
+            return attr
+
+        rgb = self.palette.rgb(color_pair_idx)
+        if self._colors < 256 or (self._shared and not self._free and not self.recent):
+            attr = PAIR_ATTRS[nearest_drawing_color(rgb)]
+            PAIR_ATTRS[color_pair_idx] = attr
+            return attr
+
+        pair = color_pair_idx
+        if self._shared:
+            if self._free:
+                pair = self._free.pop()
+            else:
+                evicted_idx, pair = self.recent.popitem(last=False)
+                PAIR_ATTRS[evicted_idx] = None
+                self.evicted.add(evicted_idx)
+            self.recent[color_pair_idx] = pair
+        curses.init_pair(pair, curses.COLOR_BLACK, xterm_number(rgb))
+        attr = curses.color_pair(pair)
+        PAIR_ATTRS[color_pair_idx] = attr
+        return attr
+
+# Colors of the palette indices of the drawing being edited
+PALETTE = Palette()
+# Color pairs of the colors of `PALETTE`
+PAIRS = PairCache(PALETTE)
+
 def get_color_pair_idx_at(w, coord):
     """Get color pair index at coordinate
 
@@ -268,7 +413,7 @@ def get_color_pair_idx_at(w, coord):
     """
     return curses.pair_number(w.inch(coord[0], coord[1]) & curses.A_COLOR)
 
-def color_cell_at(w, coord, color_pair_idx, until_end=False):
+def color_cell_at(w, coord, color_pair_idx, until_end=False, length=1):
     """Color a cell at the specified coordinate
 
     This function returns the color pair index at `coord`. This index
@@ -282,11 +427,235 @@ def color_cell_at(w, coord, color_pair_idx, until_end=False):
     :type color_pair_idx: int
     :param until_end: `True` if all columns from `coord[1]` and right of it should be colored with the new color-pair
     :type until_end: bool
+    :param length: number of columns from `coord[1]` to color with a single call if `until_end` is `False`
+    :type length: int
     """
+    attr = PAIR_ATTRS[color_pair_idx]
+    if attr is None or color_pair_idx in PAIRS.recent:
+        attr = PAIRS.attr(color_pair_idx)
     if until_end:
-        w.chgat(coord[0], coord[1], curses.color_pair(color_pair_idx))
+        w.chgat(coord[0], coord[1], attr)
     else:
-        w.chgat(coord[0], coord[1], 1, curses.color_pair(color_pair_idx))
+        w.chgat(coord[0], coord[1], length, attr)
+
+def update_screen(w):
+    """Send every pending change of the window to the terminal at once
+
+    Drawing functions only stage their changes with `noutrefresh()`;
+    this should be called once per frame.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    """
+    w.noutrefresh()
+    curses.doupdate()
+
+def draw_row_part(w, view, y_value, x_start, x_end):
+    """Draw part of a row of the view from its canvas
+
+    Each run of cells with the same color pair is drawn with a single
+    `chgat` call, so the time taken depends on the number of runs rather
+    than the number of cells.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param y_value: screen row to draw
+    :type y_value: int
+    :param x_start: first screen column to draw
+    :type x_start: int
+    :param x_end: screen column to stop drawing at (exclusive)
+    :type x_end: int
+    """
+    canvas_y, canvas_x = view.to_canvas((y_value, x_start))
+    cells = view.shown_span(canvas_y, canvas_x, canvas_x + x_end - x_start)
+    for run_start, run_end, color_pair_idx in iter_runs(cells):
+        color_cell_at(w, (y_value, x_start + run_start), color_pair_idx, length=run_end - run_start)
+
+def draw_canvas(w, view):
+    """Draw the part of a canvas shown in a view
+
+    The window is only a render target - every cell on the screen is
+    redrawn from the color pair indices stored in the canvas. Only the
+    rows and columns that fit on the screen are read, so this takes the
+    same time for any size of canvas. Screen cells outside of the canvas
+    are set to color pair 0.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    """
+    visible_dim = view.visible_dim()
+    for y_value in range(view.dim[0]):
+        if y_value >= visible_dim[0]:
+            color_cell_at(w, (y_value, 0), 0, True)
+            continue
+
+        if visible_dim[1] < view.dim[1]:
+            color_cell_at(w, (y_value, visible_dim[1]), 0, True)
+        draw_row_part(w, view, y_value, 0, visible_dim[1])
+
+def redraw_colors(w, view, color_pair_idxs):
+    """Draw the cells of a view that have one of some colors again
+
+    Only the runs of those colors are drawn, so after a color pair was
+    given to another color, the cells that showed it are fixed without
+    drawing the rest of the screen.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param color_pair_idxs: color pair indices to draw
+    :type color_pair_idxs: set
+    """
+    visible_dim = view.visible_dim()
+    for y_value in range(visible_dim[0]):
+        canvas_y, canvas_x = view.to_canvas((y_value, 0))
+        cells = bytes(view.shown_span(canvas_y, canvas_x, canvas_x + visible_dim[1]))
+        if not any(color_pair_idx in cells for color_pair_idx in color_pair_idxs):
+            continue
+        for run_start, run_end, color_pair_idx in iter_runs(cells):
+            if color_pair_idx in color_pair_idxs:
+                color_cell_at(w, (y_value, run_start), color_pair_idx, length=run_end - run_start)
+
+def draw_span(w, view, span, color_pair_idx):
+    """Draw a horizontal span of a canvas with a single `chgat` call
+
+    The span is given in canvas coordinates and clipped to the view.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param span: 3-ary tuple `(row, column_start, column_end)`, where `column_end` is exclusive
+    :type span: tuple
+    :param color_pair_idx: index of the color-pair of the span
+    :type color_pair_idx: int
+    """
+    visible_dim = view.visible_dim()
+    y_value, x_start = view.to_screen((span[0], span[1]))
+    x_end = min(span[2] - view.origin[1], visible_dim[1])
+    x_start = max(x_start, 0)
+    if 0 <= y_value < visible_dim[0] and x_start < x_end:
+        color_cell_at(w, (y_value, x_start), color_pair_idx, length=x_end - x_start)
+
+def hatch_span(w, view, span):
+    """Cover a horizontal span of a canvas with a gray checkerboard
+
+    Cells are drawn as colored spaces, so a pattern of characters stands
+    out from every color a drawing can have. The characters stay until
+    they are written over, such as by `unhatch_rows()`; drawing the
+    canvas again only changes the colors.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param span: 3-ary tuple `(row, column_start, column_end)`, where `column_end` is exclusive
+    :type span: tuple
+    """
+    visible_dim = view.visible_dim()
+    y_value, x_start = view.to_screen((span[0], span[1]))
+    x_end = min(span[2] - view.origin[1], visible_dim[1])
+    x_start = max(x_start, 0)
+    if 0 <= y_value < visible_dim[0] and x_start < x_end:
+        w.hline(y_value, x_start, curses.ACS_CKBOARD | curses.color_pair(0), x_end - x_start)
+
+def unhatch_rows(w, view):
+    """Write spaces over every cell of the view again, taking away what `hatch_span()` drew
+
+    The colors are left to be drawn again, such as by `draw_canvas()`.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    """
+    visible_dim = view.visible_dim()
+    for y_value in range(visible_dim[0]):
+        w.hline(y_value, 0, ord(' '), visible_dim[1])
+
+def redraw_span(w, view, span):
+    """Draw a horizontal span of a canvas from the cells stored in it
+
+    Like `draw_span()`, the span is given in canvas coordinates and
+    clipped to the view, but every run of colors in it is drawn.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param span: 3-ary tuple `(row, column_start, column_end)`, where `column_end` is exclusive
+    :type span: tuple
+    """
+    visible_dim = view.visible_dim()
+    y_value, x_start = view.to_screen((span[0], span[1]))
+    x_end = min(span[2] - view.origin[1], visible_dim[1])
+    x_start = max(x_start, 0)
+    if 0 <= y_value < visible_dim[0] and x_start < x_end:
+        draw_row_part(w, view, y_value, x_start, x_end)
+
+def scroll_view(w, view, origin):
+    """Move a view to a new origin
+
+    The cells still on the screen are shifted with `scroll()` (rows) and
+    `insch()`/`delch()` (columns), so only the rows and columns that come
+    into view are drawn from the canvas. If the view moves by a whole
+    screen or more, everything is redrawn instead.
+
+    :param w: the `Window` object
+    :type w: `class Window`
+    :param view: the part of the drawing shown on the screen
+    :type view: `class Viewport`
+    :param origin: wanted origin as a 2-ary tuple `(row, column)`; it is clamped to the canvas
+    :type origin: tuple
+    :return: `bool` - `True` if the view moved
+    """
+    origin = view.clamp_origin(origin)
+    d_rows, d_cols = origin[0] - view.origin[0], origin[1] - view.origin[1]
+    if d_rows == 0 and d_cols == 0:
+        return False
+
+    cur_coord = get_cursor_pos()
+    visible_dim = view.visible_dim()
+
+    if abs(d_rows) >= visible_dim[0] or abs(d_cols) >= visible_dim[1]:
+        view.origin = origin
+        draw_canvas(w, view)
+        w.move(cur_coord[0], cur_coord[1])
+        return True
+
+    # Columns first, so the rows exposed afterwards are drawn only once
+    if d_cols != 0:
+        view.origin = (view.origin[0], origin[1])
+        for y_value in range(visible_dim[0]):
+            for _ in range(abs(d_cols)):
+                if d_cols > 0:
+                    w.delch(y_value, 0)
+                else:
+                    w.insch(y_value, 0, ' ')
+
+        x_start, x_end = (visible_dim[1] - d_cols, visible_dim[1]) if d_cols > 0 else (0, -d_cols)
+        for y_value in range(visible_dim[0]):
+            draw_row_part(w, view, y_value, x_start, x_end)
+
+    if d_rows != 0:
+        view.origin = origin
+        w.setscrreg(0, visible_dim[0] - 1)
+        w.scrollok(True)
+        w.scroll(d_rows)
+        w.scrollok(False)
+        w.setscrreg(0, get_term_dim()[0] - 1)
+
+        exposed = range(visible_dim[0] - d_rows, visible_dim[0]) if d_rows > 0 else range(-d_rows)
+        for y_value in exposed:
+            draw_row_part(w, view, y_value, 0, visible_dim[1])
+
+    w.move(cur_coord[0], cur_coord[1])
+    return True
 
 def init_ui(w):
     """Initialize the UI
@@ -294,5 +663,7 @@ def init_ui(w):
     This should be called once `curses` has been initialized.
     """
     init_color_pairs()
+    # Deliver ^Q, ^S and ^Z as keys instead of flow control and job control
+    curses.raw()
     curses.curs_set(2)
     w.move(0, 0)
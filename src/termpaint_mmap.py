@@ -0,0 +1,82 @@
+import mmap
+import struct
+from termpaint_canvas import Canvas, BLANK_COLOR_PAIR_IDX
+
+BINARY_MAGIC = b'EEE111_PAINTBIN1'
+BINARY_SUFFIX = '.bpaint'
+
+# Magic string, rows and columns, padded so the cells start at a fixed offset
+_HEADER = struct.Struct('<16sII8x')
+HEADER_SIZE = _HEADER.size
+
+# Number of cells written at a time when creating a file
+_WRITE_CHUNK_SIZE = 1 << 20
+
+def create_binary_paint(fpath, dim, color_pair_idx=BLANK_COLOR_PAIR_IDX):
+    """Create a binary drawing file filled with a single color
+
+    The file has a fixed layout: a 32-byte header with the magic string
+    and the dimensions, followed by one byte per cell in row-major order.
+    The cells are written in chunks, so the canvas is never held in memory.
+
+    :param fpath: path to the binary paint file
+    :type fpath: string
+    :param dim: canvas dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param color_pair_idx: index of the color-pair every cell starts with
+    :type color_pair_idx: int
+    """
+    with open(fpath, 'wb') as binary_file:
+        binary_file.write(_HEADER.pack(BINARY_MAGIC, dim[0], dim[1]))
+        remaining = dim[0] * dim[1]
+        chunk = bytes([color_pair_idx]) * min(remaining, _WRITE_CHUNK_SIZE)
+        while remaining > 0:
+            binary_file.write(chunk[:remaining])
+            remaining -= len(chunk)
+
+def write_binary_paint(fpath, canvas):
+    """Write a canvas to a binary drawing file
+
+    If the file exists, it will be overwritten.
+
+    :param fpath: path to the binary paint file
+    :type fpath: string
+    :param canvas: the drawing to write
+    :type canvas: `class Canvas`
+    """
+    with open(fpath, 'wb') as binary_file:
+        binary_file.write(_HEADER.pack(BINARY_MAGIC, canvas.dim[0], canvas.dim[1]))
+        for row in canvas.rows():
+            binary_file.write(row)
+
+def open_binary_paint(fpath, writable=True):
+    """Open a binary drawing file as a memory-mapped canvas
+
+    Only the header is read, so opening takes the same time for any size
+    of drawing. Cells are paged in by the operating system when they are
+    first touched. Edits go straight to the mapping and reach the file
+    when the operating system writes them back, or at the latest when
+    `Canvas.flush()` or `Canvas.close()` is called.
+
+    :param fpath: path to the binary paint file
+    :type fpath: string
+    :param writable: `False` to map the file read-only
+    :type writable: bool
+    :return: the memory-mapped `Canvas`
+    """
+    with open(fpath, 'r+b' if writable else 'rb') as binary_file:
+        header = binary_file.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise ValueError('Not a binary .paint file: header is too short')
+
+        magic_string, rows, cols = _HEADER.unpack(header)
+        if magic_string != BINARY_MAGIC:
+            raise ValueError(f'Not a binary .paint file: bad magic string {magic_string!r}')
+
+        mapping = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+    if len(mapping) != HEADER_SIZE + rows * cols:
+        mapping.close()
+        raise ValueError('Binary .paint file is truncated')
+
+    return Canvas((rows, cols), cells=memoryview(mapping)[HEADER_SIZE:], mapping=mapping, mapped_path=fpath)
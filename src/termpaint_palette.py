@@ -0,0 +1,184 @@
+import re
+
+# Cell values from here up are indices into the palette of the drawing;
+# 3 to 10 are the eight drawing colors and 0 to 2 are never drawing colors
+FIRST_PALETTE_IDX = 11
+PALETTE_SIZE = 256 - FIRST_PALETTE_IDX
+
+# RGB color of every color pair index, following the background colors
+# set by `init_color_pairs()`. Indices without a drawing color are black.
+PAIR_RGB = [(0, 0, 0)] * 256
+PAIR_RGB[3:11] = [
+    (255, 0, 0),        # r
+    (0, 255, 0),        # g
+    (0, 0, 255),        # b
+    (0, 255, 255),      # c
+    (255, 0, 255),      # m
+    (255, 255, 0),      # y
+    (255, 255, 255),    # w
+    (0, 0, 0),          # x
+]
+
+# The 16 system colors of a 256-color terminal, as xterm shows them
+_SYSTEM_RGB = (
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+    (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+    (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+)
+# Channel levels of the 6x6x6 color cube of a 256-color terminal
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+_HEX_COLOR = re.compile(r'#?([0-9a-fA-F]{6})')
+
+def _distance(rgb, other):
+    return (rgb[0] - other[0]) ** 2 + (rgb[1] - other[1]) ** 2 + (rgb[2] - other[2]) ** 2
+
+def xterm_rgb(number):
+    """Get the RGB color of a color number of a 256-color terminal
+
+    :param number: color number from 0 to 255
+    :type number: int
+    :return: 3-ary tuple `(red, green, blue)`
+    """
+    if not 0 <= number < 256:
+        raise ValueError(f'Color number must be from 0 to 255, not {number}')
+    if number < 16:
+        return _SYSTEM_RGB[number]
+    if number < 232:
+        number -= 16
+        return (_CUBE_LEVELS[number // 36], _CUBE_LEVELS[number // 6 % 6], _CUBE_LEVELS[number % 6])
+    gray = 8 + (number - 232) * 10
+    return (gray, gray, gray)
+
+def xterm_number(rgb):
+    """Get the color number of a 256-color terminal closest to an RGB color
+
+    Only the color cube and the gray ramp (16 to 255) are used, as the
+    system colors are often changed by terminal themes.
+
+    :param rgb: 3-ary tuple `(red, green, blue)`
+    :type rgb: tuple
+    :return: `int` color number
+    """
+    levels = [0 if value < 48 else 1 if value < 115 else (value - 35) // 40 for value in rgb]
+    cube_number = 16 + 36 * levels[0] + 6 * levels[1] + levels[2]
+    gray_step = min(max((sum(rgb) // 3 - 3) // 10, 0), 23)
+    gray_number = 232 + gray_step
+    if _distance(rgb, xterm_rgb(gray_number)) < _distance(rgb, xterm_rgb(cube_number)):
+        return gray_number
+    return cube_number
+
+def nearest_drawing_color(rgb):
+    """Get the drawing color (3 to 10) closest to an RGB color
+
+    :param rgb: 3-ary tuple `(red, green, blue)`
+    :type rgb: tuple
+    :return: `int` color pair index
+    """
+    return min(range(3, 11), key=lambda idx: _distance(rgb, PAIR_RGB[idx]))
+
+def parse_color(text):
+    """Read a color typed as `#rrggbb` or as a color number from 0 to 255
+
+    :param text: the color as typed
+    :type text: string
+    :return: 3-ary tuple `(red, green, blue)`
+    """
+    text = text.strip()
+    if text.isdigit():
+        return xterm_rgb(int(text))
+    match = _HEX_COLOR.fullmatch(text)
+    if match is None:
+        raise ValueError(f'Not a color: {text!r}')
+    value = int(match.group(1), 16)
+    return (value >> 16, (value >> 8) & 0xff, value & 0xff)
+
+def format_color(rgb):
+    """Write an RGB color as `#rrggbb`"""
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
+
+class Palette:
+    """Extra colors of a drawing, on top of the eight drawing colors
+
+    Cells with a color pair index of `FIRST_PALETTE_IDX` or more take
+    their color from the palette, so a drawing can use up to
+    `PALETTE_SIZE` colors besides the eight. Colors are kept as RGB, so
+    a file keeps the exact colors even where the terminal can only show
+    the closest of its 256 colors.
+
+    :param colors: `dict` of palette index to 3-ary tuple `(red, green, blue)`, or `None`
+    :type colors: dict
+    """
+    __slots__ = ('colors', '_indices')
+
+    def __init__(self, colors=None):
+        self.colors = {}
+        self._indices = {}
+        for color_pair_idx, rgb in (colors or {}).items():
+            self.set(color_pair_idx, rgb)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def set(self, color_pair_idx, rgb):
+        """Set the color of a palette index"""
+        if not FIRST_PALETTE_IDX <= color_pair_idx < 256:
+            raise ValueError(f'Palette index must be from {FIRST_PALETTE_IDX} to 255, not {color_pair_idx}')
+        self.colors[color_pair_idx] = tuple(rgb)
+        self._indices.setdefault(tuple(rgb), color_pair_idx)
+
+    def add(self, rgb):
+        """Get the palette index of a color, adding it if it is not in the palette yet
+
+        :param rgb: 3-ary tuple `(red, green, blue)`
+        :type rgb: tuple
+        :return: `int` palette index
+        """
+        rgb = tuple(rgb)
+        if rgb in self._indices:
+            return self._indices[rgb]
+        for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+            if color_pair_idx not in self.colors:
+                self.set(color_pair_idx, rgb)
+                return color_pair_idx
+        raise ValueError('The palette is full')
+
+    def find(self, rgb):
+        """Get the palette index of a color, or `None` if it is not in the palette"""
+        return self._indices.get(tuple(rgb))
+
+    def rgb(self, color_pair_idx):
+        """Get the RGB color of any color pair index; palette indices without a color are black"""
+        if color_pair_idx < FIRST_PALETTE_IDX:
+            return PAIR_RGB[color_pair_idx]
+        return self.colors.get(color_pair_idx, (0, 0, 0))
+
+    def rgb_table(self):
+        """Get the RGB color of every color pair index, as a `list` of 256 3-ary tuples"""
+        return [self.rgb(color_pair_idx) for color_pair_idx in range(256)]
+
+    def drawing_color_table(self):
+        """Get a `bytes.translate()` table from every color pair index to the closest drawing color
+
+        The eight drawing colors are left as they are.
+        """
+        table = bytearray(range(256))
+        for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+            table[color_pair_idx] = nearest_drawing_color(self.rgb(color_pair_idx))
+        return bytes(table)
+
+    def clear(self):
+        """Remove every color"""
+        self.colors.clear()
+        self._indices.clear()
+
+    def replace(self, palette):
+        """Take the colors of another palette instead of these"""
+        self.clear()
+        for color_pair_idx, rgb in palette.colors.items():
+            self.set(color_pair_idx, rgb)
+
+    def copy(self):
+        """Get an independent copy of the palette"""
+        return Palette(self.colors)
@@ -0,0 +1,150 @@
+import json
+import time
+from collections import deque
+
+# Latencies kept per command for the percentiles
+_RECENT = 1000
+
+class CountingWindow:
+    """Wrapper around a `Window` that counts the calls made to it
+
+    Every method call is passed on to the wrapped window. `calls` counts
+    them, and `cells` counts the screen cells repainted by `chgat()` and
+    `addstr()`.
+
+    :param window: the `Window` object to wrap
+    :type window: `class Window`
+    """
+    __slots__ = ('window', 'calls', 'cells')
+
+    def __init__(self, window):
+        self.window = window
+        self.calls = 0
+        self.cells = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.window, name)
+        if not callable(method):
+            return method
+
+        def counted(*args):
+            self.calls += 1
+            if name == 'chgat':
+                self.cells += args[2] if len(args) == 4 else self.window.getmaxyx()[1] - args[1]
+            elif name == 'addstr':
+                self.cells += len(args[2] if isinstance(args[0], int) else args[0])
+            return method(*args)
+        return counted
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class CommandStats:
+    """Latencies and costs of one command
+
+    The latency histogram has power-of-two buckets in microseconds: bucket
+    `i` counts the calls that took from `2 ** i` up to `2 ** (i + 1)`
+    microseconds (bucket 0 also takes anything faster).
+    """
+    __slots__ = ('count', 'seconds', 'cells', 'curses_calls', 'histogram', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.cells = 0
+        self.curses_calls = 0
+        self.histogram = {}
+        self.recent = deque(maxlen=_RECENT)
+
+    def add(self, seconds, cells=0, curses_calls=0):
+        self.count += 1
+        self.seconds += seconds
+        self.cells += cells
+        self.curses_calls += curses_calls
+        bucket = max(int(seconds * 1e6).bit_length() - 1, 0)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        self.recent.append(seconds)
+
+    def percentiles(self):
+        """Get the median and 99th percentile of the recent latencies
+
+        :return: 2-ary tuple of seconds `(p50, p99)`
+        """
+        recent = sorted(self.recent)
+        return _percentile(recent, 0.5), _percentile(recent, 0.99)
+
+    def to_dict(self):
+        p50, p99 = self.percentiles()
+        return {
+            'count': self.count,
+            'seconds': self.seconds,
+            'p50_ms': p50 * 1e3,
+            'p99_ms': p99 * 1e3,
+            'cells': self.cells,
+            'curses_calls': self.curses_calls,
+            'histogram_us': {f'{1 << bucket}': count for bucket, count in sorted(self.histogram.items())},
+        }
+
+class PerfRecorder:
+    """Collects per-command latencies, frame times and curses calls
+
+    Commands are timed with `begin()` and `end()` around the call. If the
+    window is a `CountingWindow`, the cells repainted and the curses
+    calls made during the command are recorded as well.
+
+    :param w: the window the commands draw on
+    :type w: `class CountingWindow` or `class Window`
+    """
+    __slots__ = ('w', 'commands', 'frames', 'last_command', 'overlay')
+
+    def __init__(self, w):
+        self.w = w
+        self.commands = {}
+        self.frames = CommandStats()
+        self.last_command = None
+        self.overlay = False
+
+    def begin(self):
+        """Start timing a command
+
+        :return: a token to pass to `end()`
+        """
+        return (time.perf_counter(), getattr(self.w, 'cells', 0), getattr(self.w, 'calls', 0))
+
+    def end(self, token, name):
+        """Record a command started with `begin()`"""
+        seconds = time.perf_counter() - token[0]
+        if name not in self.commands:
+            self.commands[name] = CommandStats()
+        self.commands[name].add(seconds, getattr(self.w, 'cells', 0) - token[1], getattr(self.w, 'calls', 0) - token[2])
+        self.last_command = name
+
+    def frame(self, seconds):
+        """Record the time taken to handle a batch of keys and update the screen"""
+        self.frames.add(seconds)
+
+    def overlay_text(self):
+        """Get the text of the performance overlay
+
+        :return: `string` with the last frame time and the p50/p99 of the last command, empty if the overlay is off
+        """
+        if not self.overlay or not self.frames.recent:
+            return ''
+        text = f'frame {self.frames.recent[-1] * 1e3:.2f}ms'
+        if self.last_command is not None:
+            p50, p99 = self.commands[self.last_command].percentiles()
+            text += f' | {self.last_command} p50 {p50 * 1e3:.2f}ms p99 {p99 * 1e3:.2f}ms'
+        return text
+
+    def to_dict(self):
+        return {
+            'frames': self.frames.to_dict(),
+            'commands': {name: stats.to_dict() for name, stats in sorted(self.commands.items())},
+        }
+
+    def dump(self, fpath):
+        """Write the recorded numbers to a JSON file"""
+        with open(fpath, 'w') as perf_file:
+            json.dump(self.to_dict(), perf_file, indent=2)
@@ -0,0 +1,137 @@
+import argparse
+import curses
+import curses.ascii
+import json
+import sys
+import time
+import termpaint_lib
+import terminalpaint_tpl as tpl
+from termpaint_fakecurses import FakeCurses, FakeWindow
+from termpaint_io import read_paint, write_paint
+from termpaint_layers import LayeredCanvas
+from termpaint_session import read_session
+
+# Keys that answer "Yes" to the exit prompt, for sessions cut short
+QUIT_KEYS = (curses.ascii.ctrl(ord('q')), curses.KEY_RIGHT, ord('\n'))
+
+class ReplayWindow(FakeWindow):
+    """`FakeWindow` that returns the input of a recorded session
+
+    `getch()` and `getstr()` return the recorded keys and text in the
+    order they were recorded, so every batch of keys is read exactly as
+    it was. If the session ends before the editor quits, `QUIT_KEYS` are
+    returned, so the editor quits as a user would.
+
+    :param dim: window dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param events: events as returned by `read_session()`
+    :type events: list
+    :param fake_curses: the `FakeCurses` the window belongs to, or `None`
+    :type fake_curses: `class FakeCurses`
+    """
+
+    def __init__(self, dim, events, fake_curses=None):
+        super().__init__(dim, fake_curses)
+        self.events = events
+        self.event_idx = 0
+        self.feed(QUIT_KEYS)
+
+    def _next_event(self, kind):
+        if self.event_idx >= len(self.events):
+            return None
+        seconds, event_kind, value = self.events[self.event_idx]
+        if event_kind != kind:
+            raise ValueError(f'Session event {self.event_idx} is {event_kind!r}, but the editor asked for {kind!r}')
+        self.event_idx += 1
+        return value
+
+    def getch(self):
+        key = self._next_event('k')
+        if key is None:
+            return super().getch()
+        self.calls += 1
+        return key
+
+    def getstr(self):
+        text = self._next_event('s')
+        if text is None:
+            return super().getstr()
+        return text.encode('latin-1')
+
+def _flattened(canvas):
+    return canvas.flatten() if isinstance(canvas, LayeredCanvas) else canvas
+
+def replay_session(fpath, expected_path=None, perf_path=None, save_path=None):
+    """Replay a recorded session without a terminal, as fast as possible
+
+    The whole main loop runs against a `ReplayWindow` of the recorded
+    terminal size, so the drawing ends up exactly as it was when the
+    session was recorded. Autosave is off. Files are opened and saved at
+    the paths typed during the session.
+
+    :param fpath: path of the session file
+    :type fpath: string
+    :param expected_path: .paint file the final drawing should match, or `None`
+    :type expected_path: string
+    :param perf_path: path of a JSON file to write the timings of every command to (see `ui_main()`), or `None`
+    :type perf_path: string
+    :param save_path: .paint file to write the final drawing to, such as the expected drawing of a new session, or `None`
+    :type save_path: string
+    :return: `dict` with the number of keys, the recorded and replayed seconds, and whether the drawing matched
+    """
+    header, events = read_session(fpath)
+    fake_curses = FakeCurses(tuple(header['term_dim']))
+    w = ReplayWindow(fake_curses.stdscr.dim, events, fake_curses)
+    fake_curses.stdscr = w
+
+    previous_backend = termpaint_lib.use_backend(fake_curses)
+    try:
+        start = time.perf_counter()
+        canvas = tpl.ui_main(w, autosave_path=None, perf_path=perf_path, keep_canvas=True)
+        seconds = time.perf_counter() - start
+    finally:
+        termpaint_lib.use_backend(previous_backend)
+
+    keys = sum(1 for event in events if event[1] == 'k' and event[2] != -1)
+    result = {
+        'session': fpath,
+        'events': len(events),
+        'keys': keys,
+        'complete': w.event_idx == len(events),
+        'recorded_seconds': events[-1][0] if events else 0.0,
+        'replay_seconds': seconds,
+        'keys_per_second': keys / seconds if seconds else 0.0,
+        'dim': list(canvas.dim),
+    }
+    if save_path is not None:
+        write_paint(save_path, _flattened(canvas), palette=termpaint_lib.PALETTE)
+    if expected_path is not None:
+        drawing = _flattened(canvas)
+        expected = read_paint(expected_path)
+        if expected.dim != drawing.dim:
+            result['matches'] = False
+            result['cells_differing'] = None
+        else:
+            cells, expected_cells = drawing.snapshot(), expected.snapshot()
+            differing = 0 if cells == expected_cells else sum(cell != expected_cell for cell, expected_cell in zip(cells, expected_cells))
+            result['matches'] = differing == 0
+            result['cells_differing'] = differing
+    canvas.close()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded TerminalPaint sessions without a terminal.')
+    parser.add_argument('session', help='session file recorded with terminalpaint --record')
+    parser.add_argument('--expect', metavar='PATH', help='.paint file the final drawing must match')
+    parser.add_argument('--perf-log', metavar='PATH', help='write the timings of every command to this JSON file')
+    parser.add_argument('--save', metavar='PATH', help='write the final drawing to this .paint file')
+    args = parser.parse_args(argv)
+
+    result = replay_session(args.session, args.expect, args.perf_log, args.save)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if not result.get('matches', True):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
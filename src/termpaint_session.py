@@ -0,0 +1,69 @@
+import json
+import time
+
+SESSION_FORMAT = 'terminalpaint-session'
+SESSION_VERSION = 1
+
+class RecordingWindow:
+    """Wrapper around a `Window` that records the input it receives
+
+    Every method call is passed on to the wrapped window. The result of
+    every `getch()` call, including the -1 that ends a batch of keys in
+    no-delay mode, and the text returned by every `getstr()` call are
+    written to a session file, one JSON array per line with the seconds
+    since recording started:
+
+        [0.512, "k", 114]
+        [3.007, "s", "drawing.paint"]
+
+    The first line describes the session, with the terminal dimensions
+    it was recorded on.
+
+    :param window: the `Window` object to wrap
+    :type window: `class Window`
+    :param fpath: path of the session file
+    :type fpath: string
+    """
+    __slots__ = ('window', 'session_file', 'start')
+
+    def __init__(self, window, fpath):
+        self.window = window
+        self.session_file = open(fpath, 'w')
+        self.start = time.perf_counter()
+        header = {'format': SESSION_FORMAT, 'version': SESSION_VERSION, 'term_dim': list(window.getmaxyx())}
+        self.session_file.write(json.dumps(header) + '\n')
+
+    def __getattr__(self, name):
+        return getattr(self.window, name)
+
+    def _record(self, kind, value):
+        event = [round(time.perf_counter() - self.start, 6), kind, value]
+        self.session_file.write(json.dumps(event) + '\n')
+
+    def getch(self):
+        key = self.window.getch()
+        self._record('k', key)
+        return key
+
+    def getstr(self):
+        text = self.window.getstr()
+        self._record('s', text.decode('latin-1'))
+        return text
+
+    def close(self):
+        """Finish the session file"""
+        self.session_file.close()
+
+def read_session(fpath):
+    """Read a session file written by `RecordingWindow`
+
+    :param fpath: path of the session file
+    :type fpath: string
+    :return: 2-ary tuple (`dict` header, `list` events), where every event is a 3-ary tuple `(seconds, kind, value)`
+    """
+    with open(fpath, 'r') as session_file:
+        header = json.loads(session_file.readline())
+        if header.get('format') != SESSION_FORMAT or header.get('version') != SESSION_VERSION:
+            raise ValueError(f'{fpath} is not a TerminalPaint session file')
+        events = [tuple(json.loads(line)) for line in session_file if line.strip()]
+    return header, events
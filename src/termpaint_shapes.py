@@ -0,0 +1,265 @@
+from termpaint_lib import get_cursor_pos, draw_span, redraw_span
+
+def _points_to_spans(points):
+    """Merge cells into horizontal spans
+
+    :param points: iterable of coordinates as 2-ary tuples `(row, column)`
+    :type points: iterable
+    :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, sorted by row and column
+    """
+    spans = []
+    for y_value, x_value in sorted(set(points)):
+        if spans and spans[-1][0] == y_value and spans[-1][2] == x_value:
+            spans[-1] = (y_value, spans[-1][1], x_value + 1)
+        else:
+            spans.append((y_value, x_value, x_value + 1))
+    return spans
+
+def _fill_rows(spans):
+    """Join the spans of every row into one from its leftmost to its rightmost cell"""
+    rows = {}
+    for y_value, x_start, x_end in spans:
+        if y_value in rows:
+            rows[y_value] = (min(rows[y_value][0], x_start), max(rows[y_value][1], x_end))
+        else:
+            rows[y_value] = (x_start, x_end)
+    return [(y_value, x_start, x_end) for y_value, (x_start, x_end) in sorted(rows.items())]
+
+def line_spans(start_coord, end_coord):
+    """Rasterize a line with Bresenham's algorithm
+
+    Cells next to each other in a row are merged, so a flat line is a
+    single span however long it is.
+
+    :param start_coord: first end point as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param end_coord: other end point as a 2-ary tuple `(row, column)`
+    :type end_coord: tuple
+    :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive
+    """
+    y_value, x_value = start_coord
+    y_end, x_end = end_coord
+    if y_value == y_end:
+        return [(y_value, min(x_value, x_end), max(x_value, x_end) + 1)]
+
+    d_x, d_y = abs(x_end - x_value), -abs(y_end - y_value)
+    step_x = 1 if x_value < x_end else -1
+    step_y = 1 if y_value < y_end else -1
+    err = d_x + d_y
+    points = []
+    while True:
+        points.append((y_value, x_value))
+        if y_value == y_end and x_value == x_end:
+            break
+        err2 = 2 * err
+        if err2 >= d_y:
+            err += d_y
+            x_value += step_x
+        if err2 <= d_x:
+            err += d_x
+            y_value += step_y
+    return _points_to_spans(points)
+
+def rect_spans(start_coord, end_coord, filled=False):
+    """Rasterize a rectangle with two opposite corners
+
+    :param start_coord: a corner as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param end_coord: the opposite corner as a 2-ary tuple `(row, column)`
+    :type end_coord: tuple
+    :param filled: `True` for a filled rectangle, `False` for its outline
+    :type filled: bool
+    :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive
+    """
+    top, bottom = sorted((start_coord[0], end_coord[0]))
+    left, right = sorted((start_coord[1], end_coord[1]))
+    spans = []
+    for y_value in range(top, bottom + 1):
+        if filled or y_value in (top, bottom) or right - left < 2:
+            spans.append((y_value, left, right + 1))
+        else:
+            spans.append((y_value, left, left + 1))
+            spans.append((y_value, right, right + 1))
+    return spans
+
+def _ellipse_points(top_left, bottom_right):
+    """Get the outline cells of the ellipse inside a rectangle
+
+    This is the midpoint algorithm for an ellipse given by its bounding
+    rectangle, so rectangles of even width or height work as well.
+    """
+    y_start, x_start = top_left
+    y_end, x_end = bottom_right
+    width, height = x_end - x_start, y_end - y_start
+    odd = height & 1
+    d_x = 4 * (1 - width) * height * height
+    d_y = 4 * (odd + 1) * width * width
+    err = d_x + d_y + odd * width * width
+    y_start += (height + 1) // 2
+    y_end = y_start - odd
+    step_x = 8 * width * width
+    step_y = 8 * height * height
+
+    while x_start <= x_end:
+        yield (y_start, x_end)
+        yield (y_start, x_start)
+        yield (y_end, x_start)
+        yield (y_end, x_end)
+        err2 = 2 * err
+        if err2 <= d_y:
+            y_start += 1
+            y_end -= 1
+            d_y += step_x
+            err += d_y
+        if err2 >= d_x or 2 * err > d_y:
+            x_start += 1
+            x_end -= 1
+            d_x += step_y
+            err += d_x
+
+    # The loop stops before the tips of very narrow ellipses
+    while y_start - y_end <= height:
+        yield (y_start, x_start - 1)
+        yield (y_start, x_end + 1)
+        yield (y_end, x_start - 1)
+        yield (y_end, x_end + 1)
+        y_start += 1
+        y_end -= 1
+
+def ellipse_spans(start_coord, end_coord, filled=False):
+    """Rasterize the ellipse inside a rectangle with two opposite corners
+
+    :param start_coord: a corner as a 2-ary tuple `(row, column)`
+    :type start_coord: tuple
+    :param end_coord: the opposite corner as a 2-ary tuple `(row, column)`
+    :type end_coord: tuple
+    :param filled: `True` for a filled ellipse, `False` for its outline
+    :type filled: bool
+    :return: `list` of spans as 3-ary tuples `(row, column_start, column_end)`, where `column_end` is exclusive
+    """
+    top, bottom = sorted((start_coord[0], end_coord[0]))
+    left, right = sorted((start_coord[1], end_coord[1]))
+    spans = _points_to_spans(_ellipse_points((top, left), (bottom, right)))
+    return _fill_rows(spans) if filled else spans
+
+def spans_difference(spans, other_spans):
+    """Get the parts of spans that are not covered by other spans
+
+    :param spans: `list` of spans as 3-ary tuples `(row, column_start, column_end)`
+    :type spans: list
+    :param other_spans: `list` of spans to take away, in the same form
+    :type other_spans: list
+    :return: `list` of the uncovered spans
+    """
+    covered = {}
+    for y_value, x_start, x_end in other_spans:
+        covered.setdefault(y_value, []).append((x_start, x_end))
+
+    difference = []
+    for y_value, x_start, x_end in spans:
+        pieces = [(x_start, x_end)]
+        for cut_start, cut_end in covered.get(y_value, ()):
+            pieces = [
+                piece
+                for piece_start, piece_end in pieces
+                for piece in ((piece_start, min(piece_end, cut_start)), (max(piece_start, cut_end), piece_end))
+                if piece[0] < piece[1]
+            ]
+        difference.extend((y_value, piece_start, piece_end) for piece_start, piece_end in pieces)
+    return difference
+
+class RubberBand:
+    """Preview of a shape while its end point is being moved
+
+    The preview is drawn on the window only; the canvas is not modified
+    until the shape is finished. When the end point moves, only the
+    cells that leave the shape are drawn again from the canvas and only
+    the cells that join it are drawn in the color of the shape.
+    """
+    __slots__ = ('rasterize', 'start_coord', 'color_pair_idx', 'spans', 'origin')
+
+    def __init__(self):
+        self.rasterize = None
+        self.start_coord = None
+        self.color_pair_idx = None
+        self.spans = []
+        self.origin = None
+
+    def active(self):
+        """Tell whether a shape is being drawn"""
+        return self.start_coord is not None
+
+    def start(self, w, view, rasterize, start_coord, color_pair_idx):
+        """Start a shape at a canvas coordinate
+
+        :param w: the `Window` object
+        :type w: `class Window`
+        :param view: the part of the drawing shown on the screen
+        :type view: `class Viewport`
+        :param rasterize: function that turns two canvas coordinates into spans, such as `line_spans()`
+        :type rasterize: function
+        :param start_coord: canvas coordinate of the first point as a 2-ary tuple `(row, column)`
+        :type start_coord: tuple
+        :param color_pair_idx: index of the color-pair of the shape
+        :type color_pair_idx: int
+        """
+        self.rasterize = rasterize
+        self.start_coord = start_coord
+        self.color_pair_idx = color_pair_idx
+        self.spans = []
+        self.origin = view.origin
+        self.update(w, view, start_coord)
+
+    def update(self, w, view, end_coord):
+        """Move the end point of the shape and draw the cells that changed
+
+        If the view has scrolled since the last update, every cell of the
+        shape is drawn, as the rows and columns that came into view were
+        drawn from the canvas.
+
+        :param w: the `Window` object
+        :type w: `class Window`
+        :param view: the part of the drawing shown on the screen
+        :type view: `class Viewport`
+        :param end_coord: canvas coordinate of the end point as a 2-ary tuple `(row, column)`
+        :type end_coord: tuple
+        """
+        spans = self.rasterize(self.start_coord, end_coord)
+        cur_coord = get_cursor_pos()
+
+        for span in spans_difference(self.spans, spans):
+            redraw_span(w, view, span)
+        added = spans if view.origin != self.origin else spans_difference(spans, self.spans)
+        for span in added:
+            draw_span(w, view, span, self.color_pair_idx)
+
+        self.spans = spans
+        self.origin = view.origin
+        w.move(cur_coord[0], cur_coord[1])
+        w.noutrefresh()
+
+    def finish(self):
+        """Stop drawing the shape and leave the preview on the window
+
+        :return: 2-ary tuple (`list` spans, `int` color_pair_idx) of the shape
+        """
+        shape = (self.spans, self.color_pair_idx)
+        self.__init__()
+        return shape
+
+    def cancel(self, w, view):
+        """Stop drawing the shape and draw the cells under it from the canvas
+
+        :param w: the `Window` object
+        :type w: `class Window`
+        :param view: the part of the drawing shown on the screen
+        :type view: `class Viewport`
+        """
+        if not self.active():
+            return
+        cur_coord = get_cursor_pos()
+        for span in self.spans:
+            redraw_span(w, view, span)
+        self.__init__()
+        w.move(cur_coord[0], cur_coord[1])
+        w.noutrefresh()
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from termpaint_canvas import Canvas
+from termpaint_io import read_paint
+from termpaint_import import IMAGE_SUFFIXES, read_image, resize_pixels, quantize_pixels
+from termpaint_mmap import BINARY_SUFFIX, open_binary_paint
+from termpaint_palette import Palette
+
+THUMBNAIL_MAGIC = b'TPTHUMB1'
+_HEADER = struct.Struct('>HH')
+
+def default_cache_dir():
+    """Get the directory thumbnails are cached in
+
+    This is `terminalpaint/thumbnails` in `$XDG_CACHE_HOME`, or in
+    `~/.cache` if it is not set.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'terminalpaint', 'thumbnails')
+
+def fit_dim(dim, max_dim):
+    """Get the dimensions of a drawing scaled down to fit in `max_dim`, keeping its proportions
+
+    Drawings smaller than `max_dim` are not scaled up.
+
+    :param dim: drawing dimensions as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param max_dim: largest dimensions as a 2-ary tuple `(row, column)`
+    :type max_dim: tuple
+    :return: 2-ary tuple `(row, column)` of the scaled dimensions
+    """
+    scale = max(dim[0] / max_dim[0], dim[1] / max_dim[1], 1)
+    return (max(1, min(max_dim[0], round(dim[0] / scale))), max(1, min(max_dim[1], round(dim[1] / scale))))
+
+def downscale(canvas, dim, palette=None):
+    """Shrink a canvas by taking the nearest cell for every cell of the result
+
+    Only the rows that are sampled are read, so a memory-mapped canvas is
+    mostly left on disk. Palette colors are replaced by the closest of
+    the eight drawing colors, so the result can be shown whatever palette
+    is in use.
+
+    :param canvas: the drawing to shrink
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    :param dim: dimensions of the result as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    :param palette: colors of the palette indices of the drawing, or `None` if it has none
+    :type palette: `class Palette`
+    :return: the shrunk drawing as a new `Canvas`
+    """
+    rows, cols = canvas.dim
+    x_values = [x_value * cols // dim[1] for x_value in range(dim[1])]
+    cells = bytearray()
+    for y_value in range(dim[0]):
+        row = canvas.row(y_value * rows // dim[0])
+        cells.extend(row[x_value] for x_value in x_values)
+    table = (palette if palette is not None else Palette()).drawing_color_table()
+    return Canvas(dim, cells=bytearray(cells.translate(table)))
+
+def make_thumbnail(fpath, max_dim):
+    """Make a preview of a drawing or image file
+
+    :param fpath: path to a .paint, .bpaint, .png or .ppm file
+    :type fpath: string
+    :param max_dim: largest dimensions of the preview as a 2-ary tuple `(row, column)`
+    :type max_dim: tuple
+    :return: the preview as a new `Canvas`, as large as fits in `max_dim`, in the eight drawing colors
+    """
+    suffix = Path(fpath).suffix.lower()
+    if suffix in IMAGE_SUFFIXES:
+        src_dim, pixels = read_image(fpath)
+        dim = fit_dim(src_dim, max_dim)
+        return Canvas(dim, cells=bytearray(quantize_pixels(resize_pixels(pixels, src_dim, dim), dim)))
+    if suffix == BINARY_SUFFIX:
+        canvas = open_binary_paint(fpath, writable=False)
+        try:
+            return downscale(canvas, fit_dim(canvas.dim, max_dim))
+        finally:
+            canvas.close()
+    palette = Palette()
+    canvas = read_paint(fpath, palette=palette)
+    return downscale(canvas, fit_dim(canvas.dim, max_dim), palette)
+
+class ThumbnailCache:
+    """Previews of drawing files, made in a background thread and cached on disk
+
+    Previews are keyed by the path, modification time and size of the
+    file, so a changed file gets a new preview and browsing a directory
+    again reads only the small cached previews. The most recently used
+    previews are also kept in memory.
+
+    `get()` never makes a preview itself: a preview that is not cached is
+    queued for the background thread, newest request first, and
+    `pending()` tells when it is being made.
+
+    :param max_dim: largest dimensions of a preview as a 2-ary tuple `(row, column)`
+    :type max_dim: tuple
+    :param cache_dir: directory to keep the previews in, or `None` for `default_cache_dir()`
+    :type cache_dir: string
+    :param memory_entries: number of previews kept in memory
+    :type memory_entries: int
+    """
+    __slots__ = ('max_dim', 'cache_dir', 'memory_entries', '_memory', '_failed', '_pending', '_queue', '_lock', '_wake', '_stop', '_thread')
+
+    def __init__(self, max_dim, cache_dir=None, memory_entries=256):
+        self.max_dim = (max_dim[0], max_dim[1])
+        self.cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._failed = set()
+        self._pending = set()
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread"""
+        self._thread = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, waiting for the preview being made to be finished"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _key(self, fpath):
+        stat = os.stat(fpath)
+        return (os.path.abspath(fpath), stat.st_mtime_ns, stat.st_size)
+
+    def _cache_path(self, key):
+        digest = hashlib.sha1(repr((key, self.max_dim)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.thumb')
+
+    def _remember(self, key, thumbnail):
+        # Called with `_lock` held
+        self._memory[key] = thumbnail
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        try:
+            with open(self._cache_path(key), 'rb') as thumb_file:
+                data = thumb_file.read()
+        except OSError:
+            return None
+        if not data.startswith(THUMBNAIL_MAGIC):
+            return None
+        dim = _HEADER.unpack_from(data, len(THUMBNAIL_MAGIC))
+        cells = data[len(THUMBNAIL_MAGIC) + _HEADER.size:]
+        if len(cells) != dim[0] * dim[1]:
+            return None
+        return Canvas(dim, cells=bytearray(cells))
+
+    def _store(self, key, thumbnail):
+        # Write to a temporary file and rename it, so a preview is never read half-written
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(temp_fd, 'wb') as thumb_file:
+                thumb_file.write(THUMBNAIL_MAGIC + _HEADER.pack(*thumbnail.dim) + thumbnail.snapshot())
+            os.replace(temp_path, self._cache_path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def get(self, fpath):
+        """Get the preview of a file, queueing it to be made if it is not cached
+
+        :param fpath: path to the file
+        :type fpath: string
+        :return: the preview as a `Canvas`, or `None` if it is not ready or cannot be made
+        """
+        try:
+            key = self._key(fpath)
+        except OSError:
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key in self._failed or key in self._pending:
+                return None
+
+        thumbnail = self._load(key)
+        with self._lock:
+            if thumbnail is not None:
+                self._remember(key, thumbnail)
+                return thumbnail
+            self._pending.add(key)
+            self._queue.append(key)
+        self._wake.set()
+        return None
+
+    def pending(self, fpath):
+        """Tell whether the preview of a file is queued or being made"""
+        try:
+            key = self._key(fpath)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._pending
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                key = self._queue.pop() if self._queue else None
+            if key is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            try:
+                thumbnail = make_thumbnail(key[0], self.max_dim)
+            except Exception:
+                thumbnail = None
+            with self._lock:
+                self._pending.discard(key)
+                if thumbnail is None:
+                    self._failed.add(key)
+                else:
+                    self._remember(key, thumbnail)
+            if thumbnail is not None:
+                try:
+                    self._store(key, thumbnail)
+                except OSError:
+                    pass
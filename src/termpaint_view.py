@@ -0,0 +1,82 @@
+from termpaint_canvas import TiledCanvas
+from termpaint_layers import LayeredCanvas
+from termpaint_frames import Animation
+
+class Viewport:
+    """Part of a canvas shown on the screen
+
+    The viewport is a camera over the canvas. Its `origin` is the canvas
+    coordinate shown at the top-left corner of the screen, and `dim` is
+    the size of the screen area available for drawing. Screen coordinates
+    are converted to canvas coordinates by adding the origin.
+
+    :param canvas: the drawing being shown
+    :type canvas: `class Canvas` or `class TiledCanvas`
+    :param dim: dimensions of the drawing area of the screen as a 2-ary tuple `(row, column)`
+    :type dim: tuple
+    """
+    __slots__ = ('canvas', 'dim', '_origin')
+
+    def __init__(self, canvas, dim):
+        self.canvas = canvas
+        self.dim = (dim[0], dim[1])
+        self.origin = (0, 0)
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @origin.setter
+    def origin(self, origin):
+        # A tiled canvas keeps the tiles on the screen when it drops tiles
+        self._origin = (origin[0], origin[1])
+        if isinstance(self.canvas, TiledCanvas):
+            self.canvas.keep_near(self._origin, self.dim)
+
+    def visible_dim(self):
+        """Get the dimensions of the part of the canvas that is on the screen
+
+        :return: 2-ary tuple of the dimensions in `(rows, columns)`
+        """
+        return (
+            min(self.canvas.dim[0] - self.origin[0], self.dim[0]),
+            min(self.canvas.dim[1] - self.origin[1], self.dim[1]),
+        )
+
+    def shown_span(self, y_value, x_start, x_end):
+        """Get the cells of part of a canvas row as they are shown on the screen
+
+        For a `LayeredCanvas`, these are the cells of the flattened image
+        of its visible layers rather than of the active layer. For an
+        `Animation`, they include the onion skin.
+        """
+        if isinstance(self.canvas, (LayeredCanvas, Animation)):
+            return self.canvas.composite_span(y_value, x_start, x_end)
+        return self.canvas.span(y_value, x_start, x_end)
+
+    def to_canvas(self, coord):
+        """Convert a screen coordinate to a canvas coordinate"""
+        return (coord[0] + self.origin[0], coord[1] + self.origin[1])
+
+    def to_screen(self, coord):
+        """Convert a canvas coordinate to a screen coordinate"""
+        return (coord[0] - self.origin[0], coord[1] - self.origin[1])
+
+    def clamp_origin(self, origin):
+        """Clamp an origin so that the view stays inside the canvas
+
+        :param origin: wanted origin as a 2-ary tuple `(row, column)`
+        :type origin: tuple
+        :return: 2-ary tuple of the closest valid origin
+        """
+        return tuple(
+            max(0, min(value, canvas_len - view_len))
+            for value, canvas_len, view_len in zip(origin, self.canvas.dim, self.dim)
+        )
+
+    def replace(self, canvas):
+        """Show another canvas from its top-left corner, closing the current one"""
+        if canvas is not self.canvas:
+            self.canvas.close()
+        self.canvas = canvas
+        self.origin = (0, 0)
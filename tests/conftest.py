@@ -0,0 +1,88 @@
+import curses
+import curses.ascii
+import os
+import sys
+import pytest
+
+# The modules live in `src` and import each other by their bare names
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import termpaint_lib
+import terminalpaint_tpl
+from termpaint_clipboard import Clipboard
+from termpaint_fakecurses import FakeCurses, FakeWindow
+from termpaint_shapes import RubberBand
+
+# Quits the editor from any mode: ^Q, then Yes in the prompt
+QUIT_KEYS = [curses.ascii.ctrl(ord('q')), curses.KEY_RIGHT, ord('\n')]
+
+# Ends a batch of keys, as if the user stopped typing for a moment
+PAUSE = -1
+
+def ctrl(raw):
+    return curses.ascii.ctrl(ord(raw))
+
+def typed(text):
+    return [ord(char) for char in text]
+
+class ScriptedWindow(FakeWindow):
+    """Fake window that quits the editor once its keys run out
+
+    A test that leaves the editor waiting for a key a second time fails
+    instead of hanging.
+    """
+
+    def __init__(self, dim, fake_curses=None):
+        super().__init__(dim, fake_curses)
+        self.waiting = True
+        self.quitting = False
+
+    def nodelay(self, flag):
+        self.waiting = not flag
+
+    def getch(self):
+        key = super().getch()
+        if key == -1 and self.waiting:
+            if self.quitting:
+                raise RuntimeError('The editor is still waiting for keys after quitting')
+            self.quitting = True
+            self.feed(QUIT_KEYS)
+            key = super().getch()
+        return key
+
+class EditorRun:
+    __slots__ = ('canvas', 'window', 'messages')
+
+@pytest.fixture
+def run_editor(monkeypatch):
+    """Run the editor on a fake terminal with a list of keys, then quit
+
+    :return: function taking the keys and options of `ui_main()`, returning an `EditorRun` with the drawing, the window and the status bar messages
+    """
+    messages = []
+    print_status_bar = terminalpaint_tpl.print_status_bar
+
+    def recording_status_bar(w, term_dim, msg):
+        messages.append(msg)
+        print_status_bar(w, term_dim, msg)
+
+    monkeypatch.setattr(terminalpaint_tpl, 'print_status_bar', recording_status_bar)
+    # Every test starts with an empty clipboard and no unfinished shape
+    monkeypatch.setattr(terminalpaint_tpl, 'CLIPBOARD', Clipboard())
+    monkeypatch.setattr(terminalpaint_tpl, 'RUBBER_BAND', RubberBand())
+    backends = []
+
+    def run(keys, dim=(30, 100), **kwargs):
+        fake = FakeCurses(dim)
+        window = fake.stdscr = ScriptedWindow(dim, fake)
+        window.feed(keys)
+        backends.append(termpaint_lib.use_backend(fake))
+        result = EditorRun()
+        result.canvas = terminalpaint_tpl.ui_main(window, keep_canvas=True, **kwargs)
+        result.window = window
+        result.messages = messages
+        return result
+
+    yield run
+    if backends:
+        termpaint_lib.use_backend(backends[0])
@@ -0,0 +1,107 @@
+import curses
+import os
+import pytest
+import termpaint_lib
+import terminalpaint_tpl
+from conftest import ctrl, typed
+from termpaint_ansi import AnsiCurses
+from termpaint_canvas import Canvas
+from termpaint_clipboard import Clipboard
+from termpaint_io import write_paint
+from termpaint_shapes import RubberBand
+
+@pytest.fixture
+def screen(tmp_path):
+    read_fd, write_fd = os.pipe()
+    out_file = open(tmp_path / 'out', 'w+b')
+    screen = AnsiCurses(read_fd, out_file.fileno(), (5, 20))
+    screen.keys_fd = write_fd
+    screen.out_file = out_file
+    yield screen
+    os.close(read_fd)
+    os.close(write_fd)
+    out_file.close()
+
+def written(screen):
+    screen.out_file.seek(0)
+    data = screen.out_file.read().decode()
+    screen.out_file.seek(0)
+    screen.out_file.truncate()
+    return data
+
+def test_only_changed_cells_are_sent(screen):
+    screen.init_pair(3, curses.COLOR_BLACK, curses.COLOR_RED)
+    window = screen.stdscr
+    window.refresh()
+    written(screen)
+
+    window.chgat(2, 4, 3, screen.color_pair(3))
+    window.refresh()
+    data = written(screen)
+    assert '\x1b[3;5H' in data
+    assert '\x1b[0;30;41m   ' in data
+    assert window.inch(2, 4) >> 8 == 3
+
+    # Nothing changed, so nothing is sent
+    window.refresh()
+    assert written(screen) == ''
+
+def test_one_write_per_frame(screen):
+    window = screen.stdscr
+    for y_value in range(5):
+        window.chgat(y_value, 0, 20, screen.color_pair(2))
+    frames = screen.frames
+    window.refresh()
+    assert screen.frames == frames + 1
+
+def test_long_blank_runs_are_erased(screen):
+    window = screen.stdscr
+    window.addstr(1, 0, 'x' * 20)
+    window.refresh()
+    written(screen)
+    window.addstr(1, 0, ' ' * 20)
+    window.refresh()
+    assert '\x1b[20X' in written(screen)
+
+@pytest.mark.parametrize('data, key', (
+    (b'\x1b[A', curses.KEY_UP),
+    (b'\x1bOD', curses.KEY_LEFT),
+    (b'\x1b[5~', curses.KEY_PPAGE),
+    (b'\r', ord('\n')),
+    (b'q', ord('q')),
+))
+def test_keys_are_read_from_escape_sequences(screen, data, key):
+    os.write(screen.keys_fd, data)
+    assert screen.read_key(0.1) == key
+
+def test_lone_escape_and_unknown_sequences(screen):
+    os.write(screen.keys_fd, b'\x1b')
+    assert screen.read_key(0.1) == 0x1b
+    os.write(screen.keys_fd, b'\x1b[99zq')
+    assert screen.read_key(0.1) == ord('q')
+    assert screen.read_key(0) == -1
+
+def test_editor_shows_a_diff(tmp_path, monkeypatch):
+    monkeypatch.setattr(terminalpaint_tpl, 'CLIPBOARD', Clipboard())
+    monkeypatch.setattr(terminalpaint_tpl, 'RUBBER_BAND', RubberBand())
+    write_paint(str(tmp_path / 'old.paint'), Canvas((4, 6)))
+    read_fd, write_fd = os.pipe()
+    out_file = open(tmp_path / 'out', 'w+b')
+    screen = AnsiCurses(read_fd, out_file.fileno(), (30, 100))
+    # Paint two cells, compare with the file, hide the diff with z and quit
+    keys = typed('g') + [0x1b] + typed('[Cr') + [ctrl(']')] + typed(str(tmp_path / 'old.paint') + '\rz') + [ctrl('q'), 0x1b] + typed('[C\r')
+    os.write(write_fd, bytes(keys))
+    previous_backend = termpaint_lib.use_backend(screen)
+    try:
+        canvas = terminalpaint_tpl.ui_main(screen.stdscr, keep_canvas=True)
+    finally:
+        termpaint_lib.use_backend(previous_backend)
+        os.close(read_fd)
+        os.close(write_fd)
+    out_file.seek(0)
+    data = out_file.read().decode()
+    out_file.close()
+    assert '\u2592\u2592' in data
+    assert '2 cells differ' in data
+    assert canvas.span(0, 0, 3) == b'\x04\x03\x0a'
+    assert screen.front_chars[0][:3] == [' '] * 3
@@ -0,0 +1,101 @@
+import os
+import pytest
+from termpaint_autosave import Autosaver, default_autosave_path
+from termpaint_canvas import Canvas
+from termpaint_history import CellEdit, History
+from termpaint_io import read_paint
+from termpaint_mmap import create_binary_paint, open_binary_paint
+from termpaint_view import Viewport
+
+def edit(view, history, coord, color_pair_idx):
+    history.record(CellEdit(coord, view.canvas.get(coord), color_pair_idx))
+    view.canvas.set(coord, color_pair_idx)
+
+def test_default_path_is_in_the_state_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_STATE_HOME', str(tmp_path))
+    assert default_autosave_path() == os.path.join(str(tmp_path), 'terminalpaint', 'autosave.paint')
+    monkeypatch.delenv('XDG_STATE_HOME')
+    monkeypatch.setenv('HOME', str(tmp_path))
+    assert default_autosave_path() == os.path.join(str(tmp_path), '.local', 'state', 'terminalpaint', 'autosave.paint')
+
+def test_saves_only_changed_drawings(tmp_path):
+    fpath = str(tmp_path / 'state' / 'terminalpaint' / 'autosave.paint')
+    view = Viewport(Canvas((3, 4)), (3, 4))
+    history = History()
+    autosaver = Autosaver(view, history, fpath)
+    assert not autosaver.save()
+    assert not os.path.exists(fpath)
+
+    edit(view, history, (1, 2), 3)
+    assert autosaver.save()
+    assert read_paint(fpath).snapshot() == view.canvas.snapshot()
+    assert autosaver.status().startswith('Autosaved')
+    assert not autosaver.save()
+
+def test_reports_failed_writes(tmp_path):
+    (tmp_path / 'file').write_text('')
+    view = Viewport(Canvas((2, 2)), (2, 2))
+    history = History()
+    autosaver = Autosaver(view, history, str(tmp_path / 'file' / 'autosave.paint'))
+    edit(view, history, (0, 0), 4)
+    assert not autosaver.save()
+    assert autosaver.status() == 'Autosave failed!'
+
+def test_reports_drawings_that_cannot_be_written(tmp_path):
+    view = Viewport(Canvas((2, 2)), (2, 2))
+    history = History()
+    autosaver = Autosaver(view, history, str(tmp_path / 'autosave.paint'))
+    # Not the color pair of any color, so write_paint() refuses it
+    edit(view, history, (0, 0), 1)
+    assert not autosaver.save()
+    assert autosaver.status() == 'Autosave failed!'
+    edit(view, history, (0, 0), 4)
+    assert autosaver.save()
+
+def test_saves_changes_that_are_not_journaled(tmp_path):
+    fpath = str(tmp_path / 'autosave.paint')
+    view = Viewport(Canvas((2, 2)), (2, 2))
+    history = History()
+    autosaver = Autosaver(view, history, fpath)
+    view.canvas = Canvas((2, 2), 5)
+    history.clear()
+    assert autosaver.save()
+    assert read_paint(fpath).snapshot() == b'\x05' * 4
+    history.touch()
+    assert autosaver.save()
+
+def test_mapped_drawings_are_flushed_without_a_copy(tmp_path, monkeypatch):
+    bpath = str(tmp_path / 'a.bpaint')
+    fpath = str(tmp_path / 'autosave.paint')
+    create_binary_paint(bpath, (2, 3))
+    view = Viewport(open_binary_paint(bpath), (2, 3))
+    history = History()
+    autosaver = Autosaver(view, history, fpath)
+    try:
+        monkeypatch.setattr(Canvas, 'copy', lambda canvas: pytest.fail('mapped canvas copied'))
+        edit(view, history, (1, 1), 5)
+        assert autosaver.save()
+        assert not os.path.exists(fpath)
+        with open(bpath, 'rb') as f:
+            assert f.read().endswith(b'\x0a\x0a\x0a\x0a\x05\x0a')
+    finally:
+        view.canvas.close()
+
+def test_background_thread_saves_after_enough_edits(tmp_path):
+    fpath = str(tmp_path / 'autosave.paint')
+    view = Viewport(Canvas((2, 2)), (2, 2))
+    history = History()
+    autosaver = Autosaver(view, history, fpath, interval=60.0, edits=2)
+    autosaver.start()
+    try:
+        with autosaver.lock:
+            edit(view, history, (0, 0), 3)
+            edit(view, history, (1, 1), 4)
+        autosaver.poll()
+        for _ in range(200):
+            if autosaver.last_saved is not None:
+                break
+            autosaver._thread.join(0.01)
+    finally:
+        autosaver.stop()
+    assert read_paint(fpath).snapshot() == view.canvas.snapshot()
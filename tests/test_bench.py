@@ -0,0 +1,20 @@
+import json
+from termpaint_bench import bench_ansi_frames, bench_operations, main
+
+def test_operations_run_against_a_fake_window():
+    results = bench_operations((24, 80), repeat=1, keys=50)
+    assert results
+    assert all(result['rows'] == 24 and result['cols'] == 80 for result in results)
+    assert all(result['seconds'] >= 0 for result in results if 'seconds' in result)
+
+def test_ansi_frames_send_fewer_bytes_than_cells_for_small_changes():
+    results = {result['benchmark']: result for result in bench_ansi_frames((24, 80))}
+    assert set(results) == {'ansi_full_redraw', 'ansi_pencil', 'ansi_scroll_row'}
+    assert 0 < results['ansi_pencil']['bytes'] < results['ansi_full_redraw']['bytes']
+
+def test_writes_json_report(tmp_path, monkeypatch):
+    monkeypatch.setattr('termpaint_bench.bench_fill', lambda: [('comb', 100, 0.001, 10.0)])
+    out_path = tmp_path / 'bench.json'
+    main(['--sizes', '24x80', '--repeat', '1', '--keys', '20', '-o', str(out_path)])
+    report = json.loads(out_path.read_text())
+    assert any(result['benchmark'] == 'find_region_spans_comb' for result in report['results'])
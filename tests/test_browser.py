@@ -0,0 +1,91 @@
+import curses
+import os
+import time
+import terminalpaint_tpl
+from conftest import ctrl
+from termpaint_browser import ESCAPE_KEY, OpenDialog, list_entries
+from termpaint_canvas import Canvas
+from termpaint_export import write_ppm
+from termpaint_io import write_paint
+from termpaint_palette import Palette
+from termpaint_thumbs import ThumbnailCache, downscale, fit_dim, make_thumbnail
+
+def make_tree(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / '.hidden').mkdir()
+    (tmp_path / 'notes.txt').write_text('')
+    canvas = Canvas((4, 8))
+    canvas.fill_span(0, 0, 8, 3)
+    canvas.fill_span(1, 0, 8, 3)
+    write_paint(str(tmp_path / 'b.paint'), canvas)
+    write_ppm(str(tmp_path / 'A.ppm'), canvas)
+    return canvas
+
+def test_list_entries(tmp_path):
+    make_tree(tmp_path)
+    assert list_entries(str(tmp_path), ('.paint', '.ppm')) == [('..', True), ('sub', True), ('A.ppm', False), ('b.paint', False)]
+
+def test_fit_dim():
+    assert fit_dim((100, 400), (20, 40)) == (10, 40)
+    assert fit_dim((5, 6), (20, 40)) == (5, 6)
+    assert fit_dim((1000, 1), (10, 10)) == (10, 1)
+
+def test_downscale_maps_palette_colors():
+    palette = Palette()
+    color_pair_idx = palette.add((250, 5, 5))
+    canvas = Canvas((4, 4), color_pair_idx)
+    canvas.fill_span(0, 0, 4, 5)
+    thumbnail = downscale(canvas, (2, 2), palette)
+    assert thumbnail.snapshot() == b'\x05\x05\x03\x03'
+
+def test_make_thumbnail(tmp_path):
+    make_tree(tmp_path)
+    for name in ('b.paint', 'A.ppm'):
+        thumbnail = make_thumbnail(str(tmp_path / name), (3, 4))
+        assert thumbnail.dim == (2, 4)
+        assert thumbnail.snapshot() == b'\x03\x03\x03\x03\x0a\x0a\x0a\x0a'
+
+def wait_for(cache, fpath):
+    for _ in range(500):
+        thumbnail = cache.get(fpath)
+        if thumbnail is not None or not cache.pending(fpath):
+            return thumbnail
+        time.sleep(0.01)
+
+def test_cache_makes_previews_in_the_background_and_keeps_them(tmp_path):
+    make_tree(tmp_path)
+    fpath = str(tmp_path / 'b.paint')
+    cache_dir = str(tmp_path / 'cache')
+    cache = ThumbnailCache((2, 4), cache_dir)
+    assert cache.get(fpath) is None and cache.pending(fpath)
+    cache.start()
+    try:
+        assert wait_for(cache, fpath).snapshot() == b'\x03\x03\x03\x03\x0a\x0a\x0a\x0a'
+        assert wait_for(cache, str(tmp_path / 'notes.txt')) is None
+    finally:
+        cache.stop()
+    assert len(os.listdir(cache_dir)) == 1
+
+    # A new cache reads the preview from disk without making it
+    assert ThumbnailCache((2, 4), cache_dir).get(fpath).dim == (2, 4)
+    # A changed file gets a new preview
+    write_paint(fpath, Canvas((4, 8), 4))
+    os.utime(fpath, ns=(1, 1))
+    assert ThumbnailCache((2, 4), cache_dir).get(fpath) is None
+
+def test_open_dialog_picks_a_file(run_editor, tmp_path, monkeypatch):
+    canvas = make_tree(tmp_path)
+    dialog = OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache'))
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', dialog)
+    run = run_editor([ctrl('o'), curses.KEY_END, ord('\n')])
+    assert [run.canvas.span(y_value, 0, 8) for y_value in range(4)] == list(canvas.rows())
+    assert dialog.thumbnails is None
+
+def test_open_dialog_goes_into_directories_and_cancels(run_editor, tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    dialog = OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache'))
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', dialog)
+    run = run_editor([ctrl('o'), curses.KEY_DOWN, ord('\n'), ESCAPE_KEY])
+    assert 'Open cancelled' in run.messages
+    assert dialog.directory == str(tmp_path / 'sub')
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1]
@@ -0,0 +1,56 @@
+import pytest
+from termpaint_canvas import BLANK_COLOR_PAIR_IDX, Canvas, TiledCanvas
+
+def test_new_canvas_is_one_color():
+    assert Canvas((3, 4)).snapshot() == bytes([BLANK_COLOR_PAIR_IDX]) * 12
+    assert Canvas((2, 2), 5).snapshot() == b'\x05' * 4
+
+def test_cells_are_row_major():
+    canvas = Canvas((3, 4))
+    canvas.set((1, 2), 3)
+    assert canvas.get((1, 2)) == 3
+    assert canvas.cells[1 * 4 + 2] == 3
+    canvas.fill_span(2, 1, 3, 4)
+    assert [bytes(row) for row in canvas.rows()] == [b'\x0a\x0a\x0a\x0a', b'\x0a\x0a\x03\x0a', b'\x0a\x04\x04\x0a']
+
+def test_rows_share_memory_with_the_canvas():
+    canvas = Canvas((2, 3))
+    canvas.row(1)[0] = 7
+    assert canvas.get((1, 0)) == 7
+    snapshot = canvas.snapshot()
+    canvas.set((0, 1), 4)
+    assert snapshot[1] == 10
+
+def test_clear_and_load():
+    canvas = Canvas((2, 3))
+    other = Canvas((2, 3), 6)
+    other.set((1, 1), 3)
+    canvas.load(other)
+    assert canvas.snapshot() == other.snapshot()
+    other.set((0, 0), 4)
+    assert canvas.get((0, 0)) == 6
+    canvas.clear(5)
+    assert canvas.snapshot() == b'\x05' * 6
+
+def test_whole_canvas_operations():
+    canvas = Canvas((3, 3))
+    canvas.fill_span(1, 0, 3, 3)
+    canvas.recolor(3, 4)
+    assert canvas.count(4) == 3 and canvas.count(3) == 0
+    copy = canvas.copy()
+    copy.set((0, 0), 5)
+    assert canvas.get((0, 0)) == 10
+    with pytest.raises(ValueError):
+        Canvas((2, 2), cells=bytearray(3))
+
+@pytest.mark.parametrize('make_canvas', [Canvas, lambda dim: TiledCanvas(dim, tile_size=2)])
+def test_crop(make_canvas):
+    canvas = make_canvas((3, 3))
+    canvas.fill_span(1, 0, 3, 4)
+    assert canvas.crop((1, 1), (2, 2)).snapshot() == b'\x04\x04\x0a\x0a'
+    for top_left, dim in (((2, 2), (2, 2)), ((-1, 0), (1, 1))):
+        with pytest.raises(ValueError, match='outside'):
+            canvas.crop(top_left, dim)
+    for dim in ((-3, 5), (0, 2), (2, 0)):
+        with pytest.raises(ValueError, match='at least one cell'):
+            canvas.crop((0, 0), dim)
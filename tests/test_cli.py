@@ -0,0 +1,123 @@
+import json
+import os
+import pytest
+from termpaint_canvas import Canvas
+from termpaint_cli import main
+from termpaint_frames import Animation
+from termpaint_io import PAINT_MAGIC, RAW_TO_IDX, read_paint, write_paint
+from termpaint_layers import Layer, LayeredCanvas
+from termpaint_palette import Palette
+
+def write_drawing(fpath, *lines, magic=PAINT_MAGIC):
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    fpath.write_text('\n'.join((magic,) + lines) + '\n')
+    return str(fpath)
+
+def raw_rows(canvas):
+    idx_to_raw = {idx: raw for raw, idx in RAW_TO_IDX.items()}
+    return [''.join(idx_to_raw[idx] for idx in row) for row in canvas.rows()]
+
+def test_fill_writes_to_output_dir(tmp_path):
+    fpath = write_drawing(tmp_path / 'in' / 'a.paint', 'xxr', 'xrx')
+    assert main(['fill', fpath, '--at', '0', '0', '--color', 'b', '-o', str(tmp_path / 'out')]) == 0
+    assert raw_rows(read_paint(str(tmp_path / 'out' / 'a.paint'))) == ['bbr', 'brx']
+    assert raw_rows(read_paint(fpath)) == ['xxr', 'xrx']
+
+def test_recolor_in_place(tmp_path):
+    fpath = write_drawing(tmp_path / 'a.paint', 'xxr', 'xrx')
+    assert main(['recolor', fpath, '--from', 'r', '--to', 'g', '-i']) == 0
+    assert raw_rows(read_paint(fpath)) == ['xxg', 'xgx']
+
+def test_crop(tmp_path):
+    fpath = write_drawing(tmp_path / 'a.paint', 'xxr', 'xrx', 'rxx')
+    assert main(['crop', fpath, '--at', '1', '1', '--size', '2', '2', '-o', str(tmp_path / 'out')]) == 0
+    assert raw_rows(read_paint(str(tmp_path / 'out' / 'a.paint'))) == ['rx', 'xx']
+
+def test_stats(tmp_path, capsys):
+    fpath = write_drawing(tmp_path / 'a.paint', 'xxr', 'xrx')
+    assert main(['stats', fpath]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats['dim'] == [2, 3]
+    assert stats['colors']['x'] == 4 and stats['colors']['r'] == 2
+
+def test_same_name_in_two_directories_does_not_overwrite(tmp_path, capsys):
+    first = write_drawing(tmp_path / 'one' / 'a.paint', 'rr')
+    second = write_drawing(tmp_path / 'two' / 'a.paint', 'gg')
+    out_dir = tmp_path / 'out'
+    assert main(['recolor', first, second, '--from', 'b', '--to', 'w', '-o', str(out_dir)]) == 1
+    assert raw_rows(read_paint(str(out_dir / 'a.paint'))) == ['rr']
+    assert second in capsys.readouterr().err
+
+def test_export_same_name_in_two_directories(tmp_path, capsys):
+    first = write_drawing(tmp_path / 'one' / 'a.paint', 'rr')
+    second = write_drawing(tmp_path / 'two' / 'a.paint', 'gg')
+    third = write_drawing(tmp_path / 'two' / 'b.paint', 'bb')
+    out_dir = tmp_path / 'out'
+    assert main(['export', first, second, third, '--format', 'ppm', '-j', '1', '-o', str(out_dir)]) == 1
+    assert sorted(path.name for path in out_dir.iterdir()) == ['a.ppm', 'b.ppm']
+    assert (out_dir / 'a.ppm').read_bytes().endswith(b'\xff\x00\x00' * 2)
+    assert second in capsys.readouterr().err
+
+@pytest.mark.parametrize('magic', (PAINT_MAGIC, 'EEE111_PAINT_RLE'))
+def test_blank_line_is_an_empty_row(tmp_path, magic):
+    fpath = write_drawing(tmp_path / 'a.paint', 'rr', '', 'gg', '', '', magic=magic)
+    assert raw_rows(read_paint(fpath)) == ['rr', 'xx', 'gg']
+
+def test_failed_in_place_write_keeps_the_input(tmp_path, capsys):
+    fpath = str(tmp_path / 'a.paint')
+    palette = Palette()
+    canvas = Canvas((2, 3), 3)
+    canvas.set((0, 0), palette.add((1, 2, 3)))
+    write_paint(fpath, canvas, palette=palette)
+    before = open(fpath).read()
+    assert main(['recolor', fpath, '--from', 'r', '--to', 'g', '-i', '--plain']) == 1
+    assert 'run-length encoded' in capsys.readouterr().err
+    assert open(fpath).read() == before
+    assert os.listdir(str(tmp_path)) == ['a.paint']
+
+def test_stats_count_palette_colors(tmp_path, capsys):
+    fpath = str(tmp_path / 'a.paint')
+    palette = Palette()
+    palette.add((1, 2, 3))
+    canvas = Canvas((2, 3), 3)
+    canvas.fill_span(1, 1, 3, palette.add((4, 5, 6)))
+    write_paint(fpath, canvas, palette=palette)
+    assert main(['stats', fpath]) == 0
+    colors = json.loads(capsys.readouterr().out)['colors']
+    assert colors['r'] == 4 and colors['#0c'] == 2 and '#0b' not in colors
+    assert sum(colors.values()) == 6
+
+def test_layered_drawings_are_not_changed_in_place(tmp_path, capsys):
+    layered = LayeredCanvas([Layer(Canvas((2, 3), 3), 'paper')])
+    layered.add_layer('ink')
+    layered.set((0, 0), 4)
+    fpath = str(tmp_path / 'a.paint')
+    write_paint(fpath, layered)
+    before = open(fpath).read()
+    assert main(['recolor', fpath, '--from', 'r', '--to', 'b', '-i']) == 1
+    assert 'in place' in capsys.readouterr().err
+    assert open(fpath).read() == before
+    # The flattened image can still be written elsewhere
+    assert main(['recolor', fpath, '--from', 'r', '--to', 'b', '-o', str(tmp_path / 'out')]) == 0
+    assert raw_rows(read_paint(str(tmp_path / 'out' / 'a.paint'))) == ['gbb', 'bbb']
+
+def test_animations_are_not_changed_in_place(tmp_path, capsys):
+    animation = Animation([Canvas((2, 3))])
+    animation.add_frame()
+    animation.set((1, 1), 5)
+    fpath = str(tmp_path / 'a.paint')
+    write_paint(fpath, animation)
+    before = open(fpath).read()
+    assert main(['crop', fpath, '--at', '0', '0', '--size', '1', '1', '-i']) == 1
+    assert 'in place' in capsys.readouterr().err
+    assert open(fpath).read() == before
+    assert len(read_paint(fpath, frames=True).frames) == 2
+    # Stats read the first frame
+    assert main(['stats', fpath]) == 0
+    assert json.loads(capsys.readouterr().out)['colors']['x'] == 6
+
+@pytest.mark.parametrize('size', (['-3', '5'], ['0', '4']))
+def test_crop_refuses_empty_sizes(tmp_path, size):
+    fpath = write_drawing(tmp_path / 'a.paint', 'xxr', 'xrx')
+    assert main(['crop', fpath, '--at', '0', '0', '--size', *size, '-i']) == 1
+    assert raw_rows(read_paint(fpath)) == ['xxr', 'xrx']
@@ -0,0 +1,82 @@
+import curses
+import pytest
+from conftest import PAUSE, ctrl, typed
+from termpaint_canvas import Canvas
+from termpaint_clipboard import copy_region, flip_region, map_region_colors, region_rect, rotate_region
+from termpaint_palette import FIRST_PALETTE_IDX, Palette
+
+def numbered_canvas(dim):
+    return Canvas(dim, cells=bytearray(range(dim[0] * dim[1])))
+
+def test_region_rect():
+    assert region_rect((4, 1), (2, 6)) == ((2, 1), (3, 6))
+    assert region_rect((3, 3), (3, 3)) == ((3, 3), (1, 1))
+
+def test_copy_region():
+    region = copy_region(numbered_canvas((4, 5)), (1, 2), (2, 3))
+    assert region.snapshot() == bytes([7, 8, 9, 12, 13, 14])
+    with pytest.raises(ValueError):
+        copy_region(numbered_canvas((4, 5)), (3, 3), (2, 2))
+
+def test_flip_and_rotate():
+    region = numbered_canvas((2, 3))
+    assert flip_region(region).snapshot() == bytes([2, 1, 0, 5, 4, 3])
+    assert flip_region(region, horizontal=False).snapshot() == bytes([3, 4, 5, 0, 1, 2])
+    rotated = rotate_region(region)
+    assert rotated.dim == (3, 2)
+    assert rotated.snapshot() == bytes([3, 0, 4, 1, 5, 2])
+    for _ in range(3):
+        rotated = rotate_region(rotated)
+    assert rotated.snapshot() == region.snapshot()
+
+# Draws r g on the first row and selects them with the cursor on g
+DRAW_AND_SELECT = typed('r') + [curses.KEY_RIGHT] + typed('g') + [ctrl('v'), curses.KEY_LEFT] + typed(' ') + [curses.KEY_RIGHT]
+
+def test_copy_and_paste(run_editor):
+    run = run_editor(DRAW_AND_SELECT + typed('c') + [curses.KEY_DOWN] * 2 + typed('p'))
+    assert run.canvas.span(0, 0, 3) == b'\x03\x04\x0a'
+    assert run.canvas.span(2, 1, 4) == b'\x03\x04\x0a'
+    assert run.window.pairs[2][1:3] == b'\x03\x04'
+
+def test_cut_is_undone(run_editor):
+    run = run_editor(DRAW_AND_SELECT + typed('x'))
+    assert run.canvas.span(0, 0, 2) == b'\x0a\x0a'
+    run = run_editor(DRAW_AND_SELECT + typed('x') + [PAUSE, ctrl('z')])
+    assert run.canvas.span(0, 0, 2) == b'\x03\x04'
+
+def test_move_is_undone_at_once(run_editor):
+    keys = DRAW_AND_SELECT + typed('m') + [curses.KEY_DOWN] * 3 + typed('m')
+    run = run_editor(keys)
+    assert run.canvas.span(0, 0, 2) == b'\x0a\x0a'
+    assert run.canvas.span(3, 1, 3) == b'\x03\x04'
+    run = run_editor(keys + [PAUSE, ctrl('z')])
+    assert run.canvas.span(0, 0, 2) == b'\x03\x04'
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1] - 2
+
+def test_rotated_paste(run_editor):
+    run = run_editor(DRAW_AND_SELECT + typed('cr') + [curses.KEY_DOWN] + typed('p'))
+    assert run.canvas.get((1, 1)) == 3
+    assert run.canvas.get((2, 1)) == 4
+
+def test_paste_needs_a_clipboard(run_editor):
+    run = run_editor([ctrl('v')] + typed('p'))
+    assert 'Clipboard is empty!' in run.messages
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1]
+
+def test_pasted_palette_colors_keep_their_rgb():
+    source, target = Palette(), Palette()
+    teal = source.add((0, 128, 128))
+    olive = source.add((128, 128, 0))
+    region = Canvas((1, 3), cells=bytearray([teal, olive, 3]))
+    assert map_region_colors(region, source, source) is region
+    target.add((9, 9, 9))
+    mapped = map_region_colors(region, source, target)
+    assert [target.rgb(cell) for cell in mapped.cells] == [(0, 128, 128), (128, 128, 0), (255, 0, 0)]
+    assert region.cells == bytearray([teal, olive, 3])
+
+def test_pasting_into_a_full_palette_takes_the_closest_drawing_color():
+    source, target = Palette(), Palette()
+    region = Canvas((1, 1), cells=bytearray([source.add((250, 10, 10))]))
+    for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+        target.set(color_pair_idx, (0, 0, color_pair_idx))
+    assert map_region_colors(region, source, target).cells == bytearray([3])
@@ -0,0 +1,90 @@
+import curses
+import random
+import pytest
+import terminalpaint_tpl
+from collections import Counter
+from conftest import PAUSE, ctrl, typed
+from termpaint_browser import OpenDialog
+from termpaint_canvas import Canvas, TiledCanvas
+from termpaint_colorindex import ColorIndex
+from termpaint_io import write_paint
+from termpaint_palette import FIRST_PALETTE_IDX, Palette
+
+@pytest.fixture
+def palette():
+    palette = terminalpaint_tpl.PALETTE
+    yield palette
+    palette.clear()
+
+@pytest.mark.parametrize('make_canvas', [Canvas, lambda dim: TiledCanvas(dim, tile_size=8)])
+def test_index_follows_random_edits(make_canvas):
+    rng = random.Random(5)
+    dim = (19, 31)
+    canvas = make_canvas(dim)
+    index = canvas.indexed(ColorIndex)
+    for step in range(300):
+        y_value = rng.randrange(dim[0])
+        if rng.randrange(2):
+            canvas.set((y_value, rng.randrange(dim[1])), rng.randrange(3, 11))
+        else:
+            x_start = rng.randrange(dim[1])
+            canvas.fill_span(y_value, x_start, rng.randrange(x_start, dim[1] + 1), rng.randrange(3, 11))
+        if step % 11 == 0:
+            assert index.colors() == dict(Counter(canvas.snapshot()))
+    color_pair_idx = canvas.get((0, 0))
+    spans = index.spans(color_pair_idx)
+    assert sum(x_end - x_start for _, x_start, x_end in spans) == index.count(color_pair_idx)
+    assert all(canvas.span(y_value, x_start, x_end) == bytes([color_pair_idx]) * (x_end - x_start) for y_value, x_start, x_end in spans)
+
+def test_index_reads_only_changed_rows():
+    canvas = Canvas((4, 5))
+    index = canvas.indexed(ColorIndex)
+    assert index.count(10) == 20
+    canvas.fill_span(2, 1, 4, 3)
+    # A row written behind the back of the index is not counted again
+    canvas.row(0)[0] = 4
+    assert index.count(3) == 3 and index.count(4) == 0
+    canvas.clear()
+    assert index.colors() == {10: 20}
+
+def test_replace_color_and_undo(run_editor, palette):
+    keys = typed('r') + [curses.KEY_RIGHT] * 2 + typed('r') + [PAUSE, ctrl('u')] + typed('r #123456\n')
+    run = run_editor(keys)
+    new_color = palette.find((0x12, 0x34, 0x56))
+    assert new_color >= FIRST_PALETTE_IDX
+    assert run.canvas.span(0, 0, 3) == bytes([new_color, 10, new_color])
+    assert 'Replaced 2 r cells with #123456' in run.messages
+
+    run = run_editor(keys + [PAUSE, ctrl('z')])
+    assert run.canvas.span(0, 0, 3) == b'\x03\x0a\x03'
+
+def test_replace_color_into_a_full_palette(run_editor, palette, tmp_path, monkeypatch):
+    full = Palette()
+    for color_pair_idx in range(FIRST_PALETTE_IDX, 256):
+        full.set(color_pair_idx, (0, 0, color_pair_idx))
+    write_paint(str(tmp_path / 'full.paint'), Canvas((2, 2), 3), palette=full)
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache')))
+    run = run_editor([ctrl('o'), curses.KEY_END, ord('\n'), PAUSE, ctrl('u')] + typed('r #123456\n'))
+    assert run.messages[-1] == 'The palette is full!'
+    assert run.canvas.span(0, 0, 2) == b'\x03\x03'
+
+@pytest.mark.parametrize('text, msg', [('r', 'Enter two colors!'), ('r #12', 'Enter two colors!'), ('#654321 r', 'Nothing to replace'), ('g b', 'No g cells')])
+def test_replace_color_messages(run_editor, palette, text, msg):
+    run = run_editor(typed('r') + [PAUSE, ctrl('u')] + typed(text + '\n'))
+    assert run.messages[-1] == msg
+    # A color that is not replaced is not added to the palette
+    assert len(palette) == 0
+
+def test_counts_note_follows_drawing(run_editor, monkeypatch):
+    monkeypatch.setattr(terminalpaint_tpl, 'SHOWN_NOTES', set())
+    notes = []
+    print_status_note = terminalpaint_tpl.print_status_note
+
+    def recording_status_note(w, term_dim, note):
+        notes.append(note.strip())
+        print_status_note(w, term_dim, note)
+
+    monkeypatch.setattr(terminalpaint_tpl, 'print_status_note', recording_status_note)
+    run_editor([ctrl('c'), PAUSE] + typed('r') + [PAUSE, curses.KEY_RIGHT] + typed('r'), dim=(10, 100))
+    assert notes[0].startswith('x 700 ')
+    assert notes[-1].startswith('x 698 r 2 ')
@@ -0,0 +1,56 @@
+import curses
+import terminalpaint_tpl
+from conftest import PAUSE, ctrl, typed
+from termpaint_canvas import Canvas
+from termpaint_diff import PaintDiff, diff_paint_files, diff_rows, row_changes
+from termpaint_fakecurses import FakeCurses
+from termpaint_io import write_paint
+from termpaint_mmap import write_binary_paint
+from termpaint_palette import Palette
+
+def test_row_changes():
+    assert row_changes(b'\x03\x04\x05\x06', b'\x03\x04\x05\x06') == []
+    assert row_changes(b'\x03\x04\x05\x06', b'\x04\x04\x06\x07') == [(0, 1), (2, 4)]
+    # A shorter row is padded with blank cells
+    assert row_changes(b'\x03\x0a\x0a', b'\x03') == []
+    assert row_changes(b'\x03', b'\x03\x0a\x04') == [(2, 3)]
+
+def test_areas_join_touching_cells():
+    diff = PaintDiff([(0, 0, 2), (1, 2, 3), (1, 6, 7), (3, 6, 7)])
+    assert diff.cells == 5 and diff.rows == 3
+    assert diff.areas() == [((0, 0), (2, 3)), ((1, 6), (1, 1)), ((3, 6), (1, 1))]
+
+def test_files_compare_palette_colors_by_rgb(tmp_path):
+    old, new = Canvas((3, 4)), Canvas((3, 4))
+    old_palette, new_palette = Palette(), Palette()
+    old_palette.add((1, 1, 1))
+    old.set((1, 1), old_palette.add((9, 8, 7)))
+    new.set((1, 1), new_palette.add((9, 8, 7)))
+    new.fill_span(2, 2, 4, 5)
+    write_paint(str(tmp_path / 'old.paint'), old, palette=old_palette)
+    write_paint(str(tmp_path / 'new.paint'), new, palette=new_palette)
+    write_binary_paint(str(tmp_path / 'new.bpaint'), new)
+    assert diff_paint_files(str(tmp_path / 'old.paint'), str(tmp_path / 'new.paint')).spans == [(2, 2, 4)]
+    assert diff_rows(old.rows(), new.rows()).spans == [(1, 1, 2), (2, 2, 4)]
+
+def test_changed_cells_do_not_look_like_a_color(run_editor, tmp_path, monkeypatch):
+    write_paint(str(tmp_path / 'old.paint'), Canvas((4, 6)))
+    screens = []
+    update_screen = terminalpaint_tpl.update_screen
+
+    def recording_update_screen(w):
+        screens.append(([bytes(row) for row in w.pairs], [bytes(row) for row in w.chars]))
+        update_screen(w)
+
+    monkeypatch.setattr(terminalpaint_tpl, 'update_screen', recording_update_screen)
+    keys = typed('g') + [curses.KEY_RIGHT] + typed('r') + [PAUSE, ctrl(']')] + typed(str(tmp_path / 'old.paint') + '\n') + typed('z')
+    run = run_editor(keys)
+    assert '2 cells differ in 1 areas - arrows scroll, any other key hides them' in run.messages
+    pairs, chars = next(screen for screen in screens if screen[1][0][:1] != b' ')
+    assert chars[0][:3] == bytes([FakeCurses.ACS_CKBOARD & 0xff]) * 2 + b' '
+    # Not the color pair of any drawing color
+    assert pairs[0][:2] == b'\x00\x00'
+    # The checkerboard goes away with the key that ends the diff
+    assert run.window.chars[0][:3] == b'   '
+    assert run.window.pairs[0][:3] == b'\x04\x03\x0a'
+    assert run.canvas.span(0, 0, 3) == b'\x04\x03\x0a'
@@ -0,0 +1,33 @@
+import curses
+from conftest import ctrl, typed
+from termpaint_fakecurses import FakeWindow
+from terminalpaint_tpl import PROMPT_KEYS, read_keys
+
+def test_read_keys_takes_every_waiting_key():
+    window = FakeWindow((5, 5))
+    window.feed([curses.KEY_RIGHT] * 3 + typed('rg'))
+    assert read_keys(window) == [curses.KEY_RIGHT] * 3 + typed('rg')
+    assert read_keys(window) == []
+
+def test_read_keys_stops_after_a_prompt_key():
+    window = FakeWindow((5, 5))
+    window.feed(typed('r') + [ctrl('s')] + typed('name\n'))
+    assert ctrl('s') in PROMPT_KEYS
+    assert read_keys(window) == typed('r') + [ctrl('s')]
+
+def test_read_keys_caps_the_batch():
+    window = FakeWindow((5, 5))
+    window.feed(typed('r') * 10)
+    assert len(read_keys(window, max_keys=4)) == 4
+
+def test_arrow_runs_move_once_and_color_keys_draw(run_editor):
+    run = run_editor([curses.KEY_RIGHT] * 5 + [curses.KEY_DOWN] * 2 + typed('r') + [curses.KEY_LEFT] + typed('g'))
+    assert run.canvas.get((2, 5)) == 3
+    assert run.canvas.get((2, 4)) == 4
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1] - 2
+    # The screen shows the drawing
+    assert run.window.pairs[2][4:6] == b'\x04\x03'
+
+def test_arrows_stop_at_the_edge_of_the_canvas(run_editor):
+    run = run_editor([curses.KEY_LEFT, curses.KEY_UP] + typed('b'))
+    assert run.canvas.get((0, 0)) == 5
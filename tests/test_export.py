@@ -0,0 +1,108 @@
+import struct
+import zlib
+import pytest
+import termpaint_export
+from termpaint_canvas import Canvas
+from termpaint_export import export_files, write_png, write_ppm
+from termpaint_io import write_paint
+from termpaint_palette import PAIR_RGB, Palette
+
+@pytest.fixture(params=['numpy', 'pure'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(termpaint_export, 'np', None)
+    return request.param
+
+def sample_canvas():
+    canvas = Canvas((3, 4))
+    canvas.fill_span(0, 0, 2, 3)
+    canvas.set((1, 3), 5)
+    canvas.fill_span(2, 1, 4, 11)
+    return canvas
+
+def read_png(fpath):
+    with open(fpath, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks = {}
+    offset = 8
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        chunk_type = data[offset + 4:offset + 8]
+        chunk_data = data[offset + 8:offset + 8 + length]
+        assert struct.unpack('>I', data[offset + 8 + length:offset + 12 + length])[0] == zlib.crc32(chunk_type + chunk_data)
+        chunks[chunk_type] = chunks.get(chunk_type, b'') + chunk_data
+        offset += 12 + length
+    width, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+    pixels = zlib.decompress(chunks[b'IDAT'])
+    scanlines = [pixels[y_value * (width + 1):(y_value + 1) * (width + 1)] for y_value in range(height)]
+    assert all(scanline[0] == 0 for scanline in scanlines)
+    return (height, width), chunks[b'PLTE'], [scanline[1:] for scanline in scanlines]
+
+def test_png_pixels_are_the_scaled_cells(tmp_path, backend):
+    fpath = str(tmp_path / 'a.png')
+    canvas = sample_canvas()
+    write_png(fpath, canvas, scale=2)
+    dim, plte, rows = read_png(fpath)
+    assert dim == (6, 8)
+    assert plte == bytes(value for rgb in PAIR_RGB for value in rgb)
+    expected = [bytes(cell for cell in bytes(row) for _ in range(2)) for row in canvas.rows() for _ in range(2)]
+    assert rows == expected
+
+def test_png_uses_the_palette(tmp_path, backend):
+    fpath = str(tmp_path / 'a.png')
+    palette = Palette()
+    color_pair_idx = palette.add((1, 2, 3))
+    write_png(fpath, sample_canvas(), palette=palette)
+    plte = read_png(fpath)[1]
+    assert plte[color_pair_idx * 3:color_pair_idx * 3 + 3] == b'\x01\x02\x03'
+
+def test_ppm_pixels(tmp_path, backend):
+    fpath = str(tmp_path / 'a.ppm')
+    palette = Palette()
+    palette.add((1, 2, 3))
+    canvas = sample_canvas()
+    write_ppm(fpath, canvas, scale=3, palette=palette)
+    with open(fpath, 'rb') as f:
+        data = f.read()
+    header = b'P6\n12 9\n255\n'
+    assert data.startswith(header)
+    rgb_table = palette.rgb_table()
+    expected = b''.join(bytes(value for cell in bytes(row) for _ in range(3) for value in rgb_table[cell]) * 3 for row in canvas.rows())
+    assert data[len(header):] == expected
+
+def test_scale_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        write_png(str(tmp_path / 'a.png'), sample_canvas(), scale=0)
+    with pytest.raises(ValueError):
+        write_ppm(str(tmp_path / 'a.ppm'), sample_canvas(), scale=0)
+
+def write_drawings(tmp_path, count):
+    paths = []
+    for drawing_idx in range(count):
+        canvas = Canvas((2, 3))
+        canvas.set((drawing_idx % 2, drawing_idx % 3), 3 + drawing_idx % 8)
+        fpath = str(tmp_path / f'd{drawing_idx}.paint')
+        write_paint(fpath, canvas)
+        paths.append(fpath)
+    return paths
+
+def test_parallel_export_matches_serial(tmp_path):
+    paths = write_drawings(tmp_path, 5)
+    serial_dir, parallel_dir = tmp_path / 'serial', tmp_path / 'parallel'
+    serial_dir.mkdir()
+    parallel_dir.mkdir()
+    serial = list(export_files(paths, str(serial_dir), ('png', 'ppm'), workers=1))
+    parallel = list(export_files(paths, str(parallel_dir), ('png', 'ppm'), workers=2))
+    assert [result[:2] for result in serial] == [(fpath, True) for fpath in paths]
+    assert [result[:2] for result in parallel] == [(fpath, True) for fpath in paths]
+    for name in sorted(path.name for path in serial_dir.iterdir()):
+        assert (serial_dir / name).read_bytes() == (parallel_dir / name).read_bytes()
+
+def test_missing_file_fails_alone(tmp_path):
+    paths = write_drawings(tmp_path, 2)
+    paths.insert(1, str(tmp_path / 'missing.paint'))
+    results = list(export_files(paths, str(tmp_path), workers=1))
+    assert [result[1] for result in results] == [True, False, True]
@@ -0,0 +1,149 @@
+import curses
+import random
+import pytest
+import terminalpaint_tpl
+import termpaint_fill
+import termpaint_lib
+from conftest import PAUSE, ctrl, typed
+from termpaint_browser import OpenDialog
+from termpaint_canvas import Canvas
+from termpaint_fakecurses import FakeCurses, FakeWindow
+from termpaint_io import RAW_TO_IDX, write_paint
+from termpaint_fill import RegionIndex, count_runs, find_region_spans
+from termpaint_layers import Layer, LayeredCanvas
+from termpaint_mmap import create_binary_paint, open_binary_paint
+from termpaint_view import Viewport
+
+def canvas_of(*lines):
+    canvas = Canvas((len(lines), len(lines[0])))
+    for y_value, line in enumerate(lines):
+        canvas.row(y_value)[:] = bytes(RAW_TO_IDX[raw] for raw in line)
+    return canvas
+
+def cells_of(spans):
+    return {(y_value, x_value) for y_value, x_start, x_end in spans for x_value in range(x_start, x_end)}
+
+def flood_cells(canvas, start_coord, connectivity):
+    # One cell at a time, as the fill did before the scanline engine
+    target = canvas.get(start_coord)
+    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        steps += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    seen = {start_coord}
+    stack = [start_coord]
+    while stack:
+        y_value, x_value = stack.pop()
+        for step_y, step_x in steps:
+            coord = (y_value + step_y, x_value + step_x)
+            if coord not in seen and 0 <= coord[0] < canvas.dim[0] and 0 <= coord[1] < canvas.dim[1] and canvas.get(coord) == target:
+                seen.add(coord)
+                stack.append(coord)
+    return seen
+
+def test_region_stops_at_other_colors():
+    canvas = canvas_of(
+        'xxrxx',
+        'xxrxx',
+        'rrrxx',
+    )
+    assert cells_of(find_region_spans(canvas, (0, 0))) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+
+def test_diagonal_cells_join_only_with_connectivity_8():
+    canvas = canvas_of(
+        'rx',
+        'xr',
+    )
+    assert cells_of(find_region_spans(canvas, (0, 0))) == {(0, 0)}
+    assert cells_of(find_region_spans(canvas, (0, 0), 8)) == {(0, 0), (1, 1)}
+
+def test_spans_do_not_overlap():
+    canvas = canvas_of(
+        'xxxxx',
+        'xrxrx',
+        'xxxxx',
+    )
+    spans = find_region_spans(canvas, (0, 0))
+    assert sum(x_end - x_start for _, x_start, x_end in spans) == len(cells_of(spans)) == 13
+
+@pytest.mark.parametrize('connectivity', (4, 8))
+def test_matches_cell_by_cell_flood(connectivity):
+    random.seed(connectivity)
+    for _ in range(50):
+        canvas = canvas_of(*(''.join(random.choice('rx') for _ in range(12)) for _ in range(9)))
+        start_coord = (random.randrange(9), random.randrange(12))
+        assert cells_of(find_region_spans(canvas, start_coord, connectivity)) == flood_cells(canvas, start_coord, connectivity)
+
+def test_rejects_other_connectivity():
+    with pytest.raises(ValueError):
+        find_region_spans(canvas_of('x'), (0, 0), 6)
+
+def test_region_index_follows_random_edits():
+    rng = random.Random(7)
+    canvas = canvas_of(*(''.join(rng.choice('rgx') for _ in range(15)) for _ in range(11)))
+    index = canvas.indexed(RegionIndex)
+    for _ in range(200):
+        y_value = rng.randrange(11)
+        x_start = rng.randrange(15)
+        canvas.fill_span(y_value, x_start, rng.randrange(x_start, 16), RAW_TO_IDX[rng.choice('rgx')])
+        start_coord = (rng.randrange(11), rng.randrange(15))
+        assert cells_of(index.region_spans(start_coord)) == flood_cells(canvas, start_coord, 4)
+        assert index.region_size(start_coord) == len(flood_cells(canvas, start_coord, 4))
+
+def test_count_runs():
+    canvas = canvas_of('xxrr', 'rgbx', 'xxxx')
+    assert count_runs(canvas, 100) == 2 + 4 + 1
+    # Counting stops once there are too many runs
+    assert 3 < count_runs(canvas, 3) <= 6
+
+def test_noisy_drawings_are_not_labeled():
+    canvas = canvas_of('xrxr', 'rxrx')
+    index = canvas.indexed(RegionIndex)
+    assert not index.can_label(max_runs=7)
+    assert index.can_label(max_runs=8)
+    # A labeled index stays readable however many runs it gets
+    index.refresh()
+    assert index.can_label(max_runs=1)
+
+def test_runs_are_counted_again_only_after_the_whole_canvas_changed(monkeypatch):
+    canvas = canvas_of('xrxr', 'rxrx')
+    index = canvas.indexed(RegionIndex)
+    limits = []
+    monkeypatch.setattr(termpaint_fill, 'count_runs', lambda canvas, limit: limits.append(limit) or count_runs(canvas, limit))
+    assert not index.can_label(max_runs=7)
+    canvas.set((0, 0), 3)
+    assert not index.can_label(max_runs=7)
+    assert limits == [7]
+    canvas.clear()
+    assert index.can_label(max_runs=7)
+    assert limits == [7, 7]
+
+def test_mapped_layers_are_not_labeled(tmp_path, monkeypatch):
+    fpath = str(tmp_path / 'a.bpaint')
+    create_binary_paint(fpath, (3, 4))
+    layer_canvas = open_binary_paint(fpath)
+    view = Viewport(LayeredCanvas([Layer(layer_canvas, 'paper')]), (3, 4))
+    fake = FakeCurses((3, 4))
+    monkeypatch.setattr(termpaint_lib, 'curses', fake)
+    try:
+        terminalpaint_tpl.fill_canvas(FakeWindow((3, 4), fake), view, (1, 1), ord('r'))
+        assert terminalpaint_tpl.region_note(view, (1, 1)) == ''
+        assert layer_canvas.count(3) == 12
+        assert layer_canvas.indexed(RegionIndex)._stale
+    finally:
+        layer_canvas.close()
+
+def test_opening_a_drawing_does_not_label_it(run_editor, tmp_path, monkeypatch):
+    write_paint(str(tmp_path / 'a.paint'), canvas_of('rrx', 'xrx'))
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache')))
+    run = run_editor([ctrl('o'), curses.KEY_END, ord('\n')])
+    assert RegionIndex not in run.canvas.indexes
+    run = run_editor([ctrl('o'), curses.KEY_END, ord('\n'), PAUSE, ctrl('f')] + [curses.KEY_RIGHT] + typed('b'))
+    assert run.canvas.span(0, 0, 3) == b'\x05\x05\x0a' and run.canvas.span(1, 0, 3) == b'\x0a\x05\x0a'
+    assert RegionIndex in run.canvas.indexes
+
+def test_noisy_drawing_fills_without_labeling(run_editor, monkeypatch):
+    monkeypatch.setattr(termpaint_fill, 'MAX_LABELED_RUNS', 10)
+    run = run_editor(typed('r') + [curses.KEY_RIGHT] + typed('g') + [PAUSE, ctrl('f'), curses.KEY_RIGHT] + typed('b'))
+    assert run.canvas.span(0, 0, 3) == b'\x03\x04\x05'
+    assert run.canvas.count(5) == run.canvas.dim[0] * run.canvas.dim[1] - 2
+    assert run.canvas.indexed(RegionIndex)._stale
@@ -0,0 +1,87 @@
+import curses
+import terminalpaint_tpl
+from conftest import PAUSE, ctrl, typed
+from termpaint_browser import OpenDialog
+from termpaint_canvas import Canvas
+from termpaint_fakecurses import FakeWindow
+from termpaint_frames import Animation
+from termpaint_io import read_paint, write_paint
+from terminalpaint_tpl import MODE_PROMPT_KEYS, read_keys
+
+def test_new_frames_share_tiles():
+    canvas = Canvas((40, 70), 3)
+    animation = Animation([canvas], tile_size=16)
+    tiles = len(animation.store)
+    assert animation.add_frame() == 1
+    animation.commit()
+    assert len(animation.store) == tiles
+    animation.set((20, 20), 4)
+    animation.commit()
+    assert len(animation.store) == tiles + 1
+    assert list(animation.changed_spans(0, 1, (0, 0), animation.dim)) == [(20, 20, 21, 4)]
+
+def test_frames_keep_their_cells():
+    animation = Animation([Canvas((5, 6))], tile_size=4)
+    animation.fill_span(1, 0, 6, 3)
+    animation.add_frame()
+    animation.fill_span(2, 2, 5, 5)
+    animation.select(0)
+    assert animation.get((2, 3)) == 10
+    animation.select(1)
+    assert animation.get((2, 3)) == 5 and animation.get((1, 5)) == 3
+    animation.delete_frame()
+    assert len(animation.frames) == 1
+    assert animation.frame_canvas(0).span(2, 0, 6) == b'\x0a' * 6
+
+def test_round_trip(tmp_path):
+    animation = Animation([Canvas((3, 4))], fps=8.0)
+    animation.set((0, 0), 3)
+    animation.add_frame()
+    animation.set((2, 3), 4)
+    fpath = str(tmp_path / 'a.paint')
+    write_paint(fpath, animation)
+    read_back = read_paint(fpath, frames=True)
+    assert isinstance(read_back, Animation)
+    assert read_back.fps == 8.0
+    assert [list(read_back.frame_rows(idx)) for idx in range(2)] == [list(animation.frame_rows(idx)) for idx in range(2)]
+    # Readers that want one image get the first frame
+    assert read_paint(fpath).snapshot() == animation.frame_canvas(0).snapshot()
+
+def test_frame_keys_open_prompts_only_in_the_frames_mode():
+    window = FakeWindow((5, 5))
+    window.feed(typed('pdfr'))
+    assert read_keys(window, prompt_keys=MODE_PROMPT_KEYS['Pencil']) == typed('pdfr')
+    window.feed(typed('rp') + typed('x'))
+    assert read_keys(window, prompt_keys=MODE_PROMPT_KEYS['Frames']) == typed('rp')
+    # The keys after ^D are read with the prompt keys of the Frames mode
+    window.feed([ctrl('d')] + typed('p'))
+    assert read_keys(window, prompt_keys=MODE_PROMPT_KEYS['Pencil']) == typed('x') + [ctrl('d')]
+
+def test_playback_stops_on_the_next_key(run_editor):
+    run = run_editor([ctrl('d')] + typed('ar') + typed('p') + typed('g'))
+    assert len(run.canvas.frames) == 2
+    assert any(msg.startswith('Played ') for msg in run.messages)
+    # The key that stopped the playback is not drawn
+    assert run.canvas.get((0, 0)) == 3
+
+def test_new_drawing_leaves_the_frames_mode(run_editor):
+    run = run_editor([ctrl('d')] + typed('a') + [ctrl('n')] + typed('20 40\n') + typed('a.,r'))
+    assert not isinstance(run.canvas, Animation)
+    assert run.canvas.dim == (20, 40)
+    assert run.canvas.get((0, 0)) == 3
+
+def test_opened_drawing_leaves_the_frames_mode(run_editor, tmp_path, monkeypatch):
+    write_paint(str(tmp_path / 'plain.paint'), Canvas((4, 5), 6))
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache')))
+    run = run_editor([ctrl('d')] + typed('a') + [ctrl('o'), curses.KEY_END, ord('\n')] + typed('ao') + [PAUSE] + typed('d'))
+    assert not isinstance(run.canvas, Animation)
+    assert run.canvas.get((0, 0)) == 6
+
+def test_opened_animation_stays_in_the_frames_mode(run_editor, tmp_path, monkeypatch):
+    animation = Animation([Canvas((4, 5))])
+    animation.add_frame()
+    write_paint(str(tmp_path / 'moving.paint'), animation)
+    monkeypatch.setattr(terminalpaint_tpl, 'OPEN_DIALOG', OpenDialog(terminalpaint_tpl.OPEN_SUFFIXES, str(tmp_path), str(tmp_path / 'cache')))
+    run = run_editor([ctrl('d'), ctrl('o'), curses.KEY_END, ord('\n')] + typed('a'))
+    assert isinstance(run.canvas, Animation)
+    assert len(run.canvas.frames) == 3
@@ -0,0 +1,96 @@
+import random
+from termpaint_canvas import Canvas
+from termpaint_history import CanvasEdit, CellEdit, GroupEdit, History, RegionEdit, ShapeEdit, SpanEdit
+
+def edit_canvas(canvas, history, edit_kind):
+    if edit_kind == 'cell':
+        history.record(CellEdit((1, 1), canvas.get((1, 1)), 3))
+        canvas.set((1, 1), 3)
+    elif edit_kind == 'span':
+        spans = [(0, 0, 4), (2, 1, 3)]
+        history.record(SpanEdit(spans, 10, 4))
+        for span in spans:
+            canvas.fill_span(*span, 4)
+    elif edit_kind == 'shape':
+        spans = [(1, 0, 4), (3, 2, 4)]
+        history.record(ShapeEdit(spans, b''.join(bytes(canvas.span(*span)) for span in spans), 5))
+        for span in spans:
+            canvas.fill_span(*span, 5)
+    elif edit_kind == 'region':
+        old_cells = b''.join(bytes(canvas.span(y_value, 1, 3)) for y_value in (2, 3))
+        history.record(RegionEdit((2, 1), (2, 2), old_cells, b'\x06\x07\x08\x09'))
+        canvas.write_span(2, 1, b'\x06\x07')
+        canvas.write_span(3, 1, b'\x08\x09')
+    else:
+        history.record(CanvasEdit(canvas, 7))
+        canvas.clear(7)
+
+def test_undo_and_redo_every_kind_of_edit():
+    canvas = Canvas((4, 4))
+    history = History()
+    kinds = ('cell', 'span', 'shape', 'region', 'clear', 'cell')
+    snapshots = [canvas.snapshot()]
+    for edit_kind in kinds:
+        edit_canvas(canvas, history, edit_kind)
+        snapshots.append(canvas.snapshot())
+
+    for snapshot in reversed(snapshots[:-1]):
+        assert history.undo(canvas) is not False
+        assert canvas.snapshot() == snapshot
+    assert history.undo(canvas) is False
+
+    for snapshot in snapshots[1:]:
+        assert history.redo(canvas) is not False
+        assert canvas.snapshot() == snapshot
+    assert history.redo(canvas) is False
+
+def test_undo_returns_the_spans_to_redraw():
+    canvas = Canvas((4, 4))
+    history = History()
+    edit_canvas(canvas, history, 'span')
+    assert sorted(history.undo(canvas)) == [(0, 0, 4, 10), (2, 1, 3, 10)]
+    edit_canvas(canvas, history, 'clear')
+    assert history.undo(canvas) is None
+
+def test_recording_clears_the_redo_stack():
+    canvas = Canvas((4, 4))
+    history = History()
+    edit_canvas(canvas, history, 'cell')
+    history.undo(canvas)
+    edit_canvas(canvas, history, 'span')
+    assert history.redo(canvas) is False
+    assert history.size() == history._undo[0].size()
+
+def test_oldest_edits_are_dropped_over_the_cap():
+    canvas = Canvas((4, 4))
+    history = History(max_bytes=200)
+    versions = []
+    for _ in range(10):
+        edit_canvas(canvas, history, 'cell')
+        versions.append(history.version)
+    assert history.size() <= 200
+    assert len(history._undo) == 200 // CellEdit((0, 0), 0, 0).size()
+    assert versions == list(range(1, 11))
+
+def test_edit_over_the_cap_is_not_journaled():
+    rng = random.Random(3)
+    canvas = Canvas((40, 40))
+    for y_value in range(40):
+        canvas.write_span(y_value, 0, bytes(rng.randrange(3, 11) for _ in range(40)))
+    history = History(max_bytes=300)
+    edit_canvas(canvas, history, 'cell')
+    edit = CanvasEdit(canvas, 10)
+    assert edit.size() > 300
+    assert history.record(edit) is False
+    # The older edits are kept, and the drawing still counts as changed
+    assert len(history._undo) == 1 and history.version == 2
+
+def test_group_edit_undoes_all_its_parts():
+    canvas = Canvas((2, 2))
+    history = History()
+    edits = [CellEdit((0, 0), 10, 3), CellEdit((1, 1), 10, 4)]
+    canvas.set((0, 0), 3)
+    canvas.set((1, 1), 4)
+    history.record(GroupEdit(edits))
+    history.undo(canvas)
+    assert canvas.snapshot() == Canvas((2, 2)).snapshot()
@@ -0,0 +1,118 @@
+import random
+import struct
+import zlib
+import pytest
+import termpaint_import
+from termpaint_canvas import Canvas
+from termpaint_export import write_png, write_ppm
+from termpaint_import import DRAWING_COLORS, image_to_canvas, quantize_pixels, read_image, resize_pixels
+
+@pytest.fixture(params=['numpy', 'pure'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(termpaint_import, 'np', None)
+    return request.param
+
+def random_pixels(dim, seed=0):
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(dim[0] * dim[1] * 3))
+
+def paeth(left, up, upper_left):
+    estimate = left + up - upper_left
+    distances = [abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)]
+    return (left, up, upper_left)[distances.index(min(distances))]
+
+def filter_line(filter_type, line, prev, bpp):
+    out = bytearray()
+    for i, value in enumerate(line):
+        left = line[i - bpp] if i >= bpp else 0
+        upper_left = prev[i - bpp] if i >= bpp else 0
+        predictor = (0, left, prev[i], (left + prev[i]) >> 1, paeth(left, prev[i], upper_left))[filter_type]
+        out.append((value - predictor) & 0xff)
+    return bytes(out)
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def write_test_png(fpath, dim, raw, color_type, bpp, palette=None):
+    stride = dim[1] * bpp
+    prev = bytes(stride)
+    data = bytearray()
+    for y_value in range(dim[0]):
+        line = raw[y_value * stride:(y_value + 1) * stride]
+        filter_type = y_value % 5
+        data += bytes([filter_type]) + filter_line(filter_type, line, prev, bpp)
+        prev = line
+    with open(fpath, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', dim[1], dim[0], 8, color_type, 0, 0, 0)))
+        if palette is not None:
+            f.write(png_chunk(b'PLTE', palette))
+        f.write(png_chunk(b'IDAT', zlib.compress(bytes(data))))
+        f.write(png_chunk(b'IEND', b''))
+
+def test_png_filters_and_color_types(tmp_path, backend):
+    dim = (10, 7)
+    rgb = random_pixels(dim)
+    fpath = str(tmp_path / 'a.png')
+
+    write_test_png(fpath, dim, rgb, 2, 3)
+    assert read_image(fpath) == (dim, rgb)
+
+    rgba = bytes(value for i in range(0, len(rgb), 3) for value in rgb[i:i + 3] + b'\x80')
+    write_test_png(fpath, dim, rgba, 6, 4)
+    assert read_image(fpath) == (dim, rgb)
+
+    gray = rgb[::3]
+    write_test_png(fpath, dim, gray, 0, 1)
+    assert read_image(fpath) == (dim, bytes(value for value in gray for _ in range(3)))
+
+    palette = random_pixels((1, 256), seed=1)
+    write_test_png(fpath, dim, gray, 3, 1, palette)
+    assert read_image(fpath) == (dim, b''.join(palette[value * 3:value * 3 + 3] for value in gray))
+
+def test_exported_images_import_to_the_same_cells(tmp_path, backend):
+    canvas = Canvas((4, 6))
+    for x_value, color_pair_idx in enumerate(DRAWING_COLORS[:6]):
+        canvas.fill_span(x_value % 4, 0, x_value + 1, color_pair_idx)
+    for suffix, write in (('png', write_png), ('ppm', write_ppm)):
+        fpath = str(tmp_path / f'a.{suffix}')
+        write(fpath, canvas, 3)
+        assert image_to_canvas(fpath, canvas.dim).snapshot() == canvas.snapshot()
+        assert image_to_canvas(fpath, canvas.dim, dither=True).snapshot() == canvas.snapshot()
+
+def test_rejects_bad_images(tmp_path):
+    fpath = tmp_path / 'a.ppm'
+    fpath.write_bytes(b'P6\n4 4\n255\n' + bytes(10))
+    with pytest.raises(ValueError):
+        read_image(str(fpath))
+    fpath.write_bytes(b'P3\n1 1\n255\n0 0 0\n')
+    with pytest.raises(ValueError):
+        read_image(str(fpath))
+    write_ppm(str(fpath), Canvas((1, 1)))
+    with pytest.raises(ValueError):
+        image_to_canvas(str(fpath), (0, 3))
+
+@pytest.mark.parametrize('dim', [(1, 1), (1, 9), (9, 1), (13, 17)])
+def test_numpy_and_pure_python_quantize_the_same(monkeypatch, dim):
+    pytest.importorskip('numpy')
+    pixels = random_pixels(dim, seed=dim[0] * dim[1])
+    with_numpy = [quantize_pixels(pixels, dim, dither) for dither in (False, True)]
+    monkeypatch.setattr(termpaint_import, 'np', None)
+    assert [quantize_pixels(pixels, dim, dither) for dither in (False, True)] == with_numpy
+
+def test_dithering_keeps_the_average_color(backend):
+    dim = (16, 16)
+    gray = bytes([128]) * (dim[0] * dim[1] * 3)
+    assert set(quantize_pixels(gray, dim)) == {DRAWING_COLORS[6]}
+    cells = quantize_pixels(gray, dim, dither=True)
+    assert set(cells) == {DRAWING_COLORS[6], DRAWING_COLORS[7]}
+    assert abs(cells.count(DRAWING_COLORS[6]) - len(cells) // 2) <= dim[1]
+
+def test_resize(backend):
+    pixels = bytes([0, 0, 0, 255, 255, 255]) * 2 + bytes([90, 90, 90]) * 4
+    assert resize_pixels(pixels, (2, 4), (2, 4)) == pixels
+    assert resize_pixels(pixels, (2, 4), (4, 8))[:6] == bytes([0, 0, 0, 0, 0, 0])
+    assert len(resize_pixels(pixels, (2, 4), (1, 2))) == 6
@@ -0,0 +1,81 @@
+import os
+import pytest
+import termpaint_io
+from termpaint_canvas import Canvas
+from termpaint_io import (PAINT_MAGIC, PAINT_RLE_MAGIC, RAW_TO_IDX, decode_rle_row, encode_rle_row,
+                          read_paint, write_paint)
+from termpaint_palette import Palette
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test-paint')
+
+def raw_row(line):
+    return bytes(RAW_TO_IDX[raw] for raw in line)
+
+def test_rle_row_round_trip():
+    row = raw_row('ccccccccccccccccccccccwwwwwwwwwwwwwrx')
+    assert encode_rle_row(row) == '22c13wrx'
+    assert decode_rle_row('22c13wrx') == row
+
+@pytest.mark.parametrize('line', ('0r', '3r0x', '00b'))
+def test_rle_row_rejects_count_of_zero(line):
+    with pytest.raises(ValueError):
+        decode_rle_row(line)
+
+def test_rle_row_rejects_huge_count_without_allocating():
+    with pytest.raises(ValueError):
+        decode_rle_row('999999999999r')
+    with pytest.raises(ValueError):
+        decode_rle_row('5r', max_len=4)
+    assert decode_rle_row('4r', max_len=4) == raw_row('rrrr')
+
+@pytest.mark.parametrize('line', ('3', 'r3', '3R', '2#05', '#0b3'))
+def test_rle_row_rejects_malformed_rows(line):
+    with pytest.raises(ValueError):
+        decode_rle_row(line)
+
+def test_read_paint_refuses_too_many_cells(tmp_path, monkeypatch):
+    monkeypatch.setattr(termpaint_io, 'MAX_CELLS', 100)
+    fpath = tmp_path / 'big.paint'
+    fpath.write_text(PAINT_RLE_MAGIC + '\n' + '10r\n' * 11)
+    with pytest.raises(ValueError):
+        read_paint(str(fpath))
+    fpath.write_text(PAINT_RLE_MAGIC + '\n' + '10r\n' * 10)
+    assert read_paint(str(fpath)).dim == (10, 10)
+
+@pytest.mark.parametrize('name', ('sample1.paint', 'sample2.paint', 'sample3.paint'))
+@pytest.mark.parametrize('rle', (True, False))
+def test_sample_files_round_trip(tmp_path, name, rle):
+    canvas = read_paint(os.path.join(SAMPLES, name))
+    with open(os.path.join(SAMPLES, name)) as sample_file:
+        assert sample_file.readline().strip() == PAINT_MAGIC
+        lines = [line.strip() for line in sample_file]
+    assert [bytes(row) for row in canvas.rows()] == [raw_row(line) for line in lines]
+
+    out_path = str(tmp_path / name)
+    write_paint(out_path, canvas, rle=rle)
+    assert [bytes(row) for row in read_paint(out_path).rows()] == [bytes(row) for row in canvas.rows()]
+    if rle:
+        assert os.path.getsize(out_path) < os.path.getsize(os.path.join(SAMPLES, name)) / 2
+
+def test_read_paint_with_dim_crops_and_pads(tmp_path):
+    fpath = tmp_path / 'a.paint'
+    fpath.write_text(PAINT_RLE_MAGIC + '\n3r\n3g\n3b\n')
+    canvas = read_paint(str(fpath), dim=(2, 5))
+    assert [bytes(row) for row in canvas.rows()] == [raw_row('rrrxx'), raw_row('gggxx')]
+
+def test_read_paint_rejects_bad_magic(tmp_path):
+    fpath = tmp_path / 'a.paint'
+    fpath.write_text('NOT_A_PAINT_FILE\nrr\n')
+    with pytest.raises(ValueError):
+        read_paint(str(fpath))
+
+def test_failed_plain_write_leaves_the_file(tmp_path):
+    fpath = str(tmp_path / 'a.paint')
+    write_paint(fpath, Canvas((2, 3), 4))
+    before = open(fpath).read()
+    palette = Palette()
+    canvas = Canvas((2, 3))
+    canvas.set((1, 2), palette.add((1, 2, 3)))
+    with pytest.raises(ValueError, match='run-length encoded'):
+        write_paint(fpath, canvas, rle=False, palette=palette)
+    assert open(fpath).read() == before
@@ -0,0 +1,89 @@
+import curses
+import random
+import pytest
+from conftest import PAUSE, ctrl, typed
+from termpaint_canvas import Canvas
+from termpaint_io import read_paint, write_paint
+from termpaint_layers import Layer, LayeredCanvas
+
+def flatten_naively(layered):
+    rows, cols = layered.dim
+    cells = bytearray([10]) * (rows * cols)
+    for layer in layered.layers:
+        if not layer.visible:
+            continue
+        for i, cell in enumerate(layer.canvas.snapshot()):
+            if cell != layer.transparent:
+                cells[i] = cell
+    return bytes(cells)
+
+def test_layers_must_have_the_same_dimensions():
+    with pytest.raises(ValueError):
+        LayeredCanvas([Layer(Canvas((2, 2)), 'a'), Layer(Canvas((2, 3)), 'b')])
+    with pytest.raises(ValueError):
+        LayeredCanvas([])
+
+def test_composite_follows_random_edits():
+    rng = random.Random(3)
+    dim = (23, 37)
+    layered = LayeredCanvas([Layer(Canvas(dim, 7), 'bottom')], tile_size=8)
+    layered.add_layer('middle')
+    layered.add_layer('top', transparent=3)
+    for step in range(400):
+        action = rng.randrange(10)
+        if action == 0:
+            layered.select(rng.randrange(len(layered.layers)))
+        elif action == 1:
+            idx = rng.randrange(len(layered.layers))
+            layered.set_visible(idx, not layered.layers[idx].visible)
+        elif action == 2:
+            layered.set_transparent(rng.randrange(len(layered.layers)), rng.choice([None, 3, 10]))
+        elif action < 6:
+            layered.set((rng.randrange(dim[0]), rng.randrange(dim[1])), rng.randrange(3, 11))
+        else:
+            y_value = rng.randrange(dim[0])
+            x_start = rng.randrange(dim[1])
+            layered.fill_span(y_value, x_start, rng.randrange(x_start, dim[1] + 1), rng.randrange(3, 11))
+        if step % 7 == 0:
+            assert layered.flatten().snapshot() == flatten_naively(layered)
+    assert layered.flatten().snapshot() == flatten_naively(layered)
+
+def test_edits_go_to_the_active_layer():
+    layered = LayeredCanvas([Layer(Canvas((2, 3)), 'bottom')])
+    assert layered.add_layer('top') == 1
+    layered.set((0, 1), 4)
+    assert layered.layers[0].canvas.get((0, 1)) == 10
+    assert layered.get((0, 1)) == 4
+    layered.select(0)
+    layered.fill_span(0, 0, 3, 5)
+    assert layered.composite_span(0, 0, 3) == b'\x05\x04\x05'
+    layered.set_visible(1, False)
+    assert layered.composite_span(0, 0, 3) == b'\x05\x05\x05'
+
+def test_round_trip(tmp_path):
+    layered = LayeredCanvas([Layer(Canvas((3, 4), 6), 'paper')])
+    layered.add_layer('ink')
+    layered.fill_span(1, 1, 3, 3)
+    layered.add_layer('notes', transparent=None)
+    layered.set_visible(2, False)
+    fpath = str(tmp_path / 'a.paint')
+    write_paint(fpath, layered)
+
+    read_back = read_paint(fpath, layers=True)
+    assert [(layer.name, layer.visible, layer.transparent) for layer in read_back.layers] == [(layer.name, layer.visible, layer.transparent) for layer in layered.layers]
+    assert [layer.canvas.snapshot() for layer in read_back.layers] == [layer.canvas.snapshot() for layer in layered.layers]
+    # Readers that want one image get the flattened one
+    assert read_paint(fpath).snapshot() == layered.flatten().snapshot()
+
+def test_editor_draws_on_the_new_layer(run_editor):
+    run = run_editor(typed('r') + [ctrl('a')] + typed('g') + [curses.KEY_RIGHT] + typed('b'))
+    assert isinstance(run.canvas, LayeredCanvas)
+    assert run.canvas.layers[0].canvas.get((0, 0)) == 3
+    assert run.canvas.layers[1].canvas.span(0, 0, 2) == b'\x04\x05'
+    assert run.window.pairs[0][:3] == b'\x04\x05\x0a'
+
+def test_editor_hides_layers_and_undoes_on_them(run_editor):
+    run = run_editor(typed('r') + [ctrl('a')] + typed('g') + [ctrl('g')])
+    assert run.window.pairs[0][:1] == b'\x03'
+    run = run_editor(typed('r') + [ctrl('a')] + typed('g') + [PAUSE, ctrl('z'), PAUSE, ctrl('z')])
+    assert [layer.canvas.get((0, 0)) for layer in run.canvas.layers] == [10, 10]
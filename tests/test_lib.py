@@ -0,0 +1,75 @@
+import importlib.util
+import pytest
+import termpaint_lib
+from termpaint_canvas import Canvas
+from termpaint_fakecurses import FakeCurses
+from termpaint_palette import FIRST_PALETTE_IDX
+from termpaint_view import Viewport
+
+@pytest.fixture
+def fake_curses():
+    fake = FakeCurses((10, 20))
+    previous = termpaint_lib.use_backend(fake)
+    yield fake
+    termpaint_lib.use_backend(previous)
+
+def test_color_cell_at_works_before_color_pairs_are_made(fake_curses):
+    # A fresh copy of the module, as it is before `init_color_pairs()` is called
+    spec = importlib.util.spec_from_file_location('fresh_termpaint_lib', termpaint_lib.__file__)
+    fresh_lib = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fresh_lib)
+    fresh_lib.use_backend(fake_curses)
+    window = fake_curses.stdscr
+    fresh_lib.color_cell_at(window, (0, 0), 3)
+    fresh_lib.color_cell_at(window, (0, 1), 200)
+    assert window.pairs[0][:2] == b'\x00\x00'
+
+    fresh_lib.init_color_pairs()
+    fresh_lib.color_cell_at(window, (0, 0), 3)
+    assert window.pairs[0][0] == 3
+
+def test_draw_canvas_draws_runs(fake_curses):
+    termpaint_lib.init_color_pairs()
+    window = fake_curses.stdscr
+    canvas = Canvas((5, 8))
+    canvas.fill_span(2, 1, 6, 4)
+    view = Viewport(canvas, (5, 8))
+    window.calls = 0
+    termpaint_lib.draw_canvas(window, view)
+    assert bytes(window.pairs[2][:8]) == b'\x0a\x04\x04\x04\x04\x04\x0a\x0a'
+    assert all(bytes(window.pairs[y_value][:8]) == b'\x0a' * 8 for y_value in (0, 1, 3, 4))
+    # One call per run of a row, not per cell
+    assert window.calls <= 5 + 2 + 2
+
+def test_only_cells_of_evicted_colors_are_drawn_again(fake_curses):
+    # Two color pairs for the palette colors
+    fake_curses.COLOR_PAIRS = FIRST_PALETTE_IDX + 2
+    termpaint_lib.init_color_pairs()
+    palette, pairs = termpaint_lib.PALETTE, termpaint_lib.PAIRS
+    window = fake_curses.stdscr
+    try:
+        first, second, third = (palette.add(rgb) for rgb in ((10, 20, 30), (40, 50, 60), (70, 80, 90)))
+        canvas = Canvas((3, 6))
+        canvas.fill_span(0, 0, 3, first)
+        canvas.fill_span(1, 0, 3, second)
+        view = Viewport(canvas, (3, 6))
+        termpaint_lib.draw_canvas(window, view)
+        pairs.evicted.clear()
+
+        canvas.fill_span(2, 0, 2, third)
+        termpaint_lib.color_cell_at(window, (2, 0), third, length=2)
+        assert pairs.evicted == {first}
+        # The pair of the first color now shows the third
+        assert window.pairs[0][0] == window.pairs[2][0]
+
+        evicted = set(pairs.evicted)
+        pairs.evicted.clear()
+        window.calls = 0
+        termpaint_lib.redraw_colors(window, view, evicted)
+        assert window.calls == 1
+        assert window.pairs[0][:3] == bytes([window.pairs[0][0]]) * 3
+        assert window.pairs[0][0] not in (window.pairs[2][0], 0)
+    finally:
+        palette.clear()
+        pairs.reset()
+        pairs.evicted.clear()
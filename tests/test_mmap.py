@@ -0,0 +1,49 @@
+import pytest
+from termpaint_canvas import Canvas
+from termpaint_mmap import HEADER_SIZE, create_binary_paint, open_binary_paint, write_binary_paint
+
+def test_create_and_open(tmp_path):
+    fpath = str(tmp_path / 'a.bpaint')
+    create_binary_paint(fpath, (3, 5), 4)
+    canvas = open_binary_paint(fpath)
+    try:
+        assert canvas.dim == (3, 5)
+        assert canvas.mapped_path == fpath
+        assert all(bytes(row) == b'\x04' * 5 for row in canvas.rows())
+    finally:
+        canvas.close()
+
+def test_edits_reach_the_file(tmp_path):
+    fpath = str(tmp_path / 'a.bpaint')
+    create_binary_paint(fpath, (2, 4))
+    canvas = open_binary_paint(fpath)
+    canvas.set((1, 2), 3)
+    canvas.fill_span(0, 0, 2, 5)
+    canvas.close()
+
+    canvas = open_binary_paint(fpath, writable=False)
+    try:
+        assert [bytes(row) for row in canvas.rows()] == [b'\x05\x05\x0a\x0a', b'\x0a\x0a\x03\x0a']
+    finally:
+        canvas.close()
+
+def test_write_round_trip(tmp_path):
+    fpath = str(tmp_path / 'a.bpaint')
+    canvas = Canvas((2, 3))
+    canvas.set((0, 1), 7)
+    write_binary_paint(fpath, canvas)
+    mapped = open_binary_paint(fpath, writable=False)
+    try:
+        assert mapped.snapshot() == canvas.snapshot()
+    finally:
+        mapped.close()
+
+def test_rejects_truncated_and_foreign_files(tmp_path):
+    fpath = tmp_path / 'a.bpaint'
+    create_binary_paint(str(fpath), (4, 4))
+    fpath.write_bytes(fpath.read_bytes()[:HEADER_SIZE + 10])
+    with pytest.raises(ValueError):
+        open_binary_paint(str(fpath))
+    fpath.write_bytes(b'not a drawing')
+    with pytest.raises(ValueError):
+        open_binary_paint(str(fpath))
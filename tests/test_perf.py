@@ -0,0 +1,56 @@
+import json
+import terminalpaint_tpl
+from conftest import PAUSE, ctrl, typed
+from termpaint_fakecurses import FakeWindow
+from termpaint_perf import CommandStats, CountingWindow, PerfRecorder
+
+def test_histogram_buckets_and_percentiles():
+    stats = CommandStats()
+    for seconds in (0.0000005, 0.000003, 0.000003, 0.001):
+        stats.add(seconds)
+    assert stats.histogram == {0: 1, 1: 2, 9: 1}
+    assert stats.percentiles() == (0.000003, 0.001)
+    assert stats.to_dict()['histogram_us'] == {'1': 1, '2': 2, '512': 1}
+    assert CommandStats().percentiles() == (0.0, 0.0)
+
+def test_counting_window_counts_calls_and_cells():
+    window = CountingWindow(FakeWindow((4, 10)))
+    window.chgat(0, 2, 3, 0)
+    window.chgat(1, 4, 0)
+    window.addstr(2, 0, 'abc')
+    window.addstr('de')
+    assert window.getmaxyx() == (4, 10)
+    assert window.calls == 5
+    assert window.cells == 3 + 6 + 3 + 2
+
+def test_recorder_times_commands():
+    recorder = PerfRecorder(CountingWindow(FakeWindow((4, 10))))
+    token = recorder.begin()
+    recorder.w.chgat(0, 0, 4, 0)
+    recorder.end(token, 'pencil')
+    assert recorder.commands['pencil'].count == 1
+    assert recorder.commands['pencil'].cells == 4
+    assert recorder.commands['pencil'].curses_calls == 1
+    assert recorder.overlay_text() == ''
+    recorder.overlay = True
+    recorder.frame(0.002)
+    assert recorder.overlay_text().startswith('frame 2.00ms | pencil p50 ')
+
+def test_editor_writes_the_timings(run_editor, monkeypatch, tmp_path):
+    notes = []
+    print_status_note = terminalpaint_tpl.print_status_note
+
+    def recording_status_note(w, term_dim, note):
+        notes.append(note)
+        print_status_note(w, term_dim, note)
+
+    monkeypatch.setattr(terminalpaint_tpl, 'print_status_note', recording_status_note)
+    perf_path = tmp_path / 'perf.json'
+    run = run_editor(typed('r') + [ctrl('t')] + typed('g') + [PAUSE] + typed('b'), perf_path=str(perf_path))
+    assert run.canvas.get((0, 0)) == 5
+
+    timings = json.loads(perf_path.read_text())
+    assert timings['commands']['pencil']['count'] == 3
+    assert timings['commands']['pencil']['cells'] >= 2
+    assert timings['frames']['count'] >= 2
+    assert any(note.startswith('frame ') and ' | pencil p50 ' in note for note in notes)
@@ -0,0 +1,63 @@
+import curses
+import json
+import pytest
+from conftest import PAUSE, ctrl, typed
+from termpaint_io import read_paint, write_paint
+from termpaint_replay import replay_session
+from termpaint_session import read_session
+
+KEYS = typed('r') + [curses.KEY_RIGHT] * 3 + [curses.KEY_DOWN] + typed('g') + [ctrl('f')] + [curses.KEY_DOWN] + typed('b') + [PAUSE, ctrl('s')] + typed('saved.paint\n')
+
+def record(run_editor, tmp_path, monkeypatch, keys=KEYS):
+    monkeypatch.chdir(tmp_path)
+    session_path = str(tmp_path / 'session.jsonl')
+    run = run_editor(keys, dim=(12, 40), record_path=session_path)
+    return run, session_path
+
+def test_session_file(run_editor, tmp_path, monkeypatch):
+    session_path = record(run_editor, tmp_path, monkeypatch)[1]
+    header, events = read_session(session_path)
+    assert header['term_dim'] == [12, 40]
+    # The name typed at the prompt is recorded as text, not as keys
+    keys = [key for key in KEYS[:KEYS.index(ctrl('s')) + 1] if key != PAUSE]
+    assert [event[2] for event in events if event[1] == 'k' and event[2] != -1][:len(keys) + 1] == keys + [ctrl('q')]
+    assert ('s', 'saved.paint') in [event[1:] for event in events]
+    assert all(later[0] >= earlier[0] for earlier, later in zip(events, events[1:]))
+
+def test_replay_matches_the_recorded_drawing(run_editor, tmp_path, monkeypatch):
+    run, session_path = record(run_editor, tmp_path, monkeypatch)
+    expected_path = str(tmp_path / 'expected.paint')
+    write_paint(expected_path, run.canvas)
+    (tmp_path / 'saved.paint').unlink()
+
+    result = replay_session(session_path, expected_path, save_path=str(tmp_path / 'replayed.paint'))
+    assert result['complete'] and result['matches']
+    assert result['cells_differing'] == 0
+    assert result['dim'] == list(run.canvas.dim)
+    # The save typed during the session happens again
+    assert read_paint(str(tmp_path / 'saved.paint')).snapshot() == run.canvas.snapshot()
+    assert read_paint(str(tmp_path / 'replayed.paint')).snapshot() == run.canvas.snapshot()
+
+def test_replay_reports_differences(run_editor, tmp_path, monkeypatch):
+    run, session_path = record(run_editor, tmp_path, monkeypatch)
+    run.canvas.set((5, 5), 8)
+    expected_path = str(tmp_path / 'expected.paint')
+    write_paint(expected_path, run.canvas)
+    result = replay_session(session_path, expected_path)
+    assert not result['matches']
+    assert result['cells_differing'] == 1
+
+def test_replay_quits_sessions_cut_short(run_editor, tmp_path, monkeypatch):
+    session_path = record(run_editor, tmp_path, monkeypatch, typed('r'))[1]
+    with open(session_path) as f:
+        lines = f.readlines()
+    with open(session_path, 'w') as f:
+        f.writelines(lines[:3])
+    result = replay_session(session_path)
+    assert result['complete']
+
+def test_rejects_other_files(tmp_path):
+    fpath = tmp_path / 'session.jsonl'
+    fpath.write_text(json.dumps({'format': 'other'}) + '\n')
+    with pytest.raises(ValueError):
+        read_session(str(fpath))
@@ -0,0 +1,71 @@
+import curses
+import pytest
+import terminalpaint_tpl
+from conftest import PAUSE, ctrl, typed
+from termpaint_shapes import ellipse_spans, line_spans, rect_spans, spans_difference
+
+def cells(spans):
+    return {(y_value, x_value) for y_value, x_start, x_end in spans for x_value in range(x_start, x_end)}
+
+@pytest.mark.parametrize('end_coord', [(0, 9), (9, 0), (3, 8), (8, 3), (-4, -7), (5, 5)])
+def test_lines_are_connected_and_reach_both_ends(end_coord):
+    line = cells(line_spans((0, 0), end_coord))
+    assert (0, 0) in line and end_coord in line
+    assert len(line) == max(abs(end_coord[0]), abs(end_coord[1])) + 1
+    for y_value, x_value in line:
+        if (y_value, x_value) != end_coord:
+            assert any((y_value + d_y, x_value + d_x) in line for d_y in (-1, 0, 1) for d_x in (-1, 0, 1) if d_y or d_x)
+
+def test_flat_lines_are_one_span():
+    assert line_spans((2, 7), (2, 1)) == [(2, 1, 8)]
+
+def test_rectangles():
+    assert rect_spans((3, 4), (1, 1), filled=True) == [(1, 1, 5), (2, 1, 5), (3, 1, 5)]
+    outline = cells(rect_spans((1, 1), (4, 5)))
+    assert outline == {(y_value, x_value) for y_value in range(1, 5) for x_value in range(1, 6) if y_value in (1, 4) or x_value in (1, 5)}
+    assert rect_spans((0, 0), (2, 1)) == [(0, 0, 2), (1, 0, 2), (2, 0, 2)]
+
+@pytest.mark.parametrize('corner', [(0, 0), (6, 9), (7, 12), (1, 12), (12, 1)])
+def test_ellipses_touch_their_rectangle_and_are_symmetric(corner):
+    outline = cells(ellipse_spans((0, 0), corner))
+    assert min(y_value for y_value, _ in outline) == 0 and max(y_value for y_value, _ in outline) == corner[0]
+    assert min(x_value for _, x_value in outline) == 0 and max(x_value for _, x_value in outline) == corner[1]
+    assert outline == {(corner[0] - y_value, x_value) for y_value, x_value in outline}
+    assert outline == {(y_value, corner[1] - x_value) for y_value, x_value in outline}
+    filled = cells(ellipse_spans(corner, (0, 0), filled=True))
+    assert outline <= filled
+    assert {y_value for y_value, _ in filled} == set(range(corner[0] + 1))
+
+def test_spans_difference():
+    assert spans_difference([(0, 0, 10), (1, 0, 3)], [(0, 2, 4), (0, 6, 7), (2, 0, 5)]) == [(0, 0, 2), (0, 4, 6), (0, 7, 10), (1, 0, 3)]
+    assert spans_difference([(0, 2, 4)], [(0, 0, 10)]) == []
+
+def test_draw_and_undo_a_rectangle(run_editor):
+    keys = [ctrl('r')] + typed('r') + [curses.KEY_RIGHT] * 4 + [curses.KEY_DOWN] * 2 + [PAUSE] + typed('b')
+    run = run_editor(keys)
+    assert cells([(y_value, x_value, x_value + 1) for y_value in range(4) for x_value in range(6) if run.canvas.get((y_value, x_value)) == 5]) == cells(rect_spans((0, 0), (2, 4)))
+    assert run.window.pairs[1][:5] == b'\x05\x0a\x0a\x0a\x05'
+
+    run = run_editor(keys + [PAUSE, ctrl('z')])
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1]
+
+def test_preview_only_changes_the_screen(run_editor, monkeypatch):
+    # The screen before every batch of keys; quitting drops the preview
+    screens = []
+    read_keys = terminalpaint_tpl.read_keys
+
+    def recording_read_keys(w, *args, **kwargs):
+        screens.append([bytes(row) for row in w.pairs])
+        return read_keys(w, *args, **kwargs)
+
+    monkeypatch.setattr(terminalpaint_tpl, 'read_keys', recording_read_keys)
+    run = run_editor([ctrl('l')] + typed('g') + [curses.KEY_RIGHT] * 3 + [curses.KEY_DOWN] * 3)
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1]
+    assert [screens[1][y_value][y_value] for y_value in range(4)] == [4] * 4
+    assert [run.window.pairs[y_value][y_value] for y_value in range(4)] == [10] * 4
+
+def test_other_commands_drop_the_preview(run_editor):
+    run = run_editor([ctrl('e'), ctrl('e')] + typed('g') + [curses.KEY_RIGHT] * 4 + [curses.KEY_DOWN] * 2 + [PAUSE, ctrl('p')] + typed('r'))
+    assert run.canvas.get((2, 4)) == 3
+    assert run.canvas.count(10) == run.canvas.dim[0] * run.canvas.dim[1] - 1
+    assert run.window.pairs[0][:4] == b'\x0a\x0a\x0a\x0a'
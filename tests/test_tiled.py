@@ -0,0 +1,63 @@
+import random
+import pytest
+from termpaint_canvas import Canvas, TiledCanvas
+from termpaint_view import Viewport
+
+def random_edits(canvases, seed, count=300):
+    random.seed(seed)
+    rows, cols = canvases[0].dim
+    for _ in range(count):
+        y_value, x_value = random.randrange(rows), random.randrange(cols)
+        color = random.choice((3, 4, 10))
+        if random.random() < 0.5:
+            for canvas in canvases:
+                canvas.set((y_value, x_value), color)
+        else:
+            x_end = random.randint(x_value, cols)
+            for canvas in canvases:
+                canvas.fill_span(y_value, x_value, x_end, color)
+
+@pytest.mark.parametrize('max_tiles', (1, 4, 1024))
+def test_matches_a_plain_canvas(max_tiles):
+    canvas = Canvas((37, 53))
+    tiled = TiledCanvas((37, 53), tile_size=8, max_tiles=max_tiles)
+    random_edits((canvas, tiled), max_tiles)
+    assert tiled.snapshot() == canvas.snapshot()
+    assert tiled.span(5, 3, 40) == bytes(canvas.span(5, 3, 40))
+    for color in (3, 4, 10, 5):
+        assert tiled.count(color) == canvas.count(color)
+    cropped = tiled.crop((3, 7), (20, 30))
+    assert isinstance(cropped, TiledCanvas)
+    assert cropped.snapshot() == canvas.crop((3, 7), (20, 30)).snapshot()
+    with pytest.raises(ValueError):
+        tiled.crop((30, 0), (10, 10))
+
+def test_blank_tiles_take_no_memory():
+    tiled = TiledCanvas((1000, 1000), tile_size=10)
+    tiled.set((5, 5), 3)
+    tiled.set((5, 5), 10)
+    tiled.fill_span(500, 0, 1000, 10)
+    assert len(tiled._tiles) == 1
+    assert tiled.count(10) == 1000 * 1000
+
+def test_drops_tiles_away_from_the_view_first():
+    tiled = TiledCanvas((80, 80), tile_size=10, max_tiles=12)
+    view = Viewport(tiled, (10, 10))
+    view.origin = (40, 40)
+    # Touch the tiles around the view first, so they are the least recently used
+    for y_value in range(30, 60, 10):
+        for x_value in range(30, 60, 10):
+            tiled.set((y_value, x_value), 3)
+    for x_value in range(0, 80, 10):
+        tiled.set((0, x_value), 4)
+        tiled.set((79, x_value), 4)
+    assert all((tile_y, tile_x) in tiled._tiles for tile_y in range(3, 6) for tile_x in range(3, 6))
+    assert len(tiled._tiles) == 12
+    assert tiled.get((0, 0)) == 4 and tiled.get((79, 0)) == 4
+
+def test_viewport_tells_a_new_canvas_where_it_is():
+    view = Viewport(Canvas((10, 10)), (5, 5))
+    tiled = TiledCanvas((100, 100), tile_size=10)
+    view.replace(tiled)
+    view.origin = (50, 20)
+    assert tiled._kept == (4, 1, 6, 3)